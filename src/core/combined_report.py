@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+Zbiorczy raport PDF dla wielu podmiotów (pakiety audytowe)
+
+Zamiast tysięcy pojedynczych plików — każdy z własną kopią podzbioru
+czcionki i narzutem pliku — cała partia trafia do jednego dokumentu:
+na początku zestawienie podmiotów (z odnośnikami), dalej raporty kolejnych
+podmiotów, każdy z zakładką w konspekcie (outline) PDF. Czcionka jest
+osadzana raz na dokument.
+
+Rekordy są buforowane tylko do zamknięcia bieżącej części, więc pamięć
+zależy od rozmiaru części, a nie całej partii — poza trybem jednego pliku
+(max_entities=0 bez max_bytes), w którym cała partia jest trzymana
+w pamięci do close(). Części są zamykane po
+max_entities podmiotach albo — z max_bytes — tak, by plik nie przekroczył
+limitu (liczba podmiotów w części jest dobierana ze średniego rozmiaru
+podmiotu, a część większa niż limit jest dzielona na pół i renderowana
+ponownie).
+
+Zamknięte części renderuje osobny wątek zapisu (z RenderPool — w procesie
+puli), więc pętla pobierania nie czeka na ich renderowanie. Najwyżej jedna
+część czeka w kolejce za renderowaną; kolejna blokuje submit(), żeby
+bufory nie rosły, gdy pobieranie jest szybsze od renderowania.
+"""
+
+import io
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from reportlab.lib import colors
+from reportlab.lib.units import mm
+from reportlab.platypus import Flowable, PageBreak, Paragraph, Spacer, Table, TableStyle
+
+from utils.logger_config import get_logger, timed_stage
+from utils.render_context import RenderContext
+
+from utils.crbr_models import CRBRRecord
+from core.crbr_bulk_to_pdf import as_record_model, page_callback, report_document, report_story
+
+# Domyślna liczba podmiotów w jednej części zbiorczego PDF
+DEFAULT_COMBINED_ENTITIES = 250
+
+
+class EntityBookmark(Flowable):
+    """Niewidoczny element ustawiający cel odnośnika i wpis konspektu PDF na bieżącej stronie"""
+
+    def __init__(self, key: str, title: str, level: int = 0):
+        Flowable.__init__(self)
+        self.key = key
+        self.title = title
+        self.level = level
+        self.width = self.height = 0
+
+    def draw(self):
+        self.canv.bookmarkPage(self.key)
+        self.canv.addOutlineEntry(self.title, self.key, level=self.level, closed=True)
+
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def entity_title(data: CRBRRecord) -> str:
+    """Tytuł podmiotu w konspekcie i zestawieniu: nazwa (NIP)"""
+    nazwa = data.podmiot.nazwa or "—"
+    nip = data.podmiot.nip
+    return f"{nazwa} ({nip})" if nip else nazwa
+
+
+def summary_story(records: List[CRBRRecord], context: RenderContext, part: Optional[int] = None) -> list:
+    """
+    Buduje zestawienie podmiotów na początek zbiorczego PDF
+
+    Args:
+        records: Rekordy w kolejności raportów w dokumencie
+        context: Kontekst renderowania
+        part: Numer części (None — dokument bez podziału)
+
+    Returns:
+        Lista elementów Platypus
+    """
+    styles = context.styles
+    cell = context.cell_style
+    title = "Zestawienie podmiotów" + (f" — część {part}" if part else "")
+    story = [EntityBookmark("zestawienie", "Zestawienie podmiotów"),
+             Paragraph(title, styles["TitleCenter"]),
+             Paragraph(f"Liczba podmiotów: {len(records)}, wygenerowano: {context.generated_at}", styles["Meta"]),
+             Spacer(1, 6)]
+
+    rows = [["Lp.", "Podmiot", "NIP", "KRS", "Beneficjenci", "Dopasowania sankcyjne"]]
+    flagged = []
+    for i, data in enumerate(records, 1):
+        podmiot = data.podmiot
+        sanctions = len(data.sankcje or [])
+        name = _escape(podmiot.nazwa or "—")
+        rows.append([
+            str(i),
+            Paragraph(f'<a href="#podmiot{i}">{name}</a>', cell),
+            podmiot.nip or "—",
+            podmiot.krs or "—",
+            str(len(data.beneficjenci)),
+            str(sanctions) if sanctions else "—",
+        ])
+        if sanctions:
+            flagged.append(i)
+
+    table = Table(rows, colWidths=[10*mm, 62*mm, 24*mm, 24*mm, 22*mm, 28*mm], repeatRows=1)
+    table_styles = [
+        ("FONTNAME", (0, 0), (-1, -1), context.font_name),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("LEFTPADDING", (0, 0), (-1, -1), 3),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 3),
+    ]
+    for i in flagged:
+        table_styles.append(("BACKGROUND", (0, i), (-1, i), colors.mistyrose))
+    table.setStyle(TableStyle(table_styles))
+    story.append(table)
+    return story
+
+
+@timed_stage("render")
+def render_combined_pdf(records: List[CRBRRecord], target, context: Optional[RenderContext] = None,
+                        part: Optional[int] = None):
+    """
+    Renderuje zestawienie i raporty wielu podmiotów do jednego dokumentu
+
+    Args:
+        records: Rekordy CRBRRecord (opcjonalnie z dopasowaniami w polu sankcje)
+        target: Ścieżka pliku PDF lub obiekt plikowy
+        context: Kontekst renderowania przebiegu
+        part: Numer części (w tytule zestawienia)
+    """
+    context = context or RenderContext()
+    records = [as_record_model(data) for data in records]
+    story = summary_story(records, context, part)
+    for i, data in enumerate(records, 1):
+        title = entity_title(data)
+        sanctions = len(data.sankcje or [])
+        if sanctions:
+            title += f" — dopasowania sankcyjne: {sanctions}"
+        story.append(PageBreak())
+        story.append(EntityBookmark(f"podmiot{i}", title))
+        story.extend(report_story(data, context))
+    on_page = page_callback(context)
+    report_document(target).build(story, onFirstPage=on_page, onLaterPages=on_page)
+
+
+class CombinedReportWriter:
+    """
+    Zapis partii raportów do zbiorczych PDF-ów, część po części
+
+    Interfejs submit() odpowiada RenderPool.submit(): Future kończy się
+    ścieżką części, do której trafił podmiot, w chwili zapisania tej części
+    (zapis w wątku w tle). Bezpieczny wątkowo.
+
+    Args:
+        out_path: Ścieżka zbiorczego PDF; przy podziale części mają nazwy <nazwa>_001.pdf, <nazwa>_002.pdf...
+        max_entities: Maksymalna liczba podmiotów w części (0 — bez limitu: jeden plik out_path;
+                      bez max_bytes wszystkie rekordy partii zostają w pamięci do close())
+        max_bytes: Maksymalny rozmiar pliku części w bajtach (None — bez limitu)
+        context: Kontekst renderowania przebiegu
+        resume: Numeracja części kontynuuje istniejące pliki (wznowiony przebieg)
+        render_pool: Opcjonalna pula procesów (core.render_pool.RenderPool) renderująca części
+    """
+
+    def __init__(self, out_path: str, max_entities: int = DEFAULT_COMBINED_ENTITIES, max_bytes: Optional[int] = None,
+                 context: Optional[RenderContext] = None, resume: bool = False, render_pool=None):
+        self.out_path = out_path
+        self.max_entities = max(0, max_entities)
+        self.max_bytes = max_bytes
+        self.context = context or RenderContext()
+        self.chunked = bool(self.max_entities or max_bytes)
+        self.paths: List[str] = []
+        self._buffer: List[Tuple[CRBRRecord, Future]] = []
+        self.render_pool = render_pool
+        self._lock = threading.Lock()
+        # Jedna część w renderowaniu i jedna w kolejce
+        self._slots = threading.BoundedSemaphore(2)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="combined-pdf")
+        self._bytes_per_entity = None
+        self._part = self._last_part() if resume else 0
+        directory = os.path.dirname(out_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _part_path(self, part: int) -> str:
+        stem, ext = os.path.splitext(self.out_path)
+        return f"{stem}_{part:03d}{ext or '.pdf'}"
+
+    def _last_part(self) -> int:
+        """Najwyższy numer istniejącej części (wznowienie nie nadpisuje wcześniejszych plików)"""
+        stem, ext = os.path.splitext(os.path.basename(self.out_path))
+        pattern = re.compile(re.escape(stem) + r"_(\d{3,})" + re.escape(ext or ".pdf") + "$")
+        directory = os.path.dirname(self.out_path) or "."
+        if not os.path.isdir(directory):
+            return 0
+        parts = [int(m.group(1)) for m in map(pattern.match, os.listdir(directory)) if m]
+        return max(parts, default=0)
+
+    def _chunk_limit(self) -> int:
+        """Liczba podmiotów, po której bieżąca część jest zamykana"""
+        limit = self.max_entities or None
+        if self.max_bytes and self._bytes_per_entity:
+            by_size = max(1, int(self.max_bytes * 0.9 / self._bytes_per_entity))
+            limit = min(limit, by_size) if limit else by_size
+        return limit or 0
+
+    def submit(self, data: CRBRRecord, out_path: Optional[str] = None,
+               context: Optional[RenderContext] = None) -> Future:
+        """
+        Dodaje rekord do bieżącej części (out_path i context są ignorowane — zgodność z RenderPool)
+
+        Returns:
+            Future ze ścieżką pliku części
+        """
+        future = Future()
+        with self._lock:
+            self._buffer.append((data, future))
+            limit = self._chunk_limit()
+            if self.chunked and limit and len(self._buffer) >= limit:
+                self._flush_locked()
+        return future
+
+    def flush(self):
+        """Zleca zapis buforowanych rekordów jako kolejnej części"""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> List[str]:
+        """
+        Zapisuje ostatnią część i czeka na zakończenie zapisu wszystkich części
+
+        Returns:
+            Ścieżki zapisanych plików
+        """
+        self.flush()
+        self._writer.shutdown(wait=True)
+        return list(self.paths)
+
+    def _flush_locked(self):
+        batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        self._slots.acquire()
+        try:
+            self._writer.submit(self._write_batch, batch)
+        except RuntimeError:
+            self._slots.release()
+            raise
+
+    def _write_batch(self, batch: List[Tuple[CRBRRecord, Future]]):
+        """Zapis części w wątku w tle; błąd trafia do Future podmiotów części"""
+        try:
+            self._write(batch)
+        except Exception as e:
+            get_logger().error(f"Błąd zapisu zbiorczego PDF ({len(batch)} podmiotów): {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def _write(self, batch: List[Tuple[CRBRRecord, Future]]):
+        """Renderuje część; po przekroczeniu max_bytes dzieli ją na pół"""
+        part = self._part + 1 if self.chunked else None
+        records = [data for data, _ in batch]
+        if self.render_pool is not None:
+            pdf = self.render_pool.render_combined(records, self.context, part)
+        else:
+            buffer = io.BytesIO()
+            render_combined_pdf(records, buffer, self.context, part)
+            pdf = buffer.getvalue()
+        size = len(pdf)
+        if self.max_bytes and size > self.max_bytes and len(batch) > 1:
+            self._bytes_per_entity = size / len(batch)
+            middle = len(batch) // 2
+            self._write(batch[:middle])
+            self._write(batch[middle:])
+            return
+
+        path = self._part_path(part) if self.chunked else self.out_path
+        temp_path = f"{path}.part"
+        with open(temp_path, "wb") as f:
+            f.write(pdf)
+        os.replace(temp_path, path)
+        if self.chunked:
+            self._part = part
+        self._bytes_per_entity = size / len(batch)
+        self.paths.append(path)
+        get_logger().info(f"Zapisano zbiorczy PDF: {path} ({len(batch)} podmiotów, {size / 1024:.0f} KB)")
+        for _, future in batch:
+            future.set_result(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -11,17 +11,20 @@ crbr_bulk_to_pdf.py — PRO wersja (Platypus)
 - Fallback na utf8_config, walidacja CSV/NIP
 """
 
+import io
 import os
 import re
 import sys
 import time
+import json
 import argparse
+import hashlib
 import random
-import socket
 import sys
-from typing import List, Dict, Any
+import threading
+import dataclasses
+from typing import List, Dict, Any, Optional
 from datetime import datetime
-from zoneinfo import ZoneInfo
 
 import requests
 import pandas as pd
@@ -29,19 +32,28 @@ from lxml import etree
 
 # Logging
 from utils.logger_config import setup_logging, get_logger, log_soap_request, log_soap_response, log_pdf_generation, log_error
+from utils.logger_config import get_metrics, timed_stage, dump_metrics, SIZE_BUCKETS
 
 # ReportLab (Platypus)
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import (SimpleDocTemplate, Paragraph, Spacer, Table,
                                 TableStyle, PageBreak, Flowable)
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 
 # Import naszych modułów pomocniczych
-from utils.xml_parsing_helpers import parse_crbr_xml_refactored
+from utils.crbr_models import CRBRRecord
+from utils.render_context import RenderContext
+from utils.xml_index_parser import parse_crbr_xml_indexed, parse_crbr_record as parse_crbr_record_indexed, PARSER_VERSION
+from utils.xml_record_stream import iter_crbr_records, records_from_element, top_level_records
+from utils.nip_validator import clean_nip
+from utils.single_flight import SingleFlight
+from utils.hedging import Hedger
+from utils.history_store import HistoryStore, normalize_date
+from utils.crbr_faults import CRBRFault, CRBRNotFoundError, fault_from_http, check_response, is_permanent
+from utils.negative_cache import NegativeCache, DEFAULT_NEGATIVE_TTL
+from utils.parsed_cache import ParsedRecordCache
+from utils.run_journal import RunJournal, journal_path_for, STATE_STARTED, STATE_DONE, STATE_FAILED
 from utils.pdf_table_helpers import (
     create_key_value_table, create_beneficiaries_table, 
     create_address_table, create_entity_info_table,
@@ -50,7 +62,11 @@ from utils.pdf_table_helpers import (
 )
 
 # Endpoint + namespaces (MF, ApiPrzegladoweCRBR v3.0.4)
-CRBR_ENDPOINT = "https://bramka-crbr.mf.gov.pl:5058/uslugiBiznesowe/uslugiESB/AP/ApiPrzegladoweCRBR/2022/12/01"
+# SANCCHECK_CRBR_ENDPOINT pozwala wskazać np. lokalny serwer zastępczy (core/crbr_stub_server.py)
+CRBR_ENDPOINT = os.environ.get(
+    "SANCCHECK_CRBR_ENDPOINT",
+    "https://bramka-crbr.mf.gov.pl:5058/uslugiBiznesowe/uslugiESB/AP/ApiPrzegladoweCRBR/2022/12/01"
+)
 NS_SOAP = "http://www.w3.org/2003/05/soap-envelope"
 NS_AP   = "http://www.mf.gov.pl/uslugiBiznesowe/uslugiESB/AP/ApiPrzegladoweCRBR/2022/12/01"
 NS_XSD  = "http://www.mf.gov.pl/schematy/AP/ApiPrzegladoweCRBR/2022/12/01"
@@ -61,6 +77,15 @@ HEADERS = {
     "Content-Type": f'application/soap+xml; charset=utf-8; action="{SOAP_ACTION}"'
 }
 
+# Liczba równoległych wątków przetwarzania (GUI, tryb --replay)
+DEFAULT_WORKERS = 3
+
+# Wersja szablonu raportu — zmiana układu PDF wymaga podniesienia (unieważnia odciski raportów)
+RENDERER_VERSION = "1"
+
+# Rozmiar porcji przy strumieniowym odczycie odpowiedzi SOAP
+STREAM_CHUNK_SIZE = 64 * 1024
+
 # ---------- UTF-8 fallback ----------
 try:
     from utils.utf8_config import setup_utf8, get_csv_encoding
@@ -72,12 +97,13 @@ except Exception:
 
 # ---------- Sanctions checking ----------
 
-def check_contractor_sanctions(crbr_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+@timed_stage("screen")
+def check_contractor_sanctions(crbr_data: CRBRRecord) -> List[Dict[str, Any]]:
     """
     Sprawdza kontrahenta pod kątem list sankcyjnych na podstawie danych CRBR
     
     Args:
-        crbr_data: Dane kontrahenta z CRBR
+        crbr_data: Rekord kontrahenta z CRBR (CRBRRecord)
         
     Returns:
         Lista dopasowań sankcyjnych lub None jeśli brak dopasowań
@@ -180,7 +206,7 @@ def safe_pandas_to_str(value) -> str:
     except Exception:
         return ""
 
-def extract_contractor_data_from_crbr(crbr_data: Dict[str, Any]) -> Dict[str, str]:
+def extract_contractor_data_from_crbr(crbr_data: CRBRRecord) -> Dict[str, str]:
     """Wyciąga dane kontrahenta z danych CRBR"""
     contractor_data = {
         'nip': '',
@@ -202,17 +228,17 @@ def extract_contractor_data_from_crbr(crbr_data: Dict[str, Any]) -> Dict[str, st
             return ""
     
     # Wyciągnij NIP
-    podmiot = crbr_data.get("podmiot", {})
-    contractor_data['nip'] = safe_str(podmiot.get("nip", ""))
+    podmiot = crbr_data.podmiot
+    contractor_data['nip'] = safe_str(podmiot.nip)
     
     # Wyciągnij nazwę
-    contractor_data['name'] = safe_str(podmiot.get("nazwa", ""))
+    contractor_data['name'] = safe_str(podmiot.nazwa)
     
     # Wyciągnij PESEL (jeśli dostępny)
-    contractor_data['pesel'] = safe_str(podmiot.get("pesel", ""))
+    contractor_data['pesel'] = safe_str(getattr(podmiot, "pesel", ""))
     
     # Wyciągnij REGON (jeśli dostępny)
-    contractor_data['regon'] = safe_str(podmiot.get("regon", ""))
+    contractor_data['regon'] = safe_str(getattr(podmiot, "regon", ""))
     
     return contractor_data
 
@@ -397,7 +423,27 @@ def normalize_name(name: str) -> str:
 
 # ---------- SOAP helpers ----------
 
-def build_soap_request_by_nip(nip: str) -> bytes:
+def build_soap_request(nip: str = None, krs: str = None, date_from=None, date_to=None) -> bytes:
+    """
+    Buduje żądanie PobierzInformacjeOSpolkachIBeneficjentach
+    
+    Args:
+        nip: NIP podmiotu (albo krs)
+        krs: Numer KRS podmiotu (albo nip)
+        date_from: Data, od której (włącznie) zwracane są informacje (DataOd)
+        date_to: Data, do której (włącznie) zwracane są informacje (DataDo)
+        
+    Returns:
+        Bajty koperty SOAP
+        
+    Raises:
+        ValueError: Brak identyfikatora, oba identyfikatory lub niepoprawny zakres dat
+    """
+    if bool(nip) == bool(krs):
+        raise ValueError("Wymagany dokładnie jeden identyfikator: NIP albo KRS")
+    date_from, date_to = normalize_date(date_from), normalize_date(date_to)
+    if date_from and date_to and date_from > date_to:
+        raise ValueError(f"Data początkowa {date_from} jest późniejsza niż końcowa {date_to}")
     Envelope = etree.Element(etree.QName(NS_SOAP, "Envelope"), nsmap={
         "soap": NS_SOAP,
         "ns": NS_AP,
@@ -408,36 +454,311 @@ def build_soap_request_by_nip(nip: str) -> bytes:
     req = etree.SubElement(Body, etree.QName(NS_AP, "PobierzInformacjeOSpolkachIBeneficjentach"))
     dane = etree.SubElement(req, "PobierzInformacjeOSpolkachIBeneficjentachDane")
     szczeg = etree.SubElement(dane, etree.QName(NS_XSD, "SzczegolyWniosku"))
-    etree.SubElement(szczeg, etree.QName(NS_XSD, "NIP")).text = nip
+    if nip:
+        etree.SubElement(szczeg, etree.QName(NS_XSD, "NIP")).text = nip
+    else:
+        etree.SubElement(szczeg, etree.QName(NS_XSD, "KRS")).text = krs
+    if date_from:
+        etree.SubElement(szczeg, etree.QName(NS_XSD, "DataOd")).text = date_from
+    if date_to:
+        etree.SubElement(szczeg, etree.QName(NS_XSD, "DataDo")).text = date_to
     return etree.tostring(Envelope, encoding="utf-8", xml_declaration=True)
 
-def fetch_xml_by_nip(nip: str, timeout: int = 45, retries: int = 3) -> bytes:
+def build_soap_request_by_nip(nip: str) -> bytes:
+    return build_soap_request(nip=nip)
+
+def clean_krs(krs: str) -> str:
+    """Oczyszcza numer KRS (same cyfry, uzupełnione zerami do 10 znaków)"""
+    digits = re.sub(r"\D", "", krs or "")
+    return digits.zfill(10) if digits else ""
+
+# Równoległe żądania o ten sam (oczyszczony) NIP współdzielą jedno wywołanie SOAP
+_fetch_flight = SingleFlight()
+
+def fetch_xml_by_nip(nip: str, timeout: int = 45, retries: int = 3, session=None, endpoint: str = None,
+                     hedger: Hedger = None) -> bytes:
+    """
+    Pobiera odpowiedź SOAP CRBR dla NIP
+    
+    Równoległe wywołania dla tego samego NIP (niezależnie od formatowania,
+    np. "123-456-32-18" i "1234563218") współdzielą jedno żądanie i jego wynik.
+    Z przekazanym `hedger` wolne żądanie jest dublowane po czasie równym
+    percentylowi dotychczasowych opóźnień (w granicach budżetu).
+    
+    Args:
+        nip: NIP podmiotu
+        timeout: Timeout pojedynczego żądania (sekundy)
+        retries: Liczba prób
+        session: Opcjonalna sesja requests (np. z puli połączeń GUI)
+        endpoint: Adres usługi (domyślnie CRBR_ENDPOINT)
+        hedger: Opcjonalny Hedger (żądania zabezpieczające)
+        
+    Returns:
+        Bajty odpowiedzi SOAP
+    """
+    return _fetch_shared(nip, timeout, retries, session, endpoint, hedger)
+
+def fetch_inner_element_by_nip(nip: str, timeout: int = 45, retries: int = 3, session=None,
+                               endpoint: str = None, hedger: Hedger = None,
+                               archive_dir: str = None, date_from=None, date_to=None,
+                               history: HistoryStore = None,
+                               negative_cache: NegativeCache = None) -> etree._Element:
+    """
+    Pobiera odpowiedź SOAP strumieniowo i zwraca sparsowany element odpowiedzi
+    
+    Treść odpowiedzi jest podawana porcjami do przyrostowego parsera lxml —
+    bez buforowania całej koperty, ponownej serializacji wnętrza Body
+    i drugiego parsowania. Wynik można przekazać wprost do parse_crbr_xml
+    i generate_pdf_from_xml_bytes*.
+    
+    Args:
+        nip: NIP podmiotu
+        timeout, retries, session, endpoint, hedger: Jak w fetch_xml_by_nip
+        archive_dir: Katalog, do którego równolegle zapisywane są surowe bajty odpowiedzi
+        date_from, date_to, history, negative_cache: Jak w fetch_inner_element
+        
+    Returns:
+        Element odpowiedzi (pierwsze dziecko soap:Body)
+    """
+    return fetch_inner_element(nip=nip, date_from=date_from, date_to=date_to, timeout=timeout,
+                               retries=retries, session=session, endpoint=endpoint, hedger=hedger,
+                               archive_dir=archive_dir, history=history, negative_cache=negative_cache)
+
+def fetch_inner_element(nip: str = None, krs: str = None, date_from=None, date_to=None,
+                        timeout: int = 45, retries: int = 3, session=None, endpoint: str = None,
+                        hedger: Hedger = None, archive_dir: str = None,
+                        history: HistoryStore = None, negative_cache: NegativeCache = None) -> etree._Element:
+    """
+    Pobiera odpowiedź CRBR dla NIP albo KRS, opcjonalnie w zakresie dat
+    
+    Z przekazaną historią (utils/history_store.py) zapytanie mieszczące się
+    w oknie dat pobranym wcześniej dla tego podmiotu jest obsługiwane lokalnie,
+    a nowa odpowiedź z usługi trafia do historii. Z przekazaną pamięcią
+    negatywną identyfikatory niedawno nieznalezione w CRBR są odrzucane
+    bez zapytania do usługi.
+    
+    Args:
+        nip: NIP podmiotu (albo krs)
+        krs: Numer KRS podmiotu (albo nip)
+        date_from, date_to: Zakres dat (DataOd/DataDo; date lub RRRR-MM-DD)
+        timeout, retries, session, endpoint, hedger: Jak w fetch_xml_by_nip
+        archive_dir: Katalog archiwum surowych odpowiedzi
+        history: Opcjonalny HistoryStore
+        negative_cache: Opcjonalna NegativeCache (brak podmiotu w rejestrze)
+        
+    Returns:
+        Element odpowiedzi (pierwsze dziecko soap:Body)
+        
+    Raises:
+        ValueError: Brak identyfikatora lub niepoprawny zakres dat
+        CRBRNotFoundError: Brak informacji o podmiocie (także z pamięci negatywnej)
+        CRBRFault: Trwały błąd usługi (np. błąd formalny zapytania)
+    """
+    if bool(nip) == bool(krs):
+        raise ValueError("Wymagany dokładnie jeden identyfikator: NIP albo KRS")
+    kind, ident = ("NIP", clean_nip(nip) or nip) if nip else ("KRS", clean_krs(krs) or krs)
+    date_from, date_to = normalize_date(date_from), normalize_date(date_to)
+    if date_from and date_to and date_from > date_to:
+        raise ValueError(f"Data początkowa {date_from} jest późniejsza niż końcowa {date_to}")
+    
+    negative_key = ":".join(filter(None, (kind, ident, date_from, date_to)))
+    if negative_cache is not None:
+        entry = negative_cache.get(negative_key)
+        get_metrics().record_cache("negative", entry is not None)
+        if entry is not None:
+            raise CRBRNotFoundError(f"Brak informacji w CRBR dla {kind} {ident} (zapamiętane)", cached=True)
+    
+    if history is not None:
+        cached = history.lookup(kind, ident, date_from, date_to)
+        get_metrics().record_cache("history", cached is not None)
+        if cached is not None:
+            get_logger().debug(f"Odpowiedź dla {kind} {ident} ({date_from or '…'} – {date_to or '…'}) z historii")
+            return cached
+    
+    query = None if kind == "NIP" and not (date_from or date_to) else (kind, ident, date_from, date_to)
+    reader = _SoapBodyReader(ident, archive_dir)
+    try:
+        result = _fetch_shared(ident, timeout, retries, session, endpoint, hedger, reader, query)
+    except CRBRNotFoundError as e:
+        if negative_cache is not None:
+            negative_cache.add(negative_key, str(e))
+        raise
+    if history is not None:
+        history.save(kind, ident, result, date_from, date_to)
+    return result
+
+def _fetch_shared(nip, timeout, retries, session, endpoint, hedger, reader=None, query=None):
+    key = (clean_nip(nip) or nip) if query is None else query[1]
+    args = (_fetch_xml_by_nip_once, key, timeout, retries, session, endpoint or CRBR_ENDPOINT, reader, query)
+    if hedger is not None:
+        args = (hedger.call,) + args
+    flight_key = key if query is None else query
+    if reader is not None:
+        flight_key = (flight_key, "element")
+    with get_metrics().timer("crbr_stage_seconds", stage="fetch"):
+        result, shared = _fetch_flight.do(flight_key, *args)
+    get_metrics().record_cache("fetch_inflight", shared)
+    if shared:
+        get_logger().debug(f"Współdzielono żądanie SOAP dla {key}")
+    return result
+
+def _fetch_xml_by_nip_once(nip: str, timeout: int, retries: int, session=None,
+                           endpoint: str = CRBR_ENDPOINT, reader=None, query=None, cancelled=None):
     logger = get_logger()
-    payload = build_soap_request_by_nip(nip)
+    metrics = get_metrics()
+    if query is None:
+        payload = build_soap_request_by_nip(nip)
+    else:
+        kind, ident, date_from, date_to = query
+        payload = build_soap_request(**{kind.lower(): ident}, date_from=date_from, date_to=date_to)
+    post = session.post if session is not None else requests.post
     last = None
     
-    log_soap_request(nip, CRBR_ENDPOINT, logger)
+    log_soap_request(nip, endpoint, logger)
     
     for attempt in range(retries):
+        if cancelled is not None and cancelled.is_set():
+            raise FetchCancelled(f"Żądanie dla NIP {nip} anulowane (wygrało żądanie zabezpieczające)")
+        metrics.add_gauge("crbr_fetch_in_flight", 1)
         try:
-            resp = requests.post(CRBR_ENDPOINT, data=payload, headers=HEADERS, timeout=timeout)
-            log_soap_response(nip, resp.status_code, len(resp.content), logger)
+            with metrics.timer("crbr_fetch_attempt_seconds"):
+                if reader is None:
+                    resp = post(endpoint, data=payload, headers=HEADERS, timeout=timeout)
+                    result, size = resp.content, len(resp.content)
+                else:
+                    resp = post(endpoint, data=payload, headers=HEADERS, timeout=timeout, stream=True)
+                    if resp.status_code == 200:
+                        result, size = reader(resp, cancelled)
+                    else:
+                        result, size = None, len(resp.content)
+            log_soap_response(nip, resp.status_code, size, logger)
+            metrics.inc("crbr_http_responses_total", status=resp.status_code)
+            metrics.observe("crbr_response_bytes", size, buckets=SIZE_BUCKETS)
             
-            if resp.status_code in (429, 500, 502, 503, 504):
-                raise requests.HTTPError(f"HTTP {resp.status_code}")
-            resp.raise_for_status()
-            return resp.content
+            if resp.status_code != 200:
+                raise fault_from_http(resp.status_code, resp.content)
+            check_response(result, nip)
+            return result
+        except FetchCancelled:
+            raise
         except Exception as e:
+            if is_permanent(e):
+                # Błąd trwały (brak w rejestrze, niepoprawne zapytanie) — bez ponowień
+                metrics.inc("crbr_fetch_permanent_errors_total", code=e.code)
+                logger.warning(f"Błąd trwały dla {nip}: {e}")
+                raise
             last = e
             logger.warning(f"Próba {attempt + 1}/{retries} nieudana dla NIP {nip}: {e}")
             if attempt < retries - 1:
                 sleep_time = (2 ** attempt) + random.random()
                 logger.debug(f"Oczekiwanie {sleep_time:.2f}s przed kolejną próbą")
-                time.sleep(sleep_time)
+                metrics.inc("crbr_fetch_retries_total")
+                metrics.observe("crbr_retry_backoff_seconds", sleep_time)
+                if cancelled is not None:
+                    cancelled.wait(sleep_time)
+                else:
+                    time.sleep(sleep_time)
+        finally:
+            metrics.add_gauge("crbr_fetch_in_flight", -1)
     
+    metrics.inc("crbr_fetch_failures_total")
     log_error(nip, last, logger)
     raise RuntimeError(f"Nie udało się pobrać XML dla NIP {nip}: {last}")
 
+class SoapStreamParser:
+    """
+    Przyrostowy parser koperty SOAP (lxml XMLPullParser)
+    
+    Przyjmuje kolejne porcje bajtów (feed) i po domknięciu soap:Body
+    udostępnia jego pierwszy element bez ponownej serializacji.
+    Opcjonalnie kopiuje surowe bajty do pliku (spool).
+    """
+    
+    def __init__(self, spool=None):
+        self._parser = etree.XMLPullParser(events=("end",), tag=f"{{{NS_SOAP}}}Body")
+        self._spool = spool
+        self.inner = None
+        self.size = 0
+    
+    def feed(self, chunk: bytes):
+        self.size += len(chunk)
+        if self._spool is not None:
+            self._spool.write(chunk)
+        self._parser.feed(chunk)
+        for _, body in self._parser.read_events():
+            children = [c for c in body if isinstance(c.tag, str)]
+            if children:
+                self.inner = children[0]
+    
+    def close(self) -> etree._Element:
+        """
+        Kończy parsowanie
+        
+        Returns:
+            Pierwszy element soap:Body lub korzeń dokumentu, gdy to nie jest koperta SOAP
+        """
+        root = self._parser.close()
+        return self.inner if self.inner is not None else root
+
+class FetchCancelled(RuntimeError):
+    """Próba pobrania przerwana, bo wygrało żądanie zabezpieczające"""
+
+class _SoapBodyReader:
+    """Odczyt strumienia odpowiedzi requests do SoapStreamParser (z opcjonalnym archiwum)"""
+    
+    def __init__(self, nip: str, archive_dir: str = None):
+        self.nip = nip
+        self.archive_dir = archive_dir
+    
+    def _feed(self, resp, parser: "SoapStreamParser", cancelled=None):
+        """Przekazuje strumień do parsera; anulowana próba zamyka połączenie i przerywa odczyt"""
+        for chunk in resp.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            if cancelled is not None and cancelled.is_set():
+                resp.close()
+                raise FetchCancelled(f"Odczyt odpowiedzi dla {self.nip} przerwany (wygrało żądanie zabezpieczające)")
+            parser.feed(chunk)
+    
+    def __call__(self, resp, cancelled=None) -> tuple:
+        if not self.archive_dir:
+            parser = SoapStreamParser()
+            self._feed(resp, parser, cancelled)
+            return parser.close(), parser.size
+        
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = archive_path_for(self.nip, self.archive_dir)
+        tmp_path = path + ".part"
+        try:
+            with open(tmp_path, "wb") as spool:
+                parser = SoapStreamParser(spool)
+                self._feed(resp, parser, cancelled)
+                inner = parser.close()
+            if cancelled is not None and cancelled.is_set():
+                # Wygrała druga próba i to ona archiwizuje odpowiedź — bez drugiego pliku soap_<nip>_*.xml
+                raise FetchCancelled(f"Odpowiedź dla {self.nip} odrzucona (wygrało żądanie zabezpieczające)")
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return inner, parser.size
+
+def soap_body_element(soap_xml: bytes) -> etree._Element:
+    """
+    Parsuje kopertę SOAP raz i zwraca element odpowiedzi bez ponownej serializacji
+    
+    Args:
+        soap_xml: Bajty koperty SOAP (lub samego raportu XML)
+        
+    Returns:
+        Pierwszy element soap:Body lub korzeń dokumentu, gdy to nie jest koperta SOAP
+    """
+    root = etree.fromstring(soap_xml)
+    body = root.find(f".//{{{NS_SOAP}}}Body")
+    if body is None:
+        return root
+    children = [c for c in body if isinstance(c.tag, str)]
+    return children[0] if children else root
+
 def extract_inner_xml_from_soap(soap_xml: bytes) -> bytes:
     try:
         root = etree.fromstring(soap_xml)
@@ -454,126 +775,88 @@ def extract_inner_xml_from_soap(soap_xml: bytes) -> bytes:
 
 # ---------- Parsing ----------
 
-def parse_crbr_xml(xml_bytes: bytes) -> Dict[str, Any]:
+@timed_stage("parse")
+def parse_crbr_xml(xml_bytes) -> Dict[str, Any]:
     """
-    Parsuje XML CRBR używając refaktoryzowanych funkcji pomocniczych
+    Parsuje XML CRBR jednym przejściem drzewa (indeks nazw lokalnych)
+    
+    Wynik jest identyczny z parse_crbr_xml_refactored.
     
     Args:
-        xml_bytes: Bajty XML do sparsowania
+        xml_bytes: Bajty XML do sparsowania lub element z fetch_inner_element_by_nip
         
     Returns:
         Słownik z danymi CRBR
     """
-    return parse_crbr_xml_refactored(xml_bytes)
+    return parse_crbr_xml_indexed(xml_bytes)
 
-# ---------- PDF (Platypus) ----------
+@timed_stage("parse")
+def parse_crbr_record(xml_bytes) -> CRBRRecord:
+    """
+    Parsuje XML CRBR do modelu CRBRRecord (jak parse_crbr_xml, bez budowania słowników)
 
-def _pick_font_name() -> str:
-    import os
-    # Preferuj lokalny DejaVuSans.ttf dołączony do repo (pełne PL znaki)
-    here = os.path.dirname(__file__) if "__file__" in globals() else os.getcwd()
-    local_ttf = os.path.join(here, "DejaVuSans.ttf")
-    if os.path.exists(local_ttf):
-        try:
-            pdfmetrics.registerFont(TTFont("BodyFont", local_ttf))
-            print(f"Zarejestrowano czcionkę: {local_ttf}")
-            return "BodyFont"
-        except Exception as e:
-            print(f"Nie można zarejestrować {local_ttf}: {e}")
-    
-    # Fallback - spróbuj czcionek systemowych
-    if os.name == 'nt':  # Windows
-        font_paths = [
-            "C:/Windows/Fonts/arial.ttf",
-            "C:/Windows/Fonts/calibri.ttf", 
-            "C:/Windows/Fonts/tahoma.ttf",
-            "C:/Windows/Fonts/segoeui.ttf"
-        ]
-    else:  # Linux/Mac
-        font_paths = [
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-            "/System/Library/Fonts/Arial.ttf",
-            "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"
-        ]
-    
-    for font_path in font_paths:
-        if os.path.exists(font_path):
-            try:
-                pdfmetrics.registerFont(TTFont("BodyFont", font_path))
-                print(f"Zarejestrowano czcionkę systemową: {font_path}")
-                return "BodyFont"
-            except Exception as e:
-                print(f"Nie można zarejestrować {font_path}: {e}")
-                continue
-    
-    print("Użyto fallback czcionki Helvetica")
-    return "Helvetica"  # fallback
+    Args:
+        xml_bytes: Bajty XML do sparsowania lub element z fetch_inner_element_by_nip
 
-def _styles(font_name: str):
-    """Uproszczone style z jedną czcionką bez kolorów"""
-    styles = getSampleStyleSheet()
-    
-    # Nadpisanie wszystkich stylów jedną czcionką
-    for s in styles.byName.values():
-        s.fontName = font_name
-    
-    # Uproszczone style bez kolorów
-    styles.add(ParagraphStyle(name="TitleCenter", parent=styles["Title"], alignment=1, spaceAfter=12))
-    styles.add(ParagraphStyle(name="H2", parent=styles["Heading2"], spaceBefore=12, spaceAfter=6))
-    styles.add(ParagraphStyle(name="H3", parent=styles["Heading3"], spaceBefore=8, spaceAfter=4))
-    styles.add(ParagraphStyle(name="Meta", parent=styles["Normal"], fontSize=9, leading=12))
-    styles.add(ParagraphStyle(name="Small", parent=styles["Normal"], fontSize=8, leading=10))
-    styles.add(ParagraphStyle(name="Label", parent=styles["Normal"], fontSize=9, spaceAfter=2))
-    styles.add(ParagraphStyle(name="Value", parent=styles["Normal"], fontSize=10))
-    styles.add(ParagraphStyle(name="TableHeader", parent=styles["Normal"], fontSize=9))
-    
-    return styles
+    Returns:
+        Rekord CRBRRecord
+    """
+    return parse_crbr_record_indexed(xml_bytes)
+
+def as_record_model(data) -> CRBRRecord:
+    """Zwraca rekord jako CRBRRecord — słownik w formacie parse_crbr_xml jest konwertowany (from_dict)"""
+    return data if isinstance(data, CRBRRecord) else CRBRRecord.from_dict(data)
+
+# ---------- PDF (Platypus) ----------
 
-def _header_footer(canvas, doc, font_name: str):
+def _header_footer(canvas, doc, context: RenderContext):
     canvas.saveState()
     w, h = A4
     margin = 20 * mm
-    # header: IP, data
-    try:
-        ip = socket.gethostbyname(socket.gethostname())
-    except Exception:
-        ip = "-"
-    now_pl = datetime.now(ZoneInfo("Europe/Warsaw")).strftime("%d.%m.%Y %H:%M:%S")
-    canvas.setFont(font_name, 8)
-    canvas.drawRightString(w - margin, h - margin + 4*mm, f"{ip}, {now_pl}")
+    # header: IP, data (wspólne dla przebiegu — z kontekstu renderowania)
+    canvas.setFont(context.font_name, 8)
+    canvas.drawRightString(w - margin, h - margin + 4*mm, context.header_text)
     # footer: numer strony
     canvas.drawCentredString(w/2, margin - 8*mm, f"Strona {canvas.getPageNumber()}")
     canvas.restoreState()
 
-def _kv_table(data, col_widths=None, zebra=False):
-    # data = [(label, value), ...]
-    table = Table(data, colWidths=col_widths)
-    style = TableStyle([
-        ("VALIGN", (0,0), (-1,-1), "TOP"),
-        ("LEFTPADDING", (0,0), (-1,-1), 4),
-        ("RIGHTPADDING", (0,0), (-1,-1), 4),
-        ("TOPPADDING", (0,0), (-1,-1), 2),
-        ("BOTTOMPADDING", (0,0), (-1,-1), 2),
-    ])
-    if zebra:
-        for i in range(0, len(data), 2):
-            style.add("BACKGROUND", (0,i), (-1,i), colors.whitesmoke)
-    table.setStyle(style)
-    return table
-
-def render_pdf(data: Dict[str, Any], out_path: str):
-    font_name = _pick_font_name()
-    styles = _styles(font_name)
-
-    doc = SimpleDocTemplate(
-        out_path,
+def page_callback(context: RenderContext):
+    """Zwraca funkcję rysującą nagłówek i stopkę strony (onFirstPage/onLaterPages)"""
+    def on_page(canvas, doc_):
+        _header_footer(canvas, doc_, context)
+    return on_page
+
+def report_document(target, fingerprint: str = None) -> SimpleDocTemplate:
+    """
+    Szablon dokumentu raportu (A4, marginesy 20 mm)
+
+    Args:
+        target: Ścieżka pliku PDF lub obiekt plikowy (np. BytesIO)
+        fingerprint: Odcisk raportu zapisywany w metadanych (słowa kluczowe PDF, informacyjnie —
+                     pomijanie aktualnych raportów czyta plik <pdf>.fp)
+    """
+    return SimpleDocTemplate(
+        target,
         pagesize=A4,
         leftMargin=20*mm,
         rightMargin=20*mm,
         topMargin=20*mm,
-        bottomMargin=20*mm
+        bottomMargin=20*mm,
+        keywords=f"{_FINGERPRINT_TAG}{fingerprint}" if fingerprint else "",
     )
 
+def report_story(data: CRBRRecord, context: RenderContext) -> list:
+    """
+    Buduje elementy (flowables) raportu dla jednego rekordu CRBR
+
+    Args:
+        data: Rekord CRBRRecord (opcjonalnie z dopasowaniami w polu sankcje)
+        context: Kontekst renderowania przebiegu
+
+    Returns:
+        Lista elementów Platypus
+    """
+    styles = context.styles
     story = []
 
     # Tytuł
@@ -581,24 +864,24 @@ def render_pdf(data: Dict[str, Any], out_path: str):
     story.append(Spacer(1, 6))
 
     # Meta (identyfikator, daty)
-    meta = data.get("meta", {})
+    meta = data.meta
     meta_rows = [
         ("Identyfikator złożonego wniosku", meta.get("id_wniosku","") or "—"),
         ("Data i godzina złożenia wniosku", meta.get("data_zlozenia","") or "—"),
         ("Data i czas udostępnienia wniosku", meta.get("data_udostepnienia","") or "—"),
     ]
-    story.append(create_meta_info_table(meta))
+    story.append(create_meta_info_table(meta, context=context))
     story.append(Spacer(1, 6))
 
     # Kryteria wyszukiwania
     story.append(Paragraph("Kryteria wyszukiwania", styles["H2"]))
-    podmiot = data.get("podmiot", {})
+    podmiot = data.podmiot
     krows = [
-        ("NIP/identyfikator trustu", podmiot.get("nip","") or "—"),
+        ("NIP/identyfikator trustu", podmiot.nip or "—"),
         ("Data od", meta.get("data_od","") or "—"),
         ("Data do", meta.get("data_do","") or "—"),
     ]
-    story.append(create_key_value_table(krows))  # Użyj domyślnego równomiernego rozłożenia
+    story.append(create_key_value_table(krows, context=context))  # Użyj domyślnego równomiernego rozłożenia
     story.append(Spacer(1, 6))
     story.append(Paragraph(
         "Dokument pochodzi z Centralnego Rejestru Beneficjentów Rzeczywistych. "
@@ -610,21 +893,21 @@ def render_pdf(data: Dict[str, Any], out_path: str):
 
     # Podstawowe dane Podmiotu
     story.append(Paragraph("Podstawowe dane Podmiotu", styles["H2"]))
-    adr = podmiot.get("adres", {})
+    adr = podmiot.adres
     left = [
         ("Początkowa data prezentacji zgłoszenia", meta.get('data_od','') or "—"),
-        ("Nazwa podmiotu", podmiot.get("nazwa","") or "—"),
-        ("NIP/identyfikator trustu", podmiot.get("nip","") or "—"),
-        ("KRS", podmiot.get("krs","") or "—"),
-        ("Forma organizacyjna", podmiot.get("forma","") or "—"),
+        ("Nazwa podmiotu", podmiot.nazwa or "—"),
+        ("NIP/identyfikator trustu", podmiot.nip or "—"),
+        ("KRS", podmiot.krs or "—"),
+        ("Forma organizacyjna", podmiot.forma or "—"),
     ]
     right = [
         ("Końcowa data prezentacji zgłoszenia", meta.get('data_do','') or "—"),
-        ("Miejscowość", adr.get("miejscowosc","") or "—"),
-        ("Kod pocztowy", adr.get("kod_pocztowy","") or "—"),
-        ("Ulica", adr.get("ulica","") or "—"),
-        ("Numer domu", adr.get("nr_domu","") or "—"),
-        ("Numer lokalu", adr.get("nr_lokalu","") or "—"),
+        ("Miejscowość", adr.miejscowosc or "—"),
+        ("Kod pocztowy", adr.kod_pocztowy or "—"),
+        ("Ulica", adr.ulica or "—"),
+        ("Numer domu", adr.nr_domu or "—"),
+        ("Numer lokalu", adr.nr_lokalu or "—"),
     ]
 
     # Dwie kolumny jako tabela 2xN
@@ -660,21 +943,21 @@ def render_pdf(data: Dict[str, Any], out_path: str):
     # Dane Beneficjentów
     story.append(Paragraph("Beneficjenci rzeczywiści", styles["H2"]))
 
-    bens = data.get("beneficjenci", [])
+    bens = data.beneficjenci
     if not bens:
         story.append(Paragraph("— brak danych beneficjentów —", styles["Meta"]))
     else:
         # Użyj funkcji z pdf_table_helpers - uproszczonej tabeli bez kolorów
-        story.append(create_beneficiaries_table(bens))
+        story.append(create_beneficiaries_table(bens, context=context))
         
         # Dodaj szczegółowe uprawnienia dla każdego beneficjenta
         story.append(Spacer(1, 8))
         story.append(Paragraph("Szczegółowe uprawnienia beneficjentów", styles["H3"]))
         
         for i, beneficiary in enumerate(bens, 1):
-            imie = beneficiary.get("imie", "")
-            nazwisko = beneficiary.get("nazwisko", "")
-            imiona_kolejne = beneficiary.get("imiona_kolejne", "")
+            imie = beneficiary.imie
+            nazwisko = beneficiary.nazwisko
+            imiona_kolejne = beneficiary.imiona_kolejne
             
             if imiona_kolejne:
                 full_name = f"{imie} {imiona_kolejne} {nazwisko}".strip()
@@ -684,9 +967,9 @@ def render_pdf(data: Dict[str, Any], out_path: str):
             story.append(Paragraph(f"{i}. {full_name}", styles["Meta"]))
             
             # Szczegółowe uprawnienia
-            detailed_entitlements = beneficiary.get("szczegolowe_uprawnienia", [])
+            detailed_entitlements = beneficiary.szczegolowe_uprawnienia
             if detailed_entitlements:
-                entitlements_table = create_detailed_entitlements_table(detailed_entitlements)
+                entitlements_table = create_detailed_entitlements_table(detailed_entitlements, context=context)
                 if entitlements_table:
                     story.append(entitlements_table)
             else:
@@ -700,14 +983,14 @@ def render_pdf(data: Dict[str, Any], out_path: str):
     # Dane Zgłaszającego/Reprezentanta
     story.append(Paragraph("Zgłaszający/Reprezentant", styles["H2"]))
     
-    zglaszajacy = data.get("zglaszajacy", {})
-    if not zglaszajacy:
+    zglaszajacy = data.zglaszajacy
+    if zglaszajacy is None:
         story.append(Paragraph("— brak danych zgłaszającego —", styles["Meta"]))
     else:
         # Pełne imię (łącznie z kolejnymi imionami)
-        imie = zglaszajacy.get("imie", "")
-        imiona_kolejne = zglaszajacy.get("imiona_kolejne", "")
-        nazwisko = zglaszajacy.get("nazwisko", "")
+        imie = zglaszajacy.imie
+        imiona_kolejne = zglaszajacy.imiona_kolejne
+        nazwisko = zglaszajacy.nazwisko
         
         if imiona_kolejne:
             pelne_imie = f"{imie} {imiona_kolejne} {nazwisko}".strip()
@@ -717,28 +1000,28 @@ def render_pdf(data: Dict[str, Any], out_path: str):
         # Utwórz tabelę z danymi zgłaszającego
         zglaszajacy_data = [
             ("Imię i nazwisko", pelne_imie or "—"),
-            ("PESEL", zglaszajacy.get("pesel", "") or "—"),
-            ("Data urodzenia", zglaszajacy.get("data_urodzenia", "") or "—"),
-            ("Obywatelstwo", zglaszajacy.get("obywatelstwo", "") or "—"),
-            ("Kraj zamieszkania", zglaszajacy.get("kraj_zamieszkania", "") or "—"),
-            ("Rodzaj reprezentacji", zglaszajacy.get("rodzaj_reprezentacji", "") or "—"),
-            ("Funkcja", zglaszajacy.get("funkcja", "") or "—"),
+            ("PESEL", zglaszajacy.pesel or "—"),
+            ("Data urodzenia", zglaszajacy.data_urodzenia or "—"),
+            ("Obywatelstwo", zglaszajacy.obywatelstwo or "—"),
+            ("Kraj zamieszkania", zglaszajacy.kraj_zamieszkania or "—"),
+            ("Rodzaj reprezentacji", zglaszajacy.rodzaj_reprezentacji or "—"),
+            ("Funkcja", zglaszajacy.funkcja or "—"),
         ]
         
         # Usuń puste pola
         zglaszajacy_data = [(k, v) for k, v in zglaszajacy_data if v != "—"]
         
         if zglaszajacy_data:
-            story.append(create_key_value_table(zglaszajacy_data, zebra=True))
+            story.append(create_key_value_table(zglaszajacy_data, zebra=True, context=context))
         
         # Inne informacje (jeśli są)
-        inne_info = zglaszajacy.get("inne_informacje", "")
+        inne_info = zglaszajacy.inne_informacje
         if inne_info:
             story.append(Paragraph("Inne informacje:", styles["Meta"]))
             story.append(Paragraph(inne_info, styles["Value"]))
 
     # Sekcja sankcyjna
-    sanctions = data.get("sankcje")
+    sanctions = data.sankcje
     if sanctions:
         story.append(Spacer(1, 10))
         story.append(Paragraph("🚨 Sprawdzenie list sankcyjnych", styles["H2"]))
@@ -767,7 +1050,7 @@ def render_pdf(data: Dict[str, Any], out_path: str):
             sanction_data = [(k, v) for k, v in sanction_data if v != "Brak"]
             
             if sanction_data:
-                story.append(create_key_value_table(sanction_data, zebra=True))
+                story.append(create_key_value_table(sanction_data, zebra=True, context=context))
             
             # Decyzja/Uzasadnienie
             decision = sanction.get('decision', '')
@@ -793,11 +1076,179 @@ def render_pdf(data: Dict[str, Any], out_path: str):
         story.append(Paragraph("✅ Sprawdzenie list sankcyjnych", styles["H2"]))
         story.append(Paragraph("Brak dopasowań na listach sankcyjnych MF, MSWiA i UE", styles["Meta"]))
 
-    # Render z nagłówkiem/stopką
-    def on_page(canvas, doc_):
-        _header_footer(canvas, doc_, font_name)
+    return story
+
+_FINGERPRINT_TAG = "sanccheck-fp:"
+_FINGERPRINT_RE = re.compile(r"[0-9a-f]{64}")
+FINGERPRINT_SUFFIX = ".fp"
+
+def report_fingerprint(data: CRBRRecord) -> str:
+    """
+    Odcisk raportu: rekord CRBR (z wynikiem sprawdzenia sankcji), wersja szablonu i ReportLab
+
+    Znacznik czasu w nagłówku strony nie wchodzi do odcisku — raport
+    z niezmienionych danych jest uznawany za aktualny. Metadane wniosku
+    (identyfikator, daty złożenia i udostępnienia) wchodzą celowo: raport
+    drukuje je jako dowód, kiedy wykonano sprawdzenie, więc każde nowe
+    zapytanie do CRBR daje nowy raport (także nową nazwę pliku —
+    report_path_for). Pomijanie działa dla tej samej odpowiedzi: --replay
+    z --replay-skip-unchanged, --xml, odpowiedzi z historii (--history).
 
-    doc.build(story, onFirstPage=on_page, onLaterPages=on_page)
+    Returns:
+        Skrót SHA-256 (szesnastkowo)
+    """
+    from reportlab import Version as reportlab_version
+    payload = json.dumps(as_record_model(data).to_dict(), sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.sha256(f"{RENDERER_VERSION}:{reportlab_version}\n".encode("utf-8"))
+    digest.update(payload.encode("utf-8"))
+    return digest.hexdigest()
+
+def fingerprint_path(path: str) -> str:
+    """Ścieżka pliku odcisku zapisywanego obok raportu (<pdf>.fp)"""
+    return path + FINGERPRINT_SUFFIX
+
+def existing_fingerprint(path: str) -> Optional[str]:
+    """
+    Odczytuje odcisk istniejącego raportu PDF z pliku obok (<pdf>.fp)
+
+    Odcisk nie jest odczytywany z samego PDF, więc nie zależy od układu
+    pliku (aktualizacje przyrostowe, strumienie xref, wersja ReportLab).
+
+    Returns:
+        Odcisk lub None (brak raportu lub pliku odcisku, nieprawidłowa treść)
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(fingerprint_path(path), "r", encoding="ascii") as f:
+            fingerprint = f.read().strip()
+    except (OSError, ValueError):
+        return None
+    return fingerprint if _FINGERPRINT_RE.fullmatch(fingerprint) else None
+
+@timed_stage("render")
+def render_pdf(data: CRBRRecord, out_path: str, context: RenderContext = None) -> bool:
+    """
+    Renderuje raport PDF z rekordu CRBR
+
+    Raport, którego plik odcisku (<pdf>.fp) ma już ten sam odcisk
+    (report_fingerprint), nie jest renderowany ponownie (chyba że context.force).
+    Nowy plik powstaje obok pod nazwą tymczasową i jest podmieniany w całości
+    (os.replace), więc niepełny PDF nigdy nie pojawia się pod docelową nazwą.
+
+    Args:
+        data: Rekord CRBRRecord (opcjonalnie z dopasowaniami w polu sankcje);
+              słownik z parse_crbr_xml jest konwertowany
+        out_path: Ścieżka pliku PDF
+        context: Kontekst renderowania przebiegu (czcionka, style, nagłówek);
+                 None — kontekst tworzony dla tego raportu
+
+    Returns:
+        True — raport wyrenderowany, False — pominięty (plik aktualny)
+    """
+    data = as_record_model(data)
+    context = context or RenderContext()
+    unchanged, fingerprint = _report_is_current(data, out_path, context)
+    if unchanged:
+        return False
+    _write_atomically(out_path, lambda tmp_path: _build_report(tmp_path, data, context, fingerprint), fingerprint)
+    return True
+
+@timed_stage("render")
+def render_to_archive(data: CRBRRecord, out_path: str, archive, context: RenderContext = None) -> bool:
+    """
+    Renderuje raport do pamięci, zapisuje plik i dopisuje te same bajty do archiwum ZIP
+
+    Raport aktualny (ten sam odcisk) nie jest renderowany — do archiwum
+    trafia istniejący plik.
+
+    Args:
+        data: Rekord CRBRRecord (opcjonalnie z dopasowaniami w polu sankcje);
+              słownik z parse_crbr_xml jest konwertowany
+        out_path: Ścieżka pliku PDF
+        archive: Archiwum raportów (core.report_archive.ReportArchive)
+        context: Kontekst renderowania przebiegu
+
+    Returns:
+        True — raport wyrenderowany, False — pominięty (plik aktualny)
+    """
+    data = as_record_model(data)
+    context = context or RenderContext()
+    nip = data.podmiot.nip
+    sanctions_count = len(data.sankcje or [])
+    unchanged, fingerprint = _report_is_current(data, out_path, context)
+    if unchanged:
+        archive.add_file(out_path, nip, sanctions_count=sanctions_count)
+        return False
+    buffer = io.BytesIO()
+    _build_report(buffer, data, context, fingerprint)
+
+    def write(tmp_path):
+        with open(tmp_path, "wb") as f:
+            f.write(buffer.getbuffer())
+    _write_atomically(out_path, write, fingerprint)
+    archive.add_bytes(os.path.basename(out_path), buffer.getvalue(), nip, sanctions_count=sanctions_count)
+    return True
+
+def _report_is_current(data: CRBRRecord, out_path: str, context: RenderContext) -> tuple:
+    """Zwraca (czy plik ma już odcisk tych danych, odcisk); wynik trafia do metryki render_unchanged"""
+    fingerprint = report_fingerprint(data)
+    unchanged = not context.force and existing_fingerprint(out_path) == fingerprint
+    get_metrics().record_cache("render_unchanged", unchanged)
+    if unchanged:
+        get_logger().debug(f"Raport aktualny, pominięto renderowanie: {out_path}")
+    return unchanged, fingerprint
+
+def _write_atomically(out_path: str, write, fingerprint: str = None):
+    """
+    Zapisuje plik przez write(ścieżka_tymczasowa) i podmienia go w całości (os.replace)
+
+    Z fingerprint zapisywany jest też plik odcisku (<out_path>.fp): stary jest
+    usuwany tuż przed podmianą raportu, a nowy zapisywany (tak samo atomowo) po
+    niej — przerwany zapis nie zostawia przy raporcie odcisku innych danych.
+    """
+    tmp_path = f"{out_path}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        write(tmp_path)
+        if fingerprint is not None and os.path.exists(fingerprint_path(out_path)):
+            os.remove(fingerprint_path(out_path))
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    if fingerprint is not None:
+        def write_fingerprint(tmp):
+            with open(tmp, "w", encoding="ascii") as f:
+                f.write(fingerprint)
+        _write_atomically(fingerprint_path(out_path), write_fingerprint)
+
+@timed_stage("render")
+def render_pdf_bytes(data: CRBRRecord, context: RenderContext = None) -> bytes:
+    """
+    Renderuje raport PDF z rekordu CRBR do pamięci (bez plików tymczasowych)
+
+    Do odpowiedzi HTTP, archiwum ZIP lub zapisu w bazie danych. Treść jest
+    taka sama jak z render_pdf (łącznie z odciskiem w metadanych).
+
+    Args:
+        data: Rekord CRBRRecord (opcjonalnie z dopasowaniami w polu sankcje);
+              słownik z parse_crbr_xml jest konwertowany
+        context: Kontekst renderowania przebiegu; None — kontekst tworzony dla tego raportu
+
+    Returns:
+        Bajty dokumentu PDF
+    """
+    data = as_record_model(data)
+    context = context or RenderContext()
+    buffer = io.BytesIO()
+    _build_report(buffer, data, context, report_fingerprint(data))
+    return buffer.getvalue()
+
+def _build_report(target, data: CRBRRecord, context: RenderContext, fingerprint: str = None):
+    """Składa raport z nagłówkiem/stopką do pliku lub obiektu plikowego"""
+    on_page = page_callback(context)
+    report_document(target, fingerprint).build(report_story(data, context),
+                                               onFirstPage=on_page, onLaterPages=on_page)
 
 # ---------- Helpers ----------
 
@@ -806,52 +1257,238 @@ def sanitize_filename(s: str) -> str:
     s = s.strip("_") or "raport"
     return s[:80]  # skróć bardzo długie
 
-def generate_pdf_from_xml_bytes(xml_bytes: bytes, out_dir: str, default_nip: str = "unknown") -> str:
-    logger = get_logger()
-    data = parse_crbr_xml(xml_bytes)
-    nip = data.get("podmiot", {}).get("nip") or default_nip
-    ident = data.get("meta", {}).get("id_wniosku") or "brak_id"
-    fname = f"crbr_{sanitize_filename(nip)}_{sanitize_filename(ident)}.pdf"
-    out_path = os.path.join(out_dir, fname)
-    os.makedirs(out_dir, exist_ok=True)
+def report_path_for(data: CRBRRecord, out_dir: str, default_nip: str = "unknown") -> str:
+    """
+    Wyznacza ścieżkę raportu PDF dla sparsowanych danych CRBR
+    
+    Args:
+        data: Rekord CRBRRecord (lub słownik z parse_crbr_xml)
+        out_dir: Katalog wyjściowy
+        default_nip: NIP używany gdy brak go w danych
+        
+    Returns:
+        Ścieżka do pliku PDF
+    """
+    data = as_record_model(data)
+    nip = data.podmiot.nip or default_nip
+    ident = data.meta.get("id_wniosku") or "brak_id"
+    # Kolejne spółki/zgłoszenia z jednej odpowiedzi (iter_crbr_records) dostają numer rekordu
+    record = data.meta.get("rekord") or 1
+    suffix = f"_{record}" if record > 1 else ""
+    fname = f"crbr_{sanitize_filename(nip)}_{sanitize_filename(ident)}{suffix}.pdf"
+    return os.path.join(out_dir, fname)
+
+def archive_path_for(nip: str, archive_dir: str) -> str:
+    """Zwraca ścieżkę pliku archiwum odpowiedzi SOAP (soap_<NIP>_<znacznik czasu>.xml)"""
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    return os.path.join(archive_dir, f"soap_{sanitize_filename(nip)}_{stamp}.xml")
+
+def save_soap_response(nip: str, soap_xml: bytes, archive_dir: str) -> str:
+    """
+    Zapisuje surową kopertę SOAP do archiwum (do późniejszego odtworzenia --replay)
     
-    # Sprawdź sankcje przed renderowaniem PDF
+    Args:
+        nip: NIP, dla którego pobrano odpowiedź
+        soap_xml: Bajty odpowiedzi SOAP
+        archive_dir: Katalog archiwum
+        
+    Returns:
+        Ścieżka do zapisanego pliku
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = archive_path_for(nip, archive_dir)
+    with open(path, "wb") as f:
+        f.write(soap_xml)
+    return path
+
+def parsed_record_cache(directory: Optional[str] = None) -> ParsedRecordCache:
+    """
+    Tworzy pamięć podręczną sparsowanych rekordów dla bieżącej wersji parsera
+
+    Args:
+        directory: Katalog wpisów na dysku (None = tylko w pamięci)
+    """
+    return ParsedRecordCache(directory, version=PARSER_VERSION)
+
+def parse_crbr_record_cached(xml_bytes, parsed_cache: ParsedRecordCache = None) -> CRBRRecord:
+    """
+    Parsuje odpowiedź CRBR do modelu, pomijając parsowanie, gdy ta sama treść była już widziana
+
+    Args:
+        xml_bytes: Bajty XML lub element lxml
+        parsed_cache: Pamięć sparsowanych rekordów (None = zwykłe parse_crbr_record)
+
+    Returns:
+        Rekord CRBRRecord (nowy obiekt przy każdym wywołaniu)
+    """
+    if parsed_cache is None:
+        return parse_crbr_record(xml_bytes)
+    data, hit = parsed_cache.get_or_parse(xml_bytes, parse_crbr_record, CRBRRecord)
+    get_metrics().record_cache("parsed", hit)
+    return data
+
+def _as_record(source, parsed_cache: ParsedRecordCache = None) -> CRBRRecord:
+    """Zwraca rekord CRBRRecord: model jest kopiowany (płytko), słownik konwertowany, bajty/element parsowane"""
+    if isinstance(source, CRBRRecord):
+        return dataclasses.replace(source)
+    if isinstance(source, dict):
+        return CRBRRecord.from_dict(source)
+    return parse_crbr_record_cached(source, parsed_cache)
+
+@timed_stage("parse")
+def _filing_records(root: etree._Element, filings: list) -> List[CRBRRecord]:
+    return records_from_element(root, filings)
+
+def split_filings(source) -> list:
+    """
+    Dzieli odpowiedź CRBR na źródła raportów — po jednym na spółkę/zgłoszenie
+
+    parse_crbr_xml scala beneficjentów wszystkich zgłoszeń dokumentu, a zapytania
+    z zakresem dat zwracają kilka zgłoszeń tego samego podmiotu. Odpowiedź z jednym
+    zgłoszeniem jest zwracana bez zmian (dalej parsowana przez parse_crbr_record,
+    z pamięcią sparsowanych rekordów); kilka zgłoszeń daje osobne modele CRBRRecord
+    budowane z elementów już sparsowanego dokumentu (jak iter_crbr_records).
+
+    Args:
+        source: Bajty XML, element lxml, CRBRRecord lub słownik z parse_crbr_xml
+
+    Returns:
+        Lista źródeł dla prepare_report/screen_for_report (co najmniej jedno)
+    """
+    if isinstance(source, (dict, CRBRRecord)):
+        return [source]
+    root = source if isinstance(source, etree._Element) else etree.fromstring(source)
+    filings = top_level_records(root)
+    if len(filings) <= 1:
+        return [source]
+    return _filing_records(root, filings)
+
+def screen_record(xml_bytes, default_nip: str = "unknown", parsed_cache: ParsedRecordCache = None) -> tuple:
+    """
+    Parsuje odpowiedź i sprawdza sankcje (bez operacji na dysku)
+
+    Args:
+        xml_bytes: Bajty XML, element lxml, CRBRRecord lub słownik z parse_crbr_xml
+        default_nip: NIP używany gdy brak go w danych
+        parsed_cache: Opcjonalna pamięć sparsowanych rekordów
+
+    Returns:
+        tuple: (CRBRRecord z ewentualnymi dopasowaniami w polu sankcje, NIP)
+    """
+    data = _as_record(xml_bytes, parsed_cache)
+    nip = data.podmiot.nip or default_nip
     sanctions_data = check_contractor_sanctions(data)
     if sanctions_data:
-        data["sankcje"] = sanctions_data
-        logger.info(f"Znaleziono {len(sanctions_data)} dopasowań sankcyjnych dla NIP: {nip}")
-    
-    render_pdf(data, out_path)
-    log_pdf_generation(nip, out_path, logger)
-    return out_path
+        data.sankcje = sanctions_data
+        get_logger().info(f"Znaleziono {len(sanctions_data)} dopasowań sankcyjnych dla NIP: {nip}")
+    return data, nip
 
-def generate_pdf_from_xml_bytes_with_sanctions_info(xml_bytes: bytes, out_dir: str, default_nip: str = "unknown") -> tuple:
+def prepare_report(xml_bytes, out_dir: str, default_nip: str = "unknown",
+                   parsed_cache: ParsedRecordCache = None) -> tuple:
     """
-    Generuje PDF i zwraca informację o sankcjach
+    Parsuje odpowiedź, sprawdza sankcje i wyznacza ścieżkę raportu (wszystko poza renderowaniem)
+    
+    Args:
+        xml_bytes: Bajty XML, element lxml, CRBRRecord lub słownik z parse_crbr_xml
+        out_dir: Katalog wyjściowy (tworzony w razie potrzeby)
+        default_nip: NIP używany gdy brak go w danych
+        parsed_cache: Opcjonalna pamięć sparsowanych rekordów
     
     Returns:
-        tuple: (pdf_path, has_sanctions, sanctions_count)
+        tuple: (CRBRRecord z ewentualnymi dopasowaniami w polu sankcje, ścieżka PDF, NIP)
     """
-    logger = get_logger()
-    data = parse_crbr_xml(xml_bytes)
-    nip = data.get("podmiot", {}).get("nip") or default_nip
-    ident = data.get("meta", {}).get("id_wniosku") or "brak_id"
-    fname = f"crbr_{sanitize_filename(nip)}_{sanitize_filename(ident)}.pdf"
-    out_path = os.path.join(out_dir, fname)
+    data, nip = screen_record(xml_bytes, default_nip, parsed_cache)
+    out_path = report_path_for(data, out_dir, default_nip)
     os.makedirs(out_dir, exist_ok=True)
+    return data, out_path, nip
+
+def screen_for_report(screening, source, out_dir: str, default_nip: str = "unknown",
+                      parsed_cache: ParsedRecordCache = None) -> tuple:
+    """
+    Sprawdza podmiot, zapisuje wynik i wyznacza ścieżkę raportu, jeśli PDF jest potrzebny
+
+    Args:
+        screening: Zapis wyników sprawdzenia (core.screening.ScreeningWriter)
+        source: Bajty XML, element lxml, CRBRRecord lub słownik z parse_crbr_xml
+        out_dir: Katalog wyjściowy raportów
+        default_nip: NIP używany gdy brak go w danych
+        parsed_cache: Opcjonalna pamięć sparsowanych rekordów
+
+    Returns:
+        tuple: (CRBRRecord z ewentualnymi dopasowaniami w polu sankcje, ścieżka PDF lub None — bez raportu)
+    """
+    result, data = screening.screen(source, default_nip, parsed_cache)
+    out_path = None
+    if screening.wants_pdf(result):
+        out_path = report_path_for(data, out_dir, default_nip)
+        os.makedirs(out_dir, exist_ok=True)
+        result["pdf"] = out_path
+    screening.write(result)
+    return data, out_path
+
+def _render(data: CRBRRecord, out_path: str, context: RenderContext = None, render_pool=None):
+    """Renderuje raport w bieżącym procesie albo w puli procesów (core.render_pool.RenderPool)"""
+    if render_pool is not None:
+        render_pool.render(data, out_path, context)
+    else:
+        render_pdf(data, out_path, context)
+
+def generate_pdf_from_xml_bytes(xml_bytes, out_dir: str, default_nip: str = "unknown",
+                                parsed_cache: ParsedRecordCache = None, context: RenderContext = None,
+                                render_pool=None) -> str:
+    """
+    Generuje PDF z odpowiedzi CRBR
     
-    # Sprawdź sankcje przed renderowaniem PDF
-    sanctions_data = check_contractor_sanctions(data)
-    has_sanctions = sanctions_data is not None and len(sanctions_data) > 0
-    sanctions_count = len(sanctions_data) if sanctions_data else 0
+    Args:
+        xml_bytes: Bajty XML, element lxml (np. z fetch_inner_element_by_nip)
+                   lub rekord (CRBRRecord, słownik z parse_crbr_xml) — każda odpowiedź jest parsowana co najwyżej raz
+        out_dir: Katalog wyjściowy
+        default_nip: NIP używany gdy brak go w danych
+        parsed_cache: Opcjonalna pamięć sparsowanych rekordów (ta sama odpowiedź nie jest parsowana ponownie)
+        context: Kontekst renderowania przebiegu (RenderContext); None — tworzony dla raportu
+        render_pool: Opcjonalna pula procesów renderujących (RenderPool) — wątek czeka na wynik bez GIL
+        
+    Returns:
+        Ścieżka pliku PDF
+    """
+    data, out_path, nip = prepare_report(xml_bytes, out_dir, default_nip, parsed_cache)
+    _render(data, out_path, context, render_pool)
+    log_pdf_generation(nip, out_path, get_logger())
+    return out_path
+
+def generate_pdf_from_xml_bytes_with_sanctions_info(xml_bytes, out_dir: str, default_nip: str = "unknown",
+                                                   parsed_cache: ParsedRecordCache = None,
+                                                   context: RenderContext = None, render_pool=None) -> tuple:
+    """
+    Generuje PDF i zwraca informację o sankcjach
     
-    if sanctions_data:
-        data["sankcje"] = sanctions_data
-        logger.info(f"Znaleziono {len(sanctions_data)} dopasowań sankcyjnych dla NIP: {nip}")
+    Args:
+        xml_bytes: Jak w generate_pdf_from_xml_bytes (bajty, element lub rekord)
+        parsed_cache: Jak w generate_pdf_from_xml_bytes
+        context: Jak w generate_pdf_from_xml_bytes
+        render_pool: Jak w generate_pdf_from_xml_bytes
     
-    render_pdf(data, out_path)
-    log_pdf_generation(nip, out_path, logger)
-    return out_path, has_sanctions, sanctions_count
+    Returns:
+        tuple: (pdf_path, has_sanctions, sanctions_count)
+    """
+    data, out_path, nip = prepare_report(xml_bytes, out_dir, default_nip, parsed_cache)
+    sanctions_count = len(data.sankcje or [])
+    _render(data, out_path, context, render_pool)
+    log_pdf_generation(nip, out_path, get_logger())
+    return out_path, sanctions_count > 0, sanctions_count
+
+def generate_reports_with_sanctions_info(xml_bytes, out_dir: str, default_nip: str = "unknown",
+                                        parsed_cache: ParsedRecordCache = None, context: RenderContext = None,
+                                        render_pool=None) -> List[tuple]:
+    """
+    Jak generate_pdf_from_xml_bytes_with_sanctions_info, z osobnym raportem dla każdej spółki/zgłoszenia (split_filings)
+
+    Returns:
+        Lista krotek (pdf_path, has_sanctions, sanctions_count) — po jednej na zgłoszenie
+    """
+    return [generate_pdf_from_xml_bytes_with_sanctions_info(filing, out_dir, default_nip, parsed_cache,
+                                                            context, render_pool)
+            for filing in split_filings(xml_bytes)]
 
 def _is_valid_nip(nip: str) -> bool:
     """Sprawdza czy NIP jest poprawny (format + suma kontrolna)"""
@@ -859,7 +1496,53 @@ def _is_valid_nip(nip: str) -> bool:
     is_valid, _ = validate_nip(nip)
     return is_valid
 
-def bulk_from_csv(csv_path: str, out_dir: str, pause_sec: float = 0.6, timeout: int = 30) -> List[str]:
+def bulk_from_csv(csv_path: str, out_dir: str, pause_sec: float = 0.6, timeout: int = 30,
+                  archive_dir: str = None, endpoint: str = None, hedger: Hedger = None,
+                  resume: bool = False, journal_path: str = None, date_from=None, date_to=None,
+                  history: HistoryStore = None, negative_cache: NegativeCache = None,
+                  parsed_cache: ParsedRecordCache = None, context: RenderContext = None,
+                  render_pool=None, combined=None, screening=None, archive=None) -> List[str]:
+    """
+    Generuje raporty dla NIP-ów z pliku CSV
+    
+    Stan każdego NIP-u trafia do dziennika przebiegu (domyślnie
+    out_dir/.sanccheck_<csv>.journal.jsonl). Z resume=True NIP-y zakończone
+    w poprzednim przebiegu są pomijane, a nieudane i nieprzetworzone — ponawiane.
+    
+    Odpowiedź z kilkoma zgłoszeniami (np. zakres dat) daje osobny raport dla
+    każdego zgłoszenia (split_filings); dziennik wskazuje pierwszy, a wszystkie
+    są w polu "reports".
+    
+    Z render_pool pobieranie kolejnych NIP-ów nie czeka na renderowanie:
+    raporty są zlecane puli procesów, a ich wyniki zbierane na bieżąco.
+    Z combined raporty trafiają do zbiorczego PDF (jeden plik lub części),
+    a dziennik wskazuje część z raportem danego NIP-u. Części renderuje
+    wątek zapisu CombinedReportWriter (z pulą przekazaną do writera — procesy
+    puli), więc pobieranie nie czeka na zamknięcie części.
+    Ze screening wynik sprawdzenia każdego NIP-u trafia do pliku JSONL/CSV,
+    a PDF jest renderowany tylko dla wybranych podmiotów (domyślnie z trafieniem);
+    dziennik NIP-ów bez raportu wskazuje plik wyników.
+    Z archive każdy gotowy raport jest od razu dopisywany do archiwum ZIP
+    (renderowany w procesie — z bajtów w pamięci, bez ponownego odczytu pliku).
+    
+    Args:
+        csv_path: Plik CSV z kolumną 'nip'
+        out_dir: Katalog wyjściowy
+        resume: Wznowienie przerwanego przebiegu
+        journal_path: Ścieżka dziennika (opcjonalna)
+        date_from, date_to: Zakres dat zapytań (DataOd/DataDo)
+        history: Opcjonalna historia odpowiedzi (HistoryStore)
+        negative_cache: Opcjonalna pamięć NIP-ów nieobecnych w CRBR (NegativeCache)
+        parsed_cache: Opcjonalna pamięć sparsowanych rekordów (ParsedRecordCache)
+        context: Kontekst renderowania (domyślnie jeden RenderContext na cały przebieg)
+        render_pool: Opcjonalna pula procesów renderujących (core.render_pool.RenderPool)
+        combined: Opcjonalny zapis zbiorczy (core.combined_report.CombinedReportWriter) zamiast plików per NIP
+        screening: Opcjonalny zapis wyników sprawdzenia (core.screening.ScreeningWriter)
+        archive: Opcjonalne archiwum ZIP raportów (core.report_archive.ReportArchive)
+        
+    Returns:
+        Lista ścieżek raportów (łącznie z raportami z wznowionego przebiegu; ze screening także plik wyników)
+    """
     logger = get_logger()
     logger.info(f"Rozpoczynanie przetwarzania CSV: {csv_path}")
     
@@ -876,17 +1559,111 @@ def bulk_from_csv(csv_path: str, out_dir: str, pause_sec: float = 0.6, timeout:
     
     logger.info(f"Znaleziono {len(valid_nips)} poprawnych NIP-ów")
     
+    context = context or RenderContext()
     generated = []
-    for i, nip in enumerate(valid_nips["nip"], 1):
-        try:
-            logger.info(f"Przetwarzanie NIP {i}/{len(valid_nips)}: {nip}")
-            soap = fetch_xml_by_nip(nip, timeout=timeout)
-            inner = extract_inner_xml_from_soap(soap)
-            pdf_path = generate_pdf_from_xml_bytes(inner, out_dir, default_nip=nip)
-            generated.append(pdf_path)
-            time.sleep(pause_sec)
-        except Exception as e:
-            log_error(nip, e, logger)
+    # Deduplikacja w obrębie przebiegu: NIP -> ścieżka raportu (None = błąd)
+    processed = {}
+    # Raporty zlecone puli procesów: NIP -> lista Future ze ścieżkami PDF (jedna na zgłoszenie)
+    pending = {}
+    journal = RunJournal(journal_path or journal_path_for(out_dir, csv_path), resume=resume)
+    if resume:
+        processed.update(journal.completed())
+        for nip, path in processed.items():
+            for report in journal.states[nip].get("reports") or [path]:
+                if report in generated:
+                    continue  # części zbiorczego PDF — bez powtórzeń
+                generated.append(report)
+                if archive is not None and report.endswith(".pdf") and os.path.exists(report):
+                    archive.add_file(report, nip)
+        logger.info(f"Wznowienie przebiegu: {len(processed)} NIP-ów już ukończonych ({journal.path})")
+    
+    def finish(nip: str, paths: List[str]):
+        """Zapisuje ukończony NIP (przy kilku zgłoszeniach dziennik wskazuje pierwszy raport)"""
+        paths = list(dict.fromkeys(paths))
+        for path in paths:
+            if path not in generated:
+                generated.append(path)
+        processed[nip] = paths[0]
+        journal.record(nip, STATE_DONE, path=paths[0], **({"reports": paths} if len(paths) > 1 else {}))
+    
+    def collect(block: bool):
+        """Zapisuje wyniki zakończonych renderowań z puli (block=True — czeka na wszystkie)"""
+        for nip, futures in list(pending.items()):
+            if not (block or all(future.done() for future in futures)):
+                continue
+            del pending[nip]
+            try:
+                paths = [future.result() for future in futures]
+            except Exception as e:
+                journal.record(nip, STATE_FAILED, error=str(e))
+                log_error(nip, e, logger)
+                continue
+            for pdf_path in paths:
+                log_pdf_generation(nip, pdf_path, logger)
+                if archive is not None:
+                    archive.add_file(pdf_path, nip)
+            finish(nip, paths)
+    
+    if combined is not None and render_pool is not None and combined.render_pool is None:
+        logger.warning("render_pool jest pomijana przy zapisie zbiorczym — przekaż ją do CombinedReportWriter")
+    target = combined if combined is not None else render_pool
+    with journal:
+        for i, nip in enumerate(valid_nips["nip"], 1):
+            get_metrics().record_cache("report_dedup", nip in processed)
+            if nip in processed:
+                if processed[nip]:
+                    logger.info(f"Duplikat NIP {nip} — użyto istniejącego raportu: {processed[nip]}")
+                elif nip in pending:
+                    logger.info(f"Duplikat NIP {nip} — raport w trakcie renderowania")
+                else:
+                    logger.info(f"Duplikat NIP {nip} — pominięto (poprzednia próba nieudana)")
+                continue
+            processed[nip] = None
+            journal.record(nip, STATE_STARTED)
+            try:
+                logger.info(f"Przetwarzanie NIP {i}/{len(valid_nips)}: {nip}")
+                inner = fetch_inner_element_by_nip(nip, timeout=timeout, endpoint=endpoint, hedger=hedger,
+                                                   archive_dir=archive_dir, date_from=date_from,
+                                                   date_to=date_to, history=history,
+                                                   negative_cache=negative_cache)
+                filings = split_filings(inner)
+                if len(filings) > 1:
+                    logger.info(f"NIP {nip}: {len(filings)} zgłoszeń w odpowiedzi — osobny raport dla każdego")
+                reports = []
+                for filing in filings:
+                    if screening is not None:
+                        data, out_path = screen_for_report(screening, filing, out_dir, nip, parsed_cache)
+                    else:
+                        data, out_path, _ = prepare_report(filing, out_dir, default_nip=nip,
+                                                           parsed_cache=parsed_cache)
+                    if out_path is not None:
+                        reports.append((data, out_path))
+                if not reports:
+                    # Tylko wynik sprawdzenia, bez raportu PDF
+                    finish(nip, [screening.path])
+                elif target is not None:
+                    pending[nip] = [target.submit(data, out_path, context) for data, out_path in reports]
+                    collect(block=False)
+                else:
+                    for data, out_path in reports:
+                        if archive is not None:
+                            render_to_archive(data, out_path, archive, context)
+                        else:
+                            render_pdf(data, out_path, context)
+                        log_pdf_generation(nip, out_path, logger)
+                    finish(nip, [out_path for _, out_path in reports])
+                time.sleep(pause_sec)
+            except CRBRNotFoundError as e:
+                journal.record(nip, STATE_FAILED, error=str(e), not_found=True)
+                logger.warning(str(e))
+                if not e.cached:
+                    time.sleep(pause_sec)
+            except Exception as e:
+                journal.record(nip, STATE_FAILED, error=str(e))
+                log_error(nip, e, logger)
+        if combined is not None:
+            combined.flush()
+        collect(block=True)
     
     logger.info(f"Zakończono przetwarzanie. Wygenerowano {len(generated)} PDF-ów")
     return generated
@@ -898,11 +1675,52 @@ def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--csv", help="ścieżka do CSV z kolumną 'nip'")
     ap.add_argument("--nip", help="pojedynczy NIP do pobrania")
+    ap.add_argument("--krs", help="pojedynczy numer KRS do pobrania")
+    ap.add_argument("--date-from", help="data, od której (włącznie) zwracane są informacje (RRRR-MM-DD)")
+    ap.add_argument("--date-to", help="data, do której (włącznie) zwracane są informacje (RRRR-MM-DD)")
+    ap.add_argument("--history", help="katalog lokalnej historii odpowiedzi (węższe zakresy dat bez zapytań do CRBR)")
+    ap.add_argument("--negative-ttl", type=float, default=DEFAULT_NEGATIVE_TTL / 3600,
+                    help="czas (godziny) pamiętania NIP-ów nieobecnych w CRBR (0 = wyłączone)")
+    ap.add_argument("--parsed-cache", action="store_true",
+                    help="pamiętaj sparsowane odpowiedzi także bez --history (domyślnie tylko z --history)")
     ap.add_argument("--xml", help="lokalny raport XML (z portalu lub wnętrze SOAP)")
+    ap.add_argument("--replay", help="katalog lub archiwum ZIP z zapisanymi odpowiedziami SOAP (bez połączenia z CRBR)")
+    ap.add_argument("--replay-report", help="plik JSON na czasy etapów trybu --replay")
+    ap.add_argument("--replay-skip-unchanged", action="store_true",
+                    help="w --replay pomijaj raporty z aktualnym odciskiem danych (domyślnie render jest wymuszany)")
+    ap.add_argument("--replay-parsed-cache", action="store_true",
+                    help="w --replay używaj pamięci sparsowanych odpowiedzi (domyślnie każda odpowiedź jest parsowana)")
+    ap.add_argument("--archive", help="katalog, do którego zapisywane są surowe odpowiedzi SOAP")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="liczba równoległych wątków przetwarzania")
+    ap.add_argument("--render-workers", type=int, default=0,
+                    help="liczba procesów renderujących PDF (0 = renderowanie w procesie głównym)")
+    ap.add_argument("--force-render", action="store_true",
+                    help="renderuj ponownie także raporty, których plik ma aktualny odcisk danych (pomijanie "
+                         "dotyczy tylko --xml, --replay i odpowiedzi z --history; każde nowe pobranie z CRBR "
+                         "ma nowy identyfikator wniosku, więc jest renderowane zawsze)")
+    ap.add_argument("--combined", help="zbiorczy PDF dla --xml/--nip/--krs/--csv (zestawienie + zakładka na podmiot) "
+                                       "zamiast plików per NIP")
+    ap.add_argument("--combined-max-entities", type=int, default=250,
+                    help="liczba podmiotów w części zbiorczego PDF (0 = jeden plik; bez --combined-max-mb "
+                         "cała partia jest trzymana w pamięci do końca przebiegu)")
+    ap.add_argument("--combined-max-mb", type=float, help="maksymalny rozmiar części zbiorczego PDF (MB)")
+    ap.add_argument("--screen", help="tylko sprawdzenie sankcji i słów kluczowych: wyniki do pliku .jsonl lub .csv "
+                                     "(PDF wg --screen-pdf)")
+    ap.add_argument("--screen-pdf", default="flagged", choices=["flagged", "all", "none"],
+                    help="dla których podmiotów renderować PDF w trybie --screen (domyślnie z trafieniem)")
+    ap.add_argument("--zip", help="archiwum ZIP, do którego raporty (z manifestem) są dopisywane na bieżąco")
     ap.add_argument("--out", required=True, help="katalog wyjściowy na PDF-y")
     ap.add_argument("--timeout", type=int, default=30, help="timeout na zapytanie SOAP (sekundy)")
+    ap.add_argument("--endpoint", help="adres usługi CRBR (np. lokalny serwer zastępczy)")
+    ap.add_argument("--hedge", type=float, default=0.0,
+                    help="maksymalny ułamek dodatkowych żądań zabezpieczających, np. 0.05 (0 = wyłączone)")
+    ap.add_argument("--hedge-percentile", type=float, default=95.0,
+                    help="percentyl opóźnień, po którym wysyłane jest żądanie zabezpieczające")
     ap.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="poziom logowania")
     ap.add_argument("--log-file", help="plik logów (opcjonalny)")
+    ap.add_argument("--resume", action="store_true", help="wznów przerwany przebieg --csv (pomija ukończone NIP-y)")
+    ap.add_argument("--journal", help="plik dziennika przebiegu --csv (domyślnie w katalogu --out)")
+    ap.add_argument("--metrics", help="plik na metryki przebiegu (.json lub .prom — format Prometheus)")
     args = ap.parse_args()
     
     # Konfiguracja logowania
@@ -913,15 +1731,87 @@ def main():
     )
     logger.info("Aplikacja SancCheck uruchomiona")
 
+    # Przed utworzeniem plików wyjściowych — bez danych wejściowych --screen/--zip zostawiłyby puste pliki
+    if not (args.xml or args.nip or args.krs or args.csv or args.replay):
+        logger.error("Nie podano --xml, --nip, --krs, --csv ani --replay. Nic do zrobienia.")
+        sys.exit(2)
+
     os.makedirs(args.out, exist_ok=True)
     generated = []
+    hedger = Hedger(fraction=args.hedge, percentile=args.hedge_percentile) if args.hedge > 0 else None
+    history = HistoryStore(args.history) if args.history else None
+    negative_cache = (NegativeCache(os.path.join(args.out, ".sanccheck_negative.json"), ttl=args.negative_ttl * 3600)
+                      if args.negative_ttl > 0 else None)
+    # Pobrana odpowiedź ma nowy identyfikator wniosku — pamięć pomaga głównie odpowiedziom z historii
+    parsed_cache = (parsed_record_cache(os.path.join(args.out, ".sanccheck_parsed"))
+                    if args.parsed_cache or args.history else None)
+    # Czcionka, style, IP hosta i znacznik czasu — raz na przebieg
+    context = RenderContext(force=args.force_render)
+    render_pool = None
+    if args.render_workers > 0:
+        from core.render_pool import RenderPool
+        render_pool = RenderPool(args.render_workers)
+    combined = None
+    if args.combined:
+        from core.combined_report import CombinedReportWriter
+        combined = CombinedReportWriter(args.combined, max_entities=args.combined_max_entities,
+                                        max_bytes=int(args.combined_max_mb * 1024 * 1024) if args.combined_max_mb else None,
+                                        context=context, resume=args.resume, render_pool=render_pool)
+    screening = None
+    if args.screen:
+        if args.combined:
+            logger.error("--screen nie łączy się z --combined")
+            sys.exit(2)
+        from core.screening import ScreeningWriter
+        screening = ScreeningWriter(args.screen, render=args.screen_pdf, resume=args.resume)
+
+    archive = None
+    if args.zip:
+        from core.report_archive import ReportArchive
+        archive = ReportArchive(args.zip, resume=args.resume)
+
+    def report(source, default_nip):
+        """
+        Raport PDF albo — z --screen — wynik sprawdzenia i PDF tylko dla wybranych podmiotów
+
+        Z --combined rekord trafia do zbiorczego PDF (ścieżki części zwraca combined.close()) i wynikiem jest None.
+        """
+        if combined is not None:
+            combined.submit(screen_record(source, default_nip, parsed_cache)[0])
+            return None
+        if screening is None:
+            data, out_path, default_nip = prepare_report(source, args.out, default_nip, parsed_cache)
+        else:
+            data, out_path = screen_for_report(screening, source, args.out, default_nip, parsed_cache)
+            if out_path is None:
+                return screening.path
+        if archive is not None and render_pool is None:
+            render_to_archive(data, out_path, archive, context)
+        else:
+            _render(data, out_path, context, render_pool)
+            if archive is not None:
+                archive.add_file(out_path, default_nip)
+        log_pdf_generation(default_nip, out_path, logger)
+        return out_path
+
+    def reports(inner, default_nip):
+        """Raporty odpowiedzi pobranej z CRBR — osobny dla każdej spółki/zgłoszenia"""
+        paths = [report(filing, default_nip) for filing in split_filings(inner)]
+        return list(dict.fromkeys(path for path in paths if path))
+
+    try:
+        date_from, date_to = normalize_date(args.date_from), normalize_date(args.date_to)
+    except ValueError as e:
+        logger.error(f"Niepoprawna data: {e}")
+        sys.exit(2)
 
     if args.xml:
         logger.info(f"Przetwarzanie pliku XML: {args.xml}")
-        with open(args.xml, "rb") as f:
-            xml_bytes = f.read()
-        pdf_path = generate_pdf_from_xml_bytes(xml_bytes, args.out)
-        generated.append(pdf_path)
+        # Jeden PDF na spółkę/zgłoszenie; plik jest parsowany strumieniowo
+        for record in iter_crbr_records(args.xml):
+            path = report(record, "unknown")
+            if path:
+                generated.append(path)
 
     if args.nip:
         from utils.nip_validator import validate_nip
@@ -929,19 +1819,67 @@ def main():
         if not is_valid:
             logger.error(f"Niepoprawny NIP: {error_msg}")
             sys.exit(2)
-        soap = fetch_xml_by_nip(args.nip, timeout=args.timeout)
-        inner = extract_inner_xml_from_soap(soap)
-        pdf_path = generate_pdf_from_xml_bytes(inner, args.out, default_nip=args.nip)
-        generated.append(pdf_path)
+        inner = fetch_inner_element_by_nip(args.nip, timeout=args.timeout, endpoint=args.endpoint,
+                                           hedger=hedger, archive_dir=args.archive, date_from=date_from,
+                                           date_to=date_to, history=history, negative_cache=negative_cache)
+        generated.extend(reports(inner, args.nip))
+
+    if args.krs:
+        if not clean_krs(args.krs):
+            logger.error(f"Niepoprawny numer KRS: {args.krs}")
+            sys.exit(2)
+        inner = fetch_inner_element(krs=args.krs, date_from=date_from, date_to=date_to, timeout=args.timeout,
+                                    endpoint=args.endpoint, hedger=hedger, archive_dir=args.archive,
+                                    history=history, negative_cache=negative_cache)
+        generated.extend(reports(inner, clean_krs(args.krs)))
 
     if args.csv:
-        generated.extend(bulk_from_csv(args.csv, args.out, timeout=args.timeout))
+        generated.extend(bulk_from_csv(args.csv, args.out, timeout=args.timeout,
+                                       archive_dir=args.archive, endpoint=args.endpoint,
+                                       hedger=hedger, resume=args.resume, journal_path=args.journal,
+                                       date_from=date_from, date_to=date_to, history=history,
+                                       negative_cache=negative_cache, parsed_cache=parsed_cache,
+                                       context=context, render_pool=render_pool, combined=combined,
+                                       screening=screening, archive=archive))
+        if hedger is not None:
+            logger.info(f"Żądania zabezpieczające: {hedger.snapshot()}")
+
+    if args.replay:
+        from core.replay import replay_responses, log_replay_summary
+        # Pamięć sparsowanych odpowiedzi tylko na życzenie — inaczej powtórny replay mierzy trafienia
+        summary = replay_responses(args.replay, args.out, workers=args.workers,
+                                   parsed_cache=parsed_cache if args.replay_parsed_cache else None,
+                                   context=context, render_pool=render_pool,
+                                   skip_unchanged=args.replay_skip_unchanged)
+        log_replay_summary(summary, logger)
+        if args.replay_report:
+            with open(args.replay_report, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+        generated.extend(summary["generated"])
+
+    if combined is not None:
+        generated.extend(p for p in combined.close() if p not in generated)
+    if render_pool is not None:
+        render_pool.close()
+    if screening is not None:
+        screening.close()
+        generated = list(dict.fromkeys(generated + [screening.path]))
+    if archive is not None:
+        if combined is not None:
+            for path in combined.paths:
+                archive.add_file(path)
+        if screening is not None:
+            archive.add_file(screening.path)
+        generated.append(archive.close())
+
+    if args.metrics:
+        logger.info(f"Zapisano metryki: {dump_metrics(args.metrics)}")
 
     if not generated:
-        logger.error("Nie podano --xml, --nip ani --csv. Nic do zrobienia.")
+        logger.error("Nie wygenerowano żadnych plików.")
         sys.exit(2)
 
-    logger.info(f"Wygenerowano {len(generated)} plików PDF")
+    logger.info(f"Wygenerowano {len(generated)} plików" + (" PDF" if screening is None else ""))
     print("Wygenerowane pliki:")
     for p in generated:
         print(p)
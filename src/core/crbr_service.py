@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+crbr_service.py — tryb usługi: raporty CRBR na żądanie przez HTTP
+
+Żądania obsługuje priorytetowy harmonogram (utils/request_scheduler.py):
+pojedyncze raporty analityka (priority=interactive) wyprzedzają zadania
+masowe (POST /batch) i mają zarezerwowany wątek.
+
+- GET  /report?nip=...&priority=interactive|bulk — generuje raport i zwraca JSON
+  (z format=pdf — sam dokument PDF, renderowany w pamięci, bez zapisu na dysk).
+  Odpowiedź z kilkoma zgłoszeniami daje raport na zgłoszenie ("pdfs"),
+  a z format=pdf — jeden zbiorczy PDF z zakładką na zgłoszenie
+- POST /batch (NIP-y rozdzielone przecinkami lub nowymi liniami) — kolejkuje zadania masowe
+- GET  /status — stan kolejek
+- GET  /metrics — metryki w formacie Prometheus
+
+Przykład:
+    python src/core/crbr_service.py --out data/output_pdfs --port 8090
+    curl "http://127.0.0.1:8090/report?nip=1234563218"
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import argparse
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.crbr_bulk_to_pdf import (
+    DEFAULT_WORKERS, fetch_inner_element_by_nip, generate_reports_with_sanctions_info, parsed_record_cache,
+    render_pdf_bytes, report_path_for, screen_record, split_filings
+)
+from utils.hedging import Hedger
+from utils.logger_config import setup_logging, get_logger, get_metrics
+from utils.nip_validator import clean_nip, validate_nip
+from utils.request_scheduler import RequestScheduler, PRIORITY_BULK, PRIORITY_INTERACTIVE, PRIORITIES
+
+
+class ReportService:
+    """Generowanie raportów przez harmonogram priorytetowy"""
+
+    def __init__(self, out_dir: str, workers: int = DEFAULT_WORKERS + 1, reserved_interactive: int = 1,
+                 timeout: int = 30, endpoint: str = None, hedger: Hedger = None, parsed_cache=None):
+        self.out_dir = out_dir
+        self.parsed_cache = parsed_cache
+        self.timeout = timeout
+        self.endpoint = endpoint
+        self.hedger = hedger
+        self.scheduler = RequestScheduler(workers=workers, reserved_interactive=reserved_interactive)
+
+    def _generate(self, nip: str) -> Dict[str, Any]:
+        inner = fetch_inner_element_by_nip(nip, timeout=self.timeout, endpoint=self.endpoint, hedger=self.hedger)
+        reports = generate_reports_with_sanctions_info(inner, self.out_dir, default_nip=nip,
+                                                       parsed_cache=self.parsed_cache)
+        sanctions_count = sum(count for _, _, count in reports)
+        result = {"nip": nip, "pdf": reports[0][0], "has_sanctions": sanctions_count > 0,
+                  "sanctions_count": sanctions_count}
+        if len(reports) > 1:
+            result["pdfs"] = [path for path, _, _ in reports]
+        return result
+
+    def _generate_bytes(self, nip: str) -> Dict[str, Any]:
+        inner = fetch_inner_element_by_nip(nip, timeout=self.timeout, endpoint=self.endpoint, hedger=self.hedger)
+        records = [screen_record(filing, default_nip=nip, parsed_cache=self.parsed_cache)[0]
+                   for filing in split_filings(inner)]
+        sanctions_count = sum(len(data.sankcje or []) for data in records)
+        filename = os.path.basename(report_path_for(records[0], "", nip))
+        if len(records) == 1:
+            content = render_pdf_bytes(records[0])
+        else:
+            # Kilka zgłoszeń — jeden dokument z zakładką na zgłoszenie zamiast scalania beneficjentów
+            from core.combined_report import render_combined_pdf
+            buffer = io.BytesIO()
+            render_combined_pdf(records, buffer)
+            content = buffer.getvalue()
+        return {"nip": nip, "filename": filename, "content": content, "has_sanctions": sanctions_count > 0,
+                "sanctions_count": sanctions_count}
+
+    def submit(self, nip: str, priority: str = PRIORITY_INTERACTIVE, as_bytes: bool = False) -> Future:
+        """
+        Kolejkuje raport dla NIP
+
+        Args:
+            nip: NIP podmiotu
+            priority: Klasa zadania (interactive/bulk)
+            as_bytes: Raport renderowany w pamięci — wynik zawiera "filename" i "content" zamiast ścieżki "pdf"
+
+        Raises:
+            ValueError: Niepoprawny NIP lub priorytet
+        """
+        is_valid, error_msg = validate_nip(nip)
+        if not is_valid:
+            raise ValueError(f"Niepoprawny NIP: {error_msg}")
+        generate = self._generate_bytes if as_bytes else self._generate
+        return self.scheduler.submit(generate, clean_nip(nip), priority=priority)
+
+    def submit_batch(self, nips: List[str]) -> Tuple[int, List[str]]:
+        """
+        Kolejkuje listę NIP-ów jako zadania masowe
+
+        Returns:
+            Krotka (liczba zakolejkowanych, lista odrzuconych NIP-ów)
+        """
+        queued, rejected = 0, []
+        for nip in nips:
+            try:
+                self.submit(nip, PRIORITY_BULK)
+                queued += 1
+            except ValueError:
+                rejected.append(nip)
+        return queued, rejected
+
+    def shutdown(self):
+        self.scheduler.shutdown(wait=False, cancel_pending=True)
+
+
+class ReportServiceHandler(BaseHTTPRequestHandler):
+    """Obsługa żądań HTTP trybu usługi"""
+
+    def log_message(self, format, *args):  # noqa: A002 - sygnatura z BaseHTTPRequestHandler
+        get_logger().debug("HTTP %s" % (format % args))
+
+    def _send_json(self, status: int, payload: Any):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_pdf(self, report: Dict[str, Any]):
+        body = report["content"]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Content-Disposition", f'attachment; filename="{report["filename"]}"')
+        self.send_header("X-Sanctions-Count", str(report["sanctions_count"]))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        service: ReportService = self.server.service
+        if url.path == "/status":
+            self._send_json(200, service.scheduler.stats())
+            return
+        if url.path == "/metrics":
+            metrics = get_metrics()
+            for priority, counts in service.scheduler.stats().items():
+                metrics.set_gauge("crbr_scheduler_queued", counts["queued"], priority=priority)
+                metrics.set_gauge("crbr_scheduler_running", counts["running"], priority=priority)
+            body = metrics.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if url.path != "/report":
+            self._send_json(404, {"error": "Nieznana ścieżka"})
+            return
+
+        query = parse_qs(url.query)
+        nip = (query.get("nip") or [""])[0]
+        priority = (query.get("priority") or [PRIORITY_INTERACTIVE])[0]
+        as_pdf = (query.get("format") or ["json"])[0] == "pdf"
+        if priority not in PRIORITIES:
+            self._send_json(400, {"error": f"Nieznany priorytet: {priority}"})
+            return
+        try:
+            future = service.submit(nip, priority, as_bytes=as_pdf)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        try:
+            report = future.result()
+        except Exception as e:
+            self._send_json(502, {"nip": nip, "error": str(e)})
+            return
+        if as_pdf:
+            self._send_pdf(report)
+        else:
+            self._send_json(200, report)
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/batch":
+            self._send_json(404, {"error": "Nieznana ścieżka"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        text = self.rfile.read(length).decode("utf-8") if length else ""
+        nips = [n.strip() for n in re.split(r"[,;\s]+", text) if n.strip()]
+        queued, rejected = self.server.service.submit_batch(nips)
+        self._send_json(202, {"queued": queued, "rejected": rejected})
+
+
+def start_report_service(service: ReportService, host: str = "127.0.0.1",
+                         port: int = 0) -> Tuple[ThreadingHTTPServer, threading.Thread]:
+    """
+    Uruchamia serwer HTTP usługi w wątku tła
+
+    Returns:
+        Krotka (serwer, wątek); adres: server.server_address
+    """
+    server = ThreadingHTTPServer((host, port), ReportServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    thread = threading.Thread(target=server.serve_forever, name="crbr-service", daemon=True)
+    thread.start()
+    return server, thread
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="SancCheck — raporty CRBR na żądanie (HTTP)")
+    ap.add_argument("--out", required=True, help="katalog wyjściowy na PDF-y")
+    ap.add_argument("--host", default="127.0.0.1", help="adres nasłuchu")
+    ap.add_argument("--port", type=int, default=8090, help="port nasłuchu")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS + 1, help="łączna liczba wątków")
+    ap.add_argument("--reserved", type=int, default=1, help="wątki zarezerwowane dla zadań interaktywnych")
+    ap.add_argument("--timeout", type=int, default=30, help="timeout na zapytanie SOAP (sekundy)")
+    ap.add_argument("--endpoint", help="adres usługi CRBR (np. lokalny serwer zastępczy)")
+    ap.add_argument("--hedge", type=float, default=0.0, help="ułamek żądań zabezpieczających (0 = wyłączone)")
+    ap.add_argument("--parsed-cache", action="store_true",
+                    help="pamiętaj sparsowane odpowiedzi (ten sam podmiot pobrany ponownie nie jest parsowany)")
+    ap.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="poziom logowania")
+    args = ap.parse_args(argv)
+
+    logger = setup_logging(level=args.log_level, console_output=True)
+    os.makedirs(args.out, exist_ok=True)
+    service = ReportService(
+        args.out, workers=args.workers, reserved_interactive=args.reserved, timeout=args.timeout,
+        endpoint=args.endpoint, hedger=Hedger(fraction=args.hedge) if args.hedge > 0 else None,
+        parsed_cache=parsed_record_cache(os.path.join(args.out, ".sanccheck_parsed")) if args.parsed_cache else None
+    )
+    server, thread = start_report_service(service, args.host, args.port)
+    host, port = server.server_address[:2]
+    logger.info(f"Usługa raportów CRBR nasłuchuje na http://{host}:{port}/")
+    try:
+        thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
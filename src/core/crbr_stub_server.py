@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+crbr_stub_server.py — lokalny zastępnik bramki CRBR (SOAP 1.2)
+
+Implementuje operację PobierzInformacjeOSpolkachIBeneficjentach
+z docs/api/ApiPrzegladoweCRBR.wsdl i zwraca syntetyczne (deterministyczne
+dla danego NIP) odpowiedzi. Pozwala mierzyć przepustowość, ponawianie
+i zachowanie klienta przy limitach bez łączenia się z CRBR_ENDPOINT:
+
+- konfigurowalne opóźnienia (stałe, jednostajne, log-normalne, wykładnicze)
+- wstrzykiwanie HTTP 429 (z Retry-After), 5xx, SOAP Fault i zerwań połączenia
+- odpowiedzi ze statusem BrakInformacji dla wskazanych NIP-ów
+- statystyki żądań pod GET /stats, WSDL pod GET ?wsdl
+
+Przykład:
+    python src/core/crbr_stub_server.py --port 8085 --latency lognormal:-1.5,0.8 --rate-429 0.05
+    python src/core/crbr_bulk_to_pdf.py --csv nips.csv --out out --endpoint http://127.0.0.1:8085/
+"""
+
+import os
+import sys
+import json
+import random
+import socket
+import struct
+import argparse
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from lxml import etree
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.crbr_synthetic import NS_SOAP, NS_AP, NS_XSD, build_crbr_response
+
+WSDL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "docs", "api", "ApiPrzegladoweCRBR.wsdl")
+
+
+class LatencyModel:
+    """
+    Rozkład opóźnień odpowiedzi w sekundach, zadawany tekstowo:
+
+    - "none" lub "0"              — bez opóźnienia
+    - "fixed:0.2"                 — stałe 200 ms
+    - "uniform:0.1,0.8"           — jednostajny z przedziału
+    - "lognormal:MU,SIGMA"        — log-normalny (długi ogon, jak bramka MF)
+    - "exp:MEAN"                  — wykładniczy o zadanej średniej
+    Opcjonalny sufiks "@MAX" obcina wartość (np. "lognormal:-1.5,1.2@45").
+    """
+
+    def __init__(self, spec: str = "none"):
+        self.spec = spec or "none"
+        body, _, cap = self.spec.partition("@")
+        self.cap = float(cap) if cap else None
+        kind, _, params = body.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(",") if p.strip()]
+        if self.kind not in ("none", "0", "fixed", "uniform", "lognormal", "exp"):
+            raise ValueError(f"Nieznany rozkład opóźnień: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind in ("none", "0"):
+            value = 0.0
+        elif self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(self.params[0], self.params[1])
+        elif self.kind == "lognormal":
+            value = rng.lognormvariate(self.params[0], self.params[1])
+        else:
+            value = rng.expovariate(1.0 / self.params[0]) if self.params[0] > 0 else 0.0
+        if self.cap is not None:
+            value = min(value, self.cap)
+        return max(0.0, value)
+
+
+class StubConfig:
+    """Konfiguracja zachowania serwera zastępczego"""
+
+    def __init__(self, latency: str = "none", rate_429: float = 0.0, rate_5xx: float = 0.0,
+                 rate_fault: float = 0.0, rate_reset: float = 0.0, retry_after: int = 1,
+                 beneficiaries: Tuple[int, int] = (1, 4), seed: Optional[int] = None,
+                 not_found: Tuple[str, ...] = ()):
+        self.latency = LatencyModel(latency)
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.rate_fault = rate_fault
+        self.rate_reset = rate_reset
+        self.retry_after = retry_after
+        self.beneficiaries = beneficiaries
+        self.seed = seed
+        self.not_found = set(not_found)
+
+
+class StubStats:
+    """Liczniki żądań według wyniku (bezpieczne wątkowo)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def incr(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            result = dict(self.counts)
+        result["total"] = sum(result.values())
+        return result
+
+
+def _sub(parent, tag: str, text: Optional[str] = None):
+    el = etree.SubElement(parent, etree.QName(NS_XSD, tag))
+    if text is not None:
+        el.text = text
+    return el
+
+
+def build_synthetic_response(nip: str, beneficiaries: Tuple[int, int] = (1, 4)) -> bytes:
+    """
+    Buduje syntetyczną kopertę odpowiedzi SOAP 1.2 (deterministyczną dla NIP)
+
+    Dokument pochodzi z generatora utils.crbr_synthetic (kolejność elementów
+    z typów WSDL, uprawnienia jak w przykładzie z docs/api/crbr_api_spec_v3.txt).
+
+    Args:
+        nip: NIP z zapytania
+        beneficiaries: Zakres (min, max) liczby beneficjentów
+
+    Returns:
+        Bajty koperty SOAP
+    """
+    return build_crbr_response(nip, beneficiaries=beneficiaries)
+
+
+def build_not_found_response(nip: str) -> bytes:
+    """Buduje odpowiedź ze statusem BrakInformacji (podmiotu nie ma w rejestrze)"""
+    env = etree.Element(etree.QName(NS_SOAP, "Envelope"), nsmap={"soap": NS_SOAP})
+    body = etree.SubElement(env, etree.QName(NS_SOAP, "Body"))
+    resp = etree.SubElement(body, etree.QName(NS_AP, "PobierzInformacjeOSpolkachIBeneficjentachOdpowiedz"),
+                            nsmap={"ns": NS_AP, "in10": NS_XSD})
+    dane = etree.SubElement(resp, "PobierzInformacjeOSpolkachIBeneficjentachOdpowiedzDane")
+    now = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+    _sub(dane, "IdentyfikatorWniosku", "%032X" % random.Random(nip).getrandbits(128))
+    _sub(dane, "DataICzasZlozeniaWniosku", now)
+    _sub(dane, "DataICzasUdostepnieniaWniosku", now)
+    _sub(_sub(dane, "SzczegolyWniosku"), "NIP", nip)
+    _sub(dane, "Status", "BrakInformacji")
+    _sub(dane, "CelZapytania", "BeneficjenciISpolki")
+    return etree.tostring(env, encoding="utf-8", xml_declaration=True)
+
+
+def build_soap_fault(reason: str, code: str = "soap:Receiver") -> bytes:
+    """Buduje komunikat SOAP 1.2 Fault"""
+    env = etree.Element(etree.QName(NS_SOAP, "Envelope"), nsmap={"soap": NS_SOAP})
+    body = etree.SubElement(env, etree.QName(NS_SOAP, "Body"))
+    fault = etree.SubElement(body, etree.QName(NS_SOAP, "Fault"))
+    code_el = etree.SubElement(fault, etree.QName(NS_SOAP, "Code"))
+    etree.SubElement(code_el, etree.QName(NS_SOAP, "Value")).text = code
+    reason_el = etree.SubElement(fault, etree.QName(NS_SOAP, "Reason"))
+    text = etree.SubElement(reason_el, etree.QName(NS_SOAP, "Text"))
+    text.set("{http://www.w3.org/XML/1998/namespace}lang", "pl")
+    text.text = reason
+    return etree.tostring(env, encoding="utf-8", xml_declaration=True)
+
+
+def _request_nip(payload: bytes) -> str:
+    """Wyciąga NIP (lub KRS, gdy zapytanie dotyczy KRS) z koperty żądania (pusty string gdy brak)"""
+    root = etree.fromstring(payload)
+    values = root.xpath(".//*[local-name()='SzczegolyWniosku']/*[local-name()='NIP' or local-name()='KRS']/text()")
+    return values[0].strip() if values else ""
+
+
+class CRBRStubHandler(BaseHTTPRequestHandler):
+    """Obsługa żądań HTTP serwera zastępczego"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # noqa: A002 - sygnatura z BaseHTTPRequestHandler
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/soap+xml; charset=utf-8",
+              extra_headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            body = json.dumps(self.server.stats.snapshot()).encode("utf-8")
+            self._send(200, body, "application/json")
+        elif self.path.lower().endswith("?wsdl"):
+            with open(WSDL_PATH, "rb") as f:
+                self._send(200, f.read(), "text/xml; charset=utf-8")
+        else:
+            self._send(404, b"", "text/plain")
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = self.rfile.read(length) if length else b""
+
+        with server.rng_lock:
+            delay = server.config.latency.sample(server.rng)
+            roll = server.rng.random()
+            status_5xx = server.rng.choice((500, 502, 503, 504))
+
+        if delay:
+            threading.Event().wait(delay)
+
+        config = server.config
+        threshold = config.rate_reset
+        if roll < threshold:
+            server.stats.incr("reset")
+            self._reset_connection()
+            return
+        threshold += config.rate_429
+        if roll < threshold:
+            server.stats.incr("http_429")
+            self._send(429, b"", "text/plain", {"Retry-After": str(config.retry_after)})
+            return
+        threshold += config.rate_5xx
+        if roll < threshold:
+            server.stats.incr(f"http_{status_5xx}")
+            self._send(status_5xx, b"", "text/plain")
+            return
+        threshold += config.rate_fault
+        if roll < threshold:
+            server.stats.incr("soap_fault")
+            self._send(500, build_soap_fault("Wewnętrzny błąd usługi (symulowany)"))
+            return
+
+        try:
+            nip = _request_nip(payload)
+        except etree.XMLSyntaxError:
+            server.stats.incr("bad_request")
+            self._send(400, build_soap_fault("Niepoprawny komunikat SOAP", "soap:Sender"))
+            return
+
+        if nip in config.not_found:
+            server.stats.incr("not_found")
+            self._send(200, build_not_found_response(nip))
+            return
+
+        server.stats.incr("ok")
+        self._send(200, build_synthetic_response(nip, config.beneficiaries))
+
+    def _reset_connection(self):
+        """Zrywa połączenie (RST) bez wysłania odpowiedzi"""
+        self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        self.close_connection = True
+        self.connection.close()
+
+
+class CRBRStubServer(ThreadingHTTPServer):
+    """Wielowątkowy serwer HTTP z konfiguracją i statystykami"""
+
+    daemon_threads = True
+
+    def __init__(self, address, config: StubConfig):
+        super().__init__(address, CRBRStubHandler)
+        self.config = config
+        self.stats = StubStats()
+        self.rng = random.Random(config.seed)
+        self.rng_lock = threading.Lock()
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def finish_request(self, request, client_address):
+        try:
+            super().finish_request(request, client_address)
+        except OSError:
+            # Zerwane połączenie (symulowane lub po stronie klienta)
+            pass
+
+
+def start_stub_server(config: Optional[StubConfig] = None, host: str = "127.0.0.1",
+                      port: int = 0) -> Tuple[CRBRStubServer, threading.Thread]:
+    """
+    Uruchamia serwer zastępczy w wątku tła
+
+    Args:
+        config: Konfiguracja (domyślnie bez opóźnień i błędów)
+        host: Adres nasłuchu
+        port: Port (0 = dowolny wolny)
+
+    Returns:
+        Krotka (serwer, wątek); zatrzymanie: server.shutdown(); server.server_close()
+    """
+    server = CRBRStubServer((host, port), config or StubConfig())
+    thread = threading.Thread(target=server.serve_forever, name="crbr-stub", daemon=True)
+    thread.start()
+    return server, thread
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Lokalny zastępnik bramki CRBR (SOAP 1.2)")
+    ap.add_argument("--host", default="127.0.0.1", help="adres nasłuchu")
+    ap.add_argument("--port", type=int, default=8085, help="port nasłuchu")
+    ap.add_argument("--latency", default="none", help="rozkład opóźnień, np. fixed:0.2, uniform:0.1,0.8, lognormal:-1.5,0.8@45, exp:0.3")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="odsetek odpowiedzi HTTP 429")
+    ap.add_argument("--rate-5xx", type=float, default=0.0, help="odsetek odpowiedzi HTTP 5xx")
+    ap.add_argument("--rate-fault", type=float, default=0.0, help="odsetek odpowiedzi SOAP Fault")
+    ap.add_argument("--rate-reset", type=float, default=0.0, help="odsetek zerwanych połączeń")
+    ap.add_argument("--retry-after", type=int, default=1, help="wartość nagłówka Retry-After dla 429 (sekundy)")
+    ap.add_argument("--beneficiaries", default="1,4", help="zakres liczby beneficjentów min,max")
+    ap.add_argument("--seed", type=int, help="ziarno generatora (powtarzalne scenariusze)")
+    ap.add_argument("--not-found", default="", help="NIP-y (po przecinku), dla których zwracany jest status BrakInformacji")
+    args = ap.parse_args()
+
+    low, _, high = args.beneficiaries.partition(",")
+    config = StubConfig(
+        latency=args.latency,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        rate_fault=args.rate_fault,
+        rate_reset=args.rate_reset,
+        retry_after=args.retry_after,
+        beneficiaries=(int(low), int(high or low)),
+        seed=args.seed,
+        not_found=tuple(n.strip() for n in args.not_found.split(",") if n.strip()),
+    )
+    server = CRBRStubServer((args.host, args.port), config)
+    print(f"Serwer zastępczy CRBR nasłuchuje na {server.endpoint} (statystyki: {server.endpoint}stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats.snapshot(), ensure_ascii=False))
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark parserów XML CRBR na syntetycznych odpowiedziach
+
+Dokumenty są generowane przez utils.crbr_synthetic w kilku rozmiarach
+(liczba zgłoszeń, beneficjentów, uprawnień, zgłaszających), a każdy parser
+przetwarza ten sam zestaw. Wynik: przepustowość w dokumentach/s i MB/s
+(najlepszy z kilku przebiegów).
+
+Przykład:
+    python src/core/parse_benchmark.py --sizes small,large --documents 50 --json bench.json
+    python src/core/parse_benchmark.py --parser nowy=moj_modul:parse
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.crbr_synthetic import build_crbr_response
+from utils.logger_config import setup_logging, get_logger
+from utils.xml_index_parser import parse_crbr_xml_indexed
+from utils.xml_parsing_helpers import parse_crbr_xml_refactored
+from utils.xml_record_stream import iter_crbr_records
+
+# Rozmiary dokumentów (argumenty build_crbr_response)
+SIZES = {
+    "small": {"filings": 1, "beneficiaries": 2, "entitlements": 1, "declarants": 1},
+    "medium": {"filings": 3, "beneficiaries": 10, "entitlements": 2, "declarants": 2},
+    "large": {"filings": 10, "beneficiaries": 50, "entitlements": 3, "declarants": 3, "discrepancies": 2},
+    "xlarge": {"filings": 25, "beneficiaries": 200, "entitlements": 3, "declarants": 5, "discrepancies": 5},
+}
+
+DEFAULT_PARSERS: Dict[str, Callable[[bytes], Any]] = {
+    "refactored": parse_crbr_xml_refactored,
+    "indexed": parse_crbr_xml_indexed,
+    "stream": lambda xml: list(iter_crbr_records(xml)),
+}
+
+
+def generate_documents(size: str, count: int) -> List[bytes]:
+    """
+    Generuje zestaw dokumentów danego rozmiaru (wnętrze odpowiedzi, bez koperty SOAP)
+
+    Args:
+        size: Klucz SIZES
+        count: Liczba dokumentów (każdy z innym ziarnem)
+    """
+    spec = SIZES[size]
+    return [build_crbr_response(str(5260000000 + i * 7919), envelope=False, **spec) for i in range(count)]
+
+
+def load_parser(spec: str) -> Callable[[bytes], Any]:
+    """Wczytuje funkcję parsera z zapisu 'modul:funkcja'"""
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"Oczekiwano 'modul:funkcja', otrzymano: {spec}")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def benchmark_parsers(parsers: Optional[Dict[str, Callable[[bytes], Any]]] = None, sizes: Optional[List[str]] = None,
+                      documents: int = 20, repeat: int = 3) -> List[Dict[str, Any]]:
+    """
+    Mierzy przepustowość parserów dla kolejnych rozmiarów dokumentów
+
+    Args:
+        parsers: Nazwa -> funkcja parsująca bajty XML (domyślnie DEFAULT_PARSERS)
+        sizes: Lista kluczy SIZES (domyślnie wszystkie)
+        documents: Liczba dokumentów w zestawie dla rozmiaru
+        repeat: Liczba przebiegów — raportowany jest najszybszy
+
+    Returns:
+        Lista wierszy: parser, rozmiar, dokumenty, bajty, czas, dok/s, MB/s
+    """
+    parsers = parsers or DEFAULT_PARSERS
+    rows = []
+    for size in sizes or list(SIZES):
+        docs = generate_documents(size, documents)
+        total_bytes = sum(len(d) for d in docs)
+        for name, parse in parsers.items():
+            best = None
+            for _ in range(max(1, repeat)):
+                start = time.perf_counter()
+                for doc in docs:
+                    parse(doc)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            rows.append({
+                "parser": name,
+                "size": size,
+                "documents": len(docs),
+                "bytes": total_bytes,
+                "avg_kb": round(total_bytes / len(docs) / 1024, 1),
+                "best_s": round(best, 6),
+                "documents_per_s": round(len(docs) / best, 1) if best > 0 else 0.0,
+                "mb_per_s": round(total_bytes / best / 1e6, 2) if best > 0 else 0.0,
+            })
+    return rows
+
+
+def log_benchmark(rows: List[Dict[str, Any]], logger=None):
+    """Loguje wyniki benchmarku w formie tabeli"""
+    if logger is None:
+        logger = get_logger()
+    logger.info(f"{'parser':<12} {'rozmiar':<8} {'KB/dok':>8} {'dok/s':>10} {'MB/s':>8}")
+    for row in rows:
+        logger.info(f"{row['parser']:<12} {row['size']:<8} {row['avg_kb']:>8} "
+                    f"{row['documents_per_s']:>10} {row['mb_per_s']:>8}")
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Benchmark parserów XML CRBR na syntetycznych odpowiedziach")
+    ap.add_argument("--sizes", default=",".join(SIZES), help=f"rozmiary dokumentów ({', '.join(SIZES)})")
+    ap.add_argument("--documents", type=int, default=20, help="liczba dokumentów na rozmiar")
+    ap.add_argument("--repeat", type=int, default=3, help="liczba przebiegów (raportowany najszybszy)")
+    ap.add_argument("--parser", action="append", default=[],
+                    help="dodatkowy parser w postaci nazwa=modul:funkcja (można powtarzać)")
+    ap.add_argument("--only", action="store_true", help="mierz tylko parsery podane w --parser")
+    ap.add_argument("--json", help="plik JSON na wyniki")
+    args = ap.parse_args(argv)
+
+    logger = setup_logging(level="INFO", console_output=True)
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        ap.error(f"nieznane rozmiary: {', '.join(unknown)}")
+
+    parsers = {} if args.only else dict(DEFAULT_PARSERS)
+    for spec in args.parser:
+        name, _, target = spec.partition("=")
+        parsers[name] = load_parser(target or name)
+
+    rows = benchmark_parsers(parsers, sizes, documents=args.documents, repeat=args.repeat)
+    log_benchmark(rows, logger)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        logger.info(f"Wyniki zapisane do: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
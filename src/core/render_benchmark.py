@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark renderowania raportu PDF
+
+Tabele (domyślnie): tabele beneficjentów i szczegółowych uprawnień są
+budowane z syntetycznych odpowiedzi (utils.crbr_synthetic) i renderowane do
+pamięci. Wynik: czas i czas na wiersz dla kolejnych liczby wierszy — przy
+liniowym wzroście czas na wiersz pozostaje stały. Z --compare mierzona jest
+też ścieżka pojedynczej tabeli (bez bloków LongTable), dla porównania.
+
+Raporty (--reports): całe raporty render_pdf dla syntetycznych rekordów
+z rosnącą liczbą beneficjentów, bez sekcji sankcyjnej, z sekcją sankcyjną
+i z długim uzasadnieniem decyzji MSWiA. Każdy przypadek jest mierzony przy
+"zimnym" stanie czcionki (świeży proces: rejestracja czcionki i style przed
+pierwszym raportem) i "ciepłym" (kontekst przebiegu już utworzony). Wynik na
+raport: czas, liczba stron, rozmiar pliku i szczytowa pamięć (tracemalloc,
+osobny przebieg). JSON zawiera też wersje Pythona, ReportLab i szablonu,
+żeby wyniki z różnych maszyn i wersji dało się porównać.
+
+Przykład:
+    python src/core/render_benchmark.py --rows 100,500,2000 --compare --json render_bench.json
+    python src/core/render_benchmark.py --reports --beneficiaries 0,50,500 --json report_bench.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import pdf_table_helpers
+from utils.crbr_synthetic import build_crbr_response
+from utils.logger_config import setup_logging, get_logger
+from utils.render_context import RenderContext
+from utils.crbr_models import Beneficiary, CRBRRecord
+from utils.xml_index_parser import parse_crbr_record
+
+from core.crbr_bulk_to_pdf import RENDERER_VERSION, page_callback, report_document, report_story
+
+DEFAULT_ROW_COUNTS = [100, 250, 500, 1000, 2000]
+
+# Liczby beneficjentów w benchmarku raportów
+DEFAULT_BENEFICIARY_COUNTS = [0, 10, 50, 100, 250, 500]
+
+# Warianty sekcji sankcyjnej: brak, kilka dopasowań, dopasowanie MSWiA z długim uzasadnieniem
+REPORT_VARIANTS = ("none", "sanctions", "mswia_long")
+
+_JUSTIFICATION = ("Wpis na listę na podstawie art. 2 ust. 1 pkt 3 ustawy z dnia 13 kwietnia 2022 r. o szczególnych "
+                  "rozwiązaniach w zakresie przeciwdziałania wspieraniu agresji na Ukrainę oraz służących ochronie "
+                  "bezpieczeństwa narodowego; podmiot pośrednio wspiera działania naruszające integralność "
+                  "terytorialną Ukrainy. ")
+
+TABLES = {
+    "beneficjenci": lambda ben, context: pdf_table_helpers.create_beneficiaries_table(ben, context=context),
+    "uprawnienia": lambda ben, context: pdf_table_helpers.create_detailed_entitlements_table(
+        [e for b in ben for e in b.szczegolowe_uprawnienia], context=context),
+}
+
+
+def _beneficiaries(count: int) -> List[Beneficiary]:
+    """Syntetyczni beneficjenci (po jednym uprawnieniu)"""
+    xml = build_crbr_response("1234563218", beneficiaries=(count, count), entitlements=1, envelope=False)
+    return parse_crbr_record(xml).beneficjenci
+
+
+def benchmark_tables(row_counts: Optional[List[int]] = None, repeat: int = 1,
+                     long_tables: bool = True) -> List[Dict[str, Any]]:
+    """
+    Mierzy czas renderowania tabel dla kolejnych liczb wierszy
+
+    Args:
+        row_counts: Liczby beneficjentów (wierszy tabeli beneficjentów)
+        repeat: Liczba przebiegów — raportowany jest najszybszy
+        long_tables: False — cała tabela jako jeden Table (ścieżka sprzed bloków LongTable)
+
+    Returns:
+        Lista wierszy: tabela, ścieżka, wiersze, czas, ms/wiersz, strony
+    """
+    context = RenderContext()
+    threshold = pdf_table_helpers.LONG_TABLE_ROWS
+    if not long_tables:
+        pdf_table_helpers.LONG_TABLE_ROWS = float("inf")
+    try:
+        rows = []
+        for count in row_counts or DEFAULT_ROW_COUNTS:
+            beneficiaries = _beneficiaries(count)
+            for name, build in TABLES.items():
+                best = None
+                for _ in range(max(1, repeat)):
+                    doc = report_document(io.BytesIO())
+                    start = time.perf_counter()
+                    doc.build([build(beneficiaries, context)])
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                rows.append({
+                    "table": name,
+                    "path": "long" if long_tables else "single",
+                    "rows": count,
+                    "best_s": round(best, 6),
+                    "ms_per_row": round(best / count * 1000, 3),
+                    "pages": doc.page,
+                })
+        return rows
+    finally:
+        pdf_table_helpers.LONG_TABLE_ROWS = threshold
+
+
+def _sanctions(variant: str) -> Optional[List[Dict[str, Any]]]:
+    """Syntetyczne dopasowania sankcyjne dla wariantu"""
+    if variant == "none":
+        return None
+    matches = [
+        {"source": "MF", "name": "SPÓŁKA TESTOWA", "reason": "NIP", "date": "2022-04-26", "status": "Aktywny",
+         "nip": "1234563218"},
+        {"source": "UE", "name": "SPÓŁKA TESTOWA", "reason": "Nazwa", "date": "2022-03-15", "status": "Aktywny",
+         "country": "RU"},
+    ]
+    mswia = {"source": "MSWiA", "name": "Jan Kowalski", "reason": "PESEL", "date": "2022-05-10",
+             "status": "Aktywny", "citizenship": "rosyjskie"}
+    if variant == "mswia_long":
+        mswia["decision"] = _JUSTIFICATION * 40  # kilka stron tekstu
+    else:
+        mswia["decision"] = _JUSTIFICATION
+    return matches + [mswia]
+
+
+def synthetic_report_record(beneficiaries: int, variant: str = "none") -> CRBRRecord:
+    """
+    Rekord do benchmarku raportów
+
+    Args:
+        beneficiaries: Liczba beneficjentów
+        variant: Wariant sekcji sankcyjnej (REPORT_VARIANTS)
+    """
+    if variant not in REPORT_VARIANTS:
+        raise ValueError(f"Nieznany wariant: {variant}")
+    xml = build_crbr_response("1234563218", beneficiaries=(beneficiaries, beneficiaries), envelope=False)
+    data = parse_crbr_record(xml)
+    sanctions = _sanctions(variant)
+    if sanctions:
+        data.sankcje = sanctions
+    return data
+
+
+def _render_report(data: CRBRRecord, context: RenderContext) -> Tuple[int, int]:
+    """Renderuje raport do pamięci (jak render_pdf); zwraca liczbę stron i rozmiar w bajtach"""
+    buffer = io.BytesIO()
+    doc = report_document(buffer)
+    on_page = page_callback(context)
+    doc.build(report_story(data, context), onFirstPage=on_page, onLaterPages=on_page)
+    return doc.page, buffer.tell()
+
+
+def _measure(data: CRBRRecord, context: Optional[RenderContext], trace: bool) -> Dict[str, Any]:
+    """
+    Jeden pomiar; context=None — kontekst (czcionka, style) tworzony w ramach pomiaru
+
+    Z trace=True mierzona jest tylko szczytowa pamięć (tracemalloc spowalnia render, więc czas
+    pochodzi z przebiegu bez śledzenia).
+    """
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    context = context or RenderContext()
+    pages, size = _render_report(data, context)
+    elapsed = time.perf_counter() - start
+    result = {"wall_s": elapsed, "pages": pages, "bytes": size}
+    if trace:
+        result["peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    return result
+
+
+def _cold_measure(beneficiaries: int, variant: str, trace: bool) -> Dict[str, Any]:
+    """Pomiar w świeżym procesie (uruchamiany przez spawn — bez zarejestrowanej czcionki)"""
+    return _measure(synthetic_report_record(beneficiaries, variant), None, trace)
+
+
+def _in_fresh_process(beneficiaries: int, variant: str, trace: bool) -> Dict[str, Any]:
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(_cold_measure, beneficiaries, variant, trace).result()
+
+
+def benchmark_reports(beneficiary_counts: Optional[List[int]] = None, variants=REPORT_VARIANTS,
+                      repeat: int = 3, cold: bool = True) -> List[Dict[str, Any]]:
+    """
+    Mierzy renderowanie całych raportów
+
+    Args:
+        beneficiary_counts: Liczby beneficjentów
+        variants: Warianty sekcji sankcyjnej (REPORT_VARIANTS)
+        repeat: Liczba przebiegów "ciepłych" — raportowany jest najszybszy
+        cold: Mierz też pierwszy raport w świeżym procesie (po dwa procesy na przypadek)
+
+    Returns:
+        Lista wierszy: beneficjenci, wariant, stan czcionki, czas, strony, bajty, szczytowa pamięć [KB]
+    """
+    context = RenderContext()
+    rows = []
+    for count in beneficiary_counts or DEFAULT_BENEFICIARY_COUNTS:
+        for variant in variants:
+            data = synthetic_report_record(count, variant)
+            runs = [_measure(data, context, trace=False) for _ in range(max(1, repeat))]
+            warm = min(runs, key=lambda r: r["wall_s"])
+            warm["peak_kb"] = _measure(data, context, trace=True)["peak_kb"]
+            measured = [("warm", warm)]
+            if cold:
+                first = _in_fresh_process(count, variant, trace=False)
+                first["peak_kb"] = _in_fresh_process(count, variant, trace=True)["peak_kb"]
+                measured.insert(0, ("cold", first))
+            for font, result in measured:
+                rows.append({
+                    "beneficiaries": count,
+                    "variant": variant,
+                    "font": font,
+                    "wall_s": round(result["wall_s"], 6),
+                    "pages": result["pages"],
+                    "bytes": result["bytes"],
+                    "peak_kb": result["peak_kb"],
+                })
+    return rows
+
+
+def benchmark_environment() -> Dict[str, Any]:
+    """Wersje wpływające na wyniki (do porównywania plików JSON)"""
+    from reportlab import Version as reportlab_version
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "reportlab": reportlab_version,
+        "renderer_version": RENDERER_VERSION,
+        "font": RenderContext().font_name,
+    }
+
+
+def log_report_benchmark(rows: List[Dict[str, Any]], logger=None):
+    """Loguje wyniki benchmarku raportów w formie tabeli"""
+    if logger is None:
+        logger = get_logger()
+    logger.info(f"{'benef.':>7} {'wariant':<11} {'czcionka':<8} {'czas [s]':>10} {'strony':>7} "
+                f"{'KB':>8} {'pamięć [KB]':>12}")
+    for row in rows:
+        logger.info(f"{row['beneficiaries']:>7} {row['variant']:<11} {row['font']:<8} {row['wall_s']:>10} "
+                    f"{row['pages']:>7} {row['bytes'] / 1024:>8.1f} {row['peak_kb']:>12}")
+
+
+def log_table_benchmark(rows: List[Dict[str, Any]], logger=None):
+    """Loguje wyniki benchmarku w formie tabeli"""
+    if logger is None:
+        logger = get_logger()
+    logger.info(f"{'tabela':<14} {'ścieżka':<8} {'wiersze':>8} {'czas [s]':>10} {'ms/wiersz':>10} {'strony':>7}")
+    for row in rows:
+        logger.info(f"{row['table']:<14} {row['path']:<8} {row['rows']:>8} {row['best_s']:>10} "
+                    f"{row['ms_per_row']:>10} {row['pages']:>7}")
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Benchmark renderowania raportu PDF")
+    ap.add_argument("--rows", default=",".join(map(str, DEFAULT_ROW_COUNTS)), help="liczby wierszy (po przecinku)")
+    ap.add_argument("--repeat", type=int, default=1, help="liczba przebiegów (raportowany najszybszy)")
+    ap.add_argument("--compare", action="store_true", help="zmierz też ścieżkę pojedynczej tabeli")
+    ap.add_argument("--reports", action="store_true", help="benchmark całych raportów zamiast tabel")
+    ap.add_argument("--beneficiaries", default=",".join(map(str, DEFAULT_BENEFICIARY_COUNTS)),
+                    help="liczby beneficjentów dla --reports (po przecinku)")
+    ap.add_argument("--variants", default=",".join(REPORT_VARIANTS),
+                    help="warianty sekcji sankcyjnej dla --reports: " + ", ".join(REPORT_VARIANTS))
+    ap.add_argument("--no-cold", action="store_true", help="bez pomiaru w świeżym procesie (--reports)")
+    ap.add_argument("--json", help="plik JSON na wyniki")
+    args = ap.parse_args(argv)
+
+    logger = setup_logging(level="INFO", console_output=True)
+    if args.reports:
+        counts = [int(b) for b in args.beneficiaries.split(",") if b.strip()]
+        variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+        rows = benchmark_reports(counts, variants, repeat=max(args.repeat, 1), cold=not args.no_cold)
+        log_report_benchmark(rows, logger)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"environment": benchmark_environment(), "reports": rows}, f, ensure_ascii=False, indent=2)
+            logger.info(f"Wyniki zapisane do: {args.json}")
+        return
+
+    row_counts = [int(r) for r in args.rows.split(",") if r.strip()]
+    rows = benchmark_tables(row_counts, repeat=args.repeat)
+    if args.compare:
+        rows += benchmark_tables(row_counts, repeat=args.repeat, long_tables=False)
+    log_table_benchmark(rows, logger)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        logger.info(f"Wyniki zapisane do: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Renderowanie raportów PDF w puli procesów
+
+Układ dokumentu w ReportLab to czysty Python, więc wątki GUI i przebiegu
+masowego czekały na siebie na GIL w render_pdf. RenderPool wysyła
+sparsowane rekordy (CRBRRecord.to_dict() zserializowane marshal — zwięzłe
+i szybkie; proces puli odtwarza model przez from_dict) do puli
+procesów i zwraca ścieżki gotowych plików. Każdy proces przy starcie raz
+rejestruje czcionkę i buduje style (RenderContext), a znacznik czasu
+przebiegu przychodzi z zadaniem — ta sama pula obsługuje kolejne przebiegi.
+Pobieranie odpowiedzi zostaje w wątkach (I/O), a render skaluje się
+z liczbą rdzeni.
+
+Z workers=0 raporty są renderowane w bieżącym procesie (bez puli).
+"""
+
+import io
+import os
+import time
+import marshal
+import pickle
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from utils.crbr_models import CRBRRecord
+from utils.logger_config import get_logger, get_metrics
+from utils.render_context import RenderContext
+
+# Domyślnie wszystkie rdzenie poza jednym (zostaje na pobieranie i GUI)
+RENDER_POOL_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+
+def encode_record(data: CRBRRecord) -> bytes:
+    """
+    Serializuje rekord CRBR do przesłania do procesu renderującego
+
+    Słownik rekordu (to_dict) zawiera wyłącznie słowniki, listy i napisy (marshal);
+    wartości spoza tych typów (np. z list sankcyjnych) przechodzą przez pickle.
+    """
+    payload = data.to_dict() if isinstance(data, CRBRRecord) else data
+    try:
+        return b"M" + marshal.dumps(payload)
+    except ValueError:
+        return b"P" + pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+
+
+def decode_record(blob: bytes) -> CRBRRecord:
+    """Odtwarza rekord (CRBRRecord) z encode_record"""
+    if blob[:1] == b"M":
+        return CRBRRecord.from_dict(marshal.loads(blob[1:]))
+    return CRBRRecord.from_dict(pickle.loads(blob[1:]))
+
+
+def _init_worker():
+    """Inicjalizacja procesu puli: rejestracja czcionki, style i adres IP (raz na proces)"""
+    RenderContext()
+
+
+def _render_in_worker(blob: bytes, out_path: str, timestamp: datetime, force: bool = False) -> Tuple[str, float]:
+    """Renderuje jeden raport w procesie puli; zwraca ścieżkę i czas renderowania"""
+    from core.crbr_bulk_to_pdf import render_pdf
+    start = time.perf_counter()
+    render_pdf(decode_record(blob), out_path, RenderContext(timestamp, force=force))
+    return out_path, time.perf_counter() - start
+
+
+def _render_combined_in_worker(blobs: List[bytes], timestamp: datetime, force: bool = False,
+                               part: Optional[int] = None) -> Tuple[bytes, float]:
+    """Renderuje część zbiorczego PDF w procesie puli; zwraca treść pliku i czas renderowania"""
+    from core.combined_report import render_combined_pdf
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    render_combined_pdf([decode_record(blob) for blob in blobs], buffer, RenderContext(timestamp, force=force), part)
+    return buffer.getvalue(), time.perf_counter() - start
+
+
+class RenderPool:
+    """
+    Pula procesów renderujących raporty PDF
+
+    Args:
+        workers: Liczba procesów (0 — renderowanie w bieżącym procesie)
+    """
+
+    def __init__(self, workers: int = RENDER_POOL_WORKERS):
+        self.workers = max(0, workers)
+        self._executor = None
+        if self.workers:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            get_logger().info(f"Pula renderowania PDF: {self.workers} procesów")
+
+    def submit(self, data: CRBRRecord, out_path: str, context: Optional[RenderContext] = None) -> Future:
+        """
+        Zleca renderowanie raportu
+
+        Args:
+            data: Rekord CRBRRecord (opcjonalnie z dopasowaniami w polu sankcje)
+            out_path: Ścieżka pliku PDF
+            context: Kontekst przebiegu — w procesach puli odtwarzany ze znacznika czasu i flagi force
+
+        Returns:
+            Future ze ścieżką pliku PDF
+        """
+        context = context or RenderContext()
+        result = Future()
+        if self._executor is None:
+            from core.crbr_bulk_to_pdf import render_pdf
+            try:
+                render_pdf(data, out_path, context)
+                result.set_result(out_path)
+            except Exception as e:
+                result.set_exception(e)
+            return result
+
+        def done(job):
+            try:
+                path, seconds = job.result()
+            except Exception as e:
+                result.set_exception(e)
+                return
+            # Czas etapu mierzony w procesie puli — rejestr metryk jest w procesie głównym
+            get_metrics().observe("crbr_stage_seconds", seconds, stage="render")
+            result.set_result(path)
+
+        job = self._executor.submit(_render_in_worker, encode_record(data), out_path, context.timestamp,
+                                    context.force)
+        job.add_done_callback(done)
+        return result
+
+    def render(self, data: CRBRRecord, out_path: str, context: Optional[RenderContext] = None) -> str:
+        """Renderuje raport i czeka na wynik (wątek wywołujący nie trzyma GIL w trakcie renderowania)"""
+        return self.submit(data, out_path, context).result()
+
+    def render_combined(self, records: List[CRBRRecord], context: Optional[RenderContext] = None,
+                        part: Optional[int] = None) -> bytes:
+        """
+        Renderuje część zbiorczego PDF (core.combined_report) i czeka na wynik
+
+        Args:
+            records: Rekordy CRBR kolejnych podmiotów
+            context: Kontekst przebiegu
+            part: Numer części (w tytule zestawienia)
+
+        Returns:
+            Treść pliku PDF
+        """
+        context = context or RenderContext()
+        if self._executor is None:
+            from core.combined_report import render_combined_pdf
+            buffer = io.BytesIO()
+            render_combined_pdf(records, buffer, context, part)
+            return buffer.getvalue()
+        pdf, seconds = self._executor.submit(_render_combined_in_worker, [encode_record(r) for r in records],
+                                             context.timestamp, context.force, part).result()
+        get_metrics().observe("crbr_stage_seconds", seconds, stage="render")
+        return pdf
+
+    def close(self, wait: bool = True):
+        """Zamyka pulę procesów"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tryb odtwarzania (replay) — przetwarza zapisane odpowiedzi SOAP CRBR
+bez połączenia z bramką MF.
+
+Źródłem jest katalog z plikami *.xml (np. utworzony opcją --archive)
+albo archiwum ZIP z takimi plikami. Każda koperta przechodzi przez
+te same etapy co w trybie online:
+soap_body_element → parse (split_filings — raport na spółkę/zgłoszenie)
+→ sprawdzenie sankcji → render PDF, a czas każdego etapu jest mierzony osobno.
+
+Domyślnie każdy raport jest renderowany, także gdy plik z poprzedniego
+odtworzenia ma aktualny odcisk danych — inaczej powtórne odtworzenie
+mierzyłoby pominięcia zamiast renderowania (skip_unchanged=True to zmienia).
+"""
+
+import os
+import re
+import time
+import zipfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple
+
+from lxml import etree
+
+from utils.logger_config import get_logger, log_error
+from utils.crbr_models import CRBRRecord
+from utils.render_context import RenderContext
+
+from core.crbr_bulk_to_pdf import (
+    DEFAULT_WORKERS,
+    soap_body_element,
+    parse_crbr_record_cached,
+    check_contractor_sanctions,
+    render_pdf,
+    report_path_for,
+    split_filings,
+)
+
+REPLAY_STAGES = ("extract", "parse", "screen", "render")
+
+_NIP_IN_NAME = re.compile(r"(\d{10})")
+
+
+def iter_recorded_responses(source: str) -> Iterator[Tuple[str, bytes]]:
+    """
+    Iteruje po zapisanych kopertach SOAP w kolejności nazw plików
+
+    Args:
+        source: Katalog z plikami XML lub archiwum ZIP
+
+    Returns:
+        Iterator krotek (nazwa_pliku, bajty_odpowiedzi)
+    """
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            if name.lower().endswith(".xml") and os.path.isfile(path):
+                with open(path, "rb") as f:
+                    yield name, f.read()
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as zf:
+            for name in sorted(zf.namelist()):
+                if name.lower().endswith(".xml"):
+                    yield os.path.basename(name), zf.read(name)
+    else:
+        raise ValueError(f"Źródło replay musi być katalogiem lub archiwum ZIP: {source}")
+
+
+class StageTimings:
+    """Bezpieczny wątkowo zbiór czasów trwania etapów przetwarzania"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[float]] = {stage: [] for stage in REPLAY_STAGES}
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Zwraca statystyki (liczba, suma, średnia, p50, p95, max) dla każdego etapu"""
+        result = {}
+        with self._lock:
+            for stage, samples in self._samples.items():
+                if not samples:
+                    continue
+                ordered = sorted(samples)
+                result[stage] = {
+                    "count": len(ordered),
+                    "total_s": round(sum(ordered), 6),
+                    "mean_s": round(sum(ordered) / len(ordered), 6),
+                    "p50_s": round(_percentile(ordered, 50), 6),
+                    "p95_s": round(_percentile(ordered, 95), 6),
+                    "max_s": round(ordered[-1], 6),
+                }
+        return result
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    """Percentyl (metoda najbliższej rangi) z posortowanej listy"""
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def _replay_one(name: str, soap_xml: bytes, out_dir: str, timings: StageTimings, parsed_cache=None,
+                context: RenderContext = None, render_pool=None) -> List[str]:
+    """Przeprowadza jedną zapisaną odpowiedź przez wszystkie etapy; zwraca ścieżki raportów (po jednym na zgłoszenie)"""
+    match = _NIP_IN_NAME.search(name)
+    default_nip = match.group(1) if match else "unknown"
+
+    start = time.perf_counter()
+    try:
+        inner = soap_body_element(soap_xml)
+    except etree.XMLSyntaxError:
+        inner = soap_xml  # etap parse zgłosi błąd z pełnym komunikatem
+    timings.add("extract", time.perf_counter() - start)
+
+    # Jak w trybie online: odpowiedź z kilkoma zgłoszeniami daje osobne rekordy
+    start = time.perf_counter()
+    records = [filing if isinstance(filing, CRBRRecord) else parse_crbr_record_cached(filing, parsed_cache)
+               for filing in split_filings(inner)]
+    timings.add("parse", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for data in records:
+        sanctions_data = check_contractor_sanctions(data)
+        if sanctions_data:
+            data.sankcje = sanctions_data
+    timings.add("screen", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    out_paths = []
+    for data in records:
+        out_path = report_path_for(data, out_dir, default_nip)
+        if render_pool is not None:
+            render_pool.render(data, out_path, context)
+        else:
+            render_pdf(data, out_path, context)
+        out_paths.append(out_path)
+    timings.add("render", time.perf_counter() - start)
+
+    return out_paths
+
+
+def replay_responses(source: str, out_dir: str, workers: int = DEFAULT_WORKERS, parsed_cache=None,
+                     context: RenderContext = None, render_pool=None,
+                     skip_unchanged: bool = False) -> Dict[str, Any]:
+    """
+    Odtwarza pełny pipeline dla zapisanych odpowiedzi SOAP
+
+    Args:
+        source: Katalog z plikami XML lub archiwum ZIP
+        out_dir: Katalog wyjściowy na PDF-y
+        workers: Liczba równoległych wątków (jak w GUI)
+        parsed_cache: Opcjonalna ParsedRecordCache — odpowiedź widziana wcześniej nie jest parsowana ponownie
+        context: Kontekst renderowania (domyślnie jeden RenderContext na przebieg)
+        render_pool: Opcjonalna pula procesów renderujących (RenderPool) — wątki czekają na render bez GIL
+        skip_unchanged: Pomijaj raporty, których plik ma aktualny odcisk danych (bez tego render jest wymuszany)
+
+    Returns:
+        Słownik z podsumowaniem: liczba dokumentów (odpowiedzi) i raportów, błędy,
+        czas całkowity, statystyki etapów i lista wygenerowanych plików
+    """
+    logger = get_logger()
+    os.makedirs(out_dir, exist_ok=True)
+    timings = StageTimings()
+    context = context or RenderContext(force=not skip_unchanged)
+    if not skip_unchanged and not context.force:
+        context = RenderContext(context.timestamp, force=True)
+    generated = []
+    failed = []
+    documents = 0
+
+    logger.info(f"Odtwarzanie odpowiedzi SOAP z: {source} (wątki: {workers})")
+    started = time.perf_counter()
+
+    def collect(name, future):
+        nonlocal documents
+        documents += 1
+        try:
+            generated.extend(future.result())
+        except Exception as e:
+            failed.append(name)
+            log_error(name, e, logger)
+
+    workers = max(1, workers)
+    # Najwyżej 2*workers zleconych odpowiedzi — koperty są wczytywane na bieżąco, nie wszystkie naraz
+    window = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for name, soap_xml in iter_recorded_responses(source):
+            if len(window) >= 2 * workers:
+                collect(*window.popleft())
+            window.append((name, executor.submit(_replay_one, name, soap_xml, out_dir, timings, parsed_cache,
+                                                 context, render_pool)))
+        while window:
+            collect(*window.popleft())
+
+    wall_time = time.perf_counter() - started
+    return {
+        "source": source,
+        "workers": workers,
+        "render_workers": render_pool.workers if render_pool is not None else 0,
+        "skip_unchanged": not context.force,
+        "parsed_cache": parsed_cache is not None,
+        "documents": documents,
+        "reports": len(generated),
+        "failed": failed,
+        "wall_time_s": round(wall_time, 6),
+        "documents_per_s": round(documents / wall_time, 3) if wall_time > 0 else 0.0,
+        "stages": timings.summary(),
+        "generated": generated,
+    }
+
+
+def log_replay_summary(summary: Dict[str, Any], logger=None):
+    """
+    Loguje podsumowanie trybu replay z czasami etapów
+
+    Args:
+        summary: Wynik replay_responses
+        logger: Logger (opcjonalny)
+    """
+    if logger is None:
+        logger = get_logger()
+
+    logger.info(
+        f"Replay: {summary['documents']} dokumentów ({summary.get('reports', 0)} raportów), "
+        f"błędy: {len(summary['failed'])}, "
+        f"czas: {summary['wall_time_s']:.3f}s ({summary['documents_per_s']} dok/s), "
+        f"niezmienione raporty: {'pomijane' if summary.get('skip_unchanged') else 'renderowane'}, "
+        f"pamięć sparsowanych odpowiedzi: {'tak' if summary.get('parsed_cache') else 'nie'}"
+    )
+    for stage in REPLAY_STAGES:
+        stats = summary["stages"].get(stage)
+        if stats:
+            logger.info(
+                f"  {stage:<8} n={stats['count']} suma={stats['total_s']:.3f}s "
+                f"śr={stats['mean_s'] * 1000:.1f}ms p95={stats['p95_s'] * 1000:.1f}ms "
+                f"max={stats['max_s'] * 1000:.1f}ms"
+            )
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Archiwum ZIP raportów zapisywane w trakcie przebiegu
+
+Każdy gotowy raport jest dopisywany do archiwum od razu po wyrenderowaniu —
+z bajtów w pamięci (render_pdf_bytes), gdy są dostępne, albo z właśnie
+zapisanego pliku. Na końcu dopisywany jest manifest (manifest.json: plik,
+NIP-y, rozmiar, SHA-256), więc paczka jest gotowa w chwili zakończenia
+przebiegu, bez drugiego przejścia po katalogu wyjściowym.
+
+Archiwum powstaje pod nazwą tymczasową (<nazwa>.part) i jest podmieniane
+przy zamknięciu. Przy wznowieniu raporty PDF istniejącego archiwum są
+przepisywane do nowego (manifest i pliki pomocnicze, np. wyniki sprawdzenia,
+powstają na nowo przy zamknięciu).
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import zipfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from utils.logger_config import get_logger
+
+MANIFEST_NAME = "manifest.json"
+
+
+class ReportArchive:
+    """
+    Strumieniowy zapis raportów do archiwum ZIP (bezpieczny wątkowo)
+
+    PDF-y są zapisywane bez kompresji (ReportLab kompresuje już strumienie
+    stron), pozostałe pliki (manifest, wyniki sprawdzenia) — z kompresją.
+
+    Args:
+        path: Ścieżka archiwum ZIP
+        resume: Zachowaj wpisy istniejącego archiwum (wznowiony przebieg)
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._temp_path = f"{path}.part"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._zip = zipfile.ZipFile(self._temp_path, "w")
+        if resume and os.path.exists(path):
+            self._copy_existing(path)
+
+    def _copy_existing(self, path: str):
+        """Przepisuje raporty PDF (z wpisami manifestu) z archiwum poprzedniego przebiegu"""
+        try:
+            with zipfile.ZipFile(path) as previous:
+                manifest = {}
+                if MANIFEST_NAME in previous.namelist():
+                    manifest = {e["name"]: e for e in json.loads(previous.read(MANIFEST_NAME)).get("files", [])}
+                for info in previous.infolist():
+                    if not info.filename.lower().endswith(".pdf"):
+                        continue
+                    with previous.open(info) as src, self._zip.open(info, "w") as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+                    self.entries[info.filename] = manifest.get(
+                        info.filename, {"name": info.filename, "nips": [], "bytes": info.file_size})
+        except (zipfile.BadZipFile, OSError, ValueError) as e:
+            get_logger().warning(f"Nie można wznowić archiwum {path} ({e}) — tworzone od nowa")
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self.entries
+
+    def add_bytes(self, name: str, content: bytes, nip: Optional[str] = None, **fields) -> bool:
+        """
+        Dopisuje plik z pamięci
+
+        Args:
+            name: Nazwa w archiwum
+            content: Treść pliku
+            nip: NIP podmiotu (do manifestu)
+            fields: Dodatkowe pola wpisu manifestu (np. sanctions_count)
+
+        Returns:
+            False, jeśli plik o tej nazwie już jest w archiwum (dopisywany jest tylko NIP)
+            albo archiwum jest zamknięte
+        """
+        with self._lock:
+            if self._note_duplicate(name, nip):
+                return False
+            self._zip.writestr(zipfile.ZipInfo(name, datetime.now().timetuple()[:6]), content,
+                               compress_type=self._compression(name))
+            self._record(name, nip, len(content), hashlib.sha256(content).hexdigest(), fields)
+        return True
+
+    def add_file(self, path: str, nip: Optional[str] = None, name: Optional[str] = None, **fields) -> bool:
+        """
+        Dopisuje plik z dysku (np. raport wyrenderowany w puli procesów, część zbiorczego PDF)
+
+        Args:
+            path: Ścieżka pliku
+            nip: NIP podmiotu (do manifestu)
+            name: Nazwa w archiwum (domyślnie nazwa pliku)
+            fields: Dodatkowe pola wpisu manifestu
+
+        Returns:
+            False, jeśli plik o tej nazwie już jest w archiwum (dopisywany jest tylko NIP)
+            albo archiwum jest zamknięte
+        """
+        name = name or os.path.basename(path)
+        with self._lock:
+            if self._note_duplicate(name, nip):
+                return False
+            digest = hashlib.sha256()
+            info = zipfile.ZipInfo.from_file(path, name)
+            info.compress_type = self._compression(name)
+            with open(path, "rb") as src, self._zip.open(info, "w") as dst:
+                for chunk in iter(lambda: src.read(1024 * 1024), b""):
+                    digest.update(chunk)
+                    dst.write(chunk)
+            self._record(name, nip, info.file_size, digest.hexdigest(), fields)
+        return True
+
+    @staticmethod
+    def _compression(name: str) -> int:
+        return zipfile.ZIP_STORED if name.lower().endswith(".pdf") else zipfile.ZIP_DEFLATED
+
+    def _note_duplicate(self, name: str, nip: Optional[str]) -> bool:
+        if self._zip.fp is None:
+            get_logger().warning(f"Archiwum {self.path} jest już zamknięte — pominięto {name}")
+            return True
+        entry = self.entries.get(name)
+        if entry is None:
+            return False
+        if nip and nip not in entry["nips"]:
+            entry["nips"].append(nip)
+        return True
+
+    def _record(self, name: str, nip: Optional[str], size: int, sha256: str, fields: Dict[str, Any]):
+        entry = {"name": name, "nips": [nip] if nip else [], "bytes": size, "sha256": sha256,
+                 "added": datetime.now().isoformat(timespec="seconds")}
+        entry.update(fields)
+        self.entries[name] = entry
+
+    def close(self) -> Optional[str]:
+        """
+        Dopisuje manifest i podmienia archiwum docelowe
+
+        Returns:
+            Ścieżka archiwum (None, jeśli już zamknięte)
+        """
+        with self._lock:
+            if self._zip.fp is None:
+                return None
+            files: List[Dict[str, Any]] = list(self.entries.values())
+            manifest = {"created": datetime.now().isoformat(timespec="seconds"), "files": files}
+            self._zip.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2),
+                               compress_type=zipfile.ZIP_DEFLATED)
+            self._zip.close()
+            os.replace(self._temp_path, self.path)
+        get_logger().info(f"Zapisano archiwum: {self.path} ({len(files)} plików)")
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Tryb samego sprawdzenia (screening) — bez renderowania PDF
+
+Ścieżka pobranie → parsowanie → sprawdzenie list sankcyjnych i słów
+kluczowych (art. 7 ust. 1 ustawy o przeciwdziałaniu wspieraniu agresji na
+Ukrainę). Wynik każdego podmiotu trafia jako jeden wiersz do pliku JSONL
+lub CSV; PDF jest renderowany tylko dla podmiotów z trafieniem (albo dla
+wszystkich/żadnego — render="all"/"none").
+"""
+
+import os
+import csv
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils.crbr_models import CRBRRecord
+from utils.logger_config import get_logger
+from utils.parsed_cache import ParsedRecordCache
+
+from core.crbr_bulk_to_pdf import screen_record
+
+# Słowa kluczowe używane, gdy brak pliku config/exclusion_keywords.txt
+DEFAULT_EXCLUSION_KEYWORDS = ["Rosja", "Rosyjska"]
+
+EXCLUSION_KEYWORDS_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "config", "exclusion_keywords.txt")
+
+# Które podmioty dostają PDF w trybie sprawdzenia
+RENDER_FLAGGED = "flagged"
+RENDER_ALL = "all"
+RENDER_NONE = "none"
+RENDER_MODES = (RENDER_FLAGGED, RENDER_ALL, RENDER_NONE)
+
+# Kolumny pliku CSV (w JSONL te same klucze)
+RESULT_FIELDS = ["identifier", "name", "persons_screened", "matches", "match_sources", "keyword_hits",
+                 "flagged", "pdf"]
+
+
+def load_exclusion_keywords(path: str = EXCLUSION_KEYWORDS_FILE) -> List[str]:
+    """
+    Wczytuje słowa kluczowe (jedno w wierszu, # — komentarz)
+
+    Returns:
+        Lista słów kluczowych (domyślna, gdy brak pliku lub plik pusty)
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            keywords = [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+    except OSError:
+        return list(DEFAULT_EXCLUSION_KEYWORDS)
+    return keywords or list(DEFAULT_EXCLUSION_KEYWORDS)
+
+
+def _record_text(value) -> Iterable[str]:
+    """Wartości tekstowe rekordu (modele CRBRRecord, zagnieżdżone słowniki i listy)"""
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from _record_text(item)
+    elif hasattr(value, "__slots__"):
+        for name in value.__slots__:
+            yield from _record_text(getattr(value, name))
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _record_text(item)
+    elif value is not None:
+        yield str(value)
+
+
+def source_text(source, data: CRBRRecord) -> str:
+    """Tekst do wyszukiwania słów kluczowych: treść odpowiedzi (bajty/element lxml) albo wartości rekordu"""
+    if isinstance(source, bytes):
+        return source.decode("utf-8", errors="ignore")
+    if hasattr(source, "itertext"):
+        return "\n".join(source.itertext())
+    return "\n".join(_record_text(data))
+
+
+def find_keywords(text: str, keywords: List[str]) -> List[str]:
+    """Słowa kluczowe występujące w tekście (bez rozróżniania wielkości liter)"""
+    text_lower = (text or "").lower()
+    return [keyword for keyword in keywords if keyword.lower() in text_lower]
+
+
+def screen_entity(source, default_nip: str = "unknown", parsed_cache: ParsedRecordCache = None,
+                  keywords: Optional[List[str]] = None) -> Tuple[Dict[str, Any], CRBRRecord]:
+    """
+    Sprawdza podmiot bez renderowania raportu
+
+    Args:
+        source: Bajty XML, element lxml, CRBRRecord lub słownik z parse_crbr_xml
+        default_nip: NIP używany gdy brak go w danych
+        parsed_cache: Opcjonalna pamięć sparsowanych rekordów
+        keywords: Słowa kluczowe (None — load_exclusion_keywords())
+
+    Returns:
+        tuple: (wynik sprawdzenia — klucze RESULT_FIELDS, CRBRRecord z ewentualnymi dopasowaniami w polu sankcje)
+    """
+    if keywords is None:
+        keywords = load_exclusion_keywords()
+    data, nip = screen_record(source, default_nip, parsed_cache)
+    sanctions = data.sankcje or []
+    keyword_hits = find_keywords(source_text(source, data), keywords)
+    persons = len(data.beneficjenci) + (1 if data.zglaszajacy is not None else 0)
+    result = {
+        "identifier": nip,
+        "name": data.podmiot.nazwa or "",
+        "persons_screened": persons,
+        "matches": len(sanctions),
+        "match_sources": sorted({s.get("source") or "" for s in sanctions}),
+        "keyword_hits": keyword_hits,
+        "flagged": bool(sanctions or keyword_hits),
+        "pdf": None,
+    }
+    return result, data
+
+
+class ScreeningWriter:
+    """
+    Zapis wyników sprawdzenia do pliku JSONL lub CSV (po rozszerzeniu), wiersz po wierszu
+
+    Bezpieczny wątkowo; każdy wiersz jest od razu zapisywany na dysk, więc
+    przerwany przebieg zostawia kompletne wyniki przetworzonych podmiotów.
+
+    Args:
+        path: Plik wyników (.csv — CSV, inne — JSONL)
+        keywords: Słowa kluczowe (None — load_exclusion_keywords())
+        render: Które podmioty dostają PDF: RENDER_FLAGGED, RENDER_ALL lub RENDER_NONE
+        resume: Dopisywanie do istniejącego pliku (wznowiony przebieg)
+    """
+
+    def __init__(self, path: str, keywords: Optional[List[str]] = None, render: str = RENDER_FLAGGED,
+                 resume: bool = False):
+        if render not in RENDER_MODES:
+            raise ValueError(f"Nieznany tryb renderowania: {render}")
+        self.path = path
+        self.keywords = load_exclusion_keywords() if keywords is None else keywords
+        self.render = render
+        self.count = 0
+        self.flagged = 0
+        self._csv = path.lower().endswith(".csv")
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        append = resume and os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, "a" if append else "w", encoding="utf-8", newline="")
+        if self._csv:
+            self._writer = csv.DictWriter(self._file, fieldnames=RESULT_FIELDS)
+            if not append:
+                self._writer.writeheader()
+
+    def screen(self, source, default_nip: str = "unknown",
+               parsed_cache: ParsedRecordCache = None) -> Tuple[Dict[str, Any], CRBRRecord]:
+        """screen_entity ze słowami kluczowymi tego zapisu"""
+        return screen_entity(source, default_nip, parsed_cache, self.keywords)
+
+    def wants_pdf(self, result: Dict[str, Any]) -> bool:
+        """Czy dla podmiotu renderować raport PDF"""
+        return self.render == RENDER_ALL or (self.render == RENDER_FLAGGED and result["flagged"])
+
+    def write(self, result: Dict[str, Any]):
+        """Dopisuje wynik podmiotu"""
+        with self._lock:
+            if self._csv:
+                row = dict(result)
+                row["match_sources"] = "; ".join(result["match_sources"])
+                row["keyword_hits"] = "; ".join(result["keyword_hits"])
+                self._writer.writerow(row)
+            else:
+                self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self.count += 1
+            self.flagged += bool(result["flagged"])
+        if result["flagged"]:
+            get_logger().warning(
+                f"Trafienie dla {result['identifier']}: dopasowania sankcyjne: {result['matches']}, "
+                f"słowa kluczowe: {', '.join(result['keyword_hits']) or '—'}")
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.close()
+        get_logger().info(f"Wyniki sprawdzenia: {self.path} ({self.count} podmiotów, z trafieniem: {self.flagged})")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
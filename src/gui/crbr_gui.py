@@ -25,10 +25,8 @@ import time
 
 # Import funkcji z oryginalnego skryptu
 from ..core.crbr_bulk_to_pdf import (
-    fetch_xml_by_nip, 
-    extract_inner_xml_from_soap, 
+    fetch_inner_element_by_nip,
     generate_pdf_from_xml_bytes,
-    parse_crbr_xml
 )
 
 class CRBRGUI:
@@ -362,8 +360,7 @@ class CRBRGUI:
                 try:
                     # Pobierz dane z CRBR
                     self.queue.put(('log', f"Pobieranie danych dla NIP: {nip}"))
-                    soap_xml = fetch_xml_by_nip(nip, timeout=timeout)
-                    inner_xml = extract_inner_xml_from_soap(soap_xml)
+                    inner_xml = fetch_inner_element_by_nip(nip, timeout=timeout)
                     
                     # Wygeneruj PDF
                     pdf_path = generate_pdf_from_xml_bytes(inner_xml, output_dir, default_nip=nip)
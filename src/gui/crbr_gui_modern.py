@@ -17,7 +17,8 @@ import webbrowser
 from datetime import datetime, date
 from typing import List, Dict, Any
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from lxml import etree
+from concurrent.futures import as_completed, wait, FIRST_COMPLETED
 import requests
 from requests.adapters import HTTPAdapter
 import json
@@ -36,9 +37,19 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 # Import naszych modułów
-from core.crbr_bulk_to_pdf import bulk_from_csv, generate_pdf_from_xml_bytes, generate_pdf_from_xml_bytes_with_sanctions_info, fetch_xml_by_nip, extract_inner_xml_from_soap
+from core.crbr_bulk_to_pdf import bulk_from_csv, generate_pdf_from_xml_bytes, generate_pdf_from_xml_bytes_with_sanctions_info, generate_reports_with_sanctions_info, split_filings, fetch_xml_by_nip, fetch_inner_element_by_nip, extract_inner_xml_from_soap, parsed_record_cache, screen_for_report, DEFAULT_WORKERS
+from core.render_pool import RenderPool, RENDER_POOL_WORKERS
+from core.screening import ScreeningWriter, DEFAULT_EXCLUSION_KEYWORDS, EXCLUSION_KEYWORDS_FILE, find_keywords, load_exclusion_keywords
+from core.report_archive import ReportArchive
 from utils.nip_validator import validate_nip, format_nip
-from utils.logger_config import setup_logging, get_logger
+from utils.hedging import Hedger
+from utils.history_store import HistoryStore
+from utils.crbr_faults import CRBRFault, CRBRNotFoundError
+from utils.negative_cache import NegativeCache
+from utils.render_context import RenderContext
+from utils.request_scheduler import RequestScheduler, PRIORITY_INTERACTIVE, PRIORITY_BULK
+from utils.run_journal import RunJournal, journal_path_for, load_journal, STATE_STARTED, STATE_DONE, STATE_FAILED
+from utils.logger_config import setup_logging, get_logger, get_metrics, dump_metrics
 from utils.utf8_config import setup_utf8, get_csv_encoding
 
 
@@ -83,13 +94,33 @@ class ModernCRBRGUI:
         self.date_to = today
         
         # Słowa kluczowe sugerujące wykluczenie z postępowania (art. 7 ust. 1 ustawy o przeciwdziałaniu wspieraniu agresji na Ukrainę)
-        self.exclusion_keywords = [
-            "Rosja", "Rosyjska"
-        ]
+        self.exclusion_keywords = list(DEFAULT_EXCLUSION_KEYWORDS)
         
         # Sesja HTTP z retry i timeout
         self.session = self.create_http_session()
-        self.executor = None
+        # Żądania zabezpieczające na wolnych odpowiedziach (max 5% dodatkowych żądań)
+        self.hedger = Hedger(fraction=0.05)
+        # Harmonogram: DEFAULT_WORKERS wątków dla listy + 1 zarezerwowany dla pilnych raportów
+        self.scheduler = RequestScheduler(workers=DEFAULT_WORKERS + 1, reserved_interactive=1)
+        self.last_output_dir = None
+        # Dziennik bieżącego przebiegu (wznawianie po ponownym uruchomieniu GUI)
+        self.journal = None
+        # Historia odpowiedzi CRBR w katalogu wyjściowym (węższe zakresy dat bez zapytań do usługi)
+        self.history = None
+        # NIP-y nieobecne w CRBR pomijane bez zapytania przez 24 h (plik w katalogu wyjściowym)
+        self.negative_cache = None
+        # Sparsowane odpowiedzi (ta sama odpowiedź nie jest parsowana ponownie przy kolejnym raporcie)
+        self.parsed_cache = None
+        self.render_context = None
+        # Pula procesów renderujących PDF (tworzona przy pierwszym raporcie)
+        self.render_pool = None
+        # Wyniki trybu "tylko sprawdzenie" bieżącego przebiegu (PDF tylko dla podmiotów z trafieniem)
+        self.screening = None
+        # Archiwum ZIP bieżącego przebiegu (raporty dopisywane na bieżąco)
+        self.archive = None
+        # Pilne raporty w toku — archiwum jest zamykane dopiero po ich zebraniu
+        self.urgent_tasks = set()
+        self.urgent_done = threading.Condition()
         
         # Tworzenie interfejsu
         self.create_widgets()
@@ -133,11 +164,15 @@ class ModernCRBRGUI:
         """Tworzy sesję HTTP z retry i timeout"""
         session = requests.Session()
         
-        # Konfiguracja retry
+        # Konfiguracja retry — zapytania SOAP to POST (tylko odczyt z CRBR, więc można je ponawiać);
+        # urllib3 domyślnie nie ponawia POST po kodach statusu. Po wyczerpaniu prób zwracana jest
+        # ostatnia odpowiedź, którą klasyfikuje obsługa błędów CRBR (fault_from_http)
         retry_strategy = Retry(
             total=3,
             backoff_factor=1,
             status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset({"POST"}),
+            raise_on_status=False,
         )
         
         adapter = HTTPAdapter(max_retries=retry_strategy)
@@ -296,6 +331,37 @@ class ModernCRBRGUI:
         )
         self.btn_stop.pack(side=LEFT, padx=2)
         
+        # Tryb samego sprawdzenia: wyniki JSONL, PDF tylko dla podmiotów z trafieniem
+        self.screen_only_var = tk.BooleanVar(value=False)
+        self.chk_screen_only = ttk_bs.Checkbutton(
+            self.toolbar_row3,
+            text="Tylko sprawdzenie",
+            variable=self.screen_only_var,
+            bootstyle="round-toggle"
+        )
+        self.chk_screen_only.pack(side=LEFT, padx=(8, 2))
+        
+        # Pakiet ZIP: raporty dopisywane do raporty.zip (z manifestem) w trakcie przebiegu
+        self.zip_var = tk.BooleanVar(value=False)
+        self.chk_zip = ttk_bs.Checkbutton(
+            self.toolbar_row3,
+            text="Pakiet ZIP",
+            variable=self.zip_var,
+            bootstyle="round-toggle"
+        )
+        self.chk_zip.pack(side=LEFT, padx=(8, 2))
+        
+        # Przycisk Pilny raport (zaznaczone pozycje, z pominięciem kolejki masowej)
+        self.btn_urgent = ttk_bs.Button(
+            self.toolbar_row3,
+            text="⚡ Pilny raport",
+            command=self.generate_urgent_reports,
+            bootstyle="success-outline",
+            width=15,
+            compound="center"
+        )
+        self.btn_urgent.pack(side=LEFT, padx=2)
+        
         # Przycisk Eksport
         self.btn_export = ttk_bs.Button(
             self.toolbar_row3,
@@ -307,6 +373,17 @@ class ModernCRBRGUI:
         )
         self.btn_export.pack(side=LEFT, padx=2)
         
+        # Przycisk Metryki
+        self.btn_metrics = ttk_bs.Button(
+            self.toolbar_row3,
+            text="📈 Metryki",
+            command=self.export_metrics,
+            bootstyle="secondary",
+            width=12,
+            compound="center"
+        )
+        self.btn_metrics.pack(side=LEFT, padx=2)
+        
         # Separator między rzędami
         ttk_bs.Separator(self.toolbar_container, orient=HORIZONTAL).pack(fill=X, pady=5)
         
@@ -442,14 +519,8 @@ class ModernCRBRGUI:
         if not text_content:
             return False, [], ""
         
-        # Konwertuj tekst na małe litery dla porównania
-        text_lower = text_content.lower()
-        found_keywords = []
-        
-        # Sprawdź każde słowo kluczowe
-        for keyword in self.exclusion_keywords:
-            if keyword.lower() in text_lower:
-                found_keywords.append(keyword)
+        # To samo dopasowanie co w trybie sprawdzenia (core.screening)
+        found_keywords = find_keywords(text_content, self.exclusion_keywords)
         
         if found_keywords:
             warning_message = (
@@ -467,17 +538,22 @@ class ModernCRBRGUI:
         Sprawdza XML pod kątem słów kluczowych sugerujących wykluczenie
         
         Args:
-            xml_bytes (bytes): Zawartość XML do sprawdzenia
+            xml_bytes (bytes | lxml element): Zawartość XML do sprawdzenia
             nip (str): NIP dla którego sprawdzamy
         """
         try:
-            # Konwertuj XML na tekst
-            xml_text = xml_bytes.decode('utf-8', errors='ignore')
+            # Konwertuj XML na tekst (dla elementu: same wartości tekstowe, bez serializacji)
+            if isinstance(xml_bytes, bytes):
+                xml_text = xml_bytes.decode('utf-8', errors='ignore')
+            else:
+                xml_text = "\n".join(xml_bytes.itertext())
             
             # Sprawdź słowa kluczowe
             has_exclusion, found_keywords, warning_message = self.check_exclusion_keywords(xml_text)
             
             if has_exclusion:
+                if not isinstance(xml_bytes, bytes):
+                    xml_text = etree.tostring(xml_bytes, encoding='unicode')
                 # Loguj ostrzeżenie
                 self.log_message(f"⚠️ UWAGA dla NIP {format_nip(nip)}: {warning_message}", "WARNING")
                 
@@ -1395,28 +1471,53 @@ ZAWARTOŚĆ XML (fragment):
         if not output_dir:
             return
         
-        # Rozpocznij generowanie z ThreadPoolExecutor
+        # Dziennik poprzedniego przebiegu w tym katalogu — zaproponuj wznowienie
+        resume = False
+        previous = load_journal(journal_path_for(output_dir, "gui"))
+        done = [nip for nip in self.nip_list
+                if previous.get(nip, {}).get("state") == STATE_DONE and os.path.exists(previous[nip].get("path", ""))]
+        if done:
+            resume = messagebox.askyesno(
+                "Wznowienie",
+                f"W katalogu jest dziennik poprzedniego przebiegu: {len(done)} z {len(self.nip_list)} "
+                f"identyfikatorów ma już raport.\n\nWznowić (pominąć ukończone)?"
+            )
+        
+        # Rozpocznij generowanie (zadania masowe w harmonogramie)
+        self.last_output_dir = output_dir
+        self.history = HistoryStore(os.path.join(output_dir, ".sanccheck_history"))
+        self.negative_cache = NegativeCache(os.path.join(output_dir, ".sanccheck_negative.json"))
+        self.use_parsed_cache(output_dir)
+        self.render_context = RenderContext()  # czcionka, style i nagłówek raz na przebieg
+        self.use_render_pool()
+        self.screening = (ScreeningWriter(os.path.join(output_dir, "wyniki_sprawdzenia.jsonl"),
+                                          keywords=self.exclusion_keywords, resume=resume)
+                          if self.screen_only_var.get() else None)
+        self.archive = (ReportArchive(os.path.join(output_dir, "raporty.zip"), resume=resume)
+                        if self.zip_var.get() else None)
         self.is_processing = True
         self.stop_processing = False
         self.btn_generate.config(state=DISABLED)
         self.btn_stop.config(state=NORMAL)
         self.progress.config(maximum=len(self.nip_list), value=0)
         
-        # Utwórz executor z maksymalnie 3 wątkami
-        self.executor = ThreadPoolExecutor(max_workers=3)
-        
-        thread = threading.Thread(target=self.generate_pdfs_thread, args=(output_dir,))
+        thread = threading.Thread(target=self.generate_pdfs_thread, args=(output_dir, resume))
         thread.daemon = True
         thread.start()
     
-    def generate_pdfs_thread(self, output_dir):
-        """Wątek generowania PDF-ów z ThreadPoolExecutor"""
+    def generate_pdfs_thread(self, output_dir, resume=False):
+        """Wątek generowania PDF-ów (zadania masowe w harmonogramie priorytetowym)"""
+        tasks = {}
+        pending = set()
+        completed = 0
         try:
             self.update_status("Generowanie PDF-ów...")
             self.log_message(f"Rozpoczynanie generowania {len(self.nip_list)} PDF-ów")
+            self.journal = RunJournal(journal_path_for(output_dir, "gui"), resume=resume)
             
-            # Przygotuj zadania
-            tasks = []
+            # Przygotuj zadania (duplikaty NIP współdzielą jedno zadanie i jeden raport)
+            submitted = {}
+            finished = self.journal.completed() if resume else {}
             for i, nip in enumerate(self.nip_list):
                 if self.stop_processing:
                     break
@@ -1425,48 +1526,48 @@ ZAWARTOŚĆ XML (fragment):
                 if not clean_nip:
                     continue
                 
-                task = self.executor.submit(self.process_single_nip, clean_nip, output_dir, i)
-                tasks.append((task, nip, i))
-            
-            # Przetwarzaj wyniki
-            completed = 0
-            for task, nip, index in tasks:
-                if self.stop_processing:
-                    self.log_message("Generowanie zatrzymane przez użytkownika", "WARNING")
-                    break
-                
-                try:
-                    result = task.result(timeout=60)  # Timeout 60 sekund na zadanie
-                    if result:
-                        if len(result) == 4:  # Nowy format z informacją o sankcjach
-                            pdf_path, success, has_sanctions, sanctions_count = result
-                        else:  # Stary format dla kompatybilności
-                            pdf_path, success = result
-                            has_sanctions = False
-                            sanctions_count = 0
-                        
-                        if success:
-                            status_text = "Gotowy"
-                            if has_sanctions:
-                                status_text += f" (🚨 {sanctions_count} sankcji)"
-                            self.root.after(0, self.update_nip_status, nip, status_text, pdf_path, has_sanctions)
-                            self.generated_files.append(pdf_path)
-                            self.log_message(f"Wygenerowano PDF: {os.path.basename(pdf_path)}")
-                        else:
-                            self.root.after(0, self.update_nip_status, nip, "Błąd", "", False)
-                    else:
-                        self.root.after(0, self.update_nip_status, nip, "Błąd", "", False)
-                    
-                    completed += 1
-                    self.root.after(0, self.progress.config, {'value': completed})
-                    
-                except Exception as e:
-                    self.root.after(0, self.update_nip_status, nip, "Błąd", "")
-                    self.log_message(f"Błąd dla NIP {format_nip(nip)}: {e}", "ERROR")
+                if clean_nip in finished:
+                    # Ukończony w poprzednim przebiegu — tylko odtwórz status
+                    sanctions_count = self.journal.states[clean_nip].get("sanctions_count", 0)
+                    status_text = "Gotowy (wznowiono)" + (f" (🚨 {sanctions_count} sankcji)" if sanctions_count else "")
+                    self.root.after(0, self.update_nip_status, nip, status_text, finished[clean_nip], bool(sanctions_count))
+                    reports = self.journal.states[clean_nip].get("reports") or [finished[clean_nip]]
+                    for report_path in reports:
+                        if not report_path.endswith(".pdf") or not os.path.exists(report_path):
+                            continue
+                        if report_path not in self.generated_files:
+                            self.generated_files.append(report_path)
+                        if self.archive:
+                            fields = {"sanctions_count": sanctions_count} if len(reports) == 1 else {}
+                            self.archive.add_file(report_path, clean_nip, **fields)
                     completed += 1
-                    self.root.after(0, self.progress.config, {'value': completed})
-            
-            if not self.stop_processing:
+                    continue
+                
+                task = submitted.get(clean_nip)
+                if task is None:
+                    task = self.scheduler.submit(self.process_single_nip, clean_nip, output_dir, i,
+                                                 self.screening, priority=PRIORITY_BULK)
+                    submitted[clean_nip] = task
+                else:
+                    self.log_message(f"Duplikat NIP {format_nip(clean_nip)} — zostanie użyty ten sam raport")
+                tasks.setdefault(task, []).append(nip)
+            
+            if finished:
+                self.log_message(f"Wznowienie: pominięto {completed} ukończonych identyfikatorów")
+                self.root.after(0, self.progress.config, {'value': completed})
+            
+            # Przetwarzaj wyniki w kolejności ukończenia — wolny NIP nie blokuje pozostałych
+            pending = set(tasks)
+            while pending and not self.stop_processing:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for task in done:
+                    for nip in tasks[task]:
+                        completed += 1
+                        self.collect_task_result(task, nip, completed)
+            
+            if self.stop_processing:
+                self.log_message("Generowanie zatrzymane przez użytkownika", "WARNING")
+            else:
                 self.log_message(f"Zakończono generowanie. Wygenerowano {len(self.generated_files)} PDF-ów")
                 self.update_status("Generowanie zakończone")
             
@@ -1475,45 +1576,205 @@ ZAWARTOŚĆ XML (fragment):
             self.update_status("Błąd generowania")
         
         finally:
-            # Zamknij executor
-            if self.executor:
-                self.executor.shutdown(wait=False)
-                self.executor = None
+            if pending:
+                self.drain_tasks(tasks, pending, completed)
+            if self.archive:
+                # Pilne raporty zlecone w trakcie przebiegu też trafiają do archiwum
+                with self.urgent_done:
+                    self.urgent_done.wait_for(lambda: not self.urgent_tasks)
+            if self.journal:
+                self.journal.close()
+                self.journal = None
+            if self.screening:
+                self.screening.close()
+            if self.archive:
+                if self.screening:
+                    self.archive.add_file(self.screening.path)
+                archive_path = self.archive.close()
+                self.archive = None
+                if archive_path:
+                    self.log_message(f"Zapisano archiwum: {os.path.basename(archive_path)}")
             
             # Przywróć stan przycisków
             self.root.after(0, self.finish_generation)
     
-    def process_single_nip(self, clean_nip, output_dir, index):
-        """Przetwarza pojedynczy NIP"""
+    def drain_tasks(self, tasks, pending, completed):
+        """
+        Czeka na zadania uruchomione przed zatrzymaniem i zbiera ich wyniki
+        
+        Stop anuluje tylko zadania z kolejki; uruchomione kończą się normalnie,
+        więc dziennik, plik wyników i archiwum mogą być zamknięte dopiero po nich.
+        """
+        self.scheduler.cancel_pending(PRIORITY_BULK)
+        running = [task for task in pending if not task.cancelled()]
+        if running:
+            self.log_message(f"Oczekiwanie na {len(running)} uruchomionych zadań...")
+        for task in as_completed(running):
+            for nip in tasks[task]:
+                completed += 1
+                self.collect_task_result(task, nip, completed)
+    
+    def collect_urgent_result(self, task, nip):
+        """Zbiera wynik pilnego raportu i zwalnia oczekujące na niego zamknięcie archiwum"""
         try:
-            self.log_message(f"Przetwarzanie NIP: {format_nip(clean_nip)}")
-            
-            # Pobierz dane SOAP używając sesji
-            soap = self.fetch_xml_by_nip_with_session(clean_nip)
-            inner = extract_inner_xml_from_soap(soap)
-            
-            # Sprawdź słowa kluczowe sugerujące wykluczenie
-            self.check_exclusion_in_xml(inner, clean_nip)
-            
-            # Wygeneruj PDF z informacją o sankcjach
-            pdf_path, has_sanctions, sanctions_count = generate_pdf_from_xml_bytes_with_sanctions_info(inner, output_dir, default_nip=clean_nip)
+            self.collect_task_result(task, nip)
+        finally:
+            with self.urgent_done:
+                self.urgent_tasks.discard(task)
+                self.urgent_done.notify_all()
+    
+    def collect_task_result(self, task, nip, completed=None):
+        """Aktualizuje status NIP-u na podstawie ukończonego zadania"""
+        try:
+            result = task.result()
+            if result:
+                pdf_paths = None
+                if len(result) == 5:  # Kilka raportów (osobny dla każdego zgłoszenia)
+                    pdf_path, success, has_sanctions, sanctions_count, pdf_paths = result
+                elif len(result) == 4:  # Nowy format z informacją o sankcjach
+                    pdf_path, success, has_sanctions, sanctions_count = result
+                else:  # Stary format dla kompatybilności
+                    pdf_path, success = result
+                    has_sanctions = False
+                    sanctions_count = 0
+                pdf_paths = pdf_paths or [pdf_path]
+                
+                if success and not pdf_path.lower().endswith(".pdf"):
+                    # Tryb samego sprawdzenia — podmiot bez trafień, wynik tylko w pliku wyników
+                    self.root.after(0, self.update_nip_status, nip, "Sprawdzono", "", False)
+                elif success:
+                    status_text = "Gotowy"
+                    if has_sanctions:
+                        status_text += f" (🚨 {sanctions_count} sankcji)"
+                    if len(pdf_paths) > 1:
+                        status_text += f" ({len(pdf_paths)} zgłoszenia)"
+                    self.root.after(0, self.update_nip_status, nip, status_text, pdf_path, has_sanctions)
+                    archive = self.archive
+                    for report_path in pdf_paths:
+                        if report_path not in self.generated_files:
+                            self.generated_files.append(report_path)
+                            self.log_message(f"Wygenerowano PDF: {os.path.basename(report_path)}")
+                        if archive:
+                            # Liczba sankcji dotyczy całego NIP-u — w manifeście tylko przy jednym raporcie
+                            fields = {"sanctions_count": sanctions_count} if len(pdf_paths) == 1 else {}
+                            archive.add_file(report_path, nip.replace('-', ''), **fields)
+                else:
+                    self.root.after(0, self.update_nip_status, nip, "Błąd", "", False)
+            else:
+                self.root.after(0, self.update_nip_status, nip, "Błąd", "", False)
             
-            return pdf_path, True, has_sanctions, sanctions_count
+        except Exception as e:
+            self.root.after(0, self.update_nip_status, nip, "Błąd", "")
+            self.log_message(f"Błąd dla NIP {format_nip(nip)}: {e}", "ERROR")
+        
+        if completed is not None:
+            self.root.after(0, self.progress.config, {'value': completed})
+    
+    def generate_urgent_reports(self):
+        """Generuje raporty dla zaznaczonych NIP-ów z priorytetem interaktywnym"""
+        selected_items = self.nip_tree.selection()
+        if not selected_items:
+            messagebox.showwarning("Uwaga", "Zaznacz identyfikatory do pilnego raportu")
+            return
+        
+        output_dir = self.last_output_dir or filedialog.askdirectory(title="Wybierz katalog wyjściowy")
+        if not output_dir:
+            return
+        self.last_output_dir = output_dir
+        self.history = HistoryStore(os.path.join(output_dir, ".sanccheck_history"))
+        self.negative_cache = NegativeCache(os.path.join(output_dir, ".sanccheck_negative.json"))
+        self.use_parsed_cache(output_dir)
+        if not self.is_processing or self.render_context is None:
+            self.render_context = RenderContext()
+        self.use_render_pool()
+        
+        for item in selected_items:
+            nip = self.nip_tree.item(item, 'values')[0].replace('-', '')
+            self.update_nip_status(nip, "Pilny...", "", False)
+            task = self.scheduler.submit(self.process_single_nip, nip, output_dir, -1,
+                                         priority=PRIORITY_INTERACTIVE)
+            with self.urgent_done:
+                self.urgent_tasks.add(task)
+            task.add_done_callback(lambda t, nip=nip: self.collect_urgent_result(t, nip))
+            self.log_message(f"Pilny raport dla NIP {format_nip(nip)} dodany przed kolejką masową")
+    
+    def process_single_nip(self, clean_nip, output_dir, index, screening=None):
+        """Przetwarza pojedynczy NIP (ze screening — PDF tylko dla podmiotów z trafieniem)"""
+        journal = self.journal
+        if journal:
+            journal.record(clean_nip, STATE_STARTED)
+        try:
+            self.log_message(f"Przetwarzanie NIP: {format_nip(clean_nip)}")
             
+            # Pobierz dane SOAP używając sesji (strumieniowo, jednokrotne parsowanie)
+            inner = self.fetch_xml_by_nip_with_session(clean_nip)
+            
+            # Sprawdź słowa kluczowe sugerujące wykluczenie (w trybie sprawdzenia robi to screening)
+            if screening is None:
+                self.check_exclusion_in_xml(inner, clean_nip)
+            
+            # Kilka zgłoszeń w odpowiedzi (np. zakres dat) — osobny raport dla każdego
+            if screening is not None:
+                # Sprawdzenie bez renderowania; PDF tylko dla podmiotów z trafieniem
+                pdf_paths, sanctions_count = [], 0
+                for filing in split_filings(inner):
+                    data, pdf_path = screen_for_report(screening, filing, output_dir, clean_nip, self.parsed_cache)
+                    sanctions_count += len(data.sankcje or [])
+                    if pdf_path:
+                        self.render_pool.render(data, pdf_path, self.render_context)
+                        pdf_paths.append(pdf_path)
+                pdf_paths = pdf_paths or [screening.path]
+            else:
+                # Wygeneruj PDF z informacją o sankcjach
+                reports = generate_reports_with_sanctions_info(
+                    inner, output_dir, default_nip=clean_nip, parsed_cache=self.parsed_cache,
+                    context=self.render_context, render_pool=self.render_pool)
+                pdf_paths = [path for path, _, _ in reports]
+                sanctions_count = sum(count for _, _, count in reports)
+            has_sanctions = sanctions_count > 0
+            if journal:
+                extra = {"reports": pdf_paths} if len(pdf_paths) > 1 else {}
+                journal.record(clean_nip, STATE_DONE, path=pdf_paths[0], sanctions_count=sanctions_count, **extra)
+            
+            return pdf_paths[0], True, has_sanctions, sanctions_count, pdf_paths
+            
+        except CRBRNotFoundError as e:
+            if journal:
+                journal.record(clean_nip, STATE_FAILED, error=str(e), not_found=True)
+            self.log_message(f"NIP {format_nip(clean_nip)}: {e}", "WARNING")
+            return None, False
         except Exception as e:
+            if journal:
+                journal.record(clean_nip, STATE_FAILED, error=str(e))
             self.log_message(f"Błąd dla NIP {format_nip(clean_nip)}: {e}", "ERROR")
             return None, False
     
+    def use_parsed_cache(self, output_dir):
+        """
+        Ustawia pamięć sparsowanych odpowiedzi dla katalogu wyjściowego (zachowuje ją przy tym samym katalogu)
+
+        GUI zawsze korzysta z historii odpowiedzi, a klucz pamięci pomija metadane
+        wniosku, więc ponowny raport tego samego podmiotu nie jest parsowany od nowa.
+        """
+        directory = os.path.join(output_dir, ".sanccheck_parsed")
+        if self.parsed_cache is None or self.parsed_cache.directory != directory:
+            self.parsed_cache = parsed_record_cache(directory)
+    
+    def use_render_pool(self):
+        """Tworzy pulę procesów renderujących (wątki harmonogramu pobierają, procesy renderują PDF)"""
+        if self.render_pool is None:
+            # Więcej procesów niż wątków harmonogramu nie przyspieszy renderowania
+            self.render_pool = RenderPool(min(RENDER_POOL_WORKERS, DEFAULT_WORKERS + 1))
+    
     def fetch_xml_by_nip_with_session(self, nip):
-        """Pobiera XML używając sesji HTTP"""
-        from core.crbr_bulk_to_pdf import build_soap_request_by_nip, CRBR_ENDPOINT, HEADERS
-        
-        payload = build_soap_request_by_nip(nip)
-        
+        """Pobiera odpowiedź (element lxml) dla wybranego zakresu dat używając sesji HTTP (ponawianie POST po 429/5xx realizuje adapter sesji — create_http_session)"""
+        date_from, date_to = self.get_date_range()
         try:
-            response = self.session.post(CRBR_ENDPOINT, data=payload, headers=HEADERS, timeout=30)
-            response.raise_for_status()
-            return response.content
+            return fetch_inner_element_by_nip(nip, timeout=30, retries=1, session=self.session, hedger=self.hedger,
+                                              date_from=date_from, date_to=date_to, history=self.history,
+                                              negative_cache=self.negative_cache)
+        except CRBRFault:
+            raise
         except Exception as e:
             raise Exception(f"Błąd pobierania danych dla NIP {nip}: {e}")
     
@@ -1559,10 +1820,10 @@ ZAWARTOŚĆ XML (fragment):
         self.log_message("Zatrzymywanie generowania...", "WARNING")
         self.update_status("Zatrzymywanie...")
         
-        # Anuluj wszystkie zadania w executor
-        if self.executor:
-            self.executor.shutdown(wait=False)
-            self.executor = None
+        # Anuluj oczekujące zadania masowe (pilne raporty nie są przerywane)
+        cancelled = self.scheduler.cancel_pending(PRIORITY_BULK)
+        if cancelled:
+            self.log_message(f"Anulowano {cancelled} oczekujących zadań")
     
     def finish_generation(self):
         """Kończy generowanie i przywraca stan przycisków"""
@@ -1897,6 +2158,32 @@ ZAWARTOŚĆ XML (fragment):
         except Exception as e:
             messagebox.showerror("Błąd", f"Nie można zapisać pliku: {e}")
     
+    def export_metrics(self):
+        """Zapisuje bieżące metryki (JSON lub Prometheus) i pokazuje podsumowanie etapów"""
+        snapshot = get_metrics().snapshot()
+        for labels, hist in snapshot["histograms"].get("crbr_stage_seconds", {}).items():
+            stage = labels.split("=", 1)[-1]
+            self.log_message(
+                f"Etap {stage}: n={hist['count']}, śr={hist['mean'] * 1000:.0f}ms, p95≤{hist['p95'] * 1000:.0f}ms"
+            )
+        for cache, rate in snapshot["cache_hit_rates"].items():
+            if rate is not None:
+                self.log_message(f"Trafienia cache {cache}: {rate:.0%}")
+        
+        file_path = filedialog.asksaveasfilename(
+            title="Zapisz metryki",
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json"), ("Prometheus", "*.prom"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        
+        try:
+            dump_metrics(file_path)
+            self.log_message(f"Metryki zapisane do: {file_path}")
+        except Exception as e:
+            messagebox.showerror("Błąd", f"Nie można zapisać pliku: {e}")
+    
     def clear_all(self):
         """Czyści całą listę NIP-ów"""
         if not self.nip_list:
@@ -2306,7 +2593,7 @@ ZAWARTOŚĆ XML (fragment):
     def save_exclusion_keywords_to_file(self):
         """Zapisuje aktualną listę słów kluczowych do pliku"""
         try:
-            keywords_file = os.path.join(project_root, 'config', 'exclusion_keywords.txt')
+            keywords_file = EXCLUSION_KEYWORDS_FILE
             with open(keywords_file, 'w', encoding='utf-8') as f:
                 f.write("# Lista słów kluczowych sugerujących wykluczenie z postępowania\n")
                 f.write("# art. 7 ust. 1 ustawy o przeciwdziałaniu wspieraniu agresji na Ukrainę\n")
@@ -2322,20 +2609,10 @@ ZAWARTOŚĆ XML (fragment):
     def load_exclusion_keywords_from_file(self):
         """Wczytuje listę słów kluczowych z pliku"""
         try:
-            keywords_file = os.path.join(project_root, 'config', 'exclusion_keywords.txt')
-            if os.path.exists(keywords_file):
-                with open(keywords_file, 'r', encoding='utf-8') as f:
-                    keywords = []
-                    for line in f:
-                        line = line.strip()
-                        if line and not line.startswith('#'):
-                            keywords.append(line)
-                
-                if keywords:
-                    self.exclusion_keywords = keywords
-                    self.log_message(f"Wczytano {len(keywords)} słów kluczowych z pliku")
-                else:
-                    self.log_message("Plik słów kluczowych jest pusty, używam domyślnych")
+            # Ten sam plik i format co w trybie sprawdzenia CLI (core.screening)
+            if os.path.exists(EXCLUSION_KEYWORDS_FILE):
+                self.exclusion_keywords = load_exclusion_keywords(EXCLUSION_KEYWORDS_FILE)
+                self.log_message(f"Wczytano {len(self.exclusion_keywords)} słów kluczowych z pliku")
             else:
                 self.log_message("Brak pliku słów kluczowych, używam domyślnych")
                 
@@ -2361,7 +2638,11 @@ ZAWARTOŚĆ XML (fragment):
     def run(self):
         """Uruchamia aplikację"""
         self.log_message("Aplikacja SancCheck uruchomiona")
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            if self.render_pool is not None:
+                self.render_pool.close(wait=False)
 
 
 def main():
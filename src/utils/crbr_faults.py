@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Klasyfikacja błędów usługi CRBR
+
+Usługa sygnalizuje wynik zapytania elementem Status (IstniejaInformacje,
+BrakInformacji, BladFormalny), a inne błędy techniczne komunikatem
+SOAP 1.2 Fault. Błędy trwałe — brak podmiotu w rejestrze, niepoprawne
+zapytanie (BladFormalny, Fault z kodem soap:Sender, HTTP 4xx poza 408/429) —
+nie są ponawiane. Błędy przejściowe (soap:Receiver, HTTP 5xx, 408, 429)
+przechodzą przez zwykłą pętlę ponowień.
+"""
+
+import re
+from typing import Optional
+
+from lxml import etree
+
+NS_SOAP = "http://www.w3.org/2003/05/soap-envelope"
+
+STATUS_FOUND = "IstniejaInformacje"
+STATUS_NOT_FOUND = "BrakInformacji"
+STATUS_FORMAL_ERROR = "BladFormalny"
+
+TRANSIENT_HTTP_STATUSES = (408, 429, 500, 502, 503, 504)
+
+_STATUS_RE = re.compile(rb"Status>\s*(" + STATUS_NOT_FOUND.encode() + rb"|" + STATUS_FORMAL_ERROR.encode() + rb")\s*<")
+
+
+class CRBRFault(RuntimeError):
+    """
+    Błąd zgłoszony przez usługę CRBR
+
+    Args:
+        message: Opis błędu
+        code: Kod błędu (kod SOAP Fault, Status lub "HTTP <kod>")
+        permanent: True — ponowienie nie zmieni wyniku
+    """
+
+    def __init__(self, message: str, code: str = "", permanent: bool = False):
+        super().__init__(message)
+        self.code = code
+        self.permanent = permanent
+
+
+class CRBRNotFoundError(CRBRFault):
+    """Brak informacji o podmiocie w CRBR (Status BrakInformacji)"""
+
+    def __init__(self, message: str, code: str = STATUS_NOT_FOUND, cached: bool = False):
+        super().__init__(message, code, permanent=True)
+        self.cached = cached
+
+
+def _local(el) -> str:
+    return etree.QName(el).localname if isinstance(el.tag, str) else ""
+
+
+def fault_from_element(fault) -> CRBRFault:
+    """
+    Buduje wyjątek z elementu soap:Fault
+
+    Kod soap:Sender (błąd po stronie klienta) oznacza błąd trwały,
+    pozostałe kody (soap:Receiver itp.) — przejściowy.
+    """
+    code = (fault.findtext(f"{{{NS_SOAP}}}Code/{{{NS_SOAP}}}Value") or "").strip()
+    reason = (fault.findtext(f"{{{NS_SOAP}}}Reason/{{{NS_SOAP}}}Text") or "").strip()
+    permanent = code.rsplit(":", 1)[-1] == "Sender"
+    return CRBRFault(f"SOAP Fault {code}: {reason}".strip(), code, permanent)
+
+
+def fault_from_http(status_code: int, body: bytes = b"") -> CRBRFault:
+    """
+    Klasyfikuje odpowiedź HTTP różną od 200
+
+    Args:
+        status_code: Kod HTTP
+        body: Treść odpowiedzi (opcjonalnie koperta z soap:Fault)
+
+    Returns:
+        CRBRFault; Fault w treści ma pierwszeństwo przed kodem HTTP
+    """
+    if body:
+        try:
+            root = etree.fromstring(body)
+        except etree.XMLSyntaxError:
+            root = None
+        if root is not None:
+            fault = next((el for el in root.iter(f"{{{NS_SOAP}}}Fault")), None)
+            if fault is not None:
+                error = fault_from_element(fault)
+                # Fault ze statusem 5xx/429 jest zawsze przejściowy
+                if status_code in TRANSIENT_HTTP_STATUSES:
+                    error.permanent = False
+                return error
+    permanent = 400 <= status_code < 500 and status_code not in TRANSIENT_HTTP_STATUSES
+    return CRBRFault(f"HTTP {status_code}", f"HTTP {status_code}", permanent)
+
+
+def response_status(element) -> str:
+    """Zwraca wartość elementu Status odpowiedzi (szuka do dwóch poziomów w głąb)"""
+    for child in element:
+        if _local(child) == "Status":
+            return (child.text or "").strip()
+        for grandchild in child:
+            if _local(grandchild) == "Status":
+                return (grandchild.text or "").strip()
+    return ""
+
+
+def check_response(response, label: str = "") -> None:
+    """
+    Sprawdza odpowiedź 200 pod kątem Fault i statusu zapytania
+
+    Args:
+        response: Element odpowiedzi (pierwsze dziecko soap:Body) lub bajty koperty
+        label: Identyfikator zapytania (do komunikatu)
+
+    Raises:
+        CRBRNotFoundError: Status BrakInformacji
+        CRBRFault: soap:Fault lub Status BladFormalny
+    """
+    if isinstance(response, (bytes, bytearray)):
+        if b"Fault" in response:
+            error = fault_from_http(200, bytes(response))
+            if error.code != "HTTP 200":
+                raise error
+        match = _STATUS_RE.search(response)
+        status = match.group(1).decode() if match else ""
+    elif _local(response) == "Fault":
+        raise fault_from_element(response)
+    else:
+        status = response_status(response)
+
+    if status == STATUS_NOT_FOUND:
+        raise CRBRNotFoundError(f"Brak informacji w CRBR dla {label}".strip())
+    if status == STATUS_FORMAL_ERROR:
+        raise CRBRFault(f"Błąd formalny zapytania dla {label}".strip(), STATUS_FORMAL_ERROR, permanent=True)
+
+
+def is_permanent(error: Optional[BaseException]) -> bool:
+    """Sprawdza, czy błąd jest trwały (nie należy go ponawiać)"""
+    return isinstance(error, CRBRFault) and error.permanent
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Typowany model danych rekordu CRBR
+
+Klasy danych ze __slots__ (bez __dict__ na instancję) dla podmiotu, adresu,
+beneficjenta, uprawnienia i zgłaszającego. Przy przebiegach masowych,
+w których przechowywane są tysiące rekordów, zajmują wielokrotnie mniej
+pamięci niż zagnieżdżone słowniki. Raporty, sprawdzenie sankcji i zapis
+wyników korzystają bezpośrednio z modelu (dostęp przez atrybuty);
+to_dict() zwraca dokładnie strukturę parse_crbr_xml (meta, podmiot,
+beneficjenci, zglaszajacy, opcjonalnie sankcje i rozbieznosci) tylko tam,
+gdzie rekord jest serializowany (JSON, marshal), a from_dict() odtwarza
+model z takiego słownika.
+"""
+
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional
+
+
+def _slotted(cls):
+    """
+    Odtwarza klasę danych ze __slots__ (odpowiednik dataclass(slots=True) z Pythona 3.10+)
+
+    Wartości domyślne pól przechowuje wygenerowany __init__, więc atrybuty
+    klasy o nazwach pól można usunąć.
+    """
+    names = tuple(f.name for f in fields(cls))
+    namespace = {k: v for k, v in cls.__dict__.items() if k not in names and k not in ("__dict__", "__weakref__")}
+    namespace["__slots__"] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+def _values(obj) -> Dict[str, Any]:
+    return {name: getattr(obj, name) for name in obj.__slots__}
+
+
+@_slotted
+@dataclass
+class Address:
+    """Adres siedziby podmiotu"""
+
+    wojewodztwo: str = ""
+    powiat: str = ""
+    gmina: str = ""
+    miejscowosc: str = ""
+    ulica: str = ""
+    nr_domu: str = ""
+    nr_lokalu: str = ""
+    kod_pocztowy: str = ""
+
+    def to_dict(self) -> Dict[str, str]:
+        return _values(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, str]) -> "Address":
+        return cls(**{k: data.get(k, "") for k in cls.__slots__})
+
+
+@_slotted
+@dataclass
+class Entity:
+    """Podmiot (spółka) z CRBR"""
+
+    nazwa: str = ""
+    nip: str = ""
+    krs: str = ""
+    forma: str = ""
+    adres: Address = field(default_factory=Address)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = _values(self)
+        result["adres"] = self.adres.to_dict()
+        return result
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Entity":
+        return cls(nazwa=data.get("nazwa", ""), nip=data.get("nip", ""), krs=data.get("krs", ""),
+                   forma=data.get("forma", ""), adres=Address.from_dict(data.get("adres", {})))
+
+
+@_slotted
+@dataclass
+class Entitlement:
+    """
+    Uprawnienie właścicielskie beneficjenta
+
+    Pola None nie występują w wyniku to_dict (jak w słowniku z parsera,
+    do którego trafiają tylko klucze obecnego rodzaju uprawnień).
+    """
+
+    typ: Optional[str] = None
+    kod: Optional[str] = None
+    rodzaj: Optional[str] = None
+    jednostka_miary_kod: Optional[str] = None
+    jednostka_miary: Optional[str] = None
+    ilosc: Optional[str] = None
+    kod_uprzywilejowania: Optional[str] = None
+    rodzaj_uprzywilejowania: Optional[str] = None
+    opis_uprzywilejowania: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, str]:
+        return {name: getattr(self, name) for name in self.__slots__ if getattr(self, name) is not None}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, str]) -> "Entitlement":
+        return cls(**{k: data[k] for k in cls.__slots__ if k in data})
+
+
+@_slotted
+@dataclass
+class Beneficiary:
+    """Beneficjent rzeczywisty"""
+
+    imie: str = ""
+    imiona_kolejne: str = ""
+    nazwisko: str = ""
+    pesel: str = ""
+    obywatelstwo: str = ""
+    panstwo_zamieszkania: str = ""
+    uprawnienia: List[str] = field(default_factory=list)
+    szczegolowe_uprawnienia: List[Entitlement] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = _values(self)
+        result["uprawnienia"] = list(self.uprawnienia)
+        result["szczegolowe_uprawnienia"] = [e.to_dict() for e in self.szczegolowe_uprawnienia]
+        return result
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Beneficiary":
+        names = ("imie", "imiona_kolejne", "nazwisko", "pesel", "obywatelstwo", "panstwo_zamieszkania")
+        values = {k: data.get(k, "") for k in names}
+        return cls(**values, uprawnienia=list(data.get("uprawnienia", [])),
+                   szczegolowe_uprawnienia=[Entitlement.from_dict(e) for e in data.get("szczegolowe_uprawnienia", [])])
+
+
+@_slotted
+@dataclass
+class Declarant:
+    """Osoba zgłaszająca"""
+
+    imie: str = ""
+    imiona_kolejne: str = ""
+    nazwisko: str = ""
+    pesel: str = ""
+    data_urodzenia: str = ""
+    obywatelstwo: str = ""
+    kraj_zamieszkania: str = ""
+    rodzaj_reprezentacji: str = ""
+    inne_informacje: str = ""
+    funkcja: str = ""
+
+    def to_dict(self) -> Dict[str, str]:
+        return _values(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, str]) -> "Declarant":
+        return cls(**{k: data.get(k, "") for k in cls.__slots__})
+
+
+@_slotted
+@dataclass
+class CRBRRecord:
+    """
+    Sparsowany rekord CRBR
+
+    Attributes:
+        meta: Metadane wniosku (słownik jak w parse_crbr_xml)
+        podmiot: Dane podmiotu
+        beneficjenci: Lista beneficjentów rzeczywistych
+        zglaszajacy: Zgłaszający (None, gdy brak w odpowiedzi)
+        sankcje: Dopasowania z list sankcyjnych (None — nie sprawdzono lub brak dopasowań)
+        rozbieznosci: Informacje o rozbieżnościach (rekordy z iter_crbr_records)
+    """
+
+    meta: Dict[str, Any] = field(default_factory=dict)
+    podmiot: Entity = field(default_factory=Entity)
+    beneficjenci: List[Beneficiary] = field(default_factory=list)
+    zglaszajacy: Optional[Declarant] = None
+    sankcje: Optional[List[Dict[str, Any]]] = None
+    rozbieznosci: Optional[List[Dict[str, str]]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Zwraca słownik w formacie parse_crbr_xml (sankcje i rozbieznosci tylko, gdy są ustawione)"""
+        result = {
+            "meta": dict(self.meta),
+            "podmiot": self.podmiot.to_dict(),
+            "beneficjenci": [b.to_dict() for b in self.beneficjenci],
+            "zglaszajacy": self.zglaszajacy.to_dict() if self.zglaszajacy is not None else {},
+        }
+        if self.rozbieznosci is not None:
+            result["rozbieznosci"] = [dict(r) for r in self.rozbieznosci]
+        if self.sankcje is not None:
+            result["sankcje"] = [dict(s) for s in self.sankcje]
+        return result
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CRBRRecord":
+        declarant = data.get("zglaszajacy")
+        return cls(
+            meta=dict(data.get("meta", {})),
+            podmiot=Entity.from_dict(data.get("podmiot", {})),
+            beneficjenci=[Beneficiary.from_dict(b) for b in data.get("beneficjenci", [])],
+            zglaszajacy=Declarant.from_dict(declarant) if declarant else None,
+            sankcje=data.get("sankcje"),
+            rozbieznosci=data.get("rozbieznosci"),
+        )
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Generator syntetycznych odpowiedzi CRBR (PobierzInformacjeOSpolkachIBeneficjentachOdpowiedz)
+
+Dokumenty mają kolejność i liczność elementów z typów WSDL
+(docs/api/ApiPrzegladoweCRBR.wsdl): PobierzInformacjeOSpolkachIBeneficjentachOdpowiedzDaneTyp,
+SpolkaIBeneficjenciApiZapytaniaTyp, BeneficjentRzeczywistyTyp, ZglaszajacyTyp.
+Zawartość uprawnień właścicielskich (KodUprawnienWlascicielskich, KodJednostkiMiary,
+KodUprzywilejowania itd.) odpowiada przykładowi odpowiedzi ze specyfikacji
+(docs/api/crbr_api_spec_v3.txt), bo w tej postaci zwraca ją usługa i czyta parser.
+
+Liczba zgłoszeń (spółek), beneficjentów, uprawnień, zgłaszających i rozbieżności
+jest konfigurowalna, a wynik jest deterministyczny dla danego ziarna — generator
+służy serwerowi zastępczemu (crbr_stub_server) i benchmarkowi parserów.
+"""
+
+import random
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple, Union
+
+from lxml import etree
+
+NS_SOAP = "http://www.w3.org/2003/05/soap-envelope"
+NS_AP   = "http://www.mf.gov.pl/uslugiBiznesowe/uslugiESB/AP/ApiPrzegladoweCRBR/2022/12/01"
+NS_XSD  = "http://www.mf.gov.pl/schematy/AP/ApiPrzegladoweCRBR/2022/12/01"
+
+_FIRST_NAMES = ["Jan", "Anna", "Piotr", "Maria", "Tomasz", "Katarzyna", "Paweł", "Agnieszka"]
+_LAST_NAMES = ["Kowalski", "Nowak", "Wiśniewski", "Wójcik", "Kamiński", "Lewandowska", "Zielińska"]
+_CITIES = [("Warszawa", "00-001", "MAZOWIECKIE"), ("Kraków", "30-001", "MAŁOPOLSKIE"),
+           ("Gdańsk", "80-001", "POMORSKIE"), ("Poznań", "60-001", "WIELKOPOLSKIE")]
+_COUNTRIES = [("PL", "POLSKA"), ("DE", "NIEMCY"), ("CZ", "CZECHY"), ("UA", "UKRAINA")]
+_FUNCTIONS = [("CZŁONEK ZARZĄDU", "1"), ("PREZES ZARZĄDU", "2"), ("PROKURENT", "3")]
+_OTHER_RIGHTS = [("01", "uprawnienie do powoływania członków zarządu"), ("02", "kontrola przez umowę")]
+
+Count = Union[int, Tuple[int, int]]
+
+
+def _sub(parent, tag: str, text: Optional[str] = None):
+    el = etree.SubElement(parent, etree.QName(NS_XSD, tag))
+    if text is not None:
+        el.text = text
+    return el
+
+
+def _count(rng: random.Random, value: Count) -> int:
+    """Liczba stała lub losowana z zakresu (min, max)"""
+    return rng.randint(*value) if isinstance(value, tuple) else value
+
+
+def _country(parent, tag: str, rng: random.Random, home: bool = True):
+    code, name = _COUNTRIES[0] if home else rng.choice(_COUNTRIES)
+    kraj = _sub(parent, tag)
+    _sub(kraj, "Kod", code)
+    _sub(kraj, "Nazwa", name)
+
+
+def _entitlement(parent, rng: random.Random, kind: int):
+    """InformacjaOUdzialach: 0 — bezpośrednie (z uprzywilejowaniem), 1 — pośrednie, 2 — inne"""
+    info = _sub(parent, "InformacjaOUdzialach")
+    if kind == 2:
+        kod, opis = rng.choice(_OTHER_RIGHTS)
+        inne = _sub(info, "InneUprawnienia")
+        rodzaj = _sub(inne, "RodzajInnychUprawnien")
+        _sub(rodzaj, "Kod", kod)
+        _sub(rodzaj, "Opis", opis)
+        return
+    udzial = _sub(info, "UprawnieniaWlascicielskieBezposrednie" if kind == 0
+                  else "UprawnieniaWlascicielskiePosrednie")
+    _sub(udzial, "KodUprawnienWlascicielskich", "001")
+    _sub(udzial, "RodzajUprawnienWlascicielskich", "udziały")
+    _sub(udzial, "KodJednostkiMiary", "01")
+    _sub(udzial, "JednostkaMiary", "sztuki")
+    _sub(udzial, "Ilosc", str(rng.randint(1, 1000)))
+    if kind == 0:
+        uprz = _sub(udzial, "InformacjaOUprzywilejowaniu")
+        _sub(uprz, "KodUprzywilejowania", "99")
+        _sub(uprz, "RodzajUprzywilejowania", "brak")
+
+
+def _person(parent, tag: str, rng: random.Random):
+    person = _sub(parent, tag)
+    _sub(person, "PierwszeImie", rng.choice(_FIRST_NAMES))
+    if rng.random() < 0.3:
+        _sub(person, "KolejneImiona", rng.choice(_FIRST_NAMES))
+    _sub(person, "Nazwisko", rng.choice(_LAST_NAMES))
+    _sub(person, "PESEL", "%011d" % rng.randrange(10 ** 10))
+    _country(person, "Obywatelstwo", rng)
+    _country(person, "KrajZamieszkania", rng, home=rng.random() < 0.8)
+    return person
+
+
+def _filing(lista, nip: str, rng: random.Random, number: int, last: bool, beneficiaries: Count,
+            entitlements: Count, declarants: Count, discrepancies: int, start: date):
+    city, postal, voivodeship = rng.choice(_CITIES)
+    spolka = _sub(lista, "SpolkaIBeneficjenci")
+    _sub(spolka, "Nazwa", f"SPÓŁKA TESTOWA {nip} SP. Z O.O.")
+    _sub(spolka, "NIP", nip)
+    _sub(spolka, "KRS", "%010d" % rng.randrange(10 ** 9))
+    _sub(spolka, "KodFormyOrganizacyjnej", "117")
+    _sub(spolka, "OpisFormyOrganizacyjnej", "SPÓŁKA Z OGRANICZONĄ ODPOWIEDZIALNOŚCIĄ")
+    _sub(spolka, "KodPocztowy", postal)
+    _sub(spolka, "Miejscowosc", city)
+    _sub(spolka, "Ulica", "Testowa")
+    _sub(spolka, "NrDomu", str(rng.randint(1, 200)))
+    teryt = _sub(spolka, "Teryt")
+    _sub(teryt, "Wojewodztwo", voivodeship)
+
+    bens = _sub(spolka, "ListaBeneficjentowRzeczywistych")
+    for _ in range(_count(rng, beneficiaries)):
+        ben = _person(bens, "BeneficjentRzeczywisty", rng)
+        udzialy = _sub(ben, "ListaInformacjiOUdzialach")
+        for kind in range(max(1, _count(rng, entitlements))):  # schemat: co najmniej jedno
+            _entitlement(udzialy, rng, kind % 3)
+
+    count = _count(rng, declarants)
+    if count:
+        zgl_lista = _sub(spolka, "ListaZglaszajacych")
+        for _ in range(count):
+            zgl = _person(zgl_lista, "Zglaszajacy", rng)
+            funkcja = _sub(_sub(zgl, "ListaFunkcjiZglaszajacego"), "Funkcja")
+            opis, kod = rng.choice(_FUNCTIONS)
+            _sub(funkcja, "Opis", opis)
+            _sub(funkcja, "Kod", kod)
+
+    _sub(spolka, "DataPoczatkuPrezentacjiZgloszenia", (start + timedelta(days=365 * number)).isoformat())
+    if not last:  # wcześniejsze zgłoszenia mają zakończony okres prezentacji
+        _sub(spolka, "DataKoncaPrezentacjiZgloszenia", (start + timedelta(days=365 * number + 364)).isoformat())
+    _sub(spolka, "NumerReferencyjny", "%032x" % rng.getrandbits(128))
+    if discrepancies:
+        rozb = _sub(spolka, "ListaInformacjiORozbieznosciach")
+        for i in range(discrepancies):
+            info = _sub(rozb, "InformacjaORozbieznosciach")
+            _sub(info, "IdentyfikatorUwagi", f"U{number}-{i + 1}")
+            _sub(info, "InformacjaDlaZainteresowanego", "Zgłoszono rozbieżność w danych beneficjenta.")
+
+
+def build_crbr_response(nip: str, filings: Count = 1, beneficiaries: Count = (1, 4), entitlements: Count = 1,
+                        declarants: Count = 1, discrepancies: int = 0, envelope: bool = True,
+                        now: Optional[datetime] = None) -> bytes:
+    """
+    Buduje syntetyczną odpowiedź CRBR (deterministyczną dla NIP)
+
+    Liczności można podać jako liczbę albo zakres (min, max) losowany
+    generatorem o ziarnie NIP.
+
+    Args:
+        nip: NIP (ziarno generatora i NIP spółki)
+        filings: Liczba zgłoszeń (elementów SpolkaIBeneficjenci)
+        beneficiaries: Liczba beneficjentów na zgłoszenie
+        entitlements: Liczba uprawnień (InformacjaOUdzialach) na beneficjenta, co najmniej 1
+        declarants: Liczba zgłaszających na zgłoszenie
+        discrepancies: Liczba informacji o rozbieżnościach na zgłoszenie
+        envelope: True — koperta SOAP 1.2, False — sam element odpowiedzi
+        now: Znacznik czasu wniosku (domyślnie bieżący)
+
+    Returns:
+        Bajty XML
+    """
+    rng = random.Random(nip)
+    stamp = (now or datetime.now()).strftime("%Y-%m-%dT%H:%M:%S")
+
+    if envelope:
+        root = etree.Element(etree.QName(NS_SOAP, "Envelope"), nsmap={"soap": NS_SOAP})
+        body = etree.SubElement(root, etree.QName(NS_SOAP, "Body"))
+        resp = etree.SubElement(body, etree.QName(NS_AP, "PobierzInformacjeOSpolkachIBeneficjentachOdpowiedz"),
+                                nsmap={"ns": NS_AP, "in10": NS_XSD})
+    else:
+        root = resp = etree.Element(etree.QName(NS_AP, "PobierzInformacjeOSpolkachIBeneficjentachOdpowiedz"),
+                                    nsmap={"ns": NS_AP, "in10": NS_XSD})
+    dane = etree.SubElement(resp, "PobierzInformacjeOSpolkachIBeneficjentachOdpowiedzDane")
+
+    _sub(dane, "IdentyfikatorWniosku", "%032X" % rng.getrandbits(128))
+    _sub(dane, "DataICzasZlozeniaWniosku", stamp)
+    _sub(dane, "DataICzasUdostepnieniaWniosku", stamp)
+
+    lista = _sub(dane, "ListaInformacjiOSpolkachIBeneficjentach")
+    start = date(2020, 1, 1)
+    count = _count(rng, filings)
+    for number in range(count):
+        _filing(lista, nip, rng, number, number == count - 1, beneficiaries, entitlements, declarants,
+                discrepancies, start)
+
+    szczeg = _sub(dane, "SzczegolyWniosku")
+    _sub(szczeg, "NIP", nip)
+    _sub(dane, "Status", "IstniejaInformacje")
+    _sub(dane, "CelZapytania", "BeneficjenciISpolki")
+    return etree.tostring(root, encoding="utf-8", xml_declaration=True)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Żądania zabezpieczające (hedged requests) — ograniczanie ogona opóźnień
+
+Gdy pierwsze żądanie nie wróci w czasie odpowiadającym zadanemu percentylowi
+dotychczasowych opóźnień, wysyłane jest drugie, identyczne. Wygrywa
+odpowiedź, która przyjdzie pierwsza; druga jest anulowana (przestaje ponawiać,
+a jej wynik jest odrzucany). Liczba dodatkowych żądań jest ograniczona
+budżetem — nie więcej niż zadany ułamek wszystkich żądań.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, FIRST_COMPLETED, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional
+
+
+class LatencyTracker:
+    """Okno ostatnich opóźnień udanych żądań z wyznaczaniem percentyla"""
+
+    def __init__(self, window: int = 200, percentile: float = 95.0, min_samples: int = 20):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self.percentile = percentile
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Zwraca opóźnienie, po którym warto wysłać drugie żądanie
+
+        Returns:
+            Wartość percentyla w sekundach lub None, gdy próbek jest za mało
+        """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(self.percentile / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class HedgeBudget:
+    """
+    Limiter dodatkowych żądań (wiadro żetonów)
+
+    Każde żądanie podstawowe dodaje `fraction` żetonu, każde żądanie
+    zabezpieczające zużywa jeden — w długim okresie dodatkowe obciążenie
+    nie przekracza `fraction` liczby żądań.
+    """
+
+    def __init__(self, fraction: float = 0.05, burst: float = 2.0):
+        self._lock = threading.Lock()
+        self.fraction = fraction
+        self.burst = burst
+        self._tokens = 0.0
+
+    def on_request(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.fraction)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+class Hedger:
+    """
+    Wykonuje wywołania z opcjonalnym żądaniem zabezpieczającym
+
+    Wywoływana funkcja otrzymuje argument nazwany `cancelled`
+    (threading.Event) — ustawiany, gdy wygrało drugie żądanie, aby
+    przegrana próba nie ponawiała się i nie czekała na backoff.
+    """
+
+    def __init__(self, fraction: float = 0.05, percentile: float = 95.0,
+                 min_delay: float = 0.5, min_samples: int = 20):
+        self.tracker = LatencyTracker(percentile=percentile, min_samples=min_samples)
+        self.budget = HedgeBudget(fraction)
+        self.min_delay = min_delay
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "hedged": 0, "hedge_wins": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _start(self, fn: Callable[..., Any], args, kwargs, cancelled: threading.Event) -> Future:
+        future = Future()
+        future.set_running_or_notify_cancel()
+        started = time.perf_counter()
+
+        def run():
+            try:
+                result = fn(*args, cancelled=cancelled, **kwargs)
+            except BaseException as e:
+                if cancelled.is_set():
+                    # Przegrana próba przerwana po anulowaniu — jej czas to dolne ograniczenie opóźnienia
+                    self.tracker.record(time.perf_counter() - started)
+                future.set_exception(e)
+            else:
+                # Także przegrana próba: bez wolnych odpowiedzi percentyl maleje i dublowanie jest coraz częstsze
+                self.tracker.record(time.perf_counter() - started)
+                future.set_result(result)
+
+        threading.Thread(target=run, name="crbr-hedge", daemon=True).start()
+        return future
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Wywołuje fn(*args, cancelled=..., **kwargs), w razie potrzeby dublując żądanie
+
+        Returns:
+            Wynik pierwszego udanego wywołania (lub wyjątek, gdy oba zawiodą)
+        """
+        self._count("requests")
+        self.budget.on_request()
+
+        delay = self.tracker.hedge_delay()
+        if delay is None:
+            # Za mało próbek na wyznaczenie percentyla — zwykłe wywołanie
+            started = time.perf_counter()
+            result = fn(*args, cancelled=threading.Event(), **kwargs)
+            self.tracker.record(time.perf_counter() - started)
+            return result
+
+        primary_cancel = threading.Event()
+        primary = self._start(fn, args, kwargs, primary_cancel)
+        try:
+            return primary.result(timeout=max(delay, self.min_delay))
+        except FutureTimeoutError:
+            pass
+
+        if not self.budget.try_acquire():
+            return primary.result()
+
+        self._count("hedged")
+        hedge_cancel = threading.Event()
+        hedge = self._start(fn, args, kwargs, hedge_cancel)
+        attempts = {primary: hedge_cancel, hedge: primary_cancel}
+        pending = set(attempts)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # Anuluj drugą próbę — jej wynik zostanie odrzucony
+                    attempts[future].set()
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = dict(self.stats)
+        result["hedge_delay_s"] = self.tracker.hedge_delay()
+        return result
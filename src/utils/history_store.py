@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Lokalna historia odpowiedzi CRBR z zapytań z zakresem dat
+
+Dla każdego podmiotu (NIP lub KRS) przechowywana jest ostatnia odpowiedź
+wraz z oknem dat, dla którego ją pobrano. Zapytanie o węższy zakres,
+mieszczący się w zapisanym oknie, jest obsługiwane lokalnie: zgłoszenia
+(SpolkaIBeneficjenci / ZgloszenieSpolki), których okres prezentacji nie
+przecina żądanego zakresu, są odrzucane — bez nowego żądania SOAP.
+
+Okno bez daty końcowej obejmuje dane do dnia pobrania, więc zapytanie
+„do dziś” wykonane następnego dnia trafia już do usługi.
+"""
+
+import os
+import copy
+import threading
+from datetime import date, datetime
+from typing import Optional, Tuple
+
+from lxml import etree
+
+FILING_TAGS = ("SpolkaIBeneficjenci", "ZgloszenieSpolki")
+
+_ROOT_TAG = "HistoriaCRBR"
+
+
+def normalize_date(value) -> Optional[str]:
+    """
+    Sprowadza datę do postaci RRRR-MM-DD
+
+    Args:
+        value: date/datetime, tekst RRRR-MM-DD lub None
+
+    Returns:
+        Data jako tekst lub None
+
+    Raises:
+        ValueError: Niepoprawny format daty
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return datetime.strptime(str(value).strip()[:10], "%Y-%m-%d").date().isoformat()
+
+
+def _local(el) -> str:
+    return etree.QName(el).localname if isinstance(el.tag, str) else ""
+
+
+def _child_text(el, name: str) -> str:
+    for child in el:
+        if _local(child) == name:
+            return (child.text or "").strip()
+    return ""
+
+
+def filing_period(filing) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Zwraca okres prezentacji zgłoszenia (początek, koniec; None = nieokreślony)
+
+    Dla ZgloszenieSpolki bez dat prezentacji początkiem jest data zdarzenia
+    lub rejestracji zgłoszenia.
+    """
+    start = (_child_text(filing, "DataPoczatkuPrezentacjiZgloszenia")
+             or _child_text(filing, "DataZdarzenia")
+             or _child_text(filing, "DataICzasRejestracjiZgloszenia")[:10])
+    end = _child_text(filing, "DataKoncaPrezentacjiZgloszenia")
+    return start or None, end or None
+
+
+def filing_in_range(filing, date_from: Optional[str], date_to: Optional[str]) -> bool:
+    """Sprawdza, czy okres prezentacji zgłoszenia przecina zakres [date_from, date_to]"""
+    start, end = filing_period(filing)
+    if date_to and start and start > date_to:
+        return False
+    if date_from and end and end < date_from:
+        return False
+    return True
+
+
+def filter_filings(element, date_from: Optional[str], date_to: Optional[str]):
+    """
+    Usuwa (w miejscu) zgłoszenia spoza zakresu dat
+
+    Args:
+        element: Element odpowiedzi CRBR
+        date_from, date_to: Zakres dat (RRRR-MM-DD lub None)
+
+    Returns:
+        Liczba pozostawionych zgłoszeń
+    """
+    kept = 0
+    for filing in [el for el in element.iter() if _local(el) in FILING_TAGS]:
+        if filing_in_range(filing, date_from, date_to):
+            kept += 1
+        else:
+            filing.getparent().remove(filing)
+    return kept
+
+
+def _set_request_dates(element, date_from: Optional[str], date_to: Optional[str]):
+    """Ustawia DataOd/DataDo w SzczegolyWniosku odpowiedzi na zakres zapytania"""
+    for szczeg in [el for el in element.iter() if _local(el) == "SzczegolyWniosku"]:
+        ns = etree.QName(szczeg).namespace
+        for child in list(szczeg):
+            if _local(child) in ("DataOd", "DataDo"):
+                szczeg.remove(child)
+        for name, value in (("DataOd", date_from), ("DataDo", date_to)):
+            if value:
+                etree.SubElement(szczeg, etree.QName(ns, name) if ns else name).text = value
+
+
+class HistoryStore:
+    """
+    Katalog z historią odpowiedzi CRBR (jeden plik XML na podmiot)
+
+    Args:
+        directory: Katalog historii
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, kind: str, ident: str) -> str:
+        return os.path.join(self.directory, f"{kind.lower()}_{ident}.xml")
+
+    def _load(self, kind: str, ident: str):
+        path = self.path_for(kind, ident)
+        if not os.path.exists(path):
+            return None
+        try:
+            return etree.parse(path).getroot()
+        except (OSError, etree.XMLSyntaxError):
+            return None
+
+    @staticmethod
+    def _window(entry) -> Tuple[Optional[str], str]:
+        """Okno zapisu; brak daty końcowej oznacza dane do dnia pobrania"""
+        return entry.get("dataOd") or None, entry.get("dataDo") or entry.get("pobrano", "")[:10]
+
+    @classmethod
+    def _covers(cls, entry, date_from: Optional[str], date_to: Optional[str]) -> bool:
+        stored_from, stored_to = cls._window(entry)
+        requested_to = date_to or date.today().isoformat()
+        if stored_from and (not date_from or date_from < stored_from):
+            return False
+        return requested_to <= stored_to
+
+    def lookup(self, kind: str, ident: str, date_from=None, date_to=None):
+        """
+        Zwraca odpowiedź dla zakresu dat z historii
+
+        Args:
+            kind: "NIP" lub "KRS"
+            ident: Oczyszczony identyfikator
+            date_from, date_to: Zakres dat zapytania
+
+        Returns:
+            Kopia elementu odpowiedzi zawężona do zakresu lub None, gdy okno
+            zapisu nie obejmuje zakresu
+        """
+        date_from, date_to = normalize_date(date_from), normalize_date(date_to)
+        with self._lock:
+            entry = self._load(kind, ident)
+        if entry is None or len(entry) == 0 or not self._covers(entry, date_from, date_to):
+            return None
+        response = copy.deepcopy(entry[0])
+        filter_filings(response, date_from, date_to)
+        _set_request_dates(response, date_from, date_to)
+        return response
+
+    def save(self, kind: str, ident: str, response, date_from=None, date_to=None) -> bool:
+        """
+        Zapisuje odpowiedź pobraną dla zakresu dat
+
+        Istniejący zapis jest zastępowany, chyba że jego okno obejmuje nowe
+        (szersza historia nie jest nadpisywana węższą).
+
+        Returns:
+            True, gdy odpowiedź została zapisana
+        """
+        date_from, date_to = normalize_date(date_from), normalize_date(date_to)
+        with self._lock:
+            existing = self._load(kind, ident)
+            if existing is not None and len(existing) and self._covers(existing, date_from, date_to):
+                return False
+            entry = etree.Element(_ROOT_TAG, typ=kind, id=ident,
+                                  pobrano=datetime.now().isoformat(timespec="seconds"))
+            if date_from:
+                entry.set("dataOd", date_from)
+            if date_to:
+                entry.set("dataDo", date_to)
+            entry.append(copy.deepcopy(response))
+            path = self.path_for(kind, ident)
+            tmp_path = path + ".part"
+            with open(tmp_path, "wb") as f:
+                f.write(etree.tostring(entry, encoding="utf-8", xml_declaration=True))
+            os.replace(tmp_path, path)
+        return True
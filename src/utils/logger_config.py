@@ -3,9 +3,12 @@
 Konfiguracja systemu logowania dla aplikacji CRBR
 """
 
+import functools
 import logging
 import sys
 import os
+import threading
+import time
 from typing import Optional
 from datetime import datetime
 
@@ -156,6 +159,258 @@ def log_error(nip: str, error: Exception, logger: Optional[logging.Logger] = Non
     logger.error(f"Błąd dla NIP {nip}: {error}")
 
 
+# ---------- Metryki ----------
+
+# Domyślne przedziały histogramów: czasy (sekundy) i rozmiary (bajty)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class _Histogram:
+    """Histogram o stałych przedziałach (liczniki skumulowane jak w Prometheus)"""
+
+    __slots__ = ("buckets", "counts", "count", "sum", "min", "max")
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Przybliżony kwantyl (górna granica przedziału)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip([str(b) for b in self.buckets], self.counts)),
+        }
+
+
+class _Timer:
+    """Kontekst mierzący czas i zapisujący go do histogramu"""
+
+    def __init__(self, registry, name: str, labels: dict):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self.start
+        self.registry.observe(self.name, self.elapsed, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Lekki rejestr metryk w procesie: liczniki, wskaźniki (gauge) i histogramy.
+    
+    Metryki identyfikuje nazwa i etykiety, np.
+    observe("crbr_stage_seconds", 0.12, stage="parse"). Bezpieczny wątkowo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Zwiększa licznik"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """Ustawia wartość wskaźnika"""
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def add_gauge(self, name: str, delta: float, **labels):
+        """Zmienia wartość wskaźnika o delta (np. liczba żądań w toku)"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + delta
+
+    def observe(self, name: str, value: float, buckets=LATENCY_BUCKETS, **labels):
+        """Dodaje obserwację do histogramu"""
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram(buckets)
+            hist.observe(value)
+
+    def timer(self, name: str, **labels) -> _Timer:
+        """Zwraca kontekst mierzący czas bloku (histogram w sekundach)"""
+        return _Timer(self, name, labels)
+
+    def record_cache(self, cache: str, hit: bool):
+        """Rejestruje trafienie/chybienie pamięci podręcznej"""
+        self.inc("crbr_cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> dict:
+        """
+        Zwraca stan metryk jako słownik (gotowy do JSON)
+        
+        Returns:
+            dict: {"counters": ..., "gauges": ..., "histograms": ..., "cache_hit_rates": ...}
+        """
+        def label_str(labels):
+            return ",".join(f"{k}={v}" for k, v in labels)
+
+        with self._lock:
+            counters = {(n, l): v for (n, l), v in self._counters.items()}
+            gauges = dict(self._gauges)
+            histograms = {k: h.to_dict() for k, h in self._histograms.items()}
+
+        result = {"counters": {}, "gauges": {}, "histograms": {}, "cache_hit_rates": {}}
+        for section, values in (("counters", counters), ("gauges", gauges), ("histograms", histograms)):
+            for (name, labels), value in sorted(values.items()):
+                result[section].setdefault(name, {})[label_str(labels)] = value
+
+        caches = {}
+        for (name, labels), value in counters.items():
+            if name == "crbr_cache_requests_total":
+                labels = dict(labels)
+                caches.setdefault(labels.get("cache"), {"hit": 0, "miss": 0})[labels.get("result")] += value
+        for cache, counts in sorted(caches.items()):
+            total = counts["hit"] + counts["miss"]
+            result["cache_hit_rates"][cache] = counts["hit"] / total if total else None
+        return result
+
+    def to_json(self, indent: int = 2) -> str:
+        import json
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=indent)
+
+    def to_prometheus(self) -> str:
+        """Eksport w formacie tekstowym Prometheus (exposition format 0.0.4)"""
+        def fmt_labels(labels, extra=None):
+            items = list(labels) + (extra or [])
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted((k, (h.buckets, list(h.counts), h.count, h.sum)) for k, h in self._histograms.items())
+
+        lines = []
+        for kind, items in (("counter", counters), ("gauge", gauges)):
+            declared = set()
+            for (name, labels), value in items:
+                if name not in declared:
+                    lines.append(f"# TYPE {name} {kind}")
+                    declared.add(name)
+                lines.append(f"{name}{fmt_labels(labels)} {value}")
+        declared = set()
+        for (name, labels), (buckets, counts, count, total) in histograms:
+            if name not in declared:
+                lines.append(f"# TYPE {name} histogram")
+                declared.add(name)
+            cumulative = 0
+            for bound, n in zip(buckets, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{fmt_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_bucket{fmt_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{fmt_labels(labels)} {total}")
+            lines.append(f"{name}_count{fmt_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+_metrics = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """
+    Pobiera globalny rejestr metryk aplikacji.
+    
+    Returns:
+        MetricsRegistry: Rejestr metryk
+    """
+    return _metrics
+
+
+def timed_stage(stage: str):
+    """
+    Dekorator mierzący czas etapu przetwarzania (histogram crbr_stage_seconds).
+    
+    Args:
+        stage: Nazwa etapu (fetch, parse, screen, render, ...)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _metrics.timer("crbr_stage_seconds", stage=stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def dump_metrics(path: str, fmt: Optional[str] = None) -> str:
+    """
+    Zapisuje metryki do pliku.
+    
+    Args:
+        path: Ścieżka pliku
+        fmt: "json" lub "prometheus" (domyślnie wg rozszerzenia: .prom/.txt -> Prometheus)
+        
+    Returns:
+        str: Ścieżka zapisanego pliku
+    """
+    if fmt is None:
+        fmt = "prometheus" if path.endswith((".prom", ".txt")) else "json"
+    content = _metrics.to_prometheus() if fmt == "prometheus" else _metrics.to_json()
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
 # Przykład użycia
 if __name__ == "__main__":
     # Konfiguracja logowania
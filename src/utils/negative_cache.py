@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Pamięć podręczna negatywnych odpowiedzi CRBR (brak podmiotu w rejestrze)
+
+Identyfikatory, dla których usługa zwróciła BrakInformacji, są zapamiętywane
+na krótki czas (TTL), więc kolejne przebiegi pomijają je bez zapytania do
+usługi. Opcjonalny plik JSON przechowuje wpisy między uruchomieniami
+i jest zapisywany atomowo (plik tymczasowy + os.replace).
+"""
+
+import os
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_NEGATIVE_TTL = 24 * 3600
+
+
+class NegativeCache:
+    """
+    Zbiór identyfikatorów „brak w rejestrze” z czasem wygaśnięcia
+
+    Args:
+        path: Opcjonalny plik JSON z wpisami (None = tylko w pamięci)
+        ttl: Czas życia wpisu w sekundach
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = DEFAULT_NEGATIVE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        self._purge(time.time())
+
+    def _purge(self, now: float) -> bool:
+        expired = [k for k, v in self._entries.items() if now - v.get("ts", 0) >= self.ttl]
+        for key in expired:
+            del self._entries[key]
+        return bool(expired)
+
+    def get(self, key: str) -> Optional[dict]:
+        """Zwraca aktualny wpis ({"ts", "reason"}) lub None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry.get("ts", 0) >= self.ttl:
+                del self._entries[key]
+                return None
+            return dict(entry)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def add(self, key: str, reason: str = ""):
+        """Zapamiętuje identyfikator i zapisuje plik"""
+        with self._lock:
+            self._entries[key] = {"ts": time.time(), "reason": reason}
+            self._save()
+
+    def discard(self, key: str):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge(time.time())
+            return len(self._entries)
+
+    def _save(self):
+        if not self.path:
+            return
+        self._purge(time.time())
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Pamięć podręczna sparsowanych rekordów CRBR (klucz: skrót treści odpowiedzi)
+
+Ponowne renderowanie raportów (nowy szablon, ponowne sprawdzenie sankcji,
+tryb --replay, odpowiedzi z historii) parsowało identyczny XML za każdym
+razem. Tutaj skrót SHA-256 treści odpowiedzi wskazuje zapisany rekord:
+w pamięci (LRU, zserializowane bajty) i opcjonalnie na dysku (marshal + zlib,
+jeden plik na odpowiedź). Każdy wpis ma znacznik wersji parsera — wpisy
+zapisane przez inną wersję są traktowane jako chybienie i nadpisywane.
+
+Każda odpowiedź CRBR ma nowy identyfikator i czas wniosku, więc skrót
+elementu pomija metadane wniosku (i kopertę) — dwa pobrania tego samego
+podmiotu dają ten sam klucz, a trafienie dostaje metadane bieżącego wniosku.
+Bajty (pliki, --replay) są haszowane bez zmian. Wpisy na dysku starsze niż
+max_age lub ponad max_disk_bytes (najdawniej używane) są usuwane.
+"""
+
+import os
+import time
+import marshal
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from lxml import etree
+
+from utils.xml_index_parser import APPLICATION_ID_NAMES
+
+DEFAULT_PARSED_CACHE_SIZE = 512
+# Limity wpisów na dysku
+DEFAULT_PARSED_CACHE_DISK_BYTES = 256 * 1024 * 1024
+DEFAULT_PARSED_CACHE_AGE = 30 * 24 * 3600
+# Co ile zapisów sprawdzany jest rozmiar katalogu
+_PRUNE_EVERY = 256
+
+_MAGIC = b"SCREC"
+
+# Metadane wniosku (nowe przy każdym zapytaniu) -> klucz w rekordzie["meta"]
+REQUEST_META_TAGS = dict({name: "id_wniosku" for name in APPLICATION_ID_NAMES},
+                         DataICzasZlozeniaWniosku="data_zlozenia",
+                         DataICzasUdostepnieniaWniosku="data_udostepnienia")
+
+
+def _local(tag) -> str:
+    return tag.rpartition("}")[2] if isinstance(tag, str) else ""
+
+
+def _request_meta_elements(root) -> list:
+    return list(root.iter(*(f"{{*}}{name}" for name in REQUEST_META_TAGS)))
+
+
+def request_meta(source) -> Dict[str, str]:
+    """
+    Metadane wniosku z elementu odpowiedzi (identyfikator, czas złożenia i udostępnienia)
+
+    Args:
+        source: Element lxml
+
+    Returns:
+        Klucze meta rekordu -> wartości (pierwsze niepuste wystąpienie)
+    """
+    meta: Dict[str, str] = {}
+    for el in _request_meta_elements(source):
+        value = (el.text or "").strip()
+        if value:
+            meta.setdefault(REQUEST_META_TAGS[_local(el.tag)], value)
+    return meta
+
+
+def content_key(source) -> str:
+    """
+    Zwraca skrót SHA-256 treści odpowiedzi
+
+    Dla elementu haszowane są elementy danych odpowiedzi bez metadanych
+    wniosku (identyfikator, czas złożenia i udostępnienia) i bez koperty;
+    bajty są haszowane bez zmian.
+
+    Args:
+        source: Bajty XML lub element lxml
+
+    Returns:
+        Skrót szesnastkowy
+    """
+    if isinstance(source, etree._Element):
+        digest = hashlib.sha256()
+        meta = _request_meta_elements(source)
+        parent = meta[0].getparent() if meta else None
+        if parent is None:
+            digest.update(etree.tostring(source))
+        else:
+            for child in parent:
+                if _local(child.tag) not in REQUEST_META_TAGS:
+                    digest.update(etree.tostring(child))
+        return digest.hexdigest()
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    return hashlib.sha256(source).hexdigest()
+
+
+class ParsedRecordCache:
+    """
+    Skrót treści odpowiedzi -> sparsowany rekord (słownik parse_crbr_xml)
+
+    Każde trafienie zwraca nową kopię rekordu (deserializacja bajtów),
+    więc modyfikacje wykonywane przy renderowaniu nie psują wpisu.
+
+    Args:
+        directory: Katalog wpisów na dysku (None = tylko w pamięci)
+        version: Znacznik wersji parsera — inna wersja unieważnia wpis
+        max_entries: Maksymalna liczba wpisów w pamięci (LRU)
+        max_disk_bytes: Maksymalny łączny rozmiar wpisów na dysku (None = bez limitu)
+        max_age: Maksymalny wiek wpisu na dysku w sekundach od ostatniego użycia (None = bez limitu)
+    """
+
+    def __init__(self, directory: Optional[str] = None, version: str = "",
+                 max_entries: int = DEFAULT_PARSED_CACHE_SIZE,
+                 max_disk_bytes: Optional[int] = DEFAULT_PARSED_CACHE_DISK_BYTES,
+                 max_age: Optional[float] = DEFAULT_PARSED_CACHE_AGE):
+        self.directory = directory
+        self.max_entries = max(1, max_entries)
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age = max_age
+        self._tag = f"{version}:{marshal.version}".encode("ascii")
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._writes = 0
+        if directory:
+            self.prune()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".bin")
+
+    def _remember(self, key: str, payload: bytes):
+        with self._lock:
+            self._memory[key] = payload
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+        except OSError:
+            return None
+        header, sep, payload = blob.partition(b"\n")
+        if not sep or header != _MAGIC + b" " + self._tag:
+            return None  # inna wersja parsera lub uszkodzony plik
+        try:
+            os.utime(path)  # czas modyfikacji = ostatnie użycie (kolejność usuwania w prune)
+        except OSError:
+            pass
+        return payload
+
+    def _write(self, key: str, payload: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC + b" " + self._tag + b"\n" + payload)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._writes += 1
+            due = self._writes % _PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """
+        Usuwa wpisy na dysku starsze niż max_age, a ponad max_disk_bytes — najdawniej używane
+
+        Returns:
+            Liczba usuniętych plików
+        """
+        if not self.directory or not os.path.isdir(self.directory):
+            return 0
+        entries = []
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if not filename.endswith(".bin"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            expired = self.max_age is not None and now - mtime > self.max_age
+            if not expired and (self.max_disk_bytes is None or total <= self.max_disk_bytes):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Zwraca kopię zapisanego rekordu lub None"""
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+        if payload is None:
+            payload = self._read(key)
+            if payload is None:
+                return None
+            self._remember(key, payload)
+        try:
+            return marshal.loads(zlib.decompress(payload))
+        except (ValueError, EOFError, TypeError, zlib.error):
+            with self._lock:
+                self._memory.pop(key, None)
+            return None
+
+    def put(self, key: str, record: Dict[str, Any]):
+        """Zapisuje rekord (w pamięci i na dysku, jeśli ustawiono katalog)"""
+        payload = zlib.compress(marshal.dumps(record))
+        self._remember(key, payload)
+        if self.directory:
+            try:
+                self._write(key, payload)
+            except OSError:
+                pass  # brak zapisu na dysk nie blokuje przetwarzania — wpis zostaje w pamięci
+
+    def get_or_parse(self, source, parser: Callable[[Any], Any], model: Optional[type] = None) -> tuple:
+        """
+        Zwraca rekord z pamięci podręcznej albo parsuje odpowiedź i ją zapamiętuje
+
+        Trafienie dla elementu dostaje metadane bieżącego wniosku (klucz ich nie obejmuje).
+
+        Args:
+            source: Bajty XML lub element lxml
+            parser: Funkcja parsująca (np. parse_crbr_xml)
+            model: Klasa modelu zwracanego przez parser (np. CRBRRecord) — zapisywany
+                   jest model.to_dict(), a trafienie odtwarza model.from_dict();
+                   None — parser zwraca słownik
+
+        Returns:
+            Krotka (rekord, czy_trafienie)
+        """
+        key = content_key(source)
+        record = self.get(key)
+        if record is not None:
+            if isinstance(source, etree._Element) and isinstance(record.get("meta"), dict):
+                record["meta"].update(request_meta(source))
+            return (model.from_dict(record) if model is not None else record), True
+        record = parser(source)
+        self.put(key, record.to_dict() if model is not None else record)
+        return record, False
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._memory)
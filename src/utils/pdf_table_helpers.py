@@ -3,70 +3,103 @@ Pomocnicze funkcje do generowania tabel PDF
 """
 
 from typing import List, Tuple, Any, Optional, Dict
-from reportlab.platypus import Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import Table, LongTable, TableStyle, Paragraph, Spacer, Flowable
 from reportlab.lib import colors
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.lib.units import mm
 import pandas as pd
 
-# Inicjalizacja czcionki dla polskich znaków
-def _init_polish_font():
-    """Inicjalizuje czcionkę z polskimi znakami"""
-    try:
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        import os
-        
-        # Sprawdź czy czcionka już jest zarejestrowana
-        if 'BodyFont' in pdfmetrics.getRegisteredFontNames():
-            return True
-            
-        # Preferuj lokalny DejaVuSans.ttf
-        here = os.path.dirname(__file__) if "__file__" in globals() else os.getcwd()
-        local_ttf = os.path.join(here, "DejaVuSans.ttf")
-        if os.path.exists(local_ttf):
-            try:
-                pdfmetrics.registerFont(TTFont("BodyFont", local_ttf))
-                print(f"Zarejestrowano czcionkę: {local_ttf}")
-                return True
-            except Exception as e:
-                print(f"Nie można zarejestrować {local_ttf}: {e}")
-        
-        # Fallback - spróbuj czcionek systemowych
-        if os.name == 'nt':  # Windows
-            font_paths = [
-                "C:/Windows/Fonts/arial.ttf",
-                "C:/Windows/Fonts/calibri.ttf", 
-                "C:/Windows/Fonts/tahoma.ttf",
-                "C:/Windows/Fonts/segoeui.ttf"
-            ]
-        else:  # Linux/Mac
-            font_paths = [
-                "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-                "/System/Library/Fonts/Arial.ttf",
-                "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"
-            ]
-        
-        for font_path in font_paths:
-            if os.path.exists(font_path):
-                try:
-                    pdfmetrics.registerFont(TTFont("BodyFont", font_path))
-                    print(f"Zarejestrowano czcionkę systemową: {font_path}")
-                    return True
-                except Exception as e:
-                    print(f"Nie można zarejestrować {font_path}: {e}")
-                    continue
-        
-        print("Użyto fallback czcionki Helvetica")
-        return False
-        
-    except ImportError:
-        print("ReportLab nie jest zainstalowany")
-        return False
+from utils.crbr_models import Beneficiary, Entitlement
+from utils.render_context import RenderContext
+
+# Powyżej tej liczby wierszy tabela jest składana z bloków LongTable
+LONG_TABLE_ROWS = 100
+# Liczba wierszy danych w jednym bloku długiej tabeli
+TABLE_BLOCK_ROWS = 50
+
+
+class TableBlocks(Flowable):
+    """
+    Długa tabela jako ciąg bloków LongTable o wspólnych szerokościach kolumn
+
+    Podział jednej tabeli na strony przelicza przy każdej stronie wszystkie
+    pozostałe wiersze (i komendy stylu), więc czas rośnie kwadratowo z liczbą
+    wierszy. Bloki po TABLE_BLOCK_ROWS wierszy (z powtórzonym nagłówkiem) są
+    dzielone niezależnie — czas renderowania rośnie liniowo. wrap() zwraca
+    rzeczywistą wysokość wszystkich bloków (KeepTogether i zagnieżdżone tabele
+    mierzą ją poprawnie); gdy tabela się nie mieści, split() oddaje bloki
+    ramce, a gdy się mieści — bloki są rysowane jeden pod drugim.
+    """
+
+    def __init__(self, blocks: List[Table]):
+        Flowable.__init__(self)
+        self.blocks = blocks
+        self.hAlign = blocks[0].hAlign
+
+    def wrap(self, availWidth, availHeight):
+        sizes = [block.wrap(availWidth, availHeight) for block in self.blocks]
+        self._heights = [h for _, h in sizes]
+        self.width = max(w for w, _ in sizes)
+        self.height = sum(self._heights)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        # Pierwszy element podziału musi się zmieścić bez dzielenia — pusty odstęp
+        return [Spacer(0, 0)] + list(self.blocks)
+
+    def draw(self):
+        y = self.height
+        for block, height in zip(self.blocks, self._heights):
+            y -= height
+            block.drawOn(self.canv, 0, y)
+
+
+def _block_styles(commands: List[tuple], header_rows: int, first: int, last: int) -> List[tuple]:
+    """
+    Komendy stylu dla bloku z wierszami danych first..last-1 (numeracja całej tabeli)
+
+    Komendy dla pojedynczego wiersza danych są przenoszone do bloku, który go
+    zawiera (z przesuniętym indeksem); pozostałe (zakresy, nagłówek) — bez zmian.
+    """
+    shift = first - header_rows
+    result = []
+    for cmd in commands:
+        row, end_row = cmd[1][1], cmd[2][1]
+        if row == end_row and row >= header_rows:
+            if first <= row < last:
+                result.append((cmd[0], (cmd[1][0], row - shift), (cmd[2][0], row - shift)) + tuple(cmd[3:]))
+        else:
+            result.append(cmd)
+    return result
+
 
-# Inicjalizuj czcionkę przy imporcie modułu
-_init_polish_font()
+def _build_table(table_data: List[list], col_widths: List[float], commands: List[tuple],
+                 header_rows: int = 0, **kwargs) -> Flowable:
+    """
+    Tworzy Table albo — powyżej LONG_TABLE_ROWS wierszy — TableBlocks z bloków LongTable
 
+    Args:
+        table_data: Wiersze tabeli (z nagłówkiem)
+        col_widths: Stałe szerokości kolumn (bez wyliczania z zawartości)
+        commands: Komendy TableStyle dla całej tabeli
+        header_rows: Liczba wierszy nagłówka powtarzanych na stronach i w blokach
+        **kwargs: Dodatkowe argumenty Table (np. hAlign)
+
+    Returns:
+        Table lub TableBlocks
+    """
+    if len(table_data) <= LONG_TABLE_ROWS:
+        table = Table(table_data, colWidths=col_widths, repeatRows=header_rows, **kwargs)
+        table.setStyle(TableStyle(commands))
+        return table
+
+    header = table_data[:header_rows]
+    blocks = []
+    for first in range(header_rows, len(table_data), TABLE_BLOCK_ROWS):
+        last = min(first + TABLE_BLOCK_ROWS, len(table_data))
+        block = LongTable(header + table_data[first:last], colWidths=col_widths, repeatRows=header_rows, **kwargs)
+        block.setStyle(TableStyle(_block_styles(commands, header_rows, first, last)))
+        blocks.append(block)
+    return TableBlocks(blocks)
 
 def safe_pandas_to_str(value) -> str:
     """Bezpiecznie konwertuje wartość pandas (w tym Timestamp) na string"""
@@ -117,7 +150,8 @@ def create_key_value_table(
     data: List[Tuple[str, str]], 
     col_widths: Optional[List[float]] = None,
     zebra: bool = False,
-    header_bg: Optional[colors.Color] = None
+    header_bg: Optional[colors.Color] = None,
+    context: Optional[RenderContext] = None
 ) -> Table:
     """
     Tworzy tabelę klucz-wartość
@@ -127,6 +161,7 @@ def create_key_value_table(
         col_widths: Szerokości kolumn w mm
         zebra: Czy zastosować kolorowanie zebra
         header_bg: Kolor tła nagłówka
+        context: Kontekst renderowania (czcionka i style przebiegu)
         
     Returns:
         Obiekt Table
@@ -134,6 +169,10 @@ def create_key_value_table(
     if not data:
         return Table([["Brak danych"]], colWidths=[150*mm])
     
+    context = context or RenderContext()
+    normal_style = context.cell_style
+    font_name = context.font_name
+    
     # Przygotuj dane z zawijaniem tekstu
     table_data = []
     for key, value in data:
@@ -152,13 +191,7 @@ def create_key_value_table(
             except Exception:
                 value = "—"
         
-        # Użyj Paragraph dla zawijania tekstu
-        styles = getSampleStyleSheet()
-        normal_style = styles['Normal']
-        normal_style.fontName = 'BodyFont'
-        normal_style.fontSize = 9
-        
-        # Utwórz Paragraph dla długich tekstów
+        # Utwórz Paragraph dla długich tekstów (zawijanie)
         key_para = Paragraph(key, normal_style)
         value_para = Paragraph(value, normal_style)
         
@@ -186,7 +219,7 @@ def create_key_value_table(
     styles.extend([
         ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
         ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('FONTNAME', (0, 0), (-1, -1), 'BodyFont'),
+        ('FONTNAME', (0, 0), (-1, -1), font_name),
         ('FONTSIZE', (0, 0), (-1, -1), 9),
         ('LEFTPADDING', (0, 0), (-1, -1), 4),
         ('RIGHTPADDING', (0, 0), (-1, -1), 4),
@@ -203,7 +236,7 @@ def create_key_value_table(
     
     # Styl dla pierwszej kolumny (klucze) - jasny szary tło
     styles.extend([
-        ('FONTNAME', (0, 0), (0, -1), 'BodyFont'),
+        ('FONTNAME', (0, 0), (0, -1), font_name),
         ('FONTSIZE', (0, 0), (0, -1), 8),
         ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
     ])
@@ -212,50 +245,51 @@ def create_key_value_table(
     return table
 
 
-def create_detailed_entitlements_table(entitlements: List[Dict[str, Any]]) -> Table:
+def create_detailed_entitlements_table(entitlements: List[Entitlement],
+                                       context: Optional[RenderContext] = None) -> Optional[Flowable]:
     """
     Tworzy tabelę ze szczegółowymi uprawnieniami beneficjenta
     
+    Powyżej LONG_TABLE_ROWS wierszy tabela jest składana z bloków (TableBlocks).
+    
     Args:
-        entitlements: Lista szczegółowych uprawnień
+        entitlements: Lista szczegółowych uprawnień (Entitlement)
+        context: Kontekst renderowania (czcionka i style przebiegu)
         
     Returns:
-        Table z szczegółowymi uprawnieniami
+        Table lub TableBlocks ze szczegółowymi uprawnieniami (None dla pustej listy)
     """
     if not entitlements:
         return None
     
     # Przygotuj style
-    styles = getSampleStyleSheet()
-    normal_style = styles['Normal']
-    normal_style.fontName = 'BodyFont'
-    normal_style.fontSize = 9
+    normal_style = (context or RenderContext()).cell_style
     
     table_data = []
     
     for i, entitlement in enumerate(entitlements, 1):
         # Nagłówek uprawnienia
-        typ = entitlement.get("typ", "")
+        typ = entitlement.typ or ""
         header_text = f"{i}. {typ}"
         table_data.append([Paragraph(header_text, normal_style), Paragraph("", normal_style)])
         
         # Szczegóły uprawnienia
-        if entitlement.get("kod"):
-            kod = safe_pandas_to_str(entitlement["kod"]) or "—"
+        if entitlement.kod:
+            kod = safe_pandas_to_str(entitlement.kod) or "—"
             table_data.append([Paragraph("Kod uprawnień", normal_style), Paragraph(kod, normal_style)])
-        if entitlement.get("rodzaj"):
-            rodzaj = safe_pandas_to_str(entitlement["rodzaj"]) or "—"
+        if entitlement.rodzaj:
+            rodzaj = safe_pandas_to_str(entitlement.rodzaj) or "—"
             table_data.append([Paragraph("Rodzaj uprawnień", normal_style), Paragraph(rodzaj, normal_style)])
-        if entitlement.get("ilosc") and entitlement.get("jednostka_miary"):
-            ilosc = safe_pandas_to_str(entitlement["ilosc"])
-            jednostka = safe_pandas_to_str(entitlement["jednostka_miary"])
+        if entitlement.ilosc and entitlement.jednostka_miary:
+            ilosc = safe_pandas_to_str(entitlement.ilosc)
+            jednostka = safe_pandas_to_str(entitlement.jednostka_miary)
             wielkosc = f"{ilosc} {jednostka}"
             table_data.append([Paragraph("Wielkość udziału", normal_style), Paragraph(wielkosc, normal_style)])
-        if entitlement.get("rodzaj_uprzywilejowania"):
-            uprzyw = safe_pandas_to_str(entitlement["rodzaj_uprzywilejowania"]) or "—"
+        if entitlement.rodzaj_uprzywilejowania:
+            uprzyw = safe_pandas_to_str(entitlement.rodzaj_uprzywilejowania) or "—"
             table_data.append([Paragraph("Rodzaj uprzywilejowania", normal_style), Paragraph(uprzyw, normal_style)])
-        if entitlement.get("opis_uprzywilejowania"):
-            opis = safe_pandas_to_str(entitlement["opis_uprzywilejowania"]) or "—"
+        if entitlement.opis_uprzywilejowania:
+            opis = safe_pandas_to_str(entitlement.opis_uprzywilejowania) or "—"
             table_data.append([Paragraph("Opis uprzywilejowania", normal_style), Paragraph(opis, normal_style)])
         
         # Dodaj pustą linię między uprawnieniami (oprócz ostatniego)
@@ -266,8 +300,6 @@ def create_detailed_entitlements_table(entitlements: List[Dict[str, Any]]) -> Ta
     available_width = 170 * mm
     col_widths = [available_width / 2, available_width / 2]
     
-    table = Table(table_data, colWidths=col_widths)
-    
     # Style tabeli - identyczne jak w create_key_value_table
     table_styles = []
     
@@ -291,23 +323,31 @@ def create_detailed_entitlements_table(entitlements: List[Dict[str, Any]]) -> Ta
                 if i % 2 == 1:  # Co drugi wiersz z danymi
                     table_styles.append(("BACKGROUND", (1,i), (1,i), colors.whitesmoke))
     
-    table.setStyle(TableStyle(table_styles))
-    return table
+    return _build_table(table_data, col_widths, table_styles)
 
 
-def create_beneficiaries_table(beneficiaries: List[Dict[str, Any]]) -> Table:
+def create_beneficiaries_table(beneficiaries: List[Beneficiary],
+                               context: Optional[RenderContext] = None) -> Flowable:
     """
     Tworzy tabelę beneficjentów
     
+    Powyżej LONG_TABLE_ROWS wierszy tabela jest składana z bloków (TableBlocks)
+    z nagłówkiem powtórzonym w każdym bloku.
+    
     Args:
-        beneficiaries: Lista słowników z danymi beneficjentów
+        beneficiaries: Lista beneficjentów (Beneficiary)
+        context: Kontekst renderowania (czcionka i style przebiegu)
         
     Returns:
-        Obiekt Table
+        Table lub TableBlocks
     """
     if not beneficiaries:
         return Table([["Brak beneficjentów"]], colWidths=[150*mm])
     
+    context = context or RenderContext()
+    normal_style = context.cell_style
+    font_name = context.font_name
+    
     # Nagłówki
     headers = ["Imię i nazwisko", "PESEL", "Obywatelstwo", "Kraj zamieszkania", "Uprawnienia"]
     
@@ -316,9 +356,9 @@ def create_beneficiaries_table(beneficiaries: List[Dict[str, Any]]) -> Table:
     
     for beneficiary in beneficiaries:
         # Imię i nazwisko
-        imie = beneficiary.get("imie", "")
-        nazwisko = beneficiary.get("nazwisko", "")
-        imiona_kolejne = beneficiary.get("imiona_kolejne", "")
+        imie = beneficiary.imie
+        nazwisko = beneficiary.nazwisko
+        imiona_kolejne = beneficiary.imiona_kolejne
         
         # Pełne imię (łącznie z kolejnymi imionami)
         if imiona_kolejne:
@@ -330,25 +370,19 @@ def create_beneficiaries_table(beneficiaries: List[Dict[str, Any]]) -> Table:
             full_name = "—"
         
         # PESEL
-        pesel = beneficiary.get("pesel", "") or "—"
+        pesel = beneficiary.pesel or "—"
         
         # Obywatelstwo
-        obywatelstwo = beneficiary.get("obywatelstwo", "") or "—"
+        obywatelstwo = beneficiary.obywatelstwo or "—"
         
         # Kraj zamieszkania
-        kraj = beneficiary.get("panstwo_zamieszkania", "") or "—"
+        kraj = beneficiary.panstwo_zamieszkania or "—"
         
         # Uprawnienia
-        uprawnienia = beneficiary.get("uprawnienia", [])
+        uprawnienia = beneficiary.uprawnienia
         uprawnienia_text = ", ".join(uprawnienia) if uprawnienia else "—"
         
-        # Użyj Paragraph dla zawijania tekstu
-        styles = getSampleStyleSheet()
-        normal_style = styles['Normal']
-        normal_style.fontName = 'BodyFont'
-        normal_style.fontSize = 9
-        
-        # Utwórz Paragraph dla długich tekstów
+        # Utwórz Paragraph dla długich tekstów (zawijanie)
         full_name_para = Paragraph(full_name, normal_style)
         uprawnienia_para = Paragraph(uprawnienia_text, normal_style)
         
@@ -358,14 +392,11 @@ def create_beneficiaries_table(beneficiaries: List[Dict[str, Any]]) -> Table:
     available_width = 170 * mm  # Dostępna szerokość na stronie A4
     col_widths = [available_width / 5] * 5  # Równomierne rozłożenie na 5 kolumn
     
-    # Stwórz tabelę z dopasowaniem do strony i zawijaniem tekstu
-    table = Table(table_data, colWidths=col_widths, repeatRows=1, hAlign='LEFT')
-    
     # Style z subtelnym kolorowaniem i zawijaniem tekstu
     styles = [
         # Nagłówek - jasny szary tło
         ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-        ('FONTNAME', (0, 0), (-1, 0), 'BodyFont'),
+        ('FONTNAME', (0, 0), (-1, 0), font_name),
         ('FONTSIZE', (0, 0), (-1, 0), 9),
         ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
         ('VALIGN', (0, 0), (-1, 0), 'MIDDLE'),
@@ -373,7 +404,7 @@ def create_beneficiaries_table(beneficiaries: List[Dict[str, Any]]) -> Table:
         # Zawartość z zawijaniem tekstu
         ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
         ('VALIGN', (0, 1), (-1, -1), 'TOP'),
-        ('FONTNAME', (0, 1), (-1, -1), 'BodyFont'),
+        ('FONTNAME', (0, 1), (-1, -1), font_name),
         ('FONTSIZE', (0, 1), (-1, -1), 9),
         ('LEFTPADDING', (0, 0), (-1, -1), 4),
         ('RIGHTPADDING', (0, 0), (-1, -1), 4),
@@ -385,11 +416,11 @@ def create_beneficiaries_table(beneficiaries: List[Dict[str, Any]]) -> Table:
         ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.whitesmoke]),
     ]
     
-    table.setStyle(TableStyle(styles))
-    return table
+    # Tabela z dopasowaniem do strony i zawijaniem tekstu
+    return _build_table(table_data, col_widths, styles, header_rows=1, hAlign='LEFT')
 
 
-def create_address_table(address_data: Dict[str, str]) -> Table:
+def create_address_table(address_data: Dict[str, str], context: Optional[RenderContext] = None) -> Table:
     """
     Tworzy tabelę adresu
     
@@ -411,10 +442,10 @@ def create_address_table(address_data: Dict[str, str]) -> Table:
         ("Kod pocztowy", address_data.get("kod_pocztowy", "")),
     ]
     
-    return create_key_value_table(address_items, col_widths=[40*mm, None], zebra=True)
+    return create_key_value_table(address_items, col_widths=[40*mm, None], zebra=True, context=context)
 
 
-def create_entity_info_table(entity_data: Dict[str, Any]) -> Table:
+def create_entity_info_table(entity_data: Dict[str, Any], context: Optional[RenderContext] = None) -> Table:
     """
     Tworzy tabelę informacji o podmiocie
     
@@ -432,10 +463,10 @@ def create_entity_info_table(entity_data: Dict[str, Any]) -> Table:
         ("Forma organizacyjna", entity_data.get("forma", "")),
     ]
     
-    return create_key_value_table(basic_info, col_widths=[60*mm, None], zebra=True)
+    return create_key_value_table(basic_info, col_widths=[60*mm, None], zebra=True, context=context)
 
 
-def create_meta_info_table(meta_data: Dict[str, str]) -> Table:
+def create_meta_info_table(meta_data: Dict[str, str], context: Optional[RenderContext] = None) -> Table:
     """
     Tworzy tabelę metainformacji
     
@@ -451,10 +482,10 @@ def create_meta_info_table(meta_data: Dict[str, str]) -> Table:
         ("Data i czas udostępnienia wniosku", meta_data.get("data_udostepnienia", "")),
     ]
     
-    return create_key_value_table(meta_items, col_widths=[80*mm, None], zebra=True)
+    return create_key_value_table(meta_items, col_widths=[80*mm, None], zebra=True, context=context)
 
 
-def create_declarant_table(declarant_data: Dict[str, str]) -> Table:
+def create_declarant_table(declarant_data: Dict[str, str], context: Optional[RenderContext] = None) -> Table:
     """
     Tworzy tabelę danych zgłaszającego
     
@@ -474,4 +505,4 @@ def create_declarant_table(declarant_data: Dict[str, str]) -> Table:
         ("Funkcja", declarant_data.get("funkcja", "")),
     ]
     
-    return create_key_value_table(declarant_items, col_widths=[40*mm, None], zebra=True)
+    return create_key_value_table(declarant_items, col_widths=[40*mm, None], zebra=True, context=context)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Kontekst renderowania raportów PDF (czcionka, style, dane nagłówka)
+
+render_pdf rejestrował czcionkę TTF i budował arkusz stylów dla każdego
+raportu, a nagłówek rozwiązywał adres IP hosta na każdej stronie.
+RenderContext tworzony raz na przebieg przechowuje zarejestrowaną czcionkę,
+gotowy arkusz stylów, adres IP i znacznik czasu przebiegu; przekazywany jest
+do render_pdf i funkcji z pdf_table_helpers. Rejestracja czcionki, arkusz
+stylów i adres IP są dodatkowo zapamiętywane na poziomie procesu, więc
+nawet kontekst tworzony dla pojedynczego raportu jest tani.
+"""
+
+import os
+import socket
+import threading
+from datetime import datetime
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+BODY_FONT = "BodyFont"
+FALLBACK_FONT = "Helvetica"
+
+_SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Preferowany jest DejaVuSans.ttf dołączony do repo (pełne PL znaki), potem czcionki systemowe
+FONT_CANDIDATES = [
+    os.path.join(_SRC_DIR, "core", "DejaVuSans.ttf"),
+    os.path.join(_SRC_DIR, "utils", "DejaVuSans.ttf"),
+] + ([
+    "C:/Windows/Fonts/arial.ttf",
+    "C:/Windows/Fonts/calibri.ttf",
+    "C:/Windows/Fonts/tahoma.ttf",
+    "C:/Windows/Fonts/segoeui.ttf",
+] if os.name == "nt" else [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/System/Library/Fonts/Arial.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+])
+
+_font_lock = threading.Lock()
+
+
+def register_body_font() -> str:
+    """
+    Rejestruje czcionkę z polskimi znakami (raz na proces)
+
+    Returns:
+        Nazwa czcionki do użycia (BODY_FONT lub FALLBACK_FONT)
+    """
+    with _font_lock:
+        if BODY_FONT in pdfmetrics.getRegisteredFontNames():
+            return BODY_FONT
+        from utils.logger_config import get_logger
+        logger = get_logger()
+        for font_path in FONT_CANDIDATES:
+            if not os.path.exists(font_path):
+                continue
+            try:
+                pdfmetrics.registerFont(TTFont(BODY_FONT, font_path))
+                logger.debug(f"Zarejestrowano czcionkę: {font_path}")
+                return BODY_FONT
+            except Exception as e:
+                logger.warning(f"Nie można zarejestrować {font_path}: {e}")
+        logger.warning("Brak czcionki TTF z polskimi znakami — użyto Helvetica")
+        return FALLBACK_FONT
+
+
+@lru_cache(maxsize=None)
+def build_styles(font_name: str):
+    """
+    Arkusz stylów raportu z jedną czcionką (bez kolorów)
+
+    Wynik jest współdzielony — style nie mogą być modyfikowane po zbudowaniu.
+
+    Args:
+        font_name: Nazwa zarejestrowanej czcionki
+    """
+    styles = getSampleStyleSheet()
+
+    # Nadpisanie wszystkich stylów jedną czcionką
+    for s in styles.byName.values():
+        s.fontName = font_name
+
+    styles.add(ParagraphStyle(name="TitleCenter", parent=styles["Title"], alignment=1, spaceAfter=12))
+    styles.add(ParagraphStyle(name="H2", parent=styles["Heading2"], spaceBefore=12, spaceAfter=6))
+    styles.add(ParagraphStyle(name="H3", parent=styles["Heading3"], spaceBefore=8, spaceAfter=4))
+    styles.add(ParagraphStyle(name="Meta", parent=styles["Normal"], fontSize=9, leading=12))
+    styles.add(ParagraphStyle(name="Small", parent=styles["Normal"], fontSize=8, leading=10))
+    styles.add(ParagraphStyle(name="Label", parent=styles["Normal"], fontSize=9, spaceAfter=2))
+    styles.add(ParagraphStyle(name="Value", parent=styles["Normal"], fontSize=10))
+    styles.add(ParagraphStyle(name="TableHeader", parent=styles["Normal"], fontSize=9))
+    # Komórki tabel z pdf_table_helpers
+    styles.add(ParagraphStyle(name="TableCell", parent=styles["Normal"], fontSize=9))
+
+    return styles
+
+
+@lru_cache(maxsize=1)
+def host_ip() -> str:
+    """Adres IP hosta do nagłówka raportu (rozwiązywany raz na proces)"""
+    try:
+        return socket.gethostbyname(socket.gethostname())
+    except Exception:
+        return "-"
+
+
+class RenderContext:
+    """
+    Zasoby renderowania wspólne dla przebiegu
+
+    Args:
+        generated_at: Znacznik czasu w nagłówku raportów (domyślnie chwila utworzenia kontekstu)
+        force: Renderuj także raporty, których plik ma aktualny odcisk danych
+
+    Attributes:
+        font_name: Zarejestrowana czcionka
+        styles: Arkusz stylów (współdzielony, tylko do odczytu)
+        host_ip: Adres IP hosta
+        timestamp: Znacznik czasu przebiegu (datetime — pozwala odtworzyć kontekst w innym procesie)
+        generated_at: Znacznik czasu przebiegu (dd.mm.rrrr gg:mm:ss, czas polski)
+        force: Wymuszenie renderowania niezmienionych raportów
+    """
+
+    def __init__(self, generated_at: datetime = None, force: bool = False):
+        self.font_name = register_body_font()
+        self.styles = build_styles(self.font_name)
+        self.host_ip = host_ip()
+        self.timestamp = generated_at or datetime.now(ZoneInfo("Europe/Warsaw"))
+        self.generated_at = self.timestamp.strftime("%d.%m.%Y %H:%M:%S")
+        self.force = force
+
+    @property
+    def header_text(self) -> str:
+        """Tekst nagłówka strony: adres IP i znacznik czasu"""
+        return f"{self.host_ip}, {self.generated_at}"
+
+    @property
+    def cell_style(self):
+        """Styl akapitów w komórkach tabel"""
+        return self.styles["TableCell"]
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Priorytetowy harmonogram zadań przed klientem CRBR
+
+Dwie klasy zadań: interaktywne (pojedyncze, pilne raporty analityka) oraz
+masowe (import CSV, przetwarzanie listy). Zadania interaktywne są zawsze
+pobierane z kolejki jako pierwsze, a część wątków jest dla nich
+zarezerwowana — zadania masowe nie mogą zająć wszystkich wątków.
+W obrębie klasy obowiązuje kolejność FIFO.
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK = "bulk"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BULK)
+
+
+class RequestScheduler:
+    """
+    Pula wątków z kolejkami priorytetowymi
+
+    Args:
+        workers: Łączna liczba wątków
+        reserved_interactive: Liczba wątków niedostępnych dla zadań masowych
+    """
+
+    def __init__(self, workers: int = 4, reserved_interactive: int = 1, name: str = "crbr-scheduler"):
+        if workers < 1 or not 0 <= reserved_interactive < workers:
+            raise ValueError("Wymagane: workers >= 1 oraz 0 <= reserved_interactive < workers")
+        self.workers = workers
+        self.reserved_interactive = reserved_interactive
+        self._cond = threading.Condition()
+        self._queues: Dict[str, deque] = {p: deque() for p in PRIORITIES}
+        self._running: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self._completed: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self._shutdown = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn: Callable[..., Any], *args, priority: str = PRIORITY_BULK, **kwargs) -> Future:
+        """
+        Dodaje zadanie do kolejki danej klasy
+
+        Args:
+            fn: Funkcja do wykonania
+            priority: PRIORITY_INTERACTIVE lub PRIORITY_BULK
+
+        Returns:
+            Future z wynikiem zadania
+        """
+        if priority not in self._queues:
+            raise ValueError(f"Nieznany priorytet: {priority}")
+        future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Harmonogram został zamknięty")
+            self._queues[priority].append((future, fn, args, kwargs))
+            self._cond.notify_all()
+        return future
+
+    def _next_task(self):
+        """Wybiera kolejne zadanie (wywoływane pod blokadą)"""
+        if self._queues[PRIORITY_INTERACTIVE]:
+            return PRIORITY_INTERACTIVE, self._queues[PRIORITY_INTERACTIVE].popleft()
+        bulk_limit = self.workers - self.reserved_interactive
+        if self._queues[PRIORITY_BULK] and self._running[PRIORITY_BULK] < bulk_limit:
+            return PRIORITY_BULK, self._queues[PRIORITY_BULK].popleft()
+        return None, None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                priority, task = self._next_task()
+                while task is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                    priority, task = self._next_task()
+                self._running[priority] += 1
+
+            future, fn, args, kwargs = task
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        result = fn(*args, **kwargs)
+                    except BaseException as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(result)
+            finally:
+                with self._cond:
+                    self._running[priority] -= 1
+                    self._completed[priority] += 1
+                    self._cond.notify_all()
+
+    def cancel_pending(self, priority: str = None) -> int:
+        """
+        Anuluje zadania oczekujące w kolejce (uruchomione kończą się normalnie)
+
+        Args:
+            priority: Klasa do wyczyszczenia (None = wszystkie)
+
+        Returns:
+            Liczba anulowanych zadań
+        """
+        cancelled = 0
+        with self._cond:
+            for p in ([priority] if priority else PRIORITIES):
+                queue = self._queues[p]
+                while queue:
+                    future = queue.popleft()[0]
+                    if future.cancel():
+                        cancelled += 1
+        return cancelled
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Zwraca liczbę zadań oczekujących, uruchomionych i zakończonych per klasa"""
+        with self._cond:
+            return {
+                p: {
+                    "queued": len(self._queues[p]),
+                    "running": self._running[p],
+                    "completed": self._completed[p],
+                }
+                for p in PRIORITIES
+            }
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False):
+        """Zamyka harmonogram; domyślnie czeka na dokończenie kolejki"""
+        if cancel_pending:
+            self.cancel_pending()
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Dziennik przebiegu (checkpoint/resume) dla przetwarzania masowego
+
+Plik JSON Lines dopisywany po każdej zmianie stanu NIP-u. Zapisy są
+synchronizowane na dysk (fsync) partiami, więc przerwany przebieg traci
+co najwyżej ostatnią niezsynchronizowaną partię. Przy wznowieniu ostatni
+zapis dla danego NIP-u wyznacza jego stan; ucięta ostatnia linia
+(np. po zaniku zasilania) jest pomijana.
+"""
+
+import os
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+STATE_STARTED = "started"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+
+def journal_path_for(out_dir: str, source: str) -> str:
+    """
+    Zwraca domyślną ścieżkę dziennika dla źródła (np. pliku CSV) i katalogu wyjściowego
+
+    Args:
+        out_dir: Katalog wyjściowy raportów
+        source: Nazwa źródła (ścieżka CSV lub etykieta, np. "gui")
+
+    Returns:
+        Ścieżka pliku dziennika
+    """
+    stem = os.path.splitext(os.path.basename(source))[0] or "run"
+    return os.path.join(out_dir, f".sanccheck_{stem}.journal.jsonl")
+
+
+def load_journal(path: str) -> Dict[str, dict]:
+    """
+    Wczytuje dziennik i zwraca ostatni stan każdego NIP-u
+
+    Args:
+        path: Ścieżka pliku dziennika
+
+    Returns:
+        Słownik NIP -> ostatni zapis ({"nip", "state", "path", "error", "ts"})
+    """
+    states = {}
+    if not os.path.exists(path):
+        return states
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # ucięta linia po przerwaniu zapisu
+            nip = record.get("nip")
+            if nip:
+                states[nip] = record
+    return states
+
+
+class RunJournal:
+    """
+    Dziennik stanów NIP-ów z zapisem append-only i fsync partiami
+
+    Args:
+        path: Ścieżka pliku dziennika
+        resume: True — dopisuj do istniejącego dziennika; False — zacznij nowy
+        sync_every: Liczba zapisów, po której wykonywany jest fsync
+        sync_interval: Maksymalny czas (s) między kolejnymi fsync
+    """
+
+    def __init__(self, path: str, resume: bool = False, sync_every: int = 50, sync_interval: float = 2.0):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self.states = load_journal(path) if resume else {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if resume and os.path.exists(path):
+            self._terminate_partial_line()
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _terminate_partial_line(self):
+        """Domyka uciętą ostatnią linię, aby kolejny zapis zaczynał się od nowej"""
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    def completed(self, verify_files: bool = True) -> Dict[str, str]:
+        """
+        Zwraca NIP-y zakończone sukcesem
+
+        Args:
+            verify_files: Pomija wpisy, których plik wynikowy już nie istnieje
+
+        Returns:
+            Słownik NIP -> ścieżka raportu
+        """
+        with self._lock:
+            records = list(self.states.values())
+        return {
+            r["nip"]: r.get("path")
+            for r in records
+            if r.get("state") == STATE_DONE and (not verify_files or (r.get("path") and os.path.exists(r["path"])))
+        }
+
+    def record(self, nip: str, state: str, path: Optional[str] = None, error: Optional[str] = None, **fields):
+        """Dopisuje zmianę stanu NIP-u (dodatkowe pola, np. sanctions_count, trafiają do wpisu)"""
+        entry = {"nip": nip, "state": state, "ts": datetime.now().isoformat(timespec="seconds")}
+        if path:
+            entry["path"] = path
+        if error:
+            entry["error"] = error
+        entry.update(fields)
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file.closed:
+                return
+            self.states[nip] = entry
+            self._file.write(line)
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Single-flight — współdzielenie jednego wywołania między równoległymi
+żądaniami o ten sam klucz (np. ten sam NIP pobierany przez kilka wątków)
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    """Wywołanie w toku wraz z wynikiem dla oczekujących wątków"""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Grupa wywołań, w której dla danego klucza wykonywane jest co najwyżej
+    jedno wywołanie naraz. Wątki, które poproszą o ten sam klucz w trakcie
+    jego wykonywania, czekają i otrzymują ten sam wynik (lub ten sam wyjątek).
+    Po zakończeniu wywołania klucz jest zwalniany — kolejne żądanie wykona
+    funkcję ponownie.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Tuple[Any, bool]:
+        """
+        Wykonuje fn(*args, **kwargs) lub dołącza do wywołania w toku
+
+        Args:
+            key: Klucz deduplikacji (np. oczyszczony NIP)
+            fn: Funkcja do wykonania
+
+        Returns:
+            Krotka (wynik, czy_współdzielony)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, call.waiters > 0
+
+    def in_flight(self) -> int:
+        """Liczba kluczy aktualnie w trakcie wykonywania"""
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Jednoprzebiegowe parsowanie XML CRBR (indeks nazw lokalnych)
+
+parse_crbr_xml_refactored wyszukuje każde pole osobnym zapytaniem XPath
+`.//*[local-name()='X']`, czyli przechodzi całe drzewo kilkadziesiąt razy
+na dokument. Tutaj drzewo jest przechodzone raz: dla dokumentu i dla każdej
+sekcji (beneficjent, zgłaszający, obywatelstwo, udziały itd.) budowany jest
+indeks nazwa lokalna -> elementy potomne w kolejności dokumentu, z którego
+odczytywane są wszystkie pola. Wynik jest identyczny z
+parse_crbr_xml_refactored (ta sama reguła „pierwszy węzeł tekstowy
+w kolejności dokumentu”).
+"""
+
+from typing import Any, Dict, List, Optional
+
+from lxml import etree
+
+from utils.crbr_models import Address, Beneficiary, CRBRRecord, Declarant, Entitlement, Entity
+
+# Wersja wyniku parsera — zmienić przy każdej zmianie struktury/treści rekordu
+# (unieważnia wpisy ParsedRecordCache zapisane przez poprzednią wersję)
+PARSER_VERSION = "1"
+
+# Elementy, dla których budowany jest osobny indeks potomków
+SECTION_TAGS = frozenset({
+    "BeneficjentRzeczywisty",
+    "Zglaszajacy",
+    "ListaFunkcjiZglaszajacego",
+    "Funkcja",
+    "Obywatelstwo",
+    "KrajZamieszkania",
+    "InformacjaOUdzialach",
+    "UprawnieniaWlascicielskieBezposrednie",
+    "UprawnieniaWlascicielskiePosrednie",
+    "InformacjaOUprzywilejowaniu",
+    "InneUprawnienia",
+    "RodzajInnychUprawnien",
+})
+
+APPLICATION_ID_NAMES = (
+    "identyfikatorZlozonegoWniosku",
+    "IdentyfikatorWniosku",
+    "identyfikatorWniosku",
+    "IdentyfikatorZlozonegoWniosku",
+)
+
+
+def _first_text_node(elements) -> Optional[str]:
+    """Pierwszy węzeł tekstowy (text lub tail dziecka) pierwszego elementu, który go ma"""
+    for el in elements:
+        if el.text is not None:
+            return el.text
+        for child in el:
+            if child.tail is not None:
+                return child.tail
+    return None
+
+
+class LocalNameIndex:
+    """
+    Indeks potomków elementu według nazwy lokalnej
+
+    Attributes:
+        element: Element, którego potomków obejmuje indeks
+        names: Nazwa lokalna -> lista elementów (kolejność dokumentu)
+        sections: Nazwa lokalna -> lista indeksów sekcji potomnych (kolejność dokumentu)
+    """
+
+    __slots__ = ("element", "names", "sections")
+
+    def __init__(self, element):
+        self.element = element
+        self.names: Dict[str, List[Any]] = {}
+        self.sections: Dict[str, List["LocalNameIndex"]] = {}
+
+    def text(self, name: str) -> str:
+        """Odpowiednik get_text_by_local_name(element, name)"""
+        value = _first_text_node(self.names.get(name, ()))
+        return value.strip() if value is not None else ""
+
+    def all(self, name: str) -> List["LocalNameIndex"]:
+        """Wszystkie sekcje potomne o danej nazwie"""
+        return self.sections.get(name, [])
+
+    def first(self, name: str) -> Optional["LocalNameIndex"]:
+        """Pierwsza sekcja potomna o danej nazwie lub None"""
+        found = self.sections.get(name)
+        return found[0] if found else None
+
+
+def build_index(root) -> LocalNameIndex:
+    """
+    Buduje indeks dokumentu i jego sekcji w jednym przejściu drzewa
+
+    Args:
+        root: Element XML root
+
+    Returns:
+        Indeks potomków root (sekcje dostępne przez .all/.first)
+    """
+    index = LocalNameIndex(root)
+    open_indexes = [index]
+    for event, el in etree.iterwalk(root, events=("start", "end")):
+        tag = el.tag
+        if el is root or not isinstance(tag, str):
+            continue
+        name = tag.rpartition("}")[2]
+        if event == "start":
+            for idx in open_indexes:
+                idx.names.setdefault(name, []).append(el)
+            if name in SECTION_TAGS:
+                section = LocalNameIndex(el)
+                for idx in open_indexes:
+                    idx.sections.setdefault(name, []).append(section)
+                open_indexes.append(section)
+        elif name in SECTION_TAGS:
+            open_indexes.pop()
+    return index
+
+
+def find_application_id(index: LocalNameIndex) -> str:
+    """Odpowiednik xml_parsing_helpers.find_application_id"""
+    for name in APPLICATION_ID_NAMES:
+        # findtext(".//name") — element bez przestrzeni nazw, tylko jego własny tekst
+        el = next((e for e in index.names.get(name, ()) if e.tag == name), None)
+        value = ((el.text or "") if el is not None else "").strip()
+        if value:
+            return value
+    for name in APPLICATION_ID_NAMES:
+        value = _first_text_node(index.names.get(name, ()))
+        if value is not None:
+            return value.strip()
+    return ""
+
+
+def extract_meta_data(index: LocalNameIndex) -> Dict[str, str]:
+    return {
+        "id_wniosku": find_application_id(index),
+        "data_udostepnienia": index.text("DataICzasUdostepnieniaWniosku"),
+        "data_zlozenia": index.text("DataICzasZlozeniaWniosku"),
+        "data_od": index.text("DataPoczatkuPrezentacjiZgloszenia"),
+        "data_do": index.text("DataKoncaPrezentacjiZgloszenia"),
+    }
+
+
+def extract_entity(index: LocalNameIndex) -> Entity:
+    return Entity(
+        nazwa=index.text("Nazwa"),
+        nip=index.text("NIP"),
+        krs=index.text("KRS"),
+        forma=index.text("OpisFormyOrganizacyjnej"),
+        adres=Address(
+            wojewodztwo=index.text("Wojewodztwo"),
+            powiat=index.text("Powiat"),
+            gmina=index.text("Gmina"),
+            miejscowosc=index.text("Miejscowosc"),
+            ulica=index.text("Ulica"),
+            nr_domu=index.text("NrDomu"),
+            nr_lokalu=index.text("NrLokalu"),
+            kod_pocztowy=index.text("KodPocztowy"),
+        ),
+    )
+
+
+def _country(section: LocalNameIndex, name: str) -> str:
+    found = section.first(name)
+    return found.text("Nazwa") if found is not None else ""
+
+
+def _set_ownership(entitlement: Entitlement, section: LocalNameIndex, typ: str):
+    entitlement.typ = typ
+    entitlement.kod = section.text("KodUprawnienWlascicielskich")
+    entitlement.rodzaj = section.text("RodzajUprawnienWlascicielskich")
+    entitlement.jednostka_miary_kod = section.text("KodJednostkiMiary")
+    entitlement.jednostka_miary = section.text("JednostkaMiary")
+    entitlement.ilosc = section.text("Ilosc")
+
+
+def extract_beneficiary(ben: LocalNameIndex) -> Beneficiary:
+    rec = Beneficiary(
+        imie=ben.text("PierwszeImie"),
+        imiona_kolejne=ben.text("KolejneImiona"),
+        nazwisko=ben.text("Nazwisko"),
+        pesel=ben.text("PESEL"),
+        obywatelstwo=_country(ben, "Obywatelstwo"),
+        panstwo_zamieszkania=_country(ben, "KrajZamieszkania"),
+    )
+
+    for upr in ben.all("InformacjaOUdzialach"):
+        entitlement = Entitlement()
+
+        bezp = upr.first("UprawnieniaWlascicielskieBezposrednie")
+        if bezp is not None:
+            _set_ownership(entitlement, bezp, "Bezpośrednie uprawnienia")
+            uprz = bezp.first("InformacjaOUprzywilejowaniu")
+            if uprz is not None:
+                entitlement.kod_uprzywilejowania = uprz.text("KodUprzywilejowania")
+                entitlement.rodzaj_uprzywilejowania = uprz.text("RodzajUprzywilejowania")
+                entitlement.opis_uprzywilejowania = uprz.text("OpisUprzywilejowania")
+
+        posr = upr.first("UprawnieniaWlascicielskiePosrednie")
+        if posr is not None:
+            _set_ownership(entitlement, posr, "Pośrednie uprawnienia")
+
+        inne = upr.first("InneUprawnienia")
+        if inne is not None:
+            rodzaj = inne.first("RodzajInnychUprawnien")
+            entitlement.typ = "Inne uprawnienia"
+            entitlement.rodzaj = rodzaj.text("Opis") if rodzaj is not None else ""
+            entitlement.kod = rodzaj.text("Kod") if rodzaj is not None else ""
+
+        if entitlement.typ is not None:
+            rec.szczegolowe_uprawnienia.append(entitlement)
+            if entitlement.rodzaj:
+                rec.uprawnienia.append(entitlement.rodzaj)
+
+    return rec
+
+
+def extract_declarant(index: LocalNameIndex) -> Optional[Declarant]:
+    zg = index.first("Zglaszajacy")
+    if zg is None:
+        return None
+
+    funkcja = ""
+    lista = zg.first("ListaFunkcjiZglaszajacego")
+    if lista is not None:
+        first_function = lista.first("Funkcja")
+        if first_function is not None:
+            funkcja = first_function.text("Opis")
+
+    return Declarant(
+        imie=zg.text("PierwszeImie"),
+        imiona_kolejne=zg.text("KolejneImiona"),
+        nazwisko=zg.text("Nazwisko"),
+        pesel=zg.text("PESEL"),
+        data_urodzenia=zg.text("DataUrodzenia"),
+        obywatelstwo=_country(zg, "Obywatelstwo"),
+        kraj_zamieszkania=_country(zg, "KrajZamieszkania"),
+        rodzaj_reprezentacji=zg.text("RodzajReprezentacji"),
+        inne_informacje=zg.text("InneInformacje"),
+        funkcja=funkcja,
+    )
+
+
+def record_from_index(index: LocalNameIndex, meta: Dict[str, Any]) -> CRBRRecord:
+    """Buduje rekord (model) z indeksu dokumentu lub sekcji spółki"""
+    return CRBRRecord(
+        meta=meta,
+        podmiot=extract_entity(index),
+        beneficjenci=[extract_beneficiary(b) for b in index.all("BeneficjentRzeczywisty")],
+        zglaszajacy=extract_declarant(index),
+    )
+
+
+def parse_crbr_record(xml_bytes) -> CRBRRecord:
+    """
+    Parsuje XML CRBR jednym przejściem drzewa do modelu CRBRRecord
+
+    Args:
+        xml_bytes: Bajty XML lub sparsowany element
+
+    Returns:
+        Rekord CRBR (klasy danych ze __slots__)
+    """
+    root = xml_bytes if isinstance(xml_bytes, etree._Element) else etree.fromstring(xml_bytes)
+    index = build_index(root)
+    return record_from_index(index, extract_meta_data(index))
+
+
+def parse_crbr_xml_indexed(xml_bytes) -> Dict[str, Any]:
+    """
+    Parsuje XML CRBR jednym przejściem drzewa
+
+    Args:
+        xml_bytes: Bajty XML lub sparsowany element
+
+    Returns:
+        Słownik z danymi CRBR (jak parse_crbr_xml_refactored)
+    """
+    return parse_crbr_record(xml_bytes).to_dict()
@@ -268,17 +268,18 @@ def extract_declarant_data(root) -> Dict[str, str]:
     }
 
 
-def parse_crbr_xml_refactored(xml_bytes: bytes) -> Dict[str, Any]:
+def parse_crbr_xml_refactored(xml_bytes) -> Dict[str, Any]:
     """
     Refaktoryzowana funkcja parsowania XML CRBR
     
     Args:
-        xml_bytes: Bajty XML do sparsowania
+        xml_bytes: Bajty XML do sparsowania lub już sparsowany element
+                   (np. z przyrostowego parsowania odpowiedzi SOAP)
         
     Returns:
         Słownik z danymi CRBR
     """
-    root = etree.fromstring(xml_bytes)
+    root = xml_bytes if isinstance(xml_bytes, etree._Element) else etree.fromstring(xml_bytes)
     
     # Inicjalizacja struktury danych
     data = {
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Strumieniowe parsowanie odpowiedzi CRBR z wieloma spółkami / zgłoszeniami
+
+Schemat dopuszcza nieograniczoną liczbę elementów SpolkaIBeneficjenci
+i ZgloszenieSpolki, a parse_crbr_xml przeszukuje cały dokument — pierwsza
+Nazwa/NIP wygrywa, a beneficjenci wszystkich zgłoszeń są scalani.
+iter_crbr_records przetwarza dokument przez iterparse i zwraca osobny rekord
+dla każdej spółki/zgłoszenia, zawierający wyłącznie jej dane. Przetworzone
+elementy są czyszczone, więc pamięć nie rośnie z rozmiarem odpowiedzi.
+"""
+
+import io
+from typing import Any, Dict, Iterator, List, Optional
+
+from lxml import etree
+
+from utils.crbr_models import CRBRRecord
+from utils.xml_index_parser import (build_index, record_from_index, parse_crbr_record, parse_crbr_xml_indexed,
+                                    APPLICATION_ID_NAMES)
+
+RECORD_TAGS = frozenset({"SpolkaIBeneficjenci", "ZgloszenieSpolki"})
+
+# Metadane wniosku występujące poza rekordami (wspólne dla wszystkich rekordów)
+_DOCUMENT_META = {
+    "DataICzasUdostepnieniaWniosku": "data_udostepnienia",
+    "DataICzasZlozeniaWniosku": "data_zlozenia",
+}
+
+
+def _local(tag) -> str:
+    return tag.rpartition("}")[2] if isinstance(tag, str) else ""
+
+
+def _open_source(source):
+    """Zwraca obiekt dla iterparse (ścieżka, plik lub bajty)"""
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return source
+
+
+def _record_from_element(element, document_meta: Dict[str, str], number: int) -> CRBRRecord:
+    """Buduje rekord (model) z jednego elementu spółki/zgłoszenia"""
+    index = build_index(element)
+    meta = {
+        "id_wniosku": document_meta.get("id_wniosku", ""),
+        "data_udostepnienia": document_meta.get("data_udostepnienia", ""),
+        "data_zlozenia": document_meta.get("data_zlozenia", ""),
+        "data_od": index.text("DataPoczatkuPrezentacjiZgloszenia"),
+        "data_do": index.text("DataKoncaPrezentacjiZgloszenia"),
+        "numer_referencyjny": index.text("NumerReferencyjny"),
+        "rekord": number,
+    }
+    record = record_from_index(index, meta)
+    record.rozbieznosci = [
+        {
+            "identyfikator": (el.findtext("{*}IdentyfikatorUwagi") or "").strip(),
+            "informacja": (el.findtext("{*}InformacjaDlaZainteresowanego") or "").strip(),
+        }
+        for el in index.names.get("InformacjaORozbieznosciach", ())
+    ]
+    return record
+
+
+def iter_crbr_records(source) -> Iterator[Dict[str, Any]]:
+    """
+    Zwraca kolejno rekordy CRBR — po jednym na spółkę/zgłoszenie
+
+    Rekord ma strukturę wyniku parse_crbr_xml (meta, podmiot, beneficjenci,
+    zglaszajacy), ograniczoną do danej spółki, oraz dodatkowo listę
+    rozbieżności i w meta numer referencyjny oraz numer rekordu (od 1).
+    Dokument bez elementów spółek/zgłoszeń (np. raport z portalu) daje
+    jeden rekord identyczny z parse_crbr_xml.
+
+    Args:
+        source: Ścieżka pliku, obiekt plikowy lub bajty XML (także koperta SOAP)
+
+    Yields:
+        Słownik z danymi jednej spółki/zgłoszenia
+    """
+    document_meta: Dict[str, str] = {}
+    depth = 0
+    number = 0
+    root = None
+    context = etree.iterparse(_open_source(source), events=("start", "end"), remove_comments=True)
+    for event, el in context:
+        name = _local(el.tag)
+        if event == "start":
+            if root is None:
+                root = el
+            if name in RECORD_TAGS:
+                depth += 1
+            continue
+
+        if name in RECORD_TAGS:
+            depth -= 1
+            if depth:
+                continue  # zagnieżdżony rekord — obsłużony wraz z nadrzędnym
+            number += 1
+            yield _record_from_element(el, document_meta, number).to_dict()
+            # Zwolnij przetworzony rekord i wcześniejsze rodzeństwo
+            el.clear(keep_tail=True)
+            parent = el.getparent()
+            if parent is not None:
+                while el.getprevious() is not None:
+                    del parent[0]
+        elif depth == 0:
+            if name in APPLICATION_ID_NAMES and "id_wniosku" not in document_meta and (el.text or "").strip():
+                document_meta["id_wniosku"] = el.text.strip()
+            elif name in _DOCUMENT_META and _DOCUMENT_META[name] not in document_meta:
+                document_meta[_DOCUMENT_META[name]] = (el.text or "").strip()
+
+    if number == 0 and root is not None:
+        yield parse_crbr_xml_indexed(root)
+
+
+def _inside_record(el) -> bool:
+    return any(_local(parent.tag) in RECORD_TAGS for parent in el.iterancestors())
+
+
+def top_level_records(root) -> List[Any]:
+    """
+    Zwraca elementy spółek/zgłoszeń najwyższego poziomu sparsowanego dokumentu
+
+    Args:
+        root: Element lxml (np. z fetch_inner_element_by_nip)
+
+    Returns:
+        Elementy SpolkaIBeneficjenci/ZgloszenieSpolki (bez zagnieżdżonych), w kolejności dokumentu
+    """
+    return [el for el in root.iter("{*}SpolkaIBeneficjenci", "{*}ZgloszenieSpolki") if not _inside_record(el)]
+
+
+def count_records(root) -> int:
+    """Liczba spółek/zgłoszeń najwyższego poziomu w sparsowanym dokumencie"""
+    return len(top_level_records(root))
+
+
+def _document_meta(root) -> Dict[str, str]:
+    """Metadane wniosku spoza rekordów (jak zbierane przez iter_crbr_records)"""
+    meta: Dict[str, str] = {}
+    for el in root.iter(*(f"{{*}}{name}" for name in APPLICATION_ID_NAMES + tuple(_DOCUMENT_META))):
+        if _inside_record(el):
+            continue
+        name, value = _local(el.tag), (el.text or "").strip()
+        if name in _DOCUMENT_META:
+            meta.setdefault(_DOCUMENT_META[name], value)
+        elif value:
+            meta.setdefault("id_wniosku", value)
+    return meta
+
+
+def records_from_element(root, filings: Optional[List[Any]] = None) -> List[CRBRRecord]:
+    """
+    Rekordy spółek/zgłoszeń z już sparsowanego dokumentu — bez serializacji i ponownego parsowania
+
+    Wynik (po to_dict()) jest taki sam jak list(iter_crbr_records(etree.tostring(root))).
+
+    Args:
+        root: Element lxml dokumentu
+        filings: Elementy z top_level_records(root), jeśli już wyznaczone
+
+    Returns:
+        Lista modeli CRBRRecord (po jednym na spółkę/zgłoszenie)
+    """
+    if filings is None:
+        filings = top_level_records(root)
+    if not filings:
+        return [parse_crbr_record(root)]
+    meta = _document_meta(root)
+    return [_record_from_element(el, meta, number) for number, el in enumerate(filings, 1)]
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla zbiorczego raportu PDF
+"""
+
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from core.combined_report import CombinedReportWriter, render_combined_pdf
+from crbr_synthetic import build_crbr_response
+from xml_index_parser import parse_crbr_record
+
+
+def _records(count):
+    return [parse_crbr_record(build_crbr_response(str(5260000000 + i * 7919), beneficiaries=(2, 2),
+                                                  envelope=False))
+            for i in range(count)]
+
+
+def _outline_titles(pdf: bytes):
+    return re.findall(rb"/Title \(([^\n]*?)\)(?: /|\n|$)", pdf)
+
+
+class TestCombinedPdf(unittest.TestCase):
+    """Testy dla render_combined_pdf"""
+
+    def test_outline_per_entity_and_single_font(self):
+        records = _records(3)
+        records[1].sankcje = [{"source": "MF", "name": "X", "reason": "NIP", "date": "2022", "status": "Aktywny"}]
+        buffer = io.BytesIO()
+        render_combined_pdf(records, buffer)
+        pdf = buffer.getvalue()
+
+        self.assertEqual(pdf.count(b"/Outlines"), 2)  # katalog + słownik konspektu
+        self.assertIn(b"/Count 4", pdf)  # zestawienie + 3 podmioty
+        self.assertEqual(pdf.count(b"/FontFile2"), 1)
+        titles = b"\n".join(_outline_titles(pdf))
+        for record in records:
+            self.assertIn(record.podmiot.nip.encode(), titles)
+        self.assertIn(b"dopasowania sankcyjne: 1", titles)
+
+
+class TestCombinedReportWriter(unittest.TestCase):
+    """Testy dla CombinedReportWriter"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.out_path = os.path.join(self.tmp, "pakiet.pdf")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_single_file_without_limits(self):
+        with CombinedReportWriter(self.out_path, max_entities=0) as writer:
+            futures = [writer.submit(r) for r in _records(3)]
+            self.assertFalse(any(f.done() for f in futures))
+        self.assertEqual(writer.paths, [self.out_path])
+        self.assertEqual({f.result() for f in futures}, {self.out_path})
+
+    def test_parts_are_written_as_they_fill(self):
+        writer = CombinedReportWriter(self.out_path, max_entities=2)
+        futures = [writer.submit(r) for r in _records(5)]
+        self.assertEqual(os.path.basename(futures[3].result(timeout=60)), "pakiet_002.pdf")
+        self.assertTrue(futures[0].done())
+        self.assertFalse(futures[4].done())
+        paths = writer.close()
+        self.assertEqual([os.path.basename(p) for p in paths], ["pakiet_001.pdf", "pakiet_002.pdf", "pakiet_003.pdf"])
+        self.assertEqual([f.result() for f in futures], [paths[0], paths[0], paths[1], paths[1], paths[2]])
+
+    def test_parts_rendered_off_the_submitting_thread(self):
+        release = threading.Event()
+        threads = []
+
+        def render(records, target, context=None, part=None):
+            threads.append(threading.current_thread())
+            release.wait(10)
+            target.write(b"%PDF")
+
+        with mock.patch("core.combined_report.render_combined_pdf", side_effect=render):
+            writer = CombinedReportWriter(self.out_path, max_entities=1)
+            futures = [writer.submit(r) for r in _records(2)]
+            # Obie części czekają na render, a submit wrócił od razu
+            self.assertFalse(any(f.done() for f in futures))
+            release.set()
+            paths = writer.close()
+        self.assertEqual(len(paths), 2)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    def test_parts_rendered_in_render_pool(self):
+        from core.render_pool import RenderPool
+
+        with RenderPool(1) as pool:
+            with CombinedReportWriter(self.out_path, max_entities=2, render_pool=pool) as writer:
+                for record in _records(3):
+                    writer.submit(record)
+        self.assertEqual(len(writer.paths), 2)
+        with open(writer.paths[0], "rb") as f:
+            self.assertEqual(f.read(5), b"%PDF-")
+
+    def test_size_cap_splits_parts(self):
+        sizes = []
+        for count in (1, 2):
+            buffer = io.BytesIO()
+            render_combined_pdf(_records(count), buffer)
+            sizes.append(buffer.tell())
+        cap = sum(sizes) // 2  # mieści jeden podmiot, nie dwa
+        with CombinedReportWriter(self.out_path, max_entities=4, max_bytes=cap) as writer:
+            for record in _records(8):
+                writer.submit(record)
+        paths = writer.paths
+        self.assertGreater(len(paths), 2)
+        for path in paths:
+            self.assertLessEqual(os.path.getsize(path), cap)
+
+    def test_resume_continues_numbering(self):
+        with CombinedReportWriter(self.out_path, max_entities=1) as writer:
+            writer.submit(_records(1)[0])
+        with CombinedReportWriter(self.out_path, max_entities=1, resume=True) as writer:
+            writer.submit(_records(1)[0])
+        self.assertEqual(os.path.basename(writer.paths[0]), "pakiet_002.pdf")
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, "pakiet_001.pdf")))
+
+
+class TestBulkCombined(unittest.TestCase):
+    """bulk_from_csv z zapisem zbiorczym"""
+
+    def test_bulk_writes_combined_parts(self):
+        from crbr_stub_server import start_stub_server
+        from crbr_bulk_to_pdf import bulk_from_csv
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        stub, _ = start_stub_server()
+        self.addCleanup(stub.server_close)
+        self.addCleanup(stub.shutdown)
+
+        csv_path = os.path.join(tmp, "nips.csv")
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write("nip\n1234563218\n7393873360\n5260250995\n")
+        out_dir = os.path.join(tmp, "out")
+
+        writer = CombinedReportWriter(os.path.join(out_dir, "pakiet.pdf"), max_entities=2)
+        generated = bulk_from_csv(csv_path, out_dir, pause_sec=0, timeout=5, endpoint=stub.endpoint,
+                                  combined=writer)
+        self.assertEqual([os.path.basename(p) for p in generated], ["pakiet_001.pdf", "pakiet_002.pdf"])
+        self.assertEqual(sorted(p for p in os.listdir(out_dir) if p.endswith(".pdf")),
+                         ["pakiet_001.pdf", "pakiet_002.pdf"])
+
+    def test_nip_goes_to_combined(self):
+        from crbr_stub_server import start_stub_server
+        from core.crbr_bulk_to_pdf import main
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        stub, _ = start_stub_server()
+        self.addCleanup(stub.server_close)
+        self.addCleanup(stub.shutdown)
+
+        out_dir = os.path.join(tmp, "out")
+        argv = ["crbr_bulk_to_pdf", "--nip", "1234563218", "--endpoint", stub.endpoint, "--out", out_dir,
+                "--combined", os.path.join(out_dir, "pakiet.pdf"), "--render-workers", "0"]
+        with mock.patch("sys.argv", argv), mock.patch("builtins.print"):
+            main()
+        self.assertEqual(sorted(p for p in os.listdir(out_dir) if p.endswith(".pdf")), ["pakiet_001.pdf"])
+
+
+if __name__ == "__main__":
+    unittest.main()
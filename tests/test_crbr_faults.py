@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla klasyfikacji błędów CRBR i pamięci negatywnej
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from lxml import etree
+
+from utils.crbr_faults import CRBRFault, CRBRNotFoundError, fault_from_http, check_response, is_permanent
+from utils.negative_cache import NegativeCache
+from crbr_stub_server import StubConfig, build_soap_fault, build_not_found_response, start_stub_server
+from crbr_bulk_to_pdf import fetch_inner_element_by_nip, extract_inner_xml_from_soap
+
+
+class TestFaultClassification(unittest.TestCase):
+    """Testy dla crbr_faults"""
+
+    def test_sender_fault_is_permanent(self):
+        error = fault_from_http(400, build_soap_fault("Niepoprawny komunikat", "soap:Sender"))
+        self.assertTrue(error.permanent)
+        self.assertEqual(error.code, "soap:Sender")
+
+    def test_receiver_fault_and_server_errors_are_transient(self):
+        self.assertFalse(fault_from_http(500, build_soap_fault("Błąd usługi")).permanent)
+        self.assertFalse(fault_from_http(500, build_soap_fault("Błąd", "soap:Sender")).permanent)
+        self.assertFalse(fault_from_http(429).permanent)
+        self.assertTrue(fault_from_http(404, b"nie XML").permanent)
+
+    def test_status_not_found_in_bytes_and_element(self):
+        soap = build_not_found_response("1234563218")
+        with self.assertRaises(CRBRNotFoundError):
+            check_response(soap, "1234563218")
+        with self.assertRaises(CRBRNotFoundError):
+            check_response(etree.fromstring(extract_inner_xml_from_soap(soap)), "1234563218")
+
+    def test_formal_error_is_permanent(self):
+        element = etree.fromstring(b"<Odp><Dane><Status>BladFormalny</Status></Dane></Odp>")
+        with self.assertRaises(CRBRFault) as ctx:
+            check_response(element)
+        self.assertTrue(is_permanent(ctx.exception))
+        check_response(etree.fromstring(b"<Odp><Dane><Status>IstniejaInformacje</Status></Dane></Odp>"))
+
+
+class TestNegativeCache(unittest.TestCase):
+    """Testy dla NegativeCache"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.path = os.path.join(self.directory, "negative.json")
+
+    def test_entries_persist_between_instances(self):
+        NegativeCache(self.path).add("NIP:1234563218", "brak")
+        self.assertIn("NIP:1234563218", NegativeCache(self.path))
+
+    def test_entries_expire(self):
+        cache = NegativeCache(self.path, ttl=0.05)
+        cache.add("NIP:1234563218")
+        time.sleep(0.1)
+        self.assertNotIn("NIP:1234563218", cache)
+        self.assertEqual(len(NegativeCache(self.path, ttl=0.05)), 0)
+
+
+class TestFastFail(unittest.TestCase):
+    """Testy dla fetch_inner_element_by_nip z błędami trwałymi"""
+
+    def setUp(self):
+        self.stub, _ = start_stub_server(StubConfig(not_found=("7393873360",)))
+        self.addCleanup(self.stub.server_close)
+        self.addCleanup(self.stub.shutdown)
+
+    def test_not_found_is_not_retried_and_cached(self):
+        cache = NegativeCache()
+        with self.assertRaises(CRBRNotFoundError) as ctx:
+            fetch_inner_element_by_nip("7393873360", timeout=5, retries=3, endpoint=self.stub.endpoint,
+                                       negative_cache=cache)
+        self.assertFalse(ctx.exception.cached)
+        with self.assertRaises(CRBRNotFoundError) as ctx:
+            fetch_inner_element_by_nip("739-387-33-60", timeout=5, retries=3, endpoint=self.stub.endpoint,
+                                       negative_cache=cache)
+        self.assertTrue(ctx.exception.cached)
+        self.assertEqual(self.stub.stats.snapshot()["total"], 1)
+
+    def test_sender_fault_fails_fast(self):
+        """Fault soap:Sender nie jest ponawiany"""
+        class _Session:
+            calls = 0
+
+            def post(self, *args, **kwargs):
+                _Session.calls += 1
+                return type("Resp", (), {"status_code": 400,
+                                         "content": build_soap_fault("Niepoprawny NIP", "soap:Sender")})()
+
+        with self.assertRaises(CRBRFault) as ctx:
+            fetch_inner_element_by_nip("1234563218", timeout=5, retries=3, session=_Session(),
+                                       endpoint=self.stub.endpoint)
+        self.assertTrue(ctx.exception.permanent)
+        self.assertEqual(_Session.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
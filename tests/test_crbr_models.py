@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla typowanego modelu rekordu CRBR
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from crbr_stub_server import build_synthetic_response
+from crbr_bulk_to_pdf import extract_inner_xml_from_soap, generate_pdf_from_xml_bytes, prepare_report
+from xml_index_parser import parse_crbr_record, parse_crbr_xml_indexed
+from utils.crbr_models import Beneficiary, CRBRRecord, Entitlement
+from test_xml_index_parser import EDGE_XML
+
+
+def _deep_size(obj, seen=None) -> int:
+    """Przybliżony rozmiar obiektu wraz z zawartością (sys.getsizeof rekurencyjnie)"""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_size(v, seen) for v in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(_deep_size(getattr(obj, name), seen) for name in obj.__slots__)
+    return size
+
+
+class TestCRBRModels(unittest.TestCase):
+    """Testy dla CRBRRecord i klas składowych"""
+
+    def test_round_trip_matches_parser_dict(self):
+        documents = [EDGE_XML]
+        documents += [extract_inner_xml_from_soap(build_synthetic_response(nip, (3, 3)))
+                      for nip in ("1234563218", "5260250274")]
+        for xml in documents:
+            parsed = parse_crbr_xml_indexed(xml)
+            self.assertEqual(parse_crbr_record(xml).to_dict(), parsed)
+            self.assertEqual(CRBRRecord.from_dict(parsed).to_dict(), parsed)
+
+    def test_instances_have_no_dict(self):
+        record = parse_crbr_record(EDGE_XML)
+        for obj in (record, record.podmiot, record.podmiot.adres, record.beneficjenci[0],
+                    record.beneficjenci[0].szczegolowe_uprawnienia[0], record.zglaszajacy):
+            self.assertFalse(hasattr(obj, "__dict__"), type(obj).__name__)
+        with self.assertRaises(AttributeError):
+            record.podmiot.regon = "1"
+
+    def test_entitlement_omits_missing_keys(self):
+        self.assertEqual(Entitlement(typ="Inne uprawnienia", kod="", rodzaj="").to_dict(),
+                         {"typ": "Inne uprawnienia", "kod": "", "rodzaj": ""})
+        self.assertEqual(Beneficiary().to_dict()["szczegolowe_uprawnienia"], [])
+
+    def test_model_is_smaller_than_dict(self):
+        xml = extract_inner_xml_from_soap(build_synthetic_response("1234563218", (20, 20)))
+        record = parse_crbr_record(xml)
+        self.assertLess(_deep_size(record), _deep_size(record.to_dict()))
+
+    def test_pdf_accepts_model(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        xml = extract_inner_xml_from_soap(build_synthetic_response("1234563218", (2, 2)))
+        path = generate_pdf_from_xml_bytes(parse_crbr_record(xml), directory)
+        self.assertTrue(os.path.getsize(path) > 0)
+
+    def test_pipeline_carries_model(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        xml = extract_inner_xml_from_soap(build_synthetic_response("1234563218", (2, 2)))
+        data, _, nip = prepare_report(xml, directory)
+        self.assertIsInstance(data, CRBRRecord)
+        self.assertEqual(nip, "1234563218")
+
+    def test_sanctions_round_trip(self):
+        record = parse_crbr_record(EDGE_XML)
+        record.sankcje = [{"source": "MF", "name": "X"}]
+        data = record.to_dict()
+        self.assertEqual(data["sankcje"], [{"source": "MF", "name": "X"}])
+        self.assertEqual(CRBRRecord.from_dict(data), record)
+        self.assertNotIn("sankcje", parse_crbr_record(EDGE_XML).to_dict())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla lokalnego serwera zastępczego CRBR
+"""
+
+import json
+import random
+import unittest
+import urllib.request
+
+from crbr_stub_server import LatencyModel, StubConfig, start_stub_server
+from crbr_bulk_to_pdf import fetch_xml_by_nip, extract_inner_xml_from_soap, parse_crbr_xml
+
+
+class TestLatencyModel(unittest.TestCase):
+    """Testy dla specyfikacji rozkładu opóźnień"""
+
+    def test_specs(self):
+        rng = random.Random(1)
+        self.assertEqual(LatencyModel("none").sample(rng), 0.0)
+        self.assertEqual(LatencyModel("fixed:0.25").sample(rng), 0.25)
+        self.assertTrue(0.1 <= LatencyModel("uniform:0.1,0.2").sample(rng) <= 0.2)
+        self.assertLessEqual(LatencyModel("lognormal:3,1@0.5").sample(rng), 0.5)
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            LatencyModel("pareto:1")
+
+
+class TestStubServer(unittest.TestCase):
+    """Testy klienta SOAP wobec serwera zastępczego"""
+
+    def _start(self, config=None):
+        server, thread = start_stub_server(config)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_synthetic_response_is_parsed(self):
+        """Syntetyczna odpowiedź przechodzi przez ekstrakcję i parser"""
+        server = self._start()
+        soap = fetch_xml_by_nip("1234563218", timeout=5, retries=1, endpoint=server.endpoint)
+        data = parse_crbr_xml(extract_inner_xml_from_soap(soap))
+
+        self.assertEqual(data["podmiot"]["nip"], "1234563218")
+        self.assertTrue(data["beneficjenci"])
+        self.assertEqual(server.stats.snapshot()["ok"], 1)
+
+    def test_injected_errors_exhaust_retries(self):
+        """Wstrzyknięte 429 / SOAP Fault / zerwanie kończą się RuntimeError"""
+        for config in (StubConfig(rate_429=1.0, retry_after=0), StubConfig(rate_fault=1.0),
+                       StubConfig(rate_reset=1.0)):
+            server = self._start(config)
+            with self.assertRaises(RuntimeError):
+                fetch_xml_by_nip("1234563218", timeout=5, retries=1, endpoint=server.endpoint)
+
+    def test_stats_endpoint(self):
+        """GET /stats zwraca liczniki żądań"""
+        server = self._start(StubConfig(rate_5xx=1.0))
+        with self.assertRaises(RuntimeError):
+            fetch_xml_by_nip("1234563218", timeout=5, retries=1, endpoint=server.endpoint)
+        with urllib.request.urlopen(server.endpoint + "stats", timeout=5) as resp:
+            stats = json.loads(resp.read())
+        self.assertEqual(stats["total"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla generatora syntetycznych odpowiedzi CRBR i benchmarku parserów
+"""
+
+import unittest
+from datetime import datetime
+
+from lxml import etree
+
+from crbr_synthetic import NS_XSD, build_crbr_response
+from crbr_stub_server import WSDL_PATH, build_synthetic_response
+from parse_benchmark import benchmark_parsers
+from xml_index_parser import parse_crbr_xml_indexed
+from xml_parsing_helpers import parse_crbr_xml_refactored
+from xml_record_stream import iter_crbr_records
+
+XSD = "http://www.w3.org/2001/XMLSchema"
+NOW = datetime(2024, 1, 2, 3, 4, 5)
+
+
+def _wsdl_sequence(type_name):
+    """Nazwy elementów sekwencji typu złożonego z WSDL (w kolejności schematu)"""
+    wsdl = etree.parse(WSDL_PATH)
+    ctype = wsdl.find(f".//{{{XSD}}}complexType[@name='{type_name}']")
+    return [el.get("name") for el in ctype.find(f".//{{{XSD}}}sequence").iterchildren(f"{{{XSD}}}element")]
+
+
+def _follows(children, sequence):
+    """Czy elementy występują w kolejności sekwencji ze schematu"""
+    positions = [sequence.index(etree.QName(c).localname) for c in children]
+    return positions == sorted(positions)
+
+
+class TestSyntheticResponse(unittest.TestCase):
+    """Testy dla build_crbr_response"""
+
+    def setUp(self):
+        self.xml = build_crbr_response("1234563218", filings=3, beneficiaries=4, entitlements=3, declarants=2,
+                                       discrepancies=1, envelope=False, now=NOW)
+        self.root = etree.fromstring(self.xml)
+
+    def test_element_order_follows_wsdl_types(self):
+        dane = self.root[0]
+        self.assertTrue(_follows(dane, _wsdl_sequence("PobierzInformacjeOSpolkachIBeneficjentachOdpowiedzDaneTyp")))
+        spolka_seq = _wsdl_sequence("SpolkaIBeneficjenciApiZapytaniaTyp")
+        zgl_seq = _wsdl_sequence("ZglaszajacyTyp")
+        for spolka in self.root.iter(f"{{{NS_XSD}}}SpolkaIBeneficjenci"):
+            self.assertTrue(_follows(spolka, spolka_seq))
+        for zgl in self.root.iter(f"{{{NS_XSD}}}Zglaszajacy"):
+            self.assertTrue(_follows(zgl, zgl_seq))
+
+    def test_counts_are_configurable(self):
+        records = list(iter_crbr_records(self.xml))
+        self.assertEqual(len(records), 3)
+        for record in records:
+            self.assertEqual(len(record["beneficjenci"]), 4)
+            self.assertEqual(len(record["beneficjenci"][0]["szczegolowe_uprawnienia"]), 3)
+            self.assertEqual(len(record["rozbieznosci"]), 1)
+        self.assertEqual(len(self.root.findall(f".//{{{NS_XSD}}}Zglaszajacy")), 6)
+        self.assertEqual(records[0]["meta"]["data_do"], "2020-12-30")
+        self.assertEqual(records[-1]["meta"]["data_do"], "")
+
+    def test_deterministic_and_parsers_agree(self):
+        self.assertEqual(self.xml, build_crbr_response("1234563218", filings=3, beneficiaries=4, entitlements=3,
+                                                       declarants=2, discrepancies=1, envelope=False, now=NOW))
+        self.assertEqual(parse_crbr_xml_indexed(self.xml), parse_crbr_xml_refactored(self.xml))
+
+    def test_stub_uses_generator(self):
+        soap = build_synthetic_response("1234563218", (2, 2))
+        body = etree.fromstring(soap)[0][0]
+        self.assertEqual(etree.QName(body).localname, "PobierzInformacjeOSpolkachIBeneficjentachOdpowiedz")
+        self.assertEqual(len(parse_crbr_xml_indexed(etree.tostring(body))["beneficjenci"]), 2)
+
+
+class TestParseBenchmark(unittest.TestCase):
+    """Testy dla benchmark_parsers"""
+
+    def test_reports_throughput_per_parser_and_size(self):
+        rows = benchmark_parsers({"indexed": parse_crbr_xml_indexed}, ["small", "medium"], documents=2, repeat=1)
+        self.assertEqual([(r["parser"], r["size"]) for r in rows], [("indexed", "small"), ("indexed", "medium")])
+        self.assertLess(rows[0]["bytes"], rows[1]["bytes"])
+        for row in rows:
+            self.assertGreater(row["documents_per_s"], 0)
+            self.assertGreater(row["mb_per_s"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
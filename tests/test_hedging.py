@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla żądań zabezpieczających (hedged requests)
+"""
+
+import threading
+import unittest
+
+from hedging import Hedger, HedgeBudget, LatencyTracker
+
+
+class TestHedging(unittest.TestCase):
+    """Testy dla Hedger i jego limitera"""
+
+    def test_budget_limits_extra_requests(self):
+        """Budżet pozwala na nie więcej niż zadany ułamek żądań"""
+        budget = HedgeBudget(fraction=0.25, burst=1.0)
+        granted = 0
+        for _ in range(100):
+            budget.on_request()
+            granted += budget.try_acquire()
+        self.assertEqual(granted, 25)
+
+    def test_percentile_requires_samples(self):
+        tracker = LatencyTracker(percentile=90, min_samples=5)
+        self.assertIsNone(tracker.hedge_delay())
+        for value in range(10):
+            tracker.record(value / 10)
+        self.assertAlmostEqual(tracker.hedge_delay(), 0.8)
+
+    def test_hedge_wins_and_cancels_primary(self):
+        """Wolne pierwsze żądanie zostaje zdublowane, a przegrane anulowane"""
+        hedger = Hedger(fraction=1.0, min_delay=0.01, min_samples=1)
+        hedger.tracker.record(0.01)
+        hedger.budget.on_request()
+        calls = []
+
+        def fetch(cancelled):
+            calls.append(cancelled)
+            if len(calls) == 1:
+                cancelled.wait(5)  # pierwsze żądanie "utknęło"
+                return "primary"
+            return "hedge"
+
+        self.assertEqual(hedger.call(fetch), "hedge")
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(calls[0].is_set())
+        self.assertEqual(hedger.snapshot()["hedge_wins"], 1)
+
+    def test_losing_attempt_latency_is_recorded(self):
+        """Czas przegranej (wolnej) próby trafia do percentyla"""
+        hedger = Hedger(fraction=1.0, min_delay=0.01, min_samples=1)
+        hedger.tracker.record(0.01)
+        hedger.budget.on_request()
+        calls = []
+
+        def fetch(cancelled):
+            calls.append(cancelled)
+            if len(calls) == 1:
+                cancelled.wait(5)
+                threading.Event().wait(0.2)  # odpowiedź dociera mimo anulowania
+                return "primary"
+            return "hedge"
+
+        self.assertEqual(hedger.call(fetch), "hedge")
+        for _ in range(200):
+            if len(hedger.tracker._samples) == 3:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(len(hedger.tracker._samples), 3)
+        self.assertGreater(max(hedger.tracker._samples), 0.2)
+
+    def test_no_budget_waits_for_primary(self):
+        """Bez budżetu nie jest wysyłane drugie żądanie"""
+        hedger = Hedger(fraction=0.0, min_delay=0.01, min_samples=1)
+        hedger.tracker.record(0.01)
+        calls = []
+
+        def fetch(cancelled):
+            calls.append(threading.current_thread().name)
+            threading.Event().wait(0.1)
+            return "primary"
+
+        self.assertEqual(hedger.call(fetch), "primary")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(hedger.snapshot()["hedged"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
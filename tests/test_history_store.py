@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla zapytań z zakresem dat / KRS i lokalnej historii odpowiedzi
+"""
+
+import shutil
+import tempfile
+import unittest
+
+from lxml import etree
+
+from history_store import HistoryStore, normalize_date
+from crbr_stub_server import start_stub_server
+from crbr_bulk_to_pdf import build_soap_request, fetch_inner_element, parse_crbr_xml
+
+NS = "http://www.mf.gov.pl/schematy/AP/ApiPrzegladoweCRBR/2022/12/01"
+
+
+def _response(periods):
+    """Odpowiedź z listą zgłoszeń o podanych okresach prezentacji (początek, koniec)"""
+    root = etree.Element("PobierzInformacjeOSpolkachIBeneficjentachOdpowiedzDane")
+    lista = etree.SubElement(root, "ListaInformacjiOSpolkachIBeneficjentach")
+    for i, (start, end) in enumerate(periods):
+        spolka = etree.SubElement(lista, "SpolkaIBeneficjenci")
+        etree.SubElement(spolka, "NumerReferencyjny").text = str(i)
+        etree.SubElement(spolka, "DataPoczatkuPrezentacjiZgloszenia").text = start
+        if end:
+            etree.SubElement(spolka, "DataKoncaPrezentacjiZgloszenia").text = end
+    etree.SubElement(root, "SzczegolyWniosku")
+    return root
+
+
+def _refs(element):
+    return element.xpath(".//*[local-name()='NumerReferencyjny']/text()")
+
+
+class TestSoapRequest(unittest.TestCase):
+    """Testy dla build_soap_request"""
+
+    def test_krs_and_date_range(self):
+        root = etree.fromstring(build_soap_request(krs="0000012345", date_from="2023-01-01", date_to="2023-12-31"))
+        szczeg = root.find(f".//{{{NS}}}SzczegolyWniosku")
+        self.assertEqual([etree.QName(c).localname for c in szczeg], ["KRS", "DataOd", "DataDo"])
+        self.assertEqual(szczeg.findtext(f"{{{NS}}}DataDo"), "2023-12-31")
+
+    def test_requires_exactly_one_identifier(self):
+        with self.assertRaises(ValueError):
+            build_soap_request()
+        with self.assertRaises(ValueError):
+            build_soap_request(nip="1234563218", krs="0000012345")
+        with self.assertRaises(ValueError):
+            build_soap_request(nip="1234563218", date_from="2024-02-01", date_to="2024-01-01")
+
+
+class TestHistoryStore(unittest.TestCase):
+    """Testy dla HistoryStore"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.store = HistoryStore(self.directory)
+
+    def test_narrower_range_is_filtered_from_history(self):
+        periods = [("2020-01-01", "2021-06-30"), ("2021-07-01", "2022-12-31"), ("2023-01-01", None)]
+        self.store.save("NIP", "1234563218", _response(periods), "2020-01-01", "2024-12-31")
+
+        answer = self.store.lookup("NIP", "1234563218", "2022-01-01", "2022-03-31")
+        self.assertEqual(_refs(answer), ["1"])
+        self.assertEqual(answer.xpath("string(.//SzczegolyWniosku/DataOd)"), "2022-01-01")
+        self.assertEqual(_refs(self.store.lookup("NIP", "1234563218", "2021-06-30", "2023-01-01")),
+                         ["0", "1", "2"])
+
+    def test_range_outside_window_misses(self):
+        self.store.save("NIP", "1234563218", _response([("2020-01-01", None)]), "2020-01-01", "2021-12-31")
+        self.assertIsNone(self.store.lookup("NIP", "1234563218", "2019-01-01", "2020-06-30"))
+        self.assertIsNone(self.store.lookup("NIP", "1234563218", "2021-01-01", "2022-01-31"))
+        self.assertIsNone(self.store.lookup("NIP", "1234563218", "2021-01-01"))
+        self.assertIsNone(self.store.lookup("KRS", "1234563218", "2021-01-01", "2021-02-01"))
+
+    def test_wider_history_is_not_overwritten(self):
+        self.assertTrue(self.store.save("NIP", "1234563218", _response([]), None, "2024-12-31"))
+        self.assertFalse(self.store.save("NIP", "1234563218", _response([]), "2024-01-01", "2024-06-30"))
+        self.assertIsNotNone(self.store.lookup("NIP", "1234563218", "2010-01-01", "2010-12-31"))
+
+    def test_normalize_date(self):
+        self.assertEqual(normalize_date("2024-03-05T10:00:00"), "2024-03-05")
+        self.assertIsNone(normalize_date(""))
+        with self.assertRaises(ValueError):
+            normalize_date("05.03.2024")
+
+
+class TestRangedFetch(unittest.TestCase):
+    """Testy dla fetch_inner_element z historią"""
+
+    def test_history_serves_narrower_range_without_request(self):
+        stub, _ = start_stub_server()
+        self.addCleanup(stub.server_close)
+        self.addCleanup(stub.shutdown)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        store = HistoryStore(directory)
+
+        wide = fetch_inner_element(krs="12345", date_from="2020-01-01", date_to="2024-12-31", timeout=5,
+                                   retries=1, endpoint=stub.endpoint, history=store)
+        narrow = fetch_inner_element(krs="0000012345", date_from="2023-01-01", date_to="2023-06-30", timeout=5,
+                                     retries=1, endpoint=stub.endpoint, history=store)
+
+        self.assertEqual(stub.stats.snapshot()["ok"], 1)
+        self.assertEqual(parse_crbr_xml(narrow)["podmiot"], parse_crbr_xml(wide)["podmiot"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla pomijania niezmienionych raportów (odcisk danych w pliku <pdf>.fp)
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from core.crbr_bulk_to_pdf import existing_fingerprint, fingerprint_path, render_pdf, report_fingerprint
+from utils.logger_config import get_metrics
+from utils.render_context import RenderContext
+from crbr_synthetic import build_crbr_response
+from xml_index_parser import parse_crbr_xml_indexed
+
+
+def _record(beneficiaries=2):
+    # Stały znacznik czasu wniosku — inaczej odcisk zmienia się co sekundę
+    return parse_crbr_xml_indexed(build_crbr_response("1234563218", beneficiaries=(beneficiaries, beneficiaries),
+                                                      envelope=False, now=datetime(2024, 1, 2, 3, 4, 5)))
+
+
+class TestReportFingerprint(unittest.TestCase):
+    """Testy dla report_fingerprint/existing_fingerprint"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.out_path = os.path.join(self.tmp, "raport.pdf")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_fingerprint_follows_data_and_version(self):
+        record = _record()
+        fingerprint = report_fingerprint(record)
+        self.assertEqual(report_fingerprint(_record()), fingerprint)
+        with mock.patch("core.crbr_bulk_to_pdf.RENDERER_VERSION", "test"):
+            self.assertNotEqual(report_fingerprint(record), fingerprint)
+        record["sankcje"] = [{"source": "MF", "name": "X"}]
+        self.assertNotEqual(report_fingerprint(record), fingerprint)
+
+    def test_new_request_changes_fingerprint(self):
+        # Identyfikator i daty wniosku są drukowane w raporcie — nowe zapytanie to nowy raport
+        record = _record()
+        fresh = _record()
+        fresh["meta"]["id_wniosku"] = "INNY"
+        self.assertNotEqual(report_fingerprint(fresh), report_fingerprint(record))
+
+    def test_fingerprint_is_read_back_from_large_report(self):
+        record = _record(150)
+        render_pdf(record, self.out_path)
+        self.assertEqual(existing_fingerprint(self.out_path), report_fingerprint(record))
+
+    def test_missing_or_foreign_file(self):
+        self.assertIsNone(existing_fingerprint(self.out_path))
+        with open(self.out_path, "wb") as f:
+            f.write(b"%PDF-1.4\nniepelny")
+        self.assertIsNone(existing_fingerprint(self.out_path))
+        with open(fingerprint_path(self.out_path), "w", encoding="ascii") as f:
+            f.write("nie-odcisk")
+        self.assertIsNone(existing_fingerprint(self.out_path))
+
+    def test_fingerprint_does_not_depend_on_pdf_layout(self):
+        record = _record()
+        render_pdf(record, self.out_path)
+        # Aktualizacja przyrostowa dopisuje nowy xref i trailer na końcu pliku
+        with open(self.out_path, "ab") as f:
+            f.write(b"\n1 0 obj\n<< >>\nendobj\nxref\n0 1\n0000000000 65535 f \ntrailer\n<< /Size 1 >>\n"
+                    b"startxref\n0\n%%EOF\n")
+        self.assertEqual(existing_fingerprint(self.out_path), report_fingerprint(record))
+        os.remove(self.out_path)
+        self.assertIsNone(existing_fingerprint(self.out_path))
+
+
+class TestIdempotentRender(unittest.TestCase):
+    """Testy dla render_pdf z pominięciem aktualnych raportów"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.out_path = os.path.join(self.tmp, "raport.pdf")
+        get_metrics().reset()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_unchanged_report_is_skipped(self):
+        record = _record()
+        self.assertTrue(render_pdf(record, self.out_path))
+        mtime = os.stat(self.out_path).st_mtime_ns
+        self.assertFalse(render_pdf(_record(), self.out_path))
+        self.assertEqual(os.stat(self.out_path).st_mtime_ns, mtime)
+        self.assertEqual(get_metrics().snapshot()["cache_hit_rates"]["render_unchanged"], 0.5)
+
+    def test_changed_screening_result_is_rendered(self):
+        record = _record()
+        render_pdf(record, self.out_path)
+        record["sankcje"] = [{"source": "MF", "name": "X", "reason": "NIP", "date": "2022", "status": "Aktywny"}]
+        self.assertTrue(render_pdf(record, self.out_path))
+        self.assertEqual(existing_fingerprint(self.out_path), report_fingerprint(record))
+
+    def test_force_renders_unchanged_report(self):
+        record = _record()
+        render_pdf(record, self.out_path)
+        self.assertTrue(render_pdf(record, self.out_path, RenderContext(force=True)))
+
+    def test_write_is_atomic(self):
+        record = _record()
+        render_pdf(record, self.out_path)
+        with mock.patch("core.crbr_bulk_to_pdf.report_story", side_effect=RuntimeError("przerwano")):
+            with self.assertRaises(RuntimeError):
+                render_pdf(_record(3), self.out_path)
+        self.assertEqual(sorted(os.listdir(self.tmp)), ["raport.pdf", "raport.pdf.fp"])
+        self.assertEqual(existing_fingerprint(self.out_path), report_fingerprint(record))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla długich tabel raportu (bloki LongTable)
+"""
+
+import io
+import unittest
+
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import KeepTogether, LongTable, Paragraph, SimpleDocTemplate, Table
+
+from utils.pdf_table_helpers import (LONG_TABLE_ROWS, TABLE_BLOCK_ROWS, TableBlocks, _block_styles,
+                                     create_beneficiaries_table, create_detailed_entitlements_table)
+from utils.crbr_models import Beneficiary, Entitlement
+from utils.render_context import RenderContext
+from core.crbr_bulk_to_pdf import report_document
+from core.render_benchmark import benchmark_tables
+
+
+def _beneficiaries(count):
+    return [Beneficiary(imie="Jan", nazwisko=f"Nowak {i}", pesel="%011d" % i, uprawnienia=["udziały"],
+                        szczegolowe_uprawnienia=[Entitlement(typ="Bezpośrednie", kod="001", rodzaj="udziały")])
+            for i in range(count)]
+
+
+class TestLongTables(unittest.TestCase):
+    """Testy dla create_beneficiaries_table/create_detailed_entitlements_table powyżej progu"""
+
+    def setUp(self):
+        self.context = RenderContext()
+
+    def test_short_table_stays_single(self):
+        table = create_beneficiaries_table(_beneficiaries(LONG_TABLE_ROWS - 1), context=self.context)
+        self.assertIsInstance(table, Table)
+        self.assertNotIsInstance(table, TableBlocks)
+
+    def test_long_table_is_split_into_blocks_with_header(self):
+        count = TABLE_BLOCK_ROWS * 3 + 7
+        table = create_beneficiaries_table(_beneficiaries(count), context=self.context)
+        self.assertIsInstance(table, TableBlocks)
+        self.assertEqual(len(table.blocks), 4)
+        for block in table.blocks:
+            self.assertIsInstance(block, LongTable)
+            self.assertEqual(block._cellvalues[0][0], "Imię i nazwisko")
+            self.assertEqual(block.repeatRows, 1)
+        self.assertEqual(sum(len(b._cellvalues) - 1 for b in table.blocks), count)
+
+    def test_row_styles_move_to_their_block(self):
+        commands = [("GRID", (0, 0), (-1, -1), 0.5, None), ("BACKGROUND", (1, 55), (1, 55), None)]
+        self.assertEqual(_block_styles(commands, 0, 0, 50), commands[:1])
+        self.assertEqual(_block_styles(commands, 0, 50, 100), [commands[0], ("BACKGROUND", (1, 5), (1, 5), None)])
+
+    def test_long_tables_render(self):
+        bens = _beneficiaries(LONG_TABLE_ROWS * 2)
+        entitlements = create_detailed_entitlements_table(
+            [e for b in bens for e in b.szczegolowe_uprawnienia], context=self.context)
+        self.assertIsInstance(entitlements, TableBlocks)
+        buffer = io.BytesIO()
+        doc = report_document(buffer)
+        doc.build([create_beneficiaries_table(bens, context=self.context), entitlements])
+        self.assertTrue(buffer.getvalue().startswith(b"%PDF-"))
+        self.assertGreater(doc.page, 5)
+
+    def test_blocks_report_real_height(self):
+        table = create_beneficiaries_table(_beneficiaries(LONG_TABLE_ROWS * 2), context=self.context)
+        width, height = table.wrap(500, 10 ** 6)
+        self.assertEqual(height, sum(block.wrap(500, 10 ** 6)[1] for block in table.blocks))
+        self.assertLess(height, 10 ** 6)
+
+        # Tabela mieszcząca się na stronie jest rysowana w całości, bez podziału
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=(A4[0], height + 200))
+        doc.build([KeepTogether([Paragraph("Beneficjenci", self.context.styles["Normal"]), table])])
+        self.assertEqual(doc.page, 1)
+
+    def test_benchmark_reports_time_per_row(self):
+        rows = benchmark_tables([20, 150])
+        self.assertEqual([(r["table"], r["rows"]) for r in rows],
+                         [("beneficjenci", 20), ("uprawnienia", 20), ("beneficjenci", 150), ("uprawnienia", 150)])
+        for row in rows:
+            self.assertGreater(row["ms_per_row"], 0)
+            self.assertGreaterEqual(row["pages"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla rejestru metryk (logger_config)
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from logger_config import MetricsRegistry, SIZE_BUCKETS
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Testy dla MetricsRegistry"""
+
+    def setUp(self):
+        self.metrics = MetricsRegistry()
+
+    def test_counters_gauges_histograms(self):
+        self.metrics.inc("crbr_http_responses_total", status=200)
+        self.metrics.inc("crbr_http_responses_total", status=200)
+        self.metrics.add_gauge("crbr_fetch_in_flight", 2)
+        self.metrics.add_gauge("crbr_fetch_in_flight", -1)
+        for value in (0.02, 0.2, 3.0):
+            self.metrics.observe("crbr_stage_seconds", value, stage="parse")
+
+        snap = self.metrics.snapshot()
+        self.assertEqual(snap["counters"]["crbr_http_responses_total"]["status=200"], 2)
+        self.assertEqual(snap["gauges"]["crbr_fetch_in_flight"][""], 1)
+        hist = snap["histograms"]["crbr_stage_seconds"]["stage=parse"]
+        self.assertEqual(hist["count"], 3)
+        self.assertAlmostEqual(hist["sum"], 3.22)
+        self.assertEqual(hist["max"], 3.0)
+        self.assertEqual(hist["p50"], 0.25)
+
+    def test_timer_and_cache_hit_rate(self):
+        with self.metrics.timer("crbr_stage_seconds", stage="render"):
+            pass
+        for hit in (True, False, True, True):
+            self.metrics.record_cache("report_dedup", hit)
+
+        snap = self.metrics.snapshot()
+        self.assertEqual(snap["histograms"]["crbr_stage_seconds"]["stage=render"]["count"], 1)
+        self.assertEqual(snap["cache_hit_rates"]["report_dedup"], 0.75)
+        json.loads(self.metrics.to_json())
+
+    def test_prometheus_format(self):
+        self.metrics.inc("crbr_fetch_retries_total")
+        self.metrics.observe("crbr_response_bytes", 5000, buckets=SIZE_BUCKETS)
+        text = self.metrics.to_prometheus()
+
+        self.assertIn("# TYPE crbr_fetch_retries_total counter", text)
+        self.assertIn("crbr_fetch_retries_total 1", text)
+        self.assertIn('crbr_response_bytes_bucket{le="4096"} 0', text)
+        self.assertIn('crbr_response_bytes_bucket{le="16384"} 1', text)
+        self.assertIn('crbr_response_bytes_bucket{le="+Inf"} 1', text)
+        self.assertIn("crbr_response_bytes_count 1", text)
+
+
+class TestStageInstrumentation(unittest.TestCase):
+    """Etapy potoku zapisują czasy do globalnego rejestru"""
+
+    def test_parse_is_timed(self):
+        # crbr_bulk_to_pdf korzysta z utils.logger_config (ten sam rejestr)
+        from utils.logger_config import get_metrics, dump_metrics
+        from crbr_stub_server import build_synthetic_response
+        from crbr_bulk_to_pdf import extract_inner_xml_from_soap, parse_crbr_xml
+
+        metrics = get_metrics()
+        metrics.reset()
+        parse_crbr_xml(extract_inner_xml_from_soap(build_synthetic_response("1234563218")))
+        self.assertEqual(metrics.snapshot()["histograms"]["crbr_stage_seconds"]["stage=parse"]["count"], 1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = dump_metrics(os.path.join(tmp, "metrics.prom"))
+            with open(path, encoding="utf-8") as f:
+                self.assertIn('crbr_stage_seconds_count{stage="parse"} 1', f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
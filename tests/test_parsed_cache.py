@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla pamięci podręcznej sparsowanych rekordów CRBR
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from crbr_stub_server import build_synthetic_response
+from crbr_synthetic import build_crbr_response
+from crbr_bulk_to_pdf import soap_body_element, extract_inner_xml_from_soap, parse_crbr_record_cached
+from utils.parsed_cache import ParsedRecordCache, content_key
+from utils.logger_config import get_metrics
+
+
+class TestParsedRecordCache(unittest.TestCase):
+    """Testy dla ParsedRecordCache"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.inner = extract_inner_xml_from_soap(build_synthetic_response("1234563218", (2, 2)))
+
+    def test_second_parse_is_skipped_and_returns_copy(self):
+        cache = ParsedRecordCache(self.directory, version="1")
+        parser = mock.Mock(side_effect=lambda xml: {"podmiot": {"nip": "1234563218"}, "beneficjenci": [1, 2]})
+
+        first, hit = cache.get_or_parse(self.inner, parser)
+        self.assertFalse(hit)
+        first["sankcje"] = ["x"]
+        second, hit = cache.get_or_parse(self.inner, parser)
+
+        self.assertTrue(hit)
+        self.assertEqual(parser.call_count, 1)
+        self.assertNotIn("sankcje", second)
+
+    def test_disk_entries_survive_restart_and_version_change_invalidates(self):
+        key = content_key(self.inner)
+        ParsedRecordCache(self.directory, version="1").put(key, {"meta": {"rekord": 2}})
+
+        self.assertEqual(ParsedRecordCache(self.directory, version="1").get(key), {"meta": {"rekord": 2}})
+        self.assertIsNone(ParsedRecordCache(self.directory, version="2").get(key))
+        self.assertIsNone(ParsedRecordCache(self.directory, version="1").get("0" * 64))
+
+    def test_memory_lru_evicts_oldest(self):
+        cache = ParsedRecordCache(version="1", max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.put(key, {"k": key})
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), {"k": "c"})
+
+    def test_element_and_parser_output_round_trip(self):
+        cache = ParsedRecordCache(self.directory, version="1")
+        element = soap_body_element(build_synthetic_response("1234563218", (3, 3)))
+        metrics = get_metrics()
+        metrics.reset()
+
+        fresh = parse_crbr_record_cached(element, cache)
+        cached = parse_crbr_record_cached(element, cache)
+
+        self.assertEqual(cached, fresh)
+        self.assertEqual(metrics.snapshot()["cache_hit_rates"]["parsed"], 0.5)
+        self.assertTrue(os.listdir(self.directory))
+
+
+    def test_two_fetches_of_same_entity_hit(self):
+        """Nowy identyfikator i czas wniosku nie zmieniają klucza; trafienie ma metadane bieżącego wniosku"""
+        first = build_crbr_response("1234563218", beneficiaries=(2, 2), now=datetime(2024, 1, 2, 3, 4, 5))
+        second = build_crbr_response("1234563218", beneficiaries=(2, 2), now=datetime(2024, 3, 4, 5, 6, 7))
+        request_id = parse_crbr_record_cached(soap_body_element(first)).meta["id_wniosku"]
+        second = second.replace(request_id.encode(), b"F" * len(request_id))
+
+        cache = ParsedRecordCache(self.directory, version="1")
+        metrics = get_metrics()
+        metrics.reset()
+        parse_crbr_record_cached(soap_body_element(first), cache)
+        data = parse_crbr_record_cached(soap_body_element(second), cache)
+
+        self.assertEqual(metrics.snapshot()["cache_hit_rates"]["parsed"], 0.5)
+        self.assertEqual(data.meta["id_wniosku"], "F" * len(request_id))
+        self.assertEqual(data.meta["data_zlozenia"], "2024-03-04T05:06:07")
+        self.assertEqual(data, parse_crbr_record_cached(soap_body_element(second)))
+
+    def test_prune_removes_old_and_oversized_entries(self):
+        cache = ParsedRecordCache(self.directory, version="1", max_disk_bytes=None, max_age=None)
+        for i, key in enumerate(("aa" + "0" * 62, "bb" + "0" * 62, "cc" + "0" * 62)):
+            cache.put(key, {"k": "x" * 1000})
+            os.utime(cache._path(key), (time.time() - 3600 * (3 - i),) * 2)
+        size = os.path.getsize(cache._path("cc" + "0" * 62))
+
+        cache.max_age = 2.5 * 3600
+        self.assertEqual(cache.prune(), 1)  # najstarszy wpis
+        cache.max_disk_bytes = size
+        self.assertEqual(cache.prune(), 1)  # ponad limit — najdawniej używany
+        self.assertFalse(os.path.exists(cache._path("bb" + "0" * 62)))
+        self.assertTrue(os.path.exists(cache._path("cc" + "0" * 62)))
+
+
+if __name__ == "__main__":
+    unittest.main()
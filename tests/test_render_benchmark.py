@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla benchmarku renderowania raportów
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from core.render_benchmark import benchmark_reports, main, synthetic_report_record
+
+
+class TestSyntheticReportRecord(unittest.TestCase):
+    """Testy dla synthetic_report_record"""
+
+    def test_variants(self):
+        self.assertIsNone(synthetic_report_record(3, "none").sankcje)
+        short = synthetic_report_record(3, "sanctions").sankcje
+        long = synthetic_report_record(3, "mswia_long").sankcje
+        self.assertEqual([s["source"] for s in short], ["MF", "UE", "MSWiA"])
+        self.assertGreater(len(long[-1]["decision"]), 10 * len(short[-1]["decision"]))
+        self.assertEqual(len(synthetic_report_record(0).beneficjenci), 0)
+        with self.assertRaises(ValueError):
+            synthetic_report_record(1, "inny")
+
+
+class TestBenchmarkReports(unittest.TestCase):
+    """Testy dla benchmark_reports"""
+
+    def test_warm_rows(self):
+        rows = benchmark_reports([0, 20], variants=("none", "mswia_long"), repeat=1, cold=False)
+        self.assertEqual([(r["beneficiaries"], r["variant"], r["font"]) for r in rows],
+                         [(0, "none", "warm"), (0, "mswia_long", "warm"),
+                          (20, "none", "warm"), (20, "mswia_long", "warm")])
+        for row in rows:
+            self.assertGreater(row["wall_s"], 0)
+            self.assertGreater(row["bytes"], 1000)
+            self.assertGreater(row["peak_kb"], 0)
+        # Długie uzasadnienie i więcej beneficjentów — więcej stron
+        self.assertGreater(rows[1]["pages"], rows[0]["pages"])
+        self.assertGreater(rows[2]["pages"], rows[0]["pages"])
+
+    def test_cold_row_in_fresh_process(self):
+        cold, warm = benchmark_reports([0], variants=("none",), repeat=1)
+        self.assertEqual((cold["font"], warm["font"]), ("cold", "warm"))
+        self.assertEqual(cold["pages"], warm["pages"])
+        # Świeży proces ładuje czcionkę TTF — więcej pamięci niż przy gotowym kontekście
+        self.assertGreater(cold["peak_kb"], warm["peak_kb"])
+
+    def test_cli_json(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        path = os.path.join(tmp, "bench.json")
+        main(["--reports", "--beneficiaries", "1", "--variants", "sanctions", "--no-cold", "--json", path])
+        with open(path, encoding="utf-8") as f:
+            result = json.load(f)
+        self.assertIn("reportlab", result["environment"])
+        self.assertEqual(len(result["reports"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
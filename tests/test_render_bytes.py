@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla renderowania raportu do pamięci (render_pdf_bytes)
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import urllib.request
+from datetime import datetime
+from unittest import mock
+
+from lxml import etree
+
+from core.crbr_bulk_to_pdf import existing_fingerprint, render_pdf, render_pdf_bytes, report_fingerprint
+from utils.render_context import RenderContext
+from crbr_synthetic import build_crbr_response
+from xml_index_parser import parse_crbr_xml_indexed
+
+
+def _record():
+    return parse_crbr_xml_indexed(build_crbr_response("1234563218", beneficiaries=(2, 2), envelope=False))
+
+
+class TestRenderPdfBytes(unittest.TestCase):
+    """Testy dla render_pdf_bytes"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_same_document_as_file_render(self):
+        record = _record()
+        context = RenderContext(datetime(2024, 1, 2, 3, 4, 5))
+        content = render_pdf_bytes(record, context)
+        self.assertTrue(content.startswith(b"%PDF-"))
+        self.assertEqual(os.listdir(self.tmp), [])
+
+        path = os.path.join(self.tmp, "raport.pdf")
+        render_pdf(record, path, context)
+        with open(path, "rb") as f:
+            on_disk = f.read()
+        # Różnią się tylko identyfikatorem dokumentu i datą utworzenia w metadanych
+        self.assertAlmostEqual(len(content), len(on_disk), delta=64)
+
+        # Bajty zapisane pod docelową nazwą są rozpoznawane jako aktualny raport
+        with open(path, "wb") as f:
+            f.write(content)
+        self.assertEqual(existing_fingerprint(path), report_fingerprint(record))
+        self.assertFalse(render_pdf(record, path, context))
+
+
+class TestServicePdfResponse(unittest.TestCase):
+    """GET /report?format=pdf zwraca dokument bez zapisu na dysk"""
+
+    def test_pdf_format(self):
+        from crbr_stub_server import start_stub_server
+        from crbr_service import ReportService, start_report_service
+
+        stub, _ = start_stub_server()
+        self.addCleanup(stub.server_close)
+        self.addCleanup(stub.shutdown)
+        out_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, out_dir, True)
+
+        service = ReportService(out_dir, workers=2, endpoint=stub.endpoint, timeout=5)
+        self.addCleanup(service.shutdown)
+        server, _ = start_report_service(service)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        host, port = server.server_address[:2]
+
+        with urllib.request.urlopen(f"http://{host}:{port}/report?nip=1234563218&format=pdf", timeout=30) as resp:
+            self.assertEqual(resp.headers["Content-Type"], "application/pdf")
+            self.assertIn("crbr_1234563218_", resp.headers["Content-Disposition"])
+            self.assertEqual(resp.headers["X-Sanctions-Count"], "0")
+            self.assertTrue(resp.read().startswith(b"%PDF-"))
+        self.assertEqual([p for p in os.listdir(out_dir) if p.endswith(".pdf")], [])
+
+        with urllib.request.urlopen(f"http://{host}:{port}/status", timeout=5) as resp:
+            self.assertEqual(sum(c["completed"] for c in json.loads(resp.read()).values()), 1)
+
+
+    def test_multi_filing_response(self):
+        from crbr_service import ReportService
+
+        out_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, out_dir, True)
+        service = ReportService(out_dir, workers=2)
+        self.addCleanup(service.shutdown)
+        response = etree.fromstring(build_crbr_response("1234563218", filings=2, envelope=False))
+        with mock.patch("crbr_service.fetch_inner_element_by_nip", return_value=response):
+            result = service._generate("1234563218")
+            report = service._generate_bytes("1234563218")
+        # Raport na zgłoszenie; w pamięci — jeden dokument z zakładką na zgłoszenie
+        self.assertEqual(len(result["pdfs"]), 2)
+        self.assertEqual(result["pdf"], result["pdfs"][0])
+        self.assertIn(b"/Outlines", report["content"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla kontekstu renderowania raportów PDF
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from utils import render_context
+from utils.render_context import RenderContext
+from utils.crbr_models import Beneficiary
+from utils.pdf_table_helpers import create_beneficiaries_table
+from crbr_bulk_to_pdf import render_pdf
+from xml_index_parser import parse_crbr_xml_indexed
+from crbr_synthetic import build_crbr_response
+
+
+class TestRenderContext(unittest.TestCase):
+    """Testy dla RenderContext"""
+
+    def test_resources_are_shared_between_contexts(self):
+        first, second = RenderContext(), RenderContext()
+        self.assertIs(first.styles, second.styles)
+        self.assertIs(first.cell_style, first.styles["TableCell"])
+        self.assertEqual(first.font_name, second.font_name)
+
+    def test_header_uses_run_timestamp(self):
+        context = RenderContext(datetime(2024, 1, 2, 3, 4, 5))
+        self.assertEqual(context.generated_at, "02.01.2024 03:04:05")
+        self.assertTrue(context.header_text.endswith(", 02.01.2024 03:04:05"))
+
+    def test_tables_use_context_font(self):
+        context = RenderContext()
+        table = create_beneficiaries_table([Beneficiary(imie="Jan", nazwisko="Nowak")], context=context)
+        self.assertIs(table._cellvalues[1][0].style, context.cell_style)
+
+
+class TestRenderWithContext(unittest.TestCase):
+    """render_pdf z kontekstem przebiegu"""
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+        self.data = parse_crbr_xml_indexed(build_crbr_response("1234563218", beneficiaries=(3, 3), envelope=False))
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir, ignore_errors=True)
+
+    def test_host_resolved_once_per_run(self):
+        render_context.host_ip.cache_clear()
+        try:
+            with mock.patch.object(render_context.socket, "gethostbyname", return_value="10.0.0.1") as lookup:
+                context = RenderContext()
+                for i in range(3):
+                    path = os.path.join(self.out_dir, f"r{i}.pdf")
+                    render_pdf(self.data, path, context)
+                    with open(path, "rb") as f:
+                        self.assertTrue(f.read(5) == b"%PDF-")
+            self.assertEqual(lookup.call_count, 1)
+            self.assertEqual(context.host_ip, "10.0.0.1")
+        finally:
+            render_context.host_ip.cache_clear()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla puli procesów renderujących PDF
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from core.render_pool import RenderPool, encode_record, decode_record
+from utils.logger_config import get_metrics
+from utils.render_context import RenderContext
+from crbr_synthetic import build_crbr_response
+from xml_index_parser import parse_crbr_record
+
+
+def _record(nip):
+    return parse_crbr_record(build_crbr_response(nip, beneficiaries=(2, 2), envelope=False))
+
+
+class TestRecordEncoding(unittest.TestCase):
+    """Testy dla encode_record/decode_record"""
+
+    def test_round_trip(self):
+        record = _record("1234563218")
+        self.assertEqual(decode_record(encode_record(record)), record)
+
+    def test_falls_back_for_foreign_values(self):
+        record = _record("1234563218")
+        record.sankcje = [{"date": datetime(2024, 1, 2)}]
+        blob = encode_record(record)
+        self.assertEqual(blob[:1], b"P")
+        self.assertEqual(decode_record(blob), record)
+
+
+class TestRenderPool(unittest.TestCase):
+    """Testy dla RenderPool"""
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+        self.context = RenderContext(datetime(2024, 1, 2, 3, 4, 5))
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir, ignore_errors=True)
+
+    def _assert_pdf(self, path):
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(5), b"%PDF-")
+
+    def test_in_process_without_workers(self):
+        with RenderPool(0) as pool:
+            path = pool.render(_record("1234563218"), os.path.join(self.out_dir, "a.pdf"), self.context)
+        self._assert_pdf(path)
+
+    def test_process_pool_returns_paths_and_records_render_time(self):
+        nips = ["1234563218", "7393873360", "5260250995"]
+        get_metrics().reset()
+        with RenderPool(2) as pool:
+            futures = [pool.submit(_record(nip), os.path.join(self.out_dir, f"{nip}.pdf"), self.context)
+                       for nip in nips]
+            paths = [f.result(timeout=120) for f in futures]
+        self.assertEqual(paths, [os.path.join(self.out_dir, f"{nip}.pdf") for nip in nips])
+        for path in paths:
+            self._assert_pdf(path)
+        histograms = get_metrics().snapshot()["histograms"]
+        self.assertEqual(histograms["crbr_stage_seconds"]["stage=render"]["count"], len(nips))
+
+    def test_worker_error_is_reported(self):
+        with RenderPool(1) as pool:
+            future = pool.submit(_record("1234563218"), os.path.join(self.out_dir, "brak", "x.pdf"), self.context)
+            with self.assertRaises(Exception):
+                future.result(timeout=120)
+
+
+class TestBulkWithRenderPool(unittest.TestCase):
+    """bulk_from_csv zleca render puli procesów i zapisuje wyniki w dzienniku"""
+
+    def test_bulk_renders_in_pool(self):
+        from crbr_stub_server import start_stub_server
+        from crbr_bulk_to_pdf import bulk_from_csv
+        from run_journal import load_journal, journal_path_for, STATE_DONE
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        stub, _ = start_stub_server()
+        self.addCleanup(stub.server_close)
+        self.addCleanup(stub.shutdown)
+
+        csv_path = os.path.join(tmp, "nips.csv")
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write("nip\n1234563218\n7393873360\n1234563218\n")
+        out_dir = os.path.join(tmp, "out")
+
+        with RenderPool(2) as pool:
+            generated = bulk_from_csv(csv_path, out_dir, pause_sec=0, timeout=5, endpoint=stub.endpoint,
+                                      render_pool=pool)
+        self.assertEqual(len(generated), 2)
+        journal = load_journal(journal_path_for(out_dir, csv_path))
+        self.assertEqual({entry["state"] for entry in journal.values()}, {STATE_DONE})
+        self.assertEqual(sorted(entry["path"] for entry in journal.values()), sorted(generated))
+
+
+if __name__ == "__main__":
+    unittest.main()
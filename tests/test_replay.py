@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla trybu odtwarzania (replay) zapisanych odpowiedzi SOAP
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import zipfile
+from unittest import mock
+
+from replay import replay_responses, iter_recorded_responses
+
+
+SOAP_ENVELOPE = """<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope xmlns:soap="http://www.w3.org/2003/05/soap-envelope">
+    <soap:Header/>
+    <soap:Body>
+        <PobierzInformacjeOSpolkachIBeneficjentachOdpowiedz>
+            <PobierzInformacjeOSpolkachIBeneficjentachOdpowiedzDane>
+                <IdentyfikatorWniosku>REPLAY{idx}</IdentyfikatorWniosku>
+                <DataICzasZlozeniaWniosku>2023-01-01T12:00:00</DataICzasZlozeniaWniosku>
+                <ListaInformacjiOSpolkachIBeneficjentach>
+                    <SpolkaIBeneficjenci>
+                        <Nazwa>REPLAY SPOLKA {idx}</Nazwa>
+                        <NIP>{nip}</NIP>
+                        <ListaBeneficjentowRzeczywistych>
+                            <BeneficjentRzeczywisty>
+                                <PierwszeImie>Jan</PierwszeImie>
+                                <Nazwisko>Testowy</Nazwisko>
+                            </BeneficjentRzeczywisty>
+                        </ListaBeneficjentowRzeczywistych>
+                    </SpolkaIBeneficjenci>
+                </ListaInformacjiOSpolkachIBeneficjentach>
+            </PobierzInformacjeOSpolkachIBeneficjentachOdpowiedzDane>
+        </PobierzInformacjeOSpolkachIBeneficjentachOdpowiedz>
+    </soap:Body>
+</soap:Envelope>"""
+
+NIPS = ["1234563218", "7393873360"]
+
+
+class TestReplay(unittest.TestCase):
+    """Testy dla trybu replay"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.archive_dir = os.path.join(self.tmp, "archive")
+        os.makedirs(self.archive_dir)
+        for idx, nip in enumerate(NIPS):
+            path = os.path.join(self.archive_dir, f"soap_{nip}_{idx}.xml")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(SOAP_ENVELOPE.format(idx=idx, nip=nip))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_iter_directory_and_zip(self):
+        """Katalog i archiwum ZIP dają te same odpowiedzi"""
+        from_dir = list(iter_recorded_responses(self.archive_dir))
+        zip_path = os.path.join(self.tmp, "archive.zip")
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            for name, content in from_dir:
+                zf.writestr(f"nested/{name}", content)
+        from_zip = list(iter_recorded_responses(zip_path))
+
+        self.assertEqual(len(from_dir), 2)
+        self.assertEqual(from_dir, from_zip)
+
+    def test_replay_generates_pdfs_and_timings(self):
+        """Replay generuje PDF-y i raportuje czasy wszystkich etapów"""
+        out_dir = os.path.join(self.tmp, "out")
+        summary = replay_responses(self.archive_dir, out_dir, workers=2)
+
+        self.assertEqual(summary["documents"], 2)
+        self.assertEqual(summary["failed"], [])
+        self.assertEqual(len(summary["generated"]), 2)
+        for path in summary["generated"]:
+            self.assertTrue(os.path.exists(path))
+        for stage in ("extract", "parse", "screen", "render"):
+            self.assertEqual(summary["stages"][stage]["count"], 2)
+
+    def test_report_per_filing(self):
+        """Odpowiedź z kilkoma zgłoszeniami daje raport na zgłoszenie (jak w trybie online)"""
+        from crbr_synthetic import build_crbr_response
+        source = os.path.join(self.tmp, "filings")
+        os.makedirs(source)
+        with open(os.path.join(source, "soap_1234563218_0.xml"), "wb") as f:
+            f.write(build_crbr_response("1234563218", filings=3, beneficiaries=(1, 2)))
+        summary = replay_responses(source, os.path.join(self.tmp, "out"), workers=1)
+
+        self.assertEqual(summary["documents"], 1)
+        self.assertEqual(summary["reports"], 3)
+        self.assertEqual(len(set(summary["generated"])), 3)
+        self.assertEqual(summary["stages"]["parse"]["count"], 1)
+
+    def test_repeat_replay_renders_again(self):
+        """Powtórne odtworzenie mierzy renderowanie, chyba że pomijanie włączono jawnie"""
+        from utils.logger_config import get_metrics
+        out_dir = os.path.join(self.tmp, "out")
+        replay_responses(self.archive_dir, out_dir, workers=1)
+        get_metrics().reset()
+        summary = replay_responses(self.archive_dir, out_dir, workers=1)
+        self.assertFalse(summary["skip_unchanged"])
+        self.assertFalse(summary["parsed_cache"])
+        self.assertEqual(get_metrics().snapshot()["cache_hit_rates"].get("render_unchanged", 0.0), 0.0)
+
+        summary = replay_responses(self.archive_dir, out_dir, workers=1, skip_unchanged=True)
+        self.assertTrue(summary["skip_unchanged"])
+        self.assertEqual(get_metrics().snapshot()["cache_hit_rates"]["render_unchanged"], 0.5)
+
+    def test_replay_with_render_pool(self):
+        """Render w puli procesów daje te same pliki"""
+        from core.render_pool import RenderPool
+        out_dir = os.path.join(self.tmp, "out")
+        with RenderPool(2) as pool:
+            summary = replay_responses(self.archive_dir, out_dir, workers=2, render_pool=pool)
+
+        self.assertEqual(summary["failed"], [])
+        self.assertEqual(summary["render_workers"], 2)
+        for path in summary["generated"]:
+            self.assertTrue(os.path.exists(path))
+
+    def test_bounded_submission_window(self):
+        """Koperty są wczytywane najwyżej 2*workers przed zebraniem wyników"""
+        read, done = [], []
+
+        def responses():
+            for i in range(10):
+                read.append(i)
+                # Wczytane, a jeszcze nie zebrane: okno + bieżąca koperta
+                self.assertLessEqual(len(read) - len(done), 2 * 2 + 1)
+                yield f"soap_{i}.xml", b"<x/>"
+
+        def replay_one(name, *args):
+            time.sleep(0.05)  # wolny render — bez okna koperty byłyby wczytane wszystkie naraz
+            done.append(name)
+            return [name]
+
+        with mock.patch("replay.iter_recorded_responses", return_value=responses()), \
+                mock.patch("replay._replay_one", side_effect=replay_one):
+            summary = replay_responses(self.archive_dir, os.path.join(self.tmp, "out"), workers=2)
+        self.assertEqual(summary["generated"], [f"soap_{i}.xml" for i in range(10)])
+
+    def test_invalid_source(self):
+        """Niepoprawne źródło zgłasza ValueError"""
+        bogus = os.path.join(self.tmp, "bogus.txt")
+        with open(bogus, "w") as f:
+            f.write("not a zip")
+        with self.assertRaises(ValueError):
+            list(iter_recorded_responses(bogus))
+
+
+if __name__ == "__main__":
+    unittest.main()
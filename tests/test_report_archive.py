@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla archiwum ZIP raportów zapisywanego w trakcie przebiegu
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from datetime import datetime
+from unittest import mock
+
+from core.crbr_bulk_to_pdf import render_to_archive
+from core.report_archive import MANIFEST_NAME, ReportArchive
+from crbr_synthetic import build_crbr_response
+from xml_index_parser import parse_crbr_xml_indexed
+
+
+def _record(nip="1234563218"):
+    return parse_crbr_xml_indexed(build_crbr_response(nip, beneficiaries=(2, 2), envelope=False,
+                                                      now=datetime(2024, 1, 2, 3, 4, 5)))
+
+
+def _manifest(path):
+    with zipfile.ZipFile(path) as archive:
+        return {entry["name"]: entry for entry in json.loads(archive.read(MANIFEST_NAME))["files"]}
+
+
+class TestReportArchive(unittest.TestCase):
+    """Testy dla ReportArchive"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "raporty.zip")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_entries_and_manifest(self):
+        source = os.path.join(self.tmp, "b.pdf")
+        with open(source, "wb") as f:
+            f.write(b"%PDF-b")
+        with ReportArchive(self.path) as archive:
+            self.assertTrue(archive.add_bytes("a.pdf", b"%PDF-a", "1234563218", sanctions_count=1))
+            self.assertTrue(archive.add_file(source, "7393873360"))
+            # Plik tymczasowy do zamknięcia, docelowego jeszcze nie ma
+            self.assertFalse(os.path.exists(self.path))
+        with zipfile.ZipFile(self.path) as result:
+            self.assertEqual(result.namelist(), ["a.pdf", "b.pdf", MANIFEST_NAME])
+            self.assertEqual(result.getinfo("a.pdf").compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(result.read("b.pdf"), b"%PDF-b")
+        manifest = _manifest(self.path)
+        self.assertEqual(manifest["a.pdf"]["nips"], ["1234563218"])
+        self.assertEqual(manifest["a.pdf"]["sanctions_count"], 1)
+        self.assertEqual(manifest["b.pdf"]["bytes"], 6)
+        self.assertEqual(len(manifest["b.pdf"]["sha256"]), 64)
+
+    def test_duplicate_name_adds_nip(self):
+        archive = ReportArchive(self.path)
+        archive.add_bytes("a.pdf", b"1", "1234563218")
+        self.assertFalse(archive.add_bytes("a.pdf", b"2", "7393873360"))
+        self.assertIn("a.pdf", archive)
+        archive.close()
+        self.assertFalse(archive.add_bytes("c.pdf", b"3"))
+        self.assertEqual(_manifest(self.path)["a.pdf"]["nips"], ["1234563218", "7393873360"])
+
+    def test_resume_keeps_previous_reports(self):
+        with ReportArchive(self.path) as archive:
+            archive.add_bytes("a.pdf", b"1", "1234563218")
+            archive.add_bytes("wyniki.jsonl", b"{}\n")
+        with ReportArchive(self.path, resume=True) as archive:
+            archive.add_bytes("b.pdf", b"2", "7393873360")
+        manifest = _manifest(self.path)
+        self.assertEqual(sorted(manifest), ["a.pdf", "b.pdf"])
+        self.assertEqual(manifest["a.pdf"]["nips"], ["1234563218"])
+        with ReportArchive(self.path) as archive:
+            pass
+        self.assertEqual(_manifest(self.path), {})
+
+
+class TestRenderToArchive(unittest.TestCase):
+    """Testy dla render_to_archive"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.out_path = os.path.join(self.tmp, "raport.pdf")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_bytes_match_file_and_unchanged_report_is_archived(self):
+        path = os.path.join(self.tmp, "raporty.zip")
+        with ReportArchive(path) as archive:
+            self.assertTrue(render_to_archive(_record(), self.out_path, archive))
+        with open(self.out_path, "rb") as f, zipfile.ZipFile(path) as result:
+            self.assertEqual(result.read("raport.pdf"), f.read())
+
+        with ReportArchive(os.path.join(self.tmp, "ponownie.zip")) as archive:
+            self.assertFalse(render_to_archive(_record(), self.out_path, archive))
+            self.assertIn("raport.pdf", archive)
+
+
+class TestBulkArchive(unittest.TestCase):
+    """bulk_from_csv z archiwum ZIP"""
+
+    def setUp(self):
+        from crbr_stub_server import start_stub_server
+
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.stub, _ = start_stub_server()
+        self.addCleanup(self.stub.server_close)
+        self.addCleanup(self.stub.shutdown)
+        self.csv_path = os.path.join(self.tmp, "nips.csv")
+        with open(self.csv_path, "w", encoding="utf-8") as f:
+            f.write("nip\n1234563218\n7393873360\n1234563218\n")
+        self.out_dir = os.path.join(self.tmp, "out")
+        self.zip_path = os.path.join(self.tmp, "raporty.zip")
+
+    def _bulk(self, **kwargs):
+        from core.crbr_bulk_to_pdf import bulk_from_csv
+        with ReportArchive(self.zip_path, resume=kwargs.get("resume", False)) as archive:
+            return bulk_from_csv(self.csv_path, self.out_dir, pause_sec=0, timeout=5, endpoint=self.stub.endpoint,
+                                 archive=archive, **kwargs)
+
+    def test_reports_streamed_without_reading_files(self):
+        with mock.patch("core.report_archive.ReportArchive.add_file") as add_file:
+            generated = self._bulk()
+        add_file.assert_not_called()
+        manifest = _manifest(self.zip_path)
+        self.assertEqual(sorted(manifest), sorted(os.path.basename(p) for p in generated))
+        self.assertEqual(sorted(nip for entry in manifest.values() for nip in entry["nips"]),
+                         ["1234563218", "7393873360"])
+
+    def test_resume_adds_finished_reports(self):
+        self._bulk()
+        os.remove(self.zip_path)
+        self._bulk(resume=True)
+        self.assertEqual(len(_manifest(self.zip_path)), 2)
+
+    def test_render_pool_reports_added_from_disk(self):
+        from core.render_pool import RenderPool
+
+        with RenderPool(1) as pool:
+            generated = self._bulk(render_pool=pool)
+        self.assertEqual(sorted(_manifest(self.zip_path)), sorted(os.path.basename(p) for p in generated))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla priorytetowego harmonogramu zadań
+"""
+
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.request
+
+from request_scheduler import RequestScheduler, PRIORITY_BULK, PRIORITY_INTERACTIVE
+
+
+class TestRequestScheduler(unittest.TestCase):
+    """Testy dla RequestScheduler"""
+
+    def setUp(self):
+        self.scheduler = RequestScheduler(workers=2, reserved_interactive=1)
+        self.addCleanup(self.scheduler.shutdown, wait=True, cancel_pending=True)
+
+    def test_bulk_cannot_take_reserved_worker(self):
+        """Zadania masowe zajmują co najwyżej workers - reserved wątków"""
+        release = threading.Event()
+        for _ in range(3):
+            self.scheduler.submit(release.wait, 5, priority=PRIORITY_BULK)
+        threading.Event().wait(0.2)
+        stats = self.scheduler.stats()[PRIORITY_BULK]
+        self.assertEqual(stats["running"], 1)
+        self.assertEqual(stats["queued"], 2)
+
+        # Pilne zadanie wykonuje się od razu na zarezerwowanym wątku
+        urgent = self.scheduler.submit(lambda: "pilny", priority=PRIORITY_INTERACTIVE)
+        self.assertEqual(urgent.result(timeout=2), "pilny")
+        release.set()
+
+    def test_interactive_jumps_ahead_and_fifo_within_class(self):
+        """Zadania interaktywne wyprzedzają masowe; w klasie kolejność FIFO"""
+        order = []
+        gate = threading.Event()
+        blockers = [self.scheduler.submit(gate.wait, 5, priority=PRIORITY_INTERACTIVE) for _ in range(2)]
+        threading.Event().wait(0.1)
+
+        futures = [self.scheduler.submit(order.append, f"bulk-{i}", priority=PRIORITY_BULK) for i in range(3)]
+        futures += [self.scheduler.submit(order.append, f"int-{i}", priority=PRIORITY_INTERACTIVE) for i in range(2)]
+        gate.set()
+        for future in blockers + futures:
+            future.result(timeout=5)
+
+        self.assertEqual(order[:2], ["int-0", "int-1"])
+        self.assertEqual(order[2:], ["bulk-0", "bulk-1", "bulk-2"])
+
+    def test_cancel_pending_bulk(self):
+        release = threading.Event()
+        running = self.scheduler.submit(release.wait, 5, priority=PRIORITY_BULK)
+        queued = [self.scheduler.submit(lambda: None, priority=PRIORITY_BULK) for _ in range(3)]
+        threading.Event().wait(0.1)
+        self.assertEqual(self.scheduler.cancel_pending(PRIORITY_BULK), 3)
+        release.set()
+        self.assertTrue(running.result(timeout=2))
+        self.assertTrue(all(f.cancelled() for f in queued))
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(ValueError):
+            RequestScheduler(workers=1, reserved_interactive=1)
+
+
+class TestReportService(unittest.TestCase):
+    """Test trybu usługi wobec lokalnego serwera zastępczego CRBR"""
+
+    def test_report_endpoint(self):
+        from crbr_stub_server import start_stub_server
+        from crbr_service import ReportService, start_report_service
+
+        stub, _ = start_stub_server()
+        self.addCleanup(stub.server_close)
+        self.addCleanup(stub.shutdown)
+        out_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, out_dir, True)
+
+        service = ReportService(out_dir, workers=2, endpoint=stub.endpoint, timeout=5)
+        self.addCleanup(service.shutdown)
+        server, _ = start_report_service(service)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        host, port = server.server_address[:2]
+
+        with urllib.request.urlopen(f"http://{host}:{port}/report?nip=1234563218", timeout=30) as resp:
+            report = json.loads(resp.read())
+        self.assertEqual(report["nip"], "1234563218")
+        self.assertTrue(report["pdf"].endswith(".pdf"))
+
+        with urllib.request.urlopen(f"http://{host}:{port}/status", timeout=5) as resp:
+            stats = json.loads(resp.read())
+        self.assertEqual(stats[PRIORITY_INTERACTIVE]["completed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla dziennika przebiegu (checkpoint/resume)
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from run_journal import RunJournal, load_journal, journal_path_for, STATE_DONE, STATE_FAILED, STATE_STARTED
+
+
+class TestRunJournal(unittest.TestCase):
+    """Testy dla RunJournal"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = journal_path_for(self.tmp, "nips.csv")
+        self.pdf = os.path.join(self.tmp, "a.pdf")
+        with open(self.pdf, "wb") as f:
+            f.write(b"%PDF")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_last_state_wins_and_resume_skips_done(self):
+        with RunJournal(self.path, sync_every=2) as journal:
+            journal.record("1234563218", STATE_STARTED)
+            journal.record("1234563218", STATE_DONE, path=self.pdf)
+            journal.record("7393873360", STATE_STARTED)
+            journal.record("7393873360", STATE_FAILED, error="HTTP 503")
+            journal.record("5260250274", STATE_STARTED)
+
+        with RunJournal(self.path, resume=True) as journal:
+            self.assertEqual(journal.completed(), {"1234563218": self.pdf})
+            self.assertEqual(journal.states["7393873360"]["state"], STATE_FAILED)
+            self.assertEqual(journal.states["5260250274"]["state"], STATE_STARTED)
+
+    def test_missing_output_file_is_not_completed(self):
+        with RunJournal(self.path) as journal:
+            journal.record("1234563218", STATE_DONE, path=os.path.join(self.tmp, "brak.pdf"))
+        with RunJournal(self.path, resume=True) as journal:
+            self.assertEqual(journal.completed(), {})
+
+    def test_truncated_last_line_is_ignored(self):
+        with RunJournal(self.path) as journal:
+            journal.record("1234563218", STATE_DONE, path=self.pdf)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"nip": "7393873360", "sta')  # przerwany zapis
+
+        self.assertEqual(list(load_journal(self.path)), ["1234563218"])
+        with RunJournal(self.path, resume=True) as journal:
+            journal.record("7393873360", STATE_DONE, path=self.pdf)
+        self.assertEqual(sorted(load_journal(self.path)), ["1234563218", "7393873360"])
+
+    def test_new_run_truncates_journal(self):
+        with RunJournal(self.path) as journal:
+            journal.record("1234563218", STATE_DONE, path=self.pdf)
+        with RunJournal(self.path):
+            pass
+        self.assertEqual(load_journal(self.path), {})
+
+
+class TestBulkResume(unittest.TestCase):
+    """bulk_from_csv z --resume pobiera tylko nieukończone NIP-y"""
+
+    def test_resume_refetches_only_unfinished(self):
+        from crbr_stub_server import start_stub_server
+        from crbr_bulk_to_pdf import bulk_from_csv
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        stub, _ = start_stub_server()
+        self.addCleanup(stub.server_close)
+        self.addCleanup(stub.shutdown)
+
+        csv_path = os.path.join(tmp, "nips.csv")
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write("nip\n1234563218\n7393873360\n")
+        out_dir = os.path.join(tmp, "out")
+
+        first = bulk_from_csv(csv_path, out_dir, pause_sec=0, timeout=5, endpoint=stub.endpoint)
+        self.assertEqual(len(first), 2)
+        # Symulacja przerwania: ostatni NIP nie został ukończony
+        with open(journal_path_for(out_dir, csv_path), "a", encoding="utf-8") as f:
+            f.write('{"nip": "7393873360", "state": "started"}\n')
+
+        resumed = bulk_from_csv(csv_path, out_dir, pause_sec=0, timeout=5, endpoint=stub.endpoint, resume=True)
+        self.assertEqual(sorted(resumed), sorted(first))
+        self.assertEqual(stub.stats.snapshot()["ok"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
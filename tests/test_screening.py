@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla trybu samego sprawdzenia (bez renderowania PDF)
+"""
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from core.screening import RENDER_ALL, ScreeningWriter, load_exclusion_keywords, screen_entity
+from crbr_synthetic import build_crbr_response
+
+NIP = "1234563218"
+MF_MATCH = [{"source": "MF", "name": "X", "reason": "NIP", "date": "2022", "status": "Aktywny"}]
+
+
+def _response(nip=NIP):
+    return build_crbr_response(nip, beneficiaries=(2, 2), envelope=False)
+
+
+class TestScreenEntity(unittest.TestCase):
+    """Testy dla screen_entity"""
+
+    def test_clean_entity(self):
+        result, data = screen_entity(_response(), keywords=["Rosja"])
+        self.assertEqual(result["identifier"], NIP)
+        self.assertEqual(result["name"], data.podmiot.nazwa)
+        self.assertEqual(result["persons_screened"], 3)  # 2 beneficjentów + zgłaszający
+        self.assertEqual((result["matches"], result["keyword_hits"], result["flagged"]), (0, [], False))
+
+    def test_keyword_hit_in_response_text(self):
+        result, _ = screen_entity(_response(), keywords=["Rosja", "ukraina"])
+        self.assertEqual(result["keyword_hits"], ["ukraina"])
+        self.assertTrue(result["flagged"])
+
+    def test_sanctions_match(self):
+        with mock.patch("core.crbr_bulk_to_pdf.check_contractor_sanctions", return_value=MF_MATCH):
+            result, data = screen_entity(_response(), keywords=[])
+        self.assertEqual((result["matches"], result["match_sources"]), (1, ["MF"]))
+        self.assertEqual(data.sankcje, MF_MATCH)
+        self.assertTrue(result["flagged"])
+
+    def test_keywords_file(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        path = os.path.join(tmp, "slowa.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("# komentarz\nAlfa\n\nBeta\n")
+        self.assertEqual(load_exclusion_keywords(path), ["Alfa", "Beta"])
+        self.assertEqual(load_exclusion_keywords(os.path.join(tmp, "brak.txt")), ["Rosja", "Rosyjska"])
+
+
+class TestScreeningWriter(unittest.TestCase):
+    """Testy dla ScreeningWriter"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_jsonl_and_resume(self):
+        path = os.path.join(self.tmp, "wyniki.jsonl")
+        with ScreeningWriter(path, keywords=[]) as writer:
+            writer.write(writer.screen(_response())[0])
+        with ScreeningWriter(path, keywords=[], resume=True) as writer:
+            writer.write(writer.screen(_response("7393873360"))[0])
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([r["identifier"] for r in rows], [NIP, "7393873360"])
+
+    def test_csv_columns(self):
+        path = os.path.join(self.tmp, "wyniki.csv")
+        with ScreeningWriter(path, keywords=["ukraina", "kraków"]) as writer:
+            result, _ = writer.screen(_response())
+            self.assertTrue(writer.wants_pdf(result))
+            writer.write(result)
+        with open(path, encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["keyword_hits"], "ukraina; kraków")
+        self.assertEqual(rows[0]["flagged"], "True")
+
+    def test_invalid_render_mode(self):
+        with self.assertRaises(ValueError):
+            ScreeningWriter(os.path.join(self.tmp, "wyniki.jsonl"), render="czasem")
+
+
+class TestBulkScreening(unittest.TestCase):
+    """bulk_from_csv z zapisem wyników sprawdzenia"""
+
+    def setUp(self):
+        from crbr_stub_server import start_stub_server
+
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.stub, _ = start_stub_server()
+        self.addCleanup(self.stub.server_close)
+        self.addCleanup(self.stub.shutdown)
+        self.csv_path = os.path.join(self.tmp, "nips.csv")
+        with open(self.csv_path, "w", encoding="utf-8") as f:
+            f.write("nip\n1234563218\n7393873360\n1234563218\n")
+        self.out_dir = os.path.join(self.tmp, "out")
+        self.results = os.path.join(self.tmp, "wyniki.jsonl")
+
+    def _bulk(self, writer, **kwargs):
+        from core.crbr_bulk_to_pdf import bulk_from_csv
+        with writer:
+            return bulk_from_csv(self.csv_path, self.out_dir, pause_sec=0, timeout=5, endpoint=self.stub.endpoint,
+                                 screening=writer, **kwargs)
+
+    def _pdfs(self):
+        return sorted(p for p in os.listdir(self.out_dir) if p.endswith(".pdf")) if os.path.isdir(self.out_dir) else []
+
+    def _rows(self):
+        with open(self.results, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_no_pdfs_without_hits(self):
+        generated = self._bulk(ScreeningWriter(self.results, keywords=["Rosja"]))
+        self.assertEqual(generated, [self.results])
+        self.assertEqual(self._pdfs(), [])
+        self.assertEqual(sorted(r["identifier"] for r in self._rows()), ["1234563218", "7393873360"])
+
+    def test_pdf_only_for_flagged(self):
+        def sanctions(data):
+            return MF_MATCH if data.podmiot.nip == "7393873360" else None
+
+        with mock.patch("core.crbr_bulk_to_pdf.check_contractor_sanctions", side_effect=sanctions):
+            generated = self._bulk(ScreeningWriter(self.results, keywords=[]))
+        pdfs = self._pdfs()
+        self.assertEqual(len(pdfs), 1)
+        self.assertIn("7393873360", pdfs[0])
+        self.assertEqual(len(generated), 2)
+        flagged = [r for r in self._rows() if r["flagged"]]
+        self.assertEqual([os.path.basename(r["pdf"]) for r in flagged], pdfs)
+
+    def test_render_all(self):
+        self._bulk(ScreeningWriter(self.results, keywords=[], render=RENDER_ALL))
+        self.assertEqual(len(self._pdfs()), 2)
+
+
+
+class TestScreenCli(unittest.TestCase):
+    """--screen w wierszu poleceń"""
+
+    def test_no_input_leaves_no_output_files(self):
+        from core.crbr_bulk_to_pdf import main
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        results, archive = os.path.join(tmp, "wyniki.jsonl"), os.path.join(tmp, "raporty.zip")
+        argv = ["crbr_bulk_to_pdf.py", "--out", tmp, "--screen", results, "--zip", archive]
+        with mock.patch("sys.argv", argv), self.assertRaises(SystemExit) as exit_info:
+            main()
+        self.assertEqual(exit_info.exception.code, 2)
+        self.assertFalse(os.path.exists(results))
+        self.assertFalse(os.path.exists(archive))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla deduplikacji równoległych wywołań (single-flight)
+"""
+
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Testy dla SingleFlight"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        """Równoległe wywołania o ten sam klucz wykonują funkcję raz"""
+        flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def slow_fetch(key):
+            calls.append(key)
+            release.wait(5)
+            return f"xml-{key}"
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            futures = [pool.submit(flight.do, "1234563218", slow_fetch, "1234563218") for _ in range(5)]
+            time.sleep(0.2)
+            release.set()
+            results = [f.result() for f in futures]
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r[0] == "xml-1234563218" for r in results))
+        self.assertEqual(sum(1 for _, shared in results if shared), 5)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_different_keys_run_separately(self):
+        """Różne klucze nie są deduplikowane"""
+        flight = SingleFlight()
+        self.assertEqual(flight.do("a", lambda: 1), (1, False))
+        self.assertEqual(flight.do("b", lambda: 2), (2, False))
+
+    def test_error_is_shared_and_key_released(self):
+        """Wyjątek trafia do wszystkich oczekujących, a klucz jest zwalniany"""
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def failing():
+            started.set()
+            release.wait(5)
+            raise RuntimeError("HTTP 503")
+
+        errors = []
+
+        def call():
+            try:
+                flight.do("k", failing)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=call)
+        follower.start()
+        time.sleep(0.1)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        self.assertEqual(errors, ["HTTP 503", "HTTP 503"])
+        self.assertEqual(flight.do("k", lambda: "ok"), ("ok", False))
+
+
+if __name__ == "__main__":
+    unittest.main()
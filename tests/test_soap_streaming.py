@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla strumieniowego parsowania odpowiedzi SOAP
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from crbr_stub_server import build_synthetic_response, start_stub_server
+from crbr_bulk_to_pdf import (SoapStreamParser, fetch_inner_element_by_nip, extract_inner_xml_from_soap,
+                              parse_crbr_xml, soap_body_element, generate_pdf_from_xml_bytes,
+                              FetchCancelled, _SoapBodyReader)
+
+
+class _StreamedResponse:
+    """Odpowiedź requests (stream=True) podająca kopertę w porcjach"""
+
+    def __init__(self, body: bytes, on_chunk=None, on_end=None):
+        self.body = body
+        self.on_chunk = on_chunk
+        self.on_end = on_end
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), 64):
+            if self.on_chunk:
+                self.on_chunk(start)
+            yield self.body[start:start + 64]
+        if self.on_end:
+            self.on_end()
+
+    def close(self):
+        self.closed = True
+
+
+class TestSoapStreaming(unittest.TestCase):
+    """Testy dla SoapStreamParser i fetch_inner_element_by_nip"""
+
+    def test_chunked_feed_matches_buffered_path(self):
+        """Parsowanie porcjami daje te same dane co ścieżka buforowana"""
+        soap = build_synthetic_response("1234563218", beneficiaries=(5, 5))
+        parser = SoapStreamParser()
+        for i in range(0, len(soap), 7):
+            parser.feed(soap[i:i + 7])
+        inner = parser.close()
+
+        self.assertEqual(parser.size, len(soap))
+        self.assertEqual(parse_crbr_xml(inner), parse_crbr_xml(extract_inner_xml_from_soap(soap)))
+
+    def test_soap_body_element_parses_once(self):
+        """soap_body_element zwraca element odpowiedzi bez serializacji i ponownego parsowania"""
+        soap = build_synthetic_response("1234563218")
+        inner = soap_body_element(soap)
+        self.assertTrue(inner.tag.endswith("PobierzInformacjeOSpolkachIBeneficjentachOdpowiedz"))
+        self.assertEqual(parse_crbr_xml(inner), parse_crbr_xml(extract_inner_xml_from_soap(soap)))
+        self.assertEqual(soap_body_element(b"<Raport/>").tag, "Raport")
+
+    def test_generate_accepts_parsed_record(self):
+        """Rekord z parse_crbr_xml przechodzi do renderowania bez ponownego parsowania"""
+        out_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, out_dir, True)
+        record = parse_crbr_xml(soap_body_element(build_synthetic_response("1234563218")))
+        path = generate_pdf_from_xml_bytes(record, out_dir)
+        self.assertTrue(os.path.exists(path))
+        self.assertNotIn("sankcje", record)
+
+    def test_non_soap_document_returns_root(self):
+        parser = SoapStreamParser()
+        parser.feed(b"<Raport><NIP>1234563218</NIP></Raport>")
+        self.assertEqual(parser.close().tag, "Raport")
+
+    def test_fetch_streams_and_spools_archive(self):
+        """Odpowiedź jest parsowana strumieniowo i równolegle archiwizowana"""
+        stub, _ = start_stub_server()
+        self.addCleanup(stub.server_close)
+        self.addCleanup(stub.shutdown)
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir, True)
+
+        inner = fetch_inner_element_by_nip("7393873360", timeout=5, retries=1,
+                                           endpoint=stub.endpoint, archive_dir=archive_dir)
+        data = parse_crbr_xml(inner)
+        self.assertEqual(data["podmiot"]["nip"], "7393873360")
+
+        files = os.listdir(archive_dir)
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].startswith("soap_7393873360_") and files[0].endswith(".xml"))
+        with open(os.path.join(archive_dir, files[0]), "rb") as f:
+            archived = f.read()
+        self.assertEqual(parse_crbr_xml(extract_inner_xml_from_soap(archived)), data)
+
+
+    def test_cancelled_attempt_stops_reading_and_is_not_archived(self):
+        """Przegrana próba zamyka strumień i nie zostawia pliku w archiwum"""
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir, True)
+        reader = _SoapBodyReader("7393873360", archive_dir)
+        body = build_synthetic_response("7393873360")
+        cancelled = threading.Event()
+        resp = _StreamedResponse(body, on_chunk=lambda start: start >= 256 and cancelled.set())
+        with self.assertRaises(FetchCancelled):
+            reader(resp, cancelled)
+        self.assertTrue(resp.closed)
+        self.assertEqual(os.listdir(archive_dir), [])
+
+        # Odpowiedź odczytana w całości, ale po wygranej drugiej próby — też bez zapisu
+        finished = threading.Event()
+        with self.assertRaises(FetchCancelled):
+            reader(_StreamedResponse(body, on_end=finished.set), finished)
+        self.assertEqual(os.listdir(archive_dir), [])
+        inner, _ = reader(_StreamedResponse(body), threading.Event())
+        self.assertEqual(len(os.listdir(archive_dir)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla jednoprzebiegowego parsera XML CRBR
+"""
+
+import unittest
+
+from lxml import etree
+
+from crbr_stub_server import build_synthetic_response
+from crbr_bulk_to_pdf import extract_inner_xml_from_soap
+from xml_parsing_helpers import parse_crbr_xml_refactored
+from xml_index_parser import parse_crbr_xml_indexed, build_index
+
+# Przypadki brzegowe: przestrzenie nazw, kontenery z białymi znakami, tekst za dzieckiem (tail),
+# wszystkie rodzaje uprawnień i zgłaszający z funkcją
+EDGE_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<ns:Odpowiedz xmlns:ns="urn:a" xmlns:in10="urn:b">
+    <in10:IdentyfikatorWniosku>  </in10:IdentyfikatorWniosku>
+    <identyfikatorWniosku>ABC</identyfikatorWniosku>
+    <in10:DataICzasZlozeniaWniosku>2023-01-01T12:00:00</in10:DataICzasZlozeniaWniosku>
+    <SpolkaIBeneficjenci>
+        <in10:Nazwa>SPÓŁKA <b>X</b> SA</in10:Nazwa>
+        <NIP>1234563218</NIP>
+        <Teryt><Wojewodztwo>MAZOWIECKIE</Wojewodztwo></Teryt>
+        <DataPoczatkuPrezentacjiZgloszenia>2022-05-05</DataPoczatkuPrezentacjiZgloszenia>
+        <ListaBeneficjentowRzeczywistych>
+            <BeneficjentRzeczywisty>
+                <PierwszeImie>Jan</PierwszeImie>
+                <Nazwisko>Kowalski</Nazwisko>
+                <Obywatelstwo><Kod>PL</Kod><Nazwa>POLSKA</Nazwa></Obywatelstwo>
+                <ListaInformacjiOUdzialach>
+                    <InformacjaOUdzialach>
+                        <UprawnieniaWlascicielskieBezposrednie>
+                            <KodUprawnienWlascicielskich>024</KodUprawnienWlascicielskich>
+                            <RodzajUprawnienWlascicielskich>akcje</RodzajUprawnienWlascicielskich>
+                            <Ilosc>100</Ilosc>
+                            <InformacjaOUprzywilejowaniu>
+                                <KodUprzywilejowania>99</KodUprzywilejowania>
+                                <OpisUprzywilejowania>głos</OpisUprzywilejowania>
+                            </InformacjaOUprzywilejowaniu>
+                        </UprawnieniaWlascicielskieBezposrednie>
+                    </InformacjaOUdzialach>
+                    <InformacjaOUdzialach>
+                        <UprawnieniaWlascicielskiePosrednie>
+                            <RodzajUprawnienWlascicielskich>udziały</RodzajUprawnienWlascicielskich>
+                        </UprawnieniaWlascicielskiePosrednie>
+                    </InformacjaOUdzialach>
+                    <InformacjaOUdzialach>
+                        <InneUprawnienia>
+                            <RodzajInnychUprawnien><Kod>3</Kod><Opis>kontrola</Opis></RodzajInnychUprawnien>
+                        </InneUprawnienia>
+                    </InformacjaOUdzialach>
+                    <InformacjaOUdzialach/>
+                </ListaInformacjiOUdzialach>
+            </BeneficjentRzeczywisty>
+            <BeneficjentRzeczywisty>
+                <Nazwisko>Nowak</Nazwisko>
+                <KrajZamieszkania><Nazwa>NIEMCY</Nazwa></KrajZamieszkania>
+            </BeneficjentRzeczywisty>
+        </ListaBeneficjentowRzeczywistych>
+        <ListaZglaszajacych>
+            <Zglaszajacy>
+                <PierwszeImie>Anna</PierwszeImie>
+                <DataUrodzenia>1980-01-01</DataUrodzenia>
+                <ListaFunkcjiZglaszajacego>
+                    <Funkcja><Opis>PREZES</Opis></Funkcja>
+                    <Funkcja><Opis>WSPÓLNIK</Opis></Funkcja>
+                </ListaFunkcjiZglaszajacego>
+            </Zglaszajacy>
+        </ListaZglaszajacych>
+    </SpolkaIBeneficjenci>
+</ns:Odpowiedz>""".encode("utf-8")
+
+
+class TestXmlIndexParser(unittest.TestCase):
+    """Testy zgodności parse_crbr_xml_indexed z parse_crbr_xml_refactored"""
+
+    def test_edge_cases_match_reference(self):
+        self.assertEqual(parse_crbr_xml_indexed(EDGE_XML), parse_crbr_xml_refactored(EDGE_XML))
+
+    def test_synthetic_responses_match_reference(self):
+        for i in range(25):
+            with self.subTest(i=i):
+                inner = extract_inner_xml_from_soap(build_synthetic_response(str(5260000000 + i * 7919), (0, 8)))
+                self.assertEqual(parse_crbr_xml_indexed(inner), parse_crbr_xml_refactored(inner))
+
+    def test_empty_document(self):
+        self.assertEqual(parse_crbr_xml_indexed(b"<Raport/>"), parse_crbr_xml_refactored(b"<Raport/>"))
+
+    def test_sections_are_scoped(self):
+        index = build_index(etree.fromstring(EDGE_XML))
+        beneficiaries = index.all("BeneficjentRzeczywisty")
+        self.assertEqual([b.text("Nazwisko") for b in beneficiaries], ["Kowalski", "Nowak"])
+        self.assertEqual(beneficiaries[1].text("PierwszeImie"), "")
+        self.assertEqual(len(index.all("InformacjaOUdzialach")), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
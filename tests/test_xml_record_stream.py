@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Testy jednostkowe dla strumieniowego parsowania odpowiedzi z wieloma spółkami
+"""
+
+import os
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+
+from lxml import etree
+
+from crbr_stub_server import build_synthetic_response
+from crbr_synthetic import build_crbr_response
+from xml_index_parser import parse_crbr_xml_indexed
+from xml_record_stream import count_records, iter_crbr_records, records_from_element
+
+COMPANY = """
+        <SpolkaIBeneficjenci>
+            <Nazwa>SPÓŁKA {n}</Nazwa>
+            <NIP>{nip}</NIP>
+            <ListaBeneficjentowRzeczywistych>{beneficiaries}</ListaBeneficjentowRzeczywistych>
+            <DataPoczatkuPrezentacjiZgloszenia>2022-01-0{day}</DataPoczatkuPrezentacjiZgloszenia>
+            <NumerReferencyjny>REF{n}</NumerReferencyjny>
+            <ListaInformacjiORozbieznosciach>
+                <InformacjaORozbieznosciach>
+                    <IdentyfikatorUwagi>U{n}</IdentyfikatorUwagi>
+                    <InformacjaDlaZainteresowanego>Rozbieżność {n}</InformacjaDlaZainteresowanego>
+                </InformacjaORozbieznosciach>
+            </ListaInformacjiORozbieznosciach>
+        </SpolkaIBeneficjenci>"""
+
+BENEFICIARY = "<BeneficjentRzeczywisty><Nazwisko>{name}</Nazwisko></BeneficjentRzeczywisty>"
+
+
+def _document(companies) -> bytes:
+    parts = []
+    for n, names in enumerate(companies):
+        beneficiaries = "".join(BENEFICIARY.format(name=name) for name in names)
+        parts.append(COMPANY.format(n=n, nip=str(1000000000 + n), beneficiaries=beneficiaries, day=n % 9 + 1))
+    return ("<Odpowiedz><IdentyfikatorWniosku>W1</IdentyfikatorWniosku>"
+            "<DataICzasZlozeniaWniosku>2024-01-01T10:00:00</DataICzasZlozeniaWniosku>"
+            "<ListaInformacjiOSpolkachIBeneficjentach>" + "".join(parts) +
+            "</ListaInformacjiOSpolkachIBeneficjentach><Status>IstniejaInformacje</Status></Odpowiedz>"
+            ).encode("utf-8")
+
+
+class TestRecordStream(unittest.TestCase):
+    """Testy dla iter_crbr_records"""
+
+    def test_one_record_per_company_with_own_beneficiaries(self):
+        records = list(iter_crbr_records(_document([["Kowalski", "Nowak"], [], ["Wiśniewski"]])))
+
+        self.assertEqual([r["podmiot"]["nazwa"] for r in records], ["SPÓŁKA 0", "SPÓŁKA 1", "SPÓŁKA 2"])
+        self.assertEqual([[b["nazwisko"] for b in r["beneficjenci"]] for r in records],
+                         [["Kowalski", "Nowak"], [], ["Wiśniewski"]])
+        self.assertEqual([r["meta"]["rekord"] for r in records], [1, 2, 3])
+        self.assertEqual(records[2]["meta"]["id_wniosku"], "W1")
+        self.assertEqual(records[2]["meta"]["data_od"], "2022-01-03")
+        self.assertEqual(records[1]["rozbieznosci"], [{"identyfikator": "U1", "informacja": "Rozbieżność 1"}])
+
+    def test_single_company_envelope_matches_parser(self):
+        soap = build_synthetic_response("1234563218", beneficiaries=(3, 3))
+        records = list(iter_crbr_records(soap))
+        self.assertEqual(len(records), 1)
+        expected = parse_crbr_xml_indexed(soap)
+        for key in ("podmiot", "beneficjenci", "zglaszajacy"):
+            self.assertEqual(records[0][key], expected[key])
+
+    def test_document_without_companies_falls_back_to_whole_document(self):
+        xml = b"<Raport><Nazwa>X</Nazwa><NIP>1234563218</NIP></Raport>"
+        self.assertEqual(list(iter_crbr_records(xml)), [parse_crbr_xml_indexed(xml)])
+
+    def test_large_file_is_processed_in_bounded_memory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = os.path.join(directory, "duza_odpowiedz.xml")
+        with open(path, "wb") as f:
+            f.write(_document([["Kowalski"] * 5] * 4000))
+        size = os.path.getsize(path)
+
+        tracemalloc.start()
+        try:
+            count = sum(1 for _ in iter_crbr_records(path))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(count, 4000)
+        self.assertLess(peak, size / 4)
+
+
+class TestSplitFilings(unittest.TestCase):
+    """Testy dla split_filings — raport na spółkę/zgłoszenie odpowiedzi pobranej z CRBR"""
+
+    def test_single_filing_is_passed_through(self):
+        from core.crbr_bulk_to_pdf import split_filings
+        element = etree.fromstring(build_synthetic_response("1234563218"))
+        self.assertEqual(count_records(element), 1)
+        self.assertEqual(split_filings(element), [element])
+        record = parse_crbr_xml_indexed(element)
+        self.assertIs(split_filings(record)[0], record)
+
+    def test_filings_are_not_merged(self):
+        from core.crbr_bulk_to_pdf import report_path_for, split_filings
+        filings = split_filings(etree.fromstring(_document([["Kowalski"], ["Nowak", "Zieliński"]])))
+        self.assertEqual([[b.nazwisko for b in r.beneficjenci] for r in filings],
+                         [["Kowalski"], ["Nowak", "Zieliński"]])
+        self.assertEqual(len({report_path_for(r, "out") for r in filings}), 2)
+
+    def test_records_from_element_match_stream(self):
+        document = build_crbr_response("1234563218", filings=3, beneficiaries=(1, 3), discrepancies=1)
+        self.assertEqual([r.to_dict() for r in records_from_element(etree.fromstring(document))],
+                         list(iter_crbr_records(document)))
+
+
+class TestBulkFilings(unittest.TestCase):
+    """bulk_from_csv z odpowiedzią zawierającą kilka zgłoszeń"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.csv_path = os.path.join(self.tmp, "nips.csv")
+        with open(self.csv_path, "w", encoding="utf-8") as f:
+            f.write("nip\n1234563218\n")
+        self.out_dir = os.path.join(self.tmp, "out")
+
+    def _bulk(self, **kwargs):
+        from core.crbr_bulk_to_pdf import bulk_from_csv
+        response = etree.fromstring(_document([["Kowalski"], ["Nowak"], []]))
+        with mock.patch("core.crbr_bulk_to_pdf.fetch_inner_element_by_nip", return_value=response) as fetch:
+            generated = bulk_from_csv(self.csv_path, self.out_dir, pause_sec=0, **kwargs)
+        return generated, fetch
+
+    def test_report_per_filing_and_resume(self):
+        generated, _ = self._bulk()
+        self.assertEqual(len(generated), 3)
+        self.assertEqual(sorted(generated), sorted(os.path.join(self.out_dir, p) for p in os.listdir(self.out_dir)
+                                                   if p.endswith(".pdf")))
+
+        resumed, fetch = self._bulk(resume=True)
+        fetch.assert_not_called()
+        self.assertEqual(resumed, generated)
+
+
+if __name__ == "__main__":
+    unittest.main()